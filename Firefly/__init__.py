@@ -6,9 +6,12 @@ logging = FireflyLogging()
 
 from Firefly.helpers.alias import Alias
 from Firefly.helpers.scheduler import Scheduler
+from Firefly.helpers.metrics import Metrics
 
 aliases = Alias()
 scheduler = Scheduler()
+metrics = Metrics()
+metrics.listen_scheduler(scheduler.add_listener)
 
 
 from Firefly.const import ALEXA_OFF, ALEXA_ON
@@ -5,9 +5,10 @@ from aiohttp import web
 from aiohttp.web_request import Request as webRequest
 import aiohttp_cors
 
-from Firefly import logging
+from Firefly import logging, metrics
 from Firefly.const import API_ALEXA_VIEW, API_INFO_REQUEST, TYPE_AUTOMATION, TYPE_DEVICE
 from Firefly.helpers.events import Command, Request
+from Firefly.helpers.metrics import PROMETHEUS_CONTENT_TYPE
 #from Firefly.services.alexa import AlexaHomeRequest, process_alexa_request
 from Firefly.services.api_ai import process_api_ai_request
 
@@ -72,6 +73,10 @@ class FireflyCoreAPI:
       'method':   'GET',
       'path':     '/api/subscriptions',
       'function': self.get_subscriptions
+    }, {
+      'method':   'GET',
+      'path':     '/api/metrics',
+      'function': self.get_metrics
     }, {
       'method':   'POST',
       'path':     '/api/api_ai',
@@ -104,7 +109,7 @@ class FireflyCoreAPI:
 
   async def devices(self, request):
     devices = []
-    for ff_id, d in self.firefly.components.items():
+    for ff_id, d in self.firefly.component_items():
       if d.type == TYPE_DEVICE:
         devices.append({
           'alias':    d._alias,
@@ -118,7 +123,7 @@ class FireflyCoreAPI:
 
   async def rooms(self, request):
     devices = []
-    for ff_id, d in self.firefly.components.items():
+    for ff_id, d in self.firefly.component_items():
       if d.type == "ROOM":
         devices.append({
           'alias':    d._alias,
@@ -131,7 +136,7 @@ class FireflyCoreAPI:
 
   async def routines(self, request):
     devices = []
-    for ff_id, d in self.firefly.components.items():
+    for ff_id, d in self.firefly.component_items():
       if d.type == TYPE_AUTOMATION and 'routine' in d._package:
         devices.append({
           'alias':    d._alias,
@@ -211,7 +216,7 @@ class FireflyCoreAPI:
     if type(filter) is str:
       filter = [filter]
     views = []
-    for ff_id, device in self.firefly.components.items():
+    for ff_id, device in self.firefly.component_items():
       if device.type in filter or filter is None:
         data = yield from self.get_component_view(ff_id, source)
         views.append(data)
@@ -222,7 +227,7 @@ class FireflyCoreAPI:
     if type(filter) is str:
       filter = [filter]
     views = []
-    for ff_id, device in self.firefly.components.items():
+    for ff_id, device in self.firefly.component_items():
       if device.type in filter or filter is None:
         data = yield from self.get_component_alexa_view(ff_id, source)
         if data is not None:
@@ -298,6 +303,17 @@ class FireflyCoreAPI:
     return web.Response(text=data, content_type='application/json')
 
 
+  @asyncio.coroutine
+  def get_metrics(self, request: webRequest):
+    ''' Event bus, handler and startup phase metrics. Use ?format=prometheus for the Prometheus text format. '''
+    if request.rel_url.query.get('format') == 'prometheus':
+      text = metrics.export_prometheus(self.firefly.dispatcher) + self.firefly.startup.export_prometheus()
+      return web.Response(body=text.encode('utf-8'), headers={'Content-Type': PROMETHEUS_CONTENT_TYPE})
+    export = metrics.export(self.firefly.dispatcher)
+    export['startup'] = self.firefly.startup.export()
+    data = json.dumps(export, sort_keys=True)
+    return web.Response(text=data, content_type='application/json')
+
 
   def setup_api(self):
     for function in self.api_functions:
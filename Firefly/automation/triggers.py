@@ -1,4 +1,4 @@
-from typing import List, TypeVar
+from typing import Callable, List, TypeVar
 
 from Firefly import logging
 from Firefly.const import EVENT_ACTION_ANY, EVENT_ACTON_TYPE, SOURCE_LOCATION, SOURCE_TRIGGER, TIME
@@ -211,6 +211,143 @@ class Trigger(object):
     }
 
 
+"""
+Compiled triggers.
+
+compile_trigger turns a Trigger into a function check(firefly, event, ignore_event) -> bool that gives the same result
+as Trigger.check_trigger. The trigger type, the first property and the number compares are worked out once instead of
+on every event. The compiled checks are kept by the TriggerSet so Trigger objects (and their equality) are unchanged.
+"""
+
+
+def compile_trigger(trigger: Trigger) -> Callable:
+  """Compile a trigger into a check function.
+
+  Args:
+    trigger (Trigger): trigger to compile
+
+  Returns:
+    (Callable) check(firefly, event, ignore_event) -> bool
+  """
+  try:
+    if trigger.trigger_type == TIME_TRIGGER:
+      return _compile_time_trigger(trigger)
+    if trigger.trigger_type == LOCATION_TRIGGER:
+      return _compile_location_trigger(trigger)
+    if trigger.trigger_type == NUMBER_COMPARE_TRIGGER:
+      return _compile_number_compare_trigger(trigger)
+    return _compile_simple_trigger(trigger)
+  except Exception as e:
+    logging.info('[TRIGGERS] unable to compile trigger %s: %s' % (trigger, e))
+
+  def check(firefly, event, ignore_event=False):
+    return trigger.check_trigger(firefly, event, ignore_event)
+
+  return check
+
+
+def _compile_time_trigger(trigger: Trigger) -> Callable:
+  times = [(t.get('day'), t.get('month'), t['hour'], t['minute'], t['weekdays']) for t in trigger.trigger_action]
+
+  def check(firefly, event, ignore_event=False):
+    if event.source != TIME:
+      return False
+    event_action = event.event_action
+    for day, month, hour, minute, weekdays in times:
+      if day and event_action['day'] != day:
+        continue
+      if month and event_action['month'] != month:
+        continue
+      if event_action['hour'] == hour and event_action['minute'] == minute and event_action['weekday'] in weekdays:
+        return True
+    return False
+
+  return check
+
+
+def _compile_location_trigger(trigger: Trigger) -> Callable:
+  # None marks a trigger action without a location list. It fails the check like in Trigger.check_location_trigger.
+  day_events = [t.get(SOURCE_LOCATION) for t in trigger.trigger_action]
+
+  def check(firefly, event, ignore_event=False):
+    if event.source != SOURCE_LOCATION:
+      return False
+    if SOURCE_LOCATION not in event.event_action:
+      return False
+    location_event = event.event_action.get(SOURCE_LOCATION)
+    for day_event_list in day_events:
+      if day_event_list is None:
+        return False
+      if location_event in day_event_list:
+        return True
+    return False
+
+  return check
+
+
+def _compile_number_compare_trigger(trigger: Trigger) -> Callable:
+  listen_id = trigger.listen_id
+  trigger_action = trigger.trigger_action[0]
+  first_prop = list(trigger_action.keys())[0]
+  compares = {}
+  for prop, number_compares in trigger_action.items():
+    compares[prop] = [next(iter(c.items())) for c in number_compares]
+
+  def check(firefly, event, ignore_event=False):
+    if not ignore_event:
+      # Like Trigger.check_trigger this compares the only item in the event.
+      if len(event.event_action) != 1:
+        return False
+      (item, value), = event.event_action.items()
+      if item not in compares:
+        return False
+      return _number_compare(compares[item], value)
+    return _number_compare(compares[first_prop], firefly.current_state[listen_id][first_prop])
+
+  return check
+
+
+def _number_compare(compares: list, event_value) -> bool:
+  for operator, value in compares:
+    if operator == 'gt' and event_value > value:
+      continue
+    if operator == 'ge' and event_value >= value:
+      continue
+    if operator == 'lt' and event_value < value:
+      continue
+    if operator == 'le' and event_value <= value:
+      continue
+    if operator == 'eq' and event_value == value:
+      continue
+    return False
+  return True
+
+
+def _compile_simple_trigger(trigger: Trigger) -> Callable:
+  listen_id = trigger.listen_id
+  trigger_action = trigger.trigger_action[0]
+  listen_any = EVENT_ACTION_ANY in trigger_action
+  first_prop = list(trigger_action.keys())[0]
+
+  def check(firefly, event, ignore_event=False):
+    if not ignore_event and event.source == listen_id:
+      if listen_any:
+        return True
+      for item, value in event.event_action.items():
+        values = trigger_action.get(item)
+        if values is not None and (value in values or EVENT_ACTION_ANY in values):
+          return True
+      return False
+
+    try:
+      values = trigger_action[first_prop]
+      return firefly.current_state[listen_id][first_prop] in values or EVENT_ACTION_ANY in values
+    except:
+      return False
+
+  return check
+
+
 TriggerType = TypeVar('TriggerType', Trigger, List[Trigger])
 
 """
@@ -233,6 +370,7 @@ class TriggerSet(object):
     self.subscriber_id = subscriber_id
     self.trigger_set = []
     self.trigger_sources = set()
+    self._checks = None
     if trigger_set:
       self.import_trigger_set(trigger_set)
 
@@ -240,11 +378,54 @@ class TriggerSet(object):
     # Event source is not in TriggerSet sources -> return False.
     if event.source not in self.trigger_sources and not ignore_event:
       return False
-    for trigger in self.trigger_set:
-      if not trigger.check_trigger(self.firefly, event, ignore_event, **kwargs):
+    checks = self._checks
+    if checks is None:
+      checks = self._checks = [compile_trigger(trigger) for trigger in self.trigger_set]
+    firefly = self.firefly
+    for check in checks:
+      if not check(firefly, event, ignore_event):
         return False
     return True
 
+  def index_keys(self) -> list:
+    """Get the (source, property) pairs of the events that can match this TriggerSet.
+
+    Every trigger in the set has to match, so the set is only indexed under what one of its triggers needs:
+      - time and location triggers only match events from time or location.
+      - number compare triggers only match events with one of their properties.
+      - simple triggers only match events from their listen_id with one of their properties.
+
+    Returns:
+      (list) list of (source, property). A property of EVENT_ACTION_ANY matches any property.
+    """
+    trigger_types = [t.trigger_type for t in self.trigger_set]
+    if TIME_TRIGGER in trigger_types and LOCATION_TRIGGER in trigger_types:
+      return []
+    if TIME_TRIGGER in trigger_types:
+      return [(TIME, EVENT_ACTION_ANY)]
+    if LOCATION_TRIGGER in trigger_types:
+      return [(SOURCE_LOCATION, EVENT_ACTION_ANY)]
+
+    number_props = None
+    for trigger in self.trigger_set:
+      if trigger.trigger_type == NUMBER_COMPARE_TRIGGER:
+        number_props = list(trigger.trigger_action[0].keys())
+        break
+
+    keys = []
+    for source in self.trigger_sources:
+      props = number_props
+      if props is None:
+        props = [EVENT_ACTION_ANY]
+        for trigger in self.trigger_set:
+          if trigger.listen_id == source and trigger.trigger_type == SIMPLE_TRIGGER:
+            trigger_action = trigger.trigger_action[0]
+            if EVENT_ACTION_ANY not in trigger_action:
+              props = list(trigger_action.keys())
+            break
+      keys.extend((source, prop) for prop in props)
+    return keys
+
   def add_trigger(self, trigger: Trigger):
     if trigger in self.trigger_set:
       return False
@@ -255,13 +436,15 @@ class TriggerSet(object):
 
     self.trigger_sources.add(trigger.listen_id)
     self.trigger_set.append(trigger)
+    self._checks = None
     if self.check_for_number_compare(trigger.trigger_action):
       return self.add_number_compare_trigger(trigger)
     if trigger.listen_id != TIME:
       logging.debug('Adding subscription: %s %s %s' % (self.subscriber_id, trigger.listen_id, trigger.trigger_action))
       self.firefly.subscriptions.add_subscriber(self.subscriber_id, trigger.listen_id, trigger.trigger_action)
     else:
-      self.firefly.subscriptions.add_subscriber(self.subscriber_id, trigger.listen_id, EVENT_ACTION_ANY)
+      # Time triggers are woken up by the location when they are due instead of getting every TIME broadcast.
+      self.firefly.location.add_time_trigger(self.subscriber_id, trigger.trigger_action)
     return True
 
   def export(self, **kwargs):
@@ -322,19 +505,61 @@ class TriggerList(object):
     self.subscriber_id = subscriber_id
     self.trigger_list = []
     self.trigger_sources = set()
+    self._index = None
 
   def check_triggers(self, event: Event, ignore_event: bool = False, **kwargs) -> bool:
-    for trigger_set in self.trigger_list:
+    trigger_sets = self.trigger_list if ignore_event else self.get_trigger_sets(event)
+    for trigger_set in trigger_sets:
       if trigger_set.check_triggers(event, ignore_event, **kwargs):
         return True
     return False
 
+  def get_trigger_sets(self, event: Event) -> list:
+    """Get the TriggerSets that can match an event using the (source, property) index.
+
+    TriggerSets should not be changed after being added. Call rebuild_index if they are.
+
+    Args:
+      event (Event): event to check
+
+    Returns:
+      (list) TriggerSets in the order they were added.
+    """
+    if self._index is None:
+      self.rebuild_index()
+    by_prop = self._index.get(event.source)
+    if by_prop is None:
+      return []
+
+    matches = [by_prop[prop] for prop in event.event_action if prop in by_prop]
+    any_prop = by_prop.get(EVENT_ACTION_ANY)
+    if any_prop is not None:
+      matches.append(any_prop)
+    if len(matches) <= 1:
+      return matches[0] if matches else []
+
+    trigger_sets = set()
+    for m in matches:
+      trigger_sets.update(m)
+    return [t for t in self.trigger_list if t in trigger_sets]
+
+  def rebuild_index(self) -> None:
+    """Build the { SOURCE: { PROPERTY: [TriggerSets] } } index used by get_trigger_sets."""
+    index = {}
+    for trigger_set in self.trigger_list:
+      for source, prop in trigger_set.index_keys():
+        trigger_sets = index.setdefault(source, {}).setdefault(prop, [])
+        if trigger_set not in trigger_sets:
+          trigger_sets.append(trigger_set)
+    self._index = index
+
   def add_trigger_set(self, trigger_set: TriggerSet) -> bool:
     if trigger_set in self.trigger_list:
       return False
 
     self.trigger_list.append(trigger_set)
     self.trigger_sources.update(trigger_set.trigger_sources)
+    self._index = None
     return True
 
   def export(self, **kwargs):
@@ -2,7 +2,7 @@ from Firefly import logging
 # from rgb_cie import Converter
 from Firefly.components.hue.ct_fade import CTFade
 from Firefly.components.virtual_devices import AUTHOR
-from Firefly.const import (ACTION_LEVEL, ACTION_OFF, ACTION_ON, ACTION_TOGGLE, ALEXA_OFF, ALEXA_ON, ALEXA_SET_COLOR, ALEXA_SET_COLOR_TEMP, ALEXA_SET_PERCENTAGE, COMMAND_SET_LIGHT, COMMAND_UPDATE,
+from Firefly.const import (EXECUTION_CHEAP, ACTION_LEVEL, ACTION_OFF, ACTION_ON, ACTION_TOGGLE, ALEXA_OFF, ALEXA_ON, ALEXA_SET_COLOR, ALEXA_SET_COLOR_TEMP, ALEXA_SET_PERCENTAGE, COMMAND_SET_LIGHT, COMMAND_UPDATE,
                            DEVICE_TYPE_COLOR_LIGHT, EVENT_ACTION_OFF, EVENT_ACTION_ON, LEVEL, STATE, SWITCH)
 from Firefly.helpers.device.device import Device
 from Firefly.helpers.events import Command
@@ -35,8 +35,24 @@ INITIAL_VALUES = {
   '_hue_number':       -1
 }
 
+# {field reported by the bridge: attribute}
+DEVICE_FIELDS = {
+  'name':             '_name',
+  'uniqueid':         '_uniqueid',
+  'manufacturername': '_manufacturername',
+  'swversion':        '_swversion',
+  'modelid':          '_modelid',
+  'hue_service':      '_hue_service',
+  'hue_number':       '_hue_number',
+}
+# Fields of the light state or group action that are stored as _{field}.
+STATE_FIELDS = ['on', 'hue', 'sat', 'effect', 'xy', 'colormode', 'alert', 'bri', 'reachable', 'ct']
+
 
 class HueDevice(Device):
+  # Commands are forwarded to the Hue service, which sends the requests to the bridge.
+  execution_policy = EXECUTION_CHEAP
+
   def __init__(self, firefly, package, title, author, commands, requests, device_type, **kwargs):
     if not kwargs.get('initial_values'):
       kwargs['initial_values'] = INITIAL_VALUES
@@ -124,30 +140,22 @@ class HueDevice(Device):
     self._level = int(self._bri / 255.0 * 100.0)
 
   def update(self, **kwargs):
-    self._name = kwargs.get('name')
-    self._uniqueid = kwargs.get('uniqueid', '')
-    self._manufacturername = kwargs.get('manufacturername', '')
-    self._swversion = kwargs.get('swversion', '')
-    self._modelid = kwargs.get('modelid', '')
-    self._hue_service = kwargs.get('hue_service', 'service_hue')
-    self._hue_number = kwargs.get('hue_number')
+    """Apply state from the bridge. The hue service only passes the fields that changed since the last poll."""
+    for key, attribute in DEVICE_FIELDS.items():
+      if key in kwargs:
+        setattr(self, attribute, kwargs[key])
 
-    if self._alias != self._name:
+    if 'name' in kwargs and self._alias != self._name:
       self._alias = self._name
       self.firefly.aliases.set_alias(self.id, self._alias)
 
-    if kwargs.get(self.hue_noun):
-      self._on = kwargs.get(self.hue_noun).get('on')
-      self._hue = kwargs.get(self.hue_noun).get('hue')
-      self._sat = kwargs.get(self.hue_noun).get('sat')
-      self._effect = kwargs.get(self.hue_noun).get('effect')
-      self._xy = kwargs.get(self.hue_noun).get('xy')
-      self._colormode = kwargs.get(self.hue_noun).get('colormode')
-      self._alert = kwargs.get(self.hue_noun).get('alert')
-      self._bri = kwargs.get(self.hue_noun).get('bri')
-      self._reachable = kwargs.get(self.hue_noun).get('reachable')
-      self._ct = kwargs.get(self.hue_noun).get('ct')
-    self._level = int(self._bri / 255.0 * 100.0)
+    state = kwargs.get(self.hue_noun)
+    if state:
+      for key in STATE_FIELDS:
+        if key in state:
+          setattr(self, '_' + key, state[key])
+      if state.get('bri') is not None:
+        self._level = int(self._bri / 255.0 * 100.0)
 
   def off(self, **kwargs):
     self.setLight(on=False)
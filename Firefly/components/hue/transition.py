@@ -0,0 +1,194 @@
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from Firefly import logging
+from Firefly.util.color import color_temperature_kelvin_to_mired
+
+# Color temperature limits of hue lights in mireds.
+MIN_MIRED = 153
+MAX_MIRED = 500
+MAX_BRI = 255
+
+# (longest fade in seconds, number of steps). Longer fades use the last entry.
+FADE_STEPS = [(100, 1), (300, 4), (600, 10), (900, 20)]
+MAX_FADE_STEPS = 30
+# Fades shorter than this are sent as a single transition.
+MIN_STEPPED_FADE = 10
+# Steps due within this many seconds of each other are sent together so they can be merged.
+TICK_SLACK = 0.5
+TRANSITION_JOB_ID = 'HUE_TRANSITIONS'
+
+
+def kelvin_to_mired(kelvin: float) -> int:
+  return int(min(max(color_temperature_kelvin_to_mired(kelvin), MIN_MIRED), MAX_MIRED))
+
+
+def level_to_bri(level: float) -> int:
+  return int(MAX_BRI / 100.0 * min(level, 100))
+
+
+def step_count(fade_sec: float) -> int:
+  for longest, steps in FADE_STEPS:
+    if fade_sec <= longest:
+      return steps
+  return MAX_FADE_STEPS
+
+
+def fade_curve(start_k: int, end_k: int, fade_sec: float, start_level: int = None,
+               end_level: int = None) -> List[Tuple[float, dict]]:
+  """Compute every step of a color temperature (and level) fade.
+
+  The first step sets the start values right away, every following step transitions linearly towards the end values
+  over the time until the next step.
+
+  Args:
+    start_k (int): start color temperature in kelvin
+    end_k (int): end color temperature in kelvin
+    fade_sec (float): length of the fade
+    start_level (int): start level, None to leave the level alone
+    end_level (int): end level, None to leave the level alone
+
+  Returns:
+    [(seconds after the start, hue state to set)]
+  """
+  steps = step_count(fade_sec) if fade_sec >= MIN_STEPPED_FADE else 1
+  delay = fade_sec / steps
+  level_control = start_level is not None and end_level is not None
+  # Both ends interpolated in one pass over the step fractions.
+  fractions = [i / steps for i in range(steps + 1)]
+  kelvins = [start_k + (end_k - start_k) * f for f in fractions]
+  levels = [start_level + (end_level - start_level) * f for f in fractions] if level_control else None
+
+  curve = []
+  for i, fraction in enumerate(fractions):
+    state = {
+      'ct':             kelvin_to_mired(kelvins[i]),
+      'on':             True,
+      'transitiontime': 1 if i == 0 else int(delay * 10),
+    }
+    if level_control:
+      state['bri'] = level_to_bri(levels[i])
+    curve.append((i * delay, state))
+  return curve
+
+
+class _Fade(object):
+  def __init__(self, path: str, light: str, curve: List[Tuple[float, dict]], start: float):
+    self.path = path
+    self.light = light
+    self.steps = [(start + offset, state) for offset, state in curve]
+
+
+class TransitionEngine(object):
+  """TransitionEngine runs the fades of all hue lights on one timer.
+
+  Each fade is computed up front with fade_curve. On every tick the steps that are due for all fades are collected.
+  Lights that get the same state and together make up a whole bridge group are sent as one group action, the rest are
+  sent per light. send is expected to pace the requests to the bridge (HueTransport.put_threadsafe).
+
+  Args:
+    send (Callable[[str, dict], None]): sends a PUT of state to a bridge path
+    scheduler: Firefly scheduler used for the timer
+    job_id (str): scheduler job id
+  """
+
+  def __init__(self, send: Callable[[str, dict], None], scheduler, job_id: str = TRANSITION_JOB_ID):
+    self._send = send
+    self._scheduler = scheduler
+    self.job_id = job_id
+    self._lock = threading.Lock()
+    # {ff_id: _Fade}
+    self._fades = {}
+    # {group number: frozenset of light numbers}
+    self._groups = {}
+    self._next_tick = None
+    self.light_puts = 0
+    self.group_puts = 0
+
+  @property
+  def active(self) -> int:
+    return len(self._fades)
+
+  def set_groups(self, groups: Dict[str, List[str]]) -> None:
+    """Set the bridge groups that lights can be merged into.
+
+    Args:
+      groups (dict): {group number: [light numbers]}
+    """
+    with self._lock:
+      self._groups = dict((str(g), frozenset(str(l) for l in lights)) for g, lights in groups.items() if lights)
+
+  def start(self, ff_id: str, hue_type: str, hue_number, curve: List[Tuple[float, dict]]) -> None:
+    """Start a fade, replacing any fade that is running on the device.
+
+    Args:
+      ff_id (str): device id
+      hue_type (str): light or group
+      hue_number: number of the light or group on the bridge
+      curve (list): steps from fade_curve
+    """
+    noun = 'state' if hue_type == 'light' else 'action'
+    path = '%ss/%s/%s' % (hue_type, hue_number, noun)
+    light = str(hue_number) if hue_type == 'light' else None
+    with self._lock:
+      self._fades[ff_id] = _Fade(path, light, curve, time.monotonic())
+    self.tick()
+
+  def cancel(self, ff_id: str) -> None:
+    with self._lock:
+      if self._fades.pop(ff_id, None) is not None:
+        logging.info('Ending fade of %s', ff_id)
+
+  def tick(self) -> None:
+    """Send all steps that are due and schedule the next tick."""
+    with self._lock:
+      due = self._collect(time.monotonic() + TICK_SLACK)
+      next_tick = min((fade.steps[0][0] for fade in self._fades.values()), default=None)
+      self._schedule(next_tick)
+    for path, state in due:
+      self._send(path, state)
+
+  def _collect(self, until: float) -> List[Tuple[str, dict]]:
+    """Pop the steps due before until and merge them into as few requests as possible. Must hold the lock."""
+    # {state key: (state, {light number: path})} for lights and [(path, state)] for everything else.
+    by_state = {}
+    due = []
+    for ff_id in list(self._fades):
+      fade = self._fades[ff_id]
+      state = None
+      while fade.steps and fade.steps[0][0] <= until:
+        # A late tick only sends the latest step of a fade.
+        state = fade.steps.pop(0)[1]
+      if not fade.steps:
+        del self._fades[ff_id]
+      if state is None:
+        continue
+      if fade.light is None:
+        due.append((fade.path, state))
+        continue
+      key = tuple(sorted(state.items()))
+      by_state.setdefault(key, (state, {}))[1][fade.light] = fade.path
+
+    for state, lights in by_state.values():
+      remaining = set(lights)
+      for group, members in sorted(self._groups.items(), key=lambda g: -len(g[1])):
+        if len(members) > 1 and members <= remaining:
+          due.append(('groups/%s/action' % group, state))
+          remaining -= members
+          self.group_puts += 1
+      for light in sorted(remaining):
+        due.append((lights[light], state))
+        self.light_puts += 1
+    return due
+
+  def _schedule(self, next_tick: float) -> None:
+    if next_tick is None:
+      if self._next_tick is not None:
+        self._scheduler.cancel(self.job_id)
+      self._next_tick = None
+      return
+    if next_tick == self._next_tick:
+      return
+    self._next_tick = next_tick
+    self._scheduler.runInS(max(next_tick - time.monotonic(), 0), self.tick, job_id=self.job_id)
@@ -1,7 +1,7 @@
 from lightify import Luminary
 
 from Firefly import logging
-from Firefly.const import ACTION_LEVEL, AUTHOR, COMMAND_UPDATE, EVENT_ACTION_OFF, EVENT_ACTION_ON, LEVEL, SWITCH, COMMAND_SET_LIGHT
+from Firefly.const import ACTION_LEVEL, AUTHOR, COMMAND_UPDATE, EVENT_ACTION_OFF, EVENT_ACTION_ON, EXECUTION_BLOCKING, LEVEL, SWITCH, COMMAND_SET_LIGHT
 from Firefly.helpers.device_types.light import Light
 
 TITLE = 'Lightify Device'
@@ -21,6 +21,9 @@ REQUESTS = [SWITCH, LEVEL]
 
 
 class LightifyDevice(Light):
+  # Commands talk to the Lightify gateway over a socket.
+  execution_policy = EXECUTION_BLOCKING
+
   def __init__(self, firefly, package, title, author, commands, requests, device_type, **kwargs):
     if kwargs.get('initial_values') is not None:
       INITIAL_VALUES.update(kwargs['initial_values'])
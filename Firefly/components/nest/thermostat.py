@@ -6,6 +6,7 @@ from Firefly.const import (COMMAND_UPDATE, DEVICE_TYPE_THERMOSTAT, LEVEL)
 from Firefly.helpers.action import Command
 from Firefly.helpers.device.device import Device
 from Firefly.helpers.metadata import action_button_group, action_button_object, action_level, action_text
+from Firefly.helpers.refresh_coordinator import SECTION_ALIASES, SECTION_DEVICES
 
 # TODO(zpriddy): Add more delayed setters to help with rate limits.
 
@@ -30,7 +31,7 @@ def Setup(firefly, package, **kwargs):
   thermostat = Thermostat(firefly, package, **kwargs)
   firefly.install_component(thermostat)
 
-  refresh_command = Command('service_firebase', 'nest', 'refresh')
+  refresh_command = Command('service_firebase', 'nest', 'refresh', sections=[SECTION_DEVICES, SECTION_ALIASES])
   firefly.send_command(refresh_command)
   return thermostat.id
 
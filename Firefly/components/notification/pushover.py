@@ -1,7 +1,7 @@
 import requests
 
 from Firefly import logging
-from Firefly.const import AUTHOR, COMMAND_NOTIFY, DEVICE_TYPE_NOTIFICATION, PRIORITY_NORMAL, SERVICE_NOTIFICATION
+from Firefly.const import AUTHOR, COMMAND_NOTIFY, EXECUTION_BLOCKING, DEVICE_TYPE_NOTIFICATION, PRIORITY_NORMAL, SERVICE_NOTIFICATION
 from Firefly.helpers.device.device import Device
 
 TITLE = 'Firefly Pushover Device (pushover.net)'
@@ -29,6 +29,9 @@ def Setup(firefly, package, **kwargs):
 
 
 class Pushover(Device):
+  # notify posts to pushover.net
+  execution_policy = EXECUTION_BLOCKING
+
   def __init__(self, firefly, package, **kwargs):
     kwargs['initial_values'] = INITIAL_VALUES if not kwargs.get('initial_values') else kwargs.get('initial_values')
     super().__init__(firefly, package, TITLE, AUTHOR, COMMANDS, REQUESTS, DEVICE_TYPE, **kwargs)
@@ -1,6 +1,6 @@
 from Firefly import logging
 from Firefly.helpers.device_types.switch import Switch
-from Firefly.const import SWITCH, LEVEL, AUTHOR
+from Firefly.const import SWITCH, LEVEL, AUTHOR, EXECUTION_CHEAP
 
 CAPABILITIES = {
   LEVEL:       True,
@@ -16,6 +16,8 @@ def Setup(firefly, package, **kwargs):
 
 
 class VirtualSwitch(Switch):
+  execution_policy = EXECUTION_CHEAP
+
   def __init__(self, firefly, package, **kwargs):
     super().__init__(firefly, package, TITLE, AUTHOR, capabilities=CAPABILITIES, **kwargs)
 
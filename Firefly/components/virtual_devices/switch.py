@@ -1,6 +1,6 @@
 from Firefly import logging
 from Firefly.helpers.device_types.switch import Switch
-from Firefly.const import SWITCH, AUTHOR
+from Firefly.const import SWITCH, AUTHOR, EXECUTION_CHEAP
 
 TITLE = 'Virtual Switch'
 
@@ -11,6 +11,8 @@ def Setup(firefly, package, **kwargs):
 
 
 class VirtualSwitch(Switch):
+  execution_policy = EXECUTION_CHEAP
+
   def __init__(self, firefly, package, **kwargs):
     super().__init__(firefly, package, TITLE, AUTHOR, **kwargs)
 
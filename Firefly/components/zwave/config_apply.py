@@ -0,0 +1,244 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+from Firefly import logging
+from Firefly.util.zwave_command_class import COMMAND_CLASS_CONFIGURATION
+
+# Parameter writes sent to one node per tick, and seconds between ticks.
+BATCH_SIZE = 4
+BATCH_GAP = 1
+# Seconds to wait for a report of a written parameter before writing it again. Doubles on every attempt.
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 15 * 60
+MAX_ATTEMPTS = 5
+CONFIG_APPLY_JOB_ID = 'ZWAVE_CONFIG_APPLY'
+
+PARAM_PENDING = 'pending'
+PARAM_SENT = 'sent'
+PARAM_VERIFIED = 'verified'
+PARAM_FAILED = 'failed'
+PARAM_STATES = [PARAM_PENDING, PARAM_SENT, PARAM_VERIFIED, PARAM_FAILED]
+
+# (index, value) or (index, value, size)
+Param = Tuple[int, int, int]
+
+
+def config_value(value):
+  """Get the number of a configuration parameter from a value notification, to compare it with the written value.
+
+  openzwave reports the label of the selected item as the data of a List value, while the parameter is written with
+  the item's number. The number is read from the network's manager, or else taken from the position of the label in
+  the value's items or from a numeric label.
+
+  Args:
+    value: ZWaveValue
+
+  Returns:
+    the number of the parameter, or the data as reported when it can not be found
+  """
+  data = value.data
+  if not isinstance(data, str) or getattr(value, 'type', None) != 'List':
+    return to_number(data)
+  network = getattr(value, '_network', None)
+  if network is not None:
+    try:
+      return network.manager.getValueListSelectionNum(value.value_id)
+    except Exception:
+      pass
+  items = getattr(value, 'data_items', None)
+  if isinstance(items, (list, tuple)) and data in items:
+    return items.index(data)
+  return to_number(data)
+
+
+def to_number(data):
+  """Get a numeric string as an int. Other data is returned as is."""
+  if isinstance(data, str):
+    try:
+      return int(data)
+    except ValueError:
+      pass
+  return data
+
+
+class _ParamWrite(object):
+  __slots__ = ('index', 'value', 'size', 'attempts', 'next_try', 'state')
+
+  def __init__(self, index: int, value, size: int, now: float):
+    self.index = index
+    self.value = value
+    self.size = size
+    self.attempts = 0
+    self.next_try = now
+    self.state = PARAM_PENDING
+
+
+class _NodeQueue(object):
+  def __init__(self, node):
+    self.node = node
+    # {param index: _ParamWrite}
+    self.params = OrderedDict()
+
+  def due(self, now: float) -> List[_ParamWrite]:
+    return [p for p in self.params.values() if p.state in (PARAM_PENDING, PARAM_SENT) and p.next_try <= now]
+
+  def next_try(self):
+    return min((p.next_try for p in self.params.values() if p.state in (PARAM_PENDING, PARAM_SENT)), default=None)
+
+
+class ConfigApplyEngine(object):
+  """ConfigApplyEngine writes Z-Wave configuration parameters from per-node queues and verifies them from reports.
+
+  Devices queue the parameters they want with queue. On every tick one node's due writes, at most batch_size of them,
+  are sent with set_config_param, and the nodes take turns. A written parameter is verified when the node reports the
+  value (value_reported, called for every value notification) instead of polling the node for it. A parameter that is
+  not reported back is written again after retry_delay seconds, doubling on every attempt, and fails after
+  max_attempts. Sleeping battery nodes keep their writes queued in openzwave, so they are not written again until the
+  node is awake.
+
+  Args:
+    scheduler: Firefly scheduler used for the timer
+    batch_size (int): most writes sent per tick
+    batch_gap (float): seconds between ticks
+    retry_delay (float): seconds to wait for the first report
+    max_attempts (int): writes of a parameter before it fails
+    job_id (str): scheduler job id
+    clock (Callable[[], float]): monotonic clock
+  """
+
+  def __init__(self, scheduler, batch_size: int = BATCH_SIZE, batch_gap: float = BATCH_GAP,
+               retry_delay: float = RETRY_DELAY, max_attempts: int = MAX_ATTEMPTS, job_id: str = CONFIG_APPLY_JOB_ID,
+               clock: Callable[[], float] = time.monotonic):
+    self._scheduler = scheduler
+    self.batch_size = batch_size
+    self.batch_gap = batch_gap
+    self.retry_delay = retry_delay
+    self.max_attempts = max_attempts
+    self.job_id = job_id
+    self._clock = clock
+    self._lock = threading.Lock()
+    # {node_id: _NodeQueue}, in the order the nodes take turns.
+    self._queues = OrderedDict()
+    # {node_id: {param index: last reported value}}
+    self._reported = {}
+    self._next_tick = None
+    self.writes = 0
+
+  def queue(self, node, params: List[Param]) -> None:
+    """Queue parameter writes for a node.
+
+    A parameter that is already queued with the same value keeps its attempts, so devices can queue their whole config
+    on every update.
+
+    Args:
+      node: ZWaveNode
+      params (list): [(index, value)] or [(index, value, size)]
+    """
+    with self._lock:
+      now = self._clock()
+      node_queue = self._queues.get(node.node_id)
+      if node_queue is None:
+        node_queue = self._queues[node.node_id] = _NodeQueue(node)
+      node_queue.node = node
+      reported = self._reported.get(node.node_id, {})
+      for param in params:
+        index, value, size = param if len(param) == 3 else (param[0], param[1], 2)
+        current = node_queue.params.get(index)
+        if current is not None and current.value == value and current.state != PARAM_FAILED:
+          continue
+        write = node_queue.params[index] = _ParamWrite(index, value, size, now)
+        if reported.get(index) == value:
+          write.state = PARAM_VERIFIED
+      self._schedule(now, node_queue.next_try())
+
+  def value_reported(self, node_id: int, value) -> None:
+    """Verify queued writes from a value notification. Safe to call from the openzwave thread."""
+    if value.command_class != COMMAND_CLASS_CONFIGURATION:
+      return
+    data = config_value(value)
+    with self._lock:
+      self._reported.setdefault(node_id, {})[value.index] = data
+      node_queue = self._queues.get(node_id)
+      write = node_queue.params.get(value.index) if node_queue is not None else None
+      if write is not None and write.state in (PARAM_PENDING, PARAM_SENT) and write.value == data:
+        write.state = PARAM_VERIFIED
+
+  def reported(self, node_id: int, index: int):
+    """Get the last value a node reported for a parameter, None if it was not reported."""
+    return self._reported.get(node_id, {}).get(index)
+
+  def forget(self, node_id: int) -> None:
+    with self._lock:
+      self._queues.pop(node_id, None)
+      self._reported.pop(node_id, None)
+
+  def progress(self, node_id: int) -> dict:
+    """Get the progress of the writes of a node.
+
+    Returns:
+      (dict) number of parameters per state, 'total' and 'done' (nothing left to write or verify)
+    """
+    with self._lock:
+      node_queue = self._queues.get(node_id)
+      params = list(node_queue.params.values()) if node_queue is not None else []
+    progress = dict((state, 0) for state in PARAM_STATES)
+    for param in params:
+      progress[param.state] += 1
+    progress['total'] = len(params)
+    progress['done'] = progress[PARAM_PENDING] + progress[PARAM_SENT] == 0
+    return progress
+
+  def all_progress(self) -> Dict[int, dict]:
+    return dict((node_id, self.progress(node_id)) for node_id in list(self._queues))
+
+  def tick(self) -> None:
+    """Send the next batch of writes and schedule the next tick."""
+    with self._lock:
+      now = self._clock()
+      node, batch = self._next_batch(now)
+      next_tick = min((q.next_try() for q in self._queues.values() if q.next_try() is not None), default=None)
+      if batch and next_tick is not None:
+        next_tick = max(next_tick, now + self.batch_gap)
+      self._next_tick = None
+      self._schedule(now, next_tick)
+    for write in batch:
+      try:
+        node.set_config_param(write.index, write.value, write.size)
+        self.writes += 1
+      except Exception as e:
+        logging.error(code='FF.ZWA.CFG.002', args=(write.index, node.node_id, e))  # error writing param %s of node %s: %s
+
+  def _next_batch(self, now: float):
+    """Take the due writes of the next node with any. Must hold the lock."""
+    for node_id in list(self._queues):
+      node_queue = self._queues[node_id]
+      batch = []
+      for write in node_queue.due(now):
+        if write.attempts >= self.max_attempts:
+          write.state = PARAM_FAILED
+          logging.error(code='FF.ZWA.CFG.001', args=(write.index, node_id, write.attempts))  # param %s of node %s not verified after %s writes
+          continue
+        delay = min(self.retry_delay * 2 ** write.attempts, MAX_RETRY_DELAY)
+        if write.attempts and not getattr(node_queue.node, 'is_awake', True):
+          # The last write is still queued in openzwave until the node wakes up.
+          write.next_try = now + delay
+          continue
+        if len(batch) < self.batch_size:
+          write.attempts += 1
+          write.state = PARAM_SENT
+          write.next_try = now + delay
+          batch.append(write)
+      if batch:
+        # The node goes to the back of the line.
+        self._queues.move_to_end(node_id)
+        return node_queue.node, batch
+    return None, []
+
+  def _schedule(self, now: float, next_tick) -> None:
+    """Schedule a tick at next_tick unless one is scheduled earlier. Must hold the lock."""
+    if next_tick is None or (self._next_tick is not None and self._next_tick <= next_tick):
+      return
+    self._next_tick = next_tick
+    self._scheduler.runInS(max(next_tick - now, 0), self.tick, job_id=self.job_id)
@@ -19,6 +19,13 @@ COMMANDS = []
 
 REQUESTS = [ALARM, BATTERY, CONTACT]
 
+# {value label: request} of values that set a request to their data.
+VALUE_ROUTES = {
+  'Sensor':        CONTACT,
+  'Battery Level': BATTERY,
+  'Burglar':       ALARM,
+}
+
 
 class ZwaveContactSensor(ContactSensor, ZwaveDevice):
   def __init__(self, firefly, package, title='Zwave Contact Sensor', initial_values={}, value_map={}, **kwargs):
@@ -45,6 +52,10 @@ class ZwaveContactSensor(ContactSensor, ZwaveDevice):
     export_data['value_map'] = self.value_map
     return export_data
 
+  def value_routes(self):
+    # Values take the command path until the sensor has refreshed its values after waking up.
+    return VALUE_ROUTES if self.refreshed else {}
+
   def update_from_zwave(self, node: ZWaveNode = None, ignore_update=False, values: ZWaveValue = None, values_only=False, **kwargs):
     if node is None:
       return
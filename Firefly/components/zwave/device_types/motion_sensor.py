@@ -30,6 +30,13 @@ REQUESTS = [
   BATTERY
 ]
 
+# {value label: request} of values that set a request to their data.
+VALUE_ROUTES = {
+  'Sensor':        MOTION,
+  'Battery Level': BATTERY,
+  'Burglar':       ALARM,
+}
+
 class ZwaveMotionSensor(MultiSensor, ZwaveDevice):
   def __init__(self, firefly, package, title='Zwave Motion Sensor', initial_values={}, **kwargs):
     if kwargs.get('commands') is not None:
@@ -47,6 +54,9 @@ class ZwaveMotionSensor(MultiSensor, ZwaveDevice):
 
     super().__init__(firefly, package, title, AUTHOR, commands, requests, DEVICE_TYPE_MOTION, capabilities=CAPABILITIES, initial_values=initial_values, **kwargs)
 
+  def value_routes(self):
+    return VALUE_ROUTES
+
   def update_from_zwave(self, node: ZWaveNode = None, ignore_update=False, values: ZWaveValue = None, values_only=False, **kwargs):
     if node is None:
       return
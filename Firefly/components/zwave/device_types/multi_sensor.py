@@ -25,6 +25,17 @@ COMMANDS = []
 
 REQUESTS = [MOTION, ALARM, LUX, TEMPERATURE, HUMIDITY, ULTRAVIOLET, BATTERY]
 
+# {value label: request} of values that set a request to their data.
+VALUE_ROUTES = {
+  'Sensor':            MOTION,
+  'Battery Level':     BATTERY,
+  'Burglar':           ALARM,
+  'Temperature':       TEMPERATURE,
+  'Luminance':         LUX,
+  'Relative Humidity': HUMIDITY,
+  'Ultraviolet':       ULTRAVIOLET,
+}
+
 
 class ZwaveMultiSensor(MultiSensor, ZwaveDevice):
   def __init__(self, firefly, package, title='Zwave Multi Sensor', initial_values={}, **kwargs):
@@ -43,6 +54,9 @@ class ZwaveMultiSensor(MultiSensor, ZwaveDevice):
 
     super().__init__(firefly, package, title, AUTHOR, commands, requests, DEVICE_TYPE_MULTI_SENSOR, capabilities=CAPABILITIES, initial_values=initial_values, **kwargs)
 
+  def value_routes(self):
+    return VALUE_ROUTES
+
   def update_from_zwave(self, node: ZWaveNode = None, ignore_update=False, values: ZWaveValue = None, values_only=False, **kwargs):
     if node is None:
       return
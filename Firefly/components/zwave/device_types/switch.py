@@ -22,6 +22,17 @@ COMMANDS = [ACTION_OFF, ACTION_ON, LEVEL]
 
 REQUESTS = [ALARM, BATTERY, SWITCH, CURRENT, VOLTAGE, WATTS, LEVEL]
 
+# {value label: request} of values that set a request to their data.
+VALUE_ROUTES = {
+  'Switch':           SWITCH,
+  'Battery Level':    BATTERY,
+  'Energy':           CURRENT_ENERGY_READING,
+  'Previous Reading': PREVIOUS_ENERGY_READING,
+  'Power':            WATTS,
+  'Voltage':          VOLTAGE,
+  'Current':          CURRENT,
+}
+
 CAPABILITIES = {
   ALARM:       False,
   BATTERY:     False,
@@ -89,18 +100,24 @@ class ZwaveSwitch(Switch, ZwaveDevice):
 
     elif label == 'Level' and values.command_class == COMMAND_CLASS_SWITCH_MULTILEVEL and self.capabilities[LEVEL] is True:
       self.value_map[values.label] = values.value_id
-      level = node.get_dimmer_level(self.value_map[values.label])
-      self.update_values(level=level)
-      if values.data > 0:
-        self.update_values(switch=True)
-      else:
-        self.update_values(switch=False)
+      self.update_level(values)
 
     else:
       logging.info('[ZWAVE DEVICE] recieved data for label: %s' % label)
 
     super().update_from_zwave(node, **kwargs)
 
+  def value_routes(self):
+    routes = dict(VALUE_ROUTES)
+    if self.capabilities[LEVEL] is True:
+      routes['Level'] = self.update_level
+    return routes
+
+  def update_level(self, values: ZWaveValue):
+    # Before the first ZWAVE_UPDATE there is no node, the level is the data of the value.
+    level = values.data if self._node is None else self._node.get_dimmer_level(values.value_id)
+    self.update_values(level=level, switch=values.data > 0)
+
   def set_switch(self, switch=None, **kwargs):
     if switch is None:
       return
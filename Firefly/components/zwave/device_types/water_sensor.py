@@ -19,6 +19,13 @@ COMMANDS = []
 
 REQUESTS = [ALARM, BATTERY, WATER]
 
+# {value label: request} of values that set a request to their data.
+VALUE_ROUTES = {
+  'Sensor':        WATER,
+  'Battery Level': BATTERY,
+  'Burglar':       ALARM,
+}
+
 
 class ZwaveWaterSensor(WaterSensor, ZwaveDevice):
   def __init__(self, firefly, package, title='Zwave Water Sensor', initial_values={}, value_map={}, **kwargs):
@@ -44,6 +51,10 @@ class ZwaveWaterSensor(WaterSensor, ZwaveDevice):
     export_data['value_map'] = self.value_map
     return export_data
 
+  def value_routes(self):
+    # Values take the command path until the sensor has refreshed its values after waking up.
+    return VALUE_ROUTES if self.refreshed else {}
+
   def update_from_zwave(self, node: ZWaveNode = None, ignore_update=False, values: ZWaveValue = None, values_only=False, **kwargs):
     if node is None:
       return
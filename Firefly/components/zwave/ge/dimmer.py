@@ -43,6 +43,12 @@ class GEDimmer(ZwaveSwitch):
     })
     super().__init__(firefly, package, TITLE, capabilities=CAPABILITIES, **kwargs)
 
+  def value_routes(self):
+    # Level updates take the command path so update_from_zwave can enforce the min level.
+    routes = super().value_routes()
+    routes.pop('Level', None)
+    return routes
+
   def update_from_zwave(self, node: ZWaveNode = None, ignore_update=False, values: ZWaveValue = None, values_only=False, **kwargs):
     old_level = self.get_level()
     super().update_from_zwave(node, ignore_update, values, values_only, **kwargs)
@@ -0,0 +1,242 @@
+import asyncio
+import random
+
+from Firefly import logging
+from Firefly.util.zwave_command_class import COMMAND_CLASS_WAKE_UP
+
+# Seconds between polls of a mains-powered node.
+MAINS_INTERVAL = 2 * 60 * 60
+# Seconds between polls of a mains-powered node that reported a value within ACTIVE_WINDOW seconds.
+ACTIVE_INTERVAL = 15 * 60
+ACTIVE_WINDOW = 10 * 60
+# Used for battery nodes that do not report a wake-up interval.
+DEFAULT_WAKE_UP_INTERVAL = 60 * 60
+# Seconds between checks of a failed node.
+DEAD_SWEEP_INTERVAL = 6 * 60 * 60
+# Minimum seconds between two polls, so polling never floods the network.
+POLL_GAP = 5
+# First polls after startup are spread over this many seconds.
+STARTUP_SPREAD = 5 * 60
+# Intervals are randomized by +/- this fraction so nodes do not line up.
+JITTER = 0.1
+# Longest sleep of the poll loop, so nodes added to the network are picked up.
+MAX_IDLE = 60
+
+# Nodes that are due at the same time are polled in this order.
+PRIORITY_ACTIVE = 0
+PRIORITY_MAINS = 1
+PRIORITY_BATTERY = 2
+PRIORITY_FAILED = 3
+
+
+def is_mains_powered(node) -> bool:
+  return bool(node.is_listening_device or node.is_frequent_listening_device)
+
+
+def wake_up_interval(node) -> float:
+  """Get the wake-up interval of a battery node in seconds from its wake-up command class value."""
+  try:
+    for value in node.values.values():
+      if value.command_class == COMMAND_CLASS_WAKE_UP and value.label == 'Wake-up Interval' and value.data:
+        return float(value.data)
+  except Exception:
+    pass
+  return DEFAULT_WAKE_UP_INTERVAL
+
+
+class ZwavePoller(object):
+  """ZwavePoller polls the nodes of a Z-Wave network from one asyncio task.
+
+  Polls are at least poll_gap seconds apart. When several nodes are due, recently active mains-powered nodes go first,
+  then other mains-powered nodes, then battery nodes and failed nodes last. Mains-powered nodes are polled every
+  mains_interval seconds, or active_interval seconds while they keep reporting values. Battery nodes only listen while
+  awake, so they are polled when they report in (node_active) at most once per wake-up interval. Failed nodes are
+  checked with has_node_failed every dead_sweep_interval seconds. All intervals are jittered.
+
+  node_active can be called from any thread. Everything else runs on loop.
+
+  Args:
+    network: ZWaveNetwork
+    loop (asyncio.AbstractEventLoop): event loop to run the poll task on
+    ignore_nodes (list): node ids that are never polled
+  """
+
+  def __init__(self, network, loop: asyncio.AbstractEventLoop, ignore_nodes=(), poll_gap: float = POLL_GAP,
+               mains_interval: float = MAINS_INTERVAL, active_interval: float = ACTIVE_INTERVAL,
+               active_window: float = ACTIVE_WINDOW, dead_sweep_interval: float = DEAD_SWEEP_INTERVAL,
+               startup_spread: float = STARTUP_SPREAD, jitter: float = JITTER, rng: random.Random = None):
+    self.network = network
+    self.loop = loop
+    self.ignore_nodes = ignore_nodes
+    self.poll_gap = poll_gap
+    self.mains_interval = mains_interval
+    self.active_interval = active_interval
+    self.active_window = active_window
+    self.dead_sweep_interval = dead_sweep_interval
+    self.startup_spread = startup_spread
+    self.jitter = jitter
+    self._random = rng or random.Random()
+    # {node_id: loop time the node is due}. Battery nodes are only in here while they are known to be awake.
+    self._due = {}
+    # {node_id: loop time of the last poll}
+    self._last_poll = {}
+    # {node_id: loop time the node last reported a value}
+    self._last_active = {}
+    self._known = set()
+    self._task = None
+    self._wakeup = None
+    self.polls = 0
+    self.failed_checks = 0
+
+  def start(self) -> None:
+    if self._task is None:
+      self._wakeup = asyncio.Event(loop=self.loop)
+      self._task = self.loop.create_task(self.run())
+
+  def stop(self) -> None:
+    if self._task is not None:
+      self._task.cancel()
+      self._task = None
+
+  def due(self, node_id: int):
+    return self._due.get(node_id)
+
+  def node_active(self, node_id: int) -> None:
+    """Record that a node reported a value. Safe to call from any thread."""
+    now = self.loop.time()
+    self._last_active[node_id] = now
+    # Read once: poll() on the loop can pop the entry at any time.
+    due = self._due.get(node_id)
+    if due is not None:
+      if due > now + self.active_interval:
+        self.loop.call_soon_threadsafe(self._set_due, node_id, now + self.active_interval)
+      return
+    # A battery node that is not scheduled is awake now. Poll it if its wake-up interval has passed.
+    self.loop.call_soon_threadsafe(self._battery_awake, node_id)
+
+  def poll_all(self) -> None:
+    """Make every node due now. Safe to call from any thread."""
+    self.loop.call_soon_threadsafe(self._poll_all)
+
+  def sweep_failed(self) -> None:
+    """Make every failed node due now. Safe to call from any thread."""
+    self.loop.call_soon_threadsafe(self._sweep_failed)
+
+  def _sweep_failed(self) -> None:
+    now = self.loop.time()
+    for node_id in self._known:
+      node = self.network.nodes.get(node_id)
+      if node is not None and node.is_failed:
+        self._due[node_id] = now
+    self._wake()
+
+  def _poll_all(self) -> None:
+    now = self.loop.time()
+    for node_id in self._known:
+      self._due[node_id] = now
+    self._wake()
+
+  def _set_due(self, node_id: int, due: float) -> None:
+    if node_id in self._known:
+      self._due[node_id] = due
+      self._wake()
+
+  def _battery_awake(self, node_id: int) -> None:
+    node = self.network.nodes.get(node_id)
+    if node is None or node_id not in self._known or node_id in self._due:
+      return
+    last_poll = self._last_poll.get(node_id)
+    if last_poll is None or self.loop.time() - last_poll >= wake_up_interval(node):
+      self._due[node_id] = self.loop.time()
+      self._wake()
+
+  def _wake(self) -> None:
+    if self._wakeup is not None:
+      self._wakeup.set()
+
+  def _jittered(self, interval: float) -> float:
+    return interval * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+  def sync_nodes(self) -> None:
+    """Pick up nodes added to or removed from the network."""
+    now = self.loop.time()
+    nodes = self.network.nodes
+    for node_id in list(self._known):
+      if node_id not in nodes:
+        self._known.discard(node_id)
+        self._due.pop(node_id, None)
+    for node_id, node in list(nodes.items()):
+      if node_id in self._known or node_id in self.ignore_nodes or node_id == self.network.controller.node_id:
+        continue
+      self._known.add(node_id)
+      if is_mains_powered(node) or node.is_failed:
+        self._due[node_id] = now + self._random.uniform(0, self.startup_spread)
+
+  def priority(self, node_id: int, now: float) -> int:
+    node = self.network.nodes.get(node_id)
+    if node is None or node.is_failed:
+      return PRIORITY_FAILED
+    if not is_mains_powered(node):
+      return PRIORITY_BATTERY
+    if now - self._last_active.get(node_id, float('-inf')) < self.active_window:
+      return PRIORITY_ACTIVE
+    return PRIORITY_MAINS
+
+  def next_node(self, now: float):
+    """Get the node to poll now, or None when no node is due."""
+    due = [(self.priority(node_id, now), due, node_id) for node_id, due in self._due.items() if due <= now]
+    if not due:
+      return None
+    return min(due)[2]
+
+  def poll(self, node_id: int, now: float) -> None:
+    """Poll a node and schedule its next poll."""
+    node = self.network.nodes.get(node_id)
+    self._due.pop(node_id, None)
+    if node is None:
+      return
+    self.polls += 1
+    first_poll = node_id not in self._last_poll
+    self._last_poll[node_id] = now
+    try:
+      if node.is_failed:
+        self.failed_checks += 1
+        logging.info('[ZWAVE POLLER] checking failed node %s', node_id)
+        self.network.controller.has_node_failed(node_id)
+        self._due[node_id] = now + self._jittered(self.dead_sweep_interval)
+        return
+      if not is_mains_powered(node):
+        # The next poll is when the node reports in after its wake-up interval.
+        if node.is_awake:
+          node.request_state()
+        return
+      node.request_state()
+      if first_poll:
+        node.refresh_info()
+    except Exception as e:
+      logging.error(code='FF.ZWA.POL.001', args=(node_id, e))  # error polling node %s: %s
+    active = now - self._last_active.get(node_id, float('-inf')) < self.active_window
+    self._due[node_id] = now + self._jittered(self.active_interval if active else self.mains_interval)
+
+  async def run(self) -> None:
+    while True:
+      self._wakeup.clear()
+      now = self.loop.time()
+      try:
+        self.sync_nodes()
+        node_id = self.next_node(now)
+        if node_id is not None:
+          self.poll(node_id, now)
+        next_due = min(self._due.values(), default=now + MAX_IDLE)
+      except Exception as e:
+        # An error must not end the task, that would stop all polling until restart.
+        logging.error(code='FF.ZWA.POL.002', args=(e,))  # error in poll loop: %s
+        node_id = None
+        next_due = now + self.poll_gap
+      if node_id is not None:
+        await asyncio.sleep(self.poll_gap, loop=self.loop)
+        continue
+      try:
+        await asyncio.wait_for(self._wakeup.wait(), min(max(next_due - now, 0), MAX_IDLE), loop=self.loop)
+      except asyncio.TimeoutError:
+        pass
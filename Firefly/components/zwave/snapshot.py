@@ -0,0 +1,151 @@
+import json
+import threading
+
+from Firefly import logging
+from Firefly.const import ZWAVE_SNAPSHOT_FILE
+from Firefly.util.files import write_json_atomic
+
+SNAPSHOT_VERSION = 1
+
+# Node attributes kept in the snapshot.
+NODE_FIELDS = ['manufacturer_id', 'manufacturer_name', 'product_name', 'product_type', 'is_listening_device',
+               'is_frequent_listening_device']
+
+# Value data of other types (lists, bytes) is not kept.
+JSON_TYPES = (bool, int, float, str, type(None))
+
+
+def value_entry(value) -> list:
+  """Get the compact snapshot entry of a ZWaveValue: [index, label, data, command_class, type, genre]."""
+  data = value.data if isinstance(value.data, JSON_TYPES) else None
+  return [value.index, value.label, data, value.command_class, value.type, value.genre]
+
+
+class ZwaveSnapshot(object):
+  """ZwaveSnapshot keeps the last known metadata, value_map and values of every Z-Wave node in a json file.
+
+  The snapshot is read at startup so devices can be hydrated before the network is awake. Live values are reconciled
+  into it one at a time with update_value, full nodes with capture_node once they have been interrogated. save only
+  writes the file when something changed. All methods are safe to call from any thread.
+
+  The file looks like:
+    {'version': 1, 'nodes': {node_id: {'ff_id': str, <NODE_FIELDS>, 'value_map': {label: value_id},
+                                       'values': {value_id: [index, label, data, command_class, type, genre]}}}}
+
+  Args:
+    path (str): snapshot file
+  """
+
+  def __init__(self, path: str = ZWAVE_SNAPSHOT_FILE):
+    self.path = path
+    # {node_id (str): node entry}
+    self.nodes = {}
+    self.dirty = False
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self.nodes)
+
+  def load(self) -> bool:
+    """Read the snapshot file. A missing, broken or outdated file leaves the snapshot empty.
+
+    Returns:
+      (bool) the snapshot was read
+    """
+    try:
+      with open(self.path) as f:
+        snapshot = json.load(f)
+    except FileNotFoundError:
+      return False
+    except Exception as e:
+      logging.error(code='FF.ZWA.SNA.001', args=(e,))  # error reading zwave snapshot: %s
+      return False
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+      return False
+    with self._lock:
+      self.nodes = snapshot.get('nodes', {})
+      self.dirty = False
+    return True
+
+  def save(self) -> bool:
+    """Write the snapshot file if anything changed since the last load or save.
+
+    Returns:
+      (bool) the file was written
+    """
+    with self._lock:
+      if not self.dirty:
+        return False
+      try:
+        write_json_atomic(self.path, {'version': SNAPSHOT_VERSION, 'nodes': self.nodes}, sort_keys=True)
+      except Exception as e:
+        logging.error(code='FF.ZWA.SNA.002', args=(e,))  # error writing zwave snapshot: %s
+        return False
+      self.dirty = False
+    return True
+
+  def get(self, node_id: int) -> dict:
+    return self.nodes.get(str(node_id))
+
+  def capture_node(self, node, ff_id: str, value_map: dict) -> None:
+    """Replace the entry of a node with its live metadata and values.
+
+    Args:
+      node: ZWaveNode
+      ff_id (str): id of the device of the node
+      value_map (dict): {label: value_id} of the device
+    """
+    entry = dict((field, getattr(node, field, None)) for field in NODE_FIELDS)
+    entry['ff_id'] = ff_id
+    entry['value_map'] = dict(value_map)
+    entry['values'] = dict((str(value_id), value_entry(value)) for value_id, value in node.get_values().items())
+    with self._lock:
+      if self.nodes.get(str(node.node_id)) != entry:
+        self.nodes[str(node.node_id)] = entry
+        self.dirty = True
+
+  def update_value(self, node_id: int, value) -> None:
+    """Reconcile one live value into the entry of its node. Nodes that were never captured are skipped."""
+    new_value = value_entry(value)
+    value_id = str(value.value_id)
+    with self._lock:
+      entry = self.nodes.get(str(node_id))
+      if entry is not None and entry['values'].get(value_id) != new_value:
+        entry['values'][value_id] = new_value
+        self.dirty = True
+
+  def set_value_map(self, node_id: int, value_map: dict) -> None:
+    with self._lock:
+      entry = self.nodes.get(str(node_id))
+      if entry is not None and entry['value_map'] != value_map:
+        entry['value_map'] = dict(value_map)
+        self.dirty = True
+
+  def forget(self, node_id: int) -> None:
+    with self._lock:
+      if self.nodes.pop(str(node_id), None) is not None:
+        self.dirty = True
+
+  def hydrate(self, components: dict, installed_nodes: dict) -> list:
+    """Hydrate the installed devices from the snapshot.
+
+    Args:
+      components (dict): {ff_id: component}
+      installed_nodes (dict): {node_id (str): ff_id}
+
+    Returns:
+      (list) [(node_id, device)] of the hydrated devices
+    """
+    hydrated = []
+    for node_id, ff_id in installed_nodes.items():
+      entry = self.nodes.get(str(node_id))
+      device = components.get(ff_id)
+      if entry is None or entry.get('ff_id') != ff_id or not hasattr(device, 'hydrate_from_snapshot'):
+        continue
+      try:
+        device.hydrate_from_snapshot(int(node_id), entry)
+      except Exception as e:
+        logging.error(code='FF.ZWA.SNA.003', args=(ff_id, e))  # error hydrating %s from zwave snapshot: %s
+        continue
+      hydrated.append((int(node_id), device))
+    return hydrated
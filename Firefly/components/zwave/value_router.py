@@ -0,0 +1,134 @@
+from typing import Callable, Dict, Union
+
+from Firefly import logging
+
+# A route handler is the name of a request to set to the value's data, or a function called with the value.
+RouteHandler = Union[str, Callable]
+
+
+def bind_handler(device, handler: RouteHandler) -> Callable:
+  """Get a function that applies a value to a device for a route handler."""
+  if callable(handler):
+    return handler
+  update_values = device.update_values
+  return lambda value: update_values(**{handler: value.data})
+
+
+class ValueRouter(object):
+  """ValueRouter sends Z-Wave value notifications straight to the device handler for the value.
+
+  Routes map (node_id, value_id) to a bound handler of the device that owns the node. They are learned from the
+  device's value_map ({label: value_id}, filled in by update_from_zwave) and value_routes() ({label: handler}), so a
+  routed value skips building a Command and matching its label. Values without a route take the ZWAVE_UPDATE command
+  path, which fills in value_map, and relearn() picks up the new routes once value_map grew. Routes learned before the
+  device has its node (from a snapshot) are request routes only, function routes are learned once the node is set.
+
+  Routed values are applied through the CommandExecutor when one is given, so they take the device's turn with its
+  commands (and ZWAVE_UPDATE) instead of changing its state on the openzwave thread.
+
+  Args:
+    components (dict): {ff_id: component}. A route is dropped when its device is no longer installed.
+    commands (CommandExecutor): runs routed values on the device's command path. None applies them right away.
+  """
+
+  def __init__(self, components: dict, commands=None):
+    self._components = components
+    self._commands = commands
+    # {(node_id, value_id): (device, handler)}
+    self._routes = {}
+    # {node_id: [value_id]}
+    self._node_values = {}
+    # {node_id: (device, size of its value_map, only request routes)} when the routes were learned.
+    self._learned = {}
+    self.routed = 0
+    self.missed = 0
+
+  def __len__(self):
+    return len(self._routes)
+
+  def learn(self, node_id: int, device, requests_only: bool = False) -> int:
+    """Build the routes of a node from its device, replacing the routes it had.
+
+    Args:
+      node_id (int): Z-Wave node id
+      device: device of the node
+      requests_only (bool): skip function routes, they may need the live node
+
+    Returns:
+      (int) number of routes of the node
+    """
+    self.forget(node_id)
+    value_map = getattr(device, 'value_map', {})
+    self._learned[node_id] = (device, len(value_map), requests_only)
+    value_routes = getattr(device, 'value_routes', None)
+    if value_routes is None:
+      return 0
+    handlers: Dict[str, RouteHandler] = value_routes()
+    value_ids = []
+    for label, value_id in value_map.items():
+      handler = handlers.get(label)
+      if handler is None or value_id is None or (requests_only and callable(handler)):
+        continue
+      self._routes[(node_id, value_id)] = (device, bind_handler(device, handler))
+      value_ids.append(value_id)
+    if value_ids:
+      self._node_values[node_id] = value_ids
+    return len(value_ids)
+
+  def relearn(self, node_id: int, device) -> bool:
+    """Learn the routes of a node again if its device or the size of the device's value_map changed since they were
+    learned, or only request routes were learned and the device has its node now. Values without a route call this, so
+    it must be cheap when nothing changed.
+
+    Returns:
+      (bool) the routes were learned again and the node has routes
+    """
+    learned = self._learned.get(node_id)
+    if learned is not None and learned[0] is device and learned[1] == len(getattr(device, 'value_map', {})) and not (
+        learned[2] and getattr(device, 'node', None) is not None):
+      return False
+    return self.learn(node_id, device) > 0
+
+  def forget(self, node_id: int) -> None:
+    self._learned.pop(node_id, None)
+    for value_id in self._node_values.pop(node_id, []):
+      self._routes.pop((node_id, value_id), None)
+
+  def route(self, node_id: int, value) -> bool:
+    """Apply a value notification to the device it is routed to.
+
+    Args:
+      node_id (int): Z-Wave node id
+      value: the ZWaveValue that changed
+
+    Returns:
+      (bool) the value was routed. False means it should take the command path.
+    """
+    route = self._routes.get((node_id, value.value_id))
+    if route is None:
+      self.missed += 1
+      return False
+    device, handler = route
+    if self._components.get(device.id) is not device:
+      self.forget(node_id)
+      self.missed += 1
+      return False
+    if self._commands is not None:
+      self._commands.submit_call(device.id, self.apply, device, handler, value)
+    elif not self.apply(device, handler, value):
+      return False
+    self.routed += 1
+    return True
+
+  def apply(self, device, handler: Callable, value) -> bool:
+    """Apply a routed value to its device.
+
+    Returns:
+      (bool) the value was applied
+    """
+    try:
+      device.apply_zwave_value(handler, value)
+    except Exception as e:
+      logging.error(code='FF.ZWA.ROU.001', args=(value.value_id, device.id, e))  # error routing value %s to %s: %s
+      return False
+    return True
@@ -0,0 +1,84 @@
+import sys
+from operator import attrgetter
+from typing import Dict, List
+
+from Firefly.util.zwave_command_class import COMMAND_CLASS_DESC
+
+# Fields of a value, in the order of the columnar export.
+VALUE_FIELDS = ('index', 'label', 'ref', 'value', 'command_class', 'type', 'genre')
+_get_fields = attrgetter(*VALUE_FIELDS)
+
+
+def intern_string(value):
+  """Intern a string so every value with the same label, type or genre shares one copy. Other types are returned as is."""
+  return sys.intern(value) if type(value) is str else value
+
+
+class ZwavePrarmValue(object):
+  __slots__ = VALUE_FIELDS
+
+  #TODO: Maybe set better defaults
+  def __init__(self, index=None, label=None, ref=None, value=None, command_class=None, value_type=None, genre=None):
+    self.index = index
+    self.ref = ref
+    self.value = value
+    self.set_info(label, command_class, value_type, genre)
+
+  def set_info(self, label, command_class, value_type, genre) -> None:
+    self.label = intern_string(label)
+    self.command_class = COMMAND_CLASS_DESC.get(command_class, command_class)
+    self.type = intern_string(value_type)
+    self.genre = intern_string(genre)
+
+  def to_dict(self) -> dict:
+    return {
+      'index':         self.index,
+      'label':         self.label,
+      'ref':           self.ref,
+      'value':         self.value,
+      'command_class': self.command_class,
+      'type':          self.type,
+      'genre':         self.genre
+    }
+
+  def __repr__(self):
+    return '<[ZWAVE VALUE] %(label)s: %(value)s [index: %(index)s, command class: %(command_class)s, genre: %(genre)s] %(ref)s>' % {
+      'label': self.label,
+      'value': self.value,
+      'index': self.index,
+      'command_class': self.command_class,
+      'genre': self.genre,
+      'ref': self.ref
+    }
+
+
+class ZwaveValueTable(dict):
+  """ZwaveValueTable holds the ZwavePrarmValues of a device by index.
+
+  set updates the value at an index in place, so refreshing a node does not allocate a new object per value. Labels,
+  types and genres are interned and command classes map to the shared COMMAND_CLASS_DESC names, so the strings are
+  stored once for the whole network instead of once per value.
+  """
+
+  def set(self, index, label, ref, value, command_class, value_type, genre) -> ZwavePrarmValue:
+    param = self.get(index)
+    if param is None:
+      param = self[index] = ZwavePrarmValue(index, label, ref, value, command_class, value_type, genre)
+      return param
+    param.ref = ref
+    param.value = value
+    param.set_info(label, command_class, value_type, genre)
+    return param
+
+  def rows(self) -> List[dict]:
+    """Get the values as a list of dicts, the format of the ZWAVE_VALUES request."""
+    return [param.to_dict() for param in self.values()]
+
+  def columns(self) -> Dict[str, list]:
+    """Get the values as one list per field, so each field name is sent once instead of once per value.
+
+    Returns:
+      (dict) {field: [value of the field for each value]}
+    """
+    columns = zip(*map(_get_fields, self.values()))
+    return dict(zip(VALUE_FIELDS, map(list, columns))) if self else dict((field, []) for field in VALUE_FIELDS)
@@ -1,40 +1,13 @@
 from openzwave.network import ZWaveNode
 
 from Firefly import logging, scheduler
+from Firefly.components.zwave.config_apply import to_number
+from Firefly.components.zwave.value_table import ZwavePrarmValue, ZwaveValueTable
+from Firefly.const import SERVICE_ZWAVE
 from Firefly.helpers.device.device import Device
 from Firefly.helpers.device import *
 from Firefly.helpers.metadata import action_battery
-from Firefly.util.zwave_command_class import COMMAND_CLASS_BATTERY, COMMAND_CLASS_DESC
-
-
-class ZwavePrarmValue(object):
-  #TODO: Maybe set better defaults
-  def __init__(self, index=None, label=None, ref=None, value=None, command_class=None, value_type=None, genre=None):
-    self.index = index
-    try:
-      self.label = self.label.lower()
-    except:
-      self.label = label
-    self.ref = ref
-    self.value = value
-    try:
-      self.command_class = COMMAND_CLASS_DESC[command_class]
-    except:
-      self.command_class = command_class
-    self.type = value_type
-    self.genre = genre
-
-
-
-  def __repr__(self):
-    return '<[ZWAVE VALUE] %(label)s: %(value)s [index: %(index)s, command class: %(command_class)s, genre: %(genre)s] %(ref)s>' % {
-      'label': self.label,
-      'value': self.value,
-      'index': self.index,
-      'command_class': self.command_class,
-      'genre': self.genre,
-      'ref': self.ref
-    }
+from Firefly.util.zwave_command_class import COMMAND_CLASS_BATTERY, COMMAND_CLASS_CONFIGURATION, COMMAND_CLASS_DESC
 
 
 class ZwaveDevice(Device):
@@ -56,7 +29,7 @@ class ZwaveDevice(Device):
     self._sensors = {}
     self._switches = {}
     self._config_params = {}
-    self.zwave_values = {}
+    self.zwave_values = ZwaveValueTable()
     self._raw_values = {}
     self._config_updated = False
     self._update_try_count = 0
@@ -119,11 +92,10 @@ class ZwaveDevice(Device):
     export_data['value_map'] = self.value_map
     return export_data
 
-  def get_zwave_values(self, **kwargs):
-    return_data = []
-    for idx, value in self.zwave_values.items():
-      return_data.append(value.__dict__)
-    return return_data
+  def get_zwave_values(self, columnar=False, **kwargs):
+    if columnar:
+      return self.zwave_values.columns()
+    return self.zwave_values.rows()
 
   def get_sensors(self, **kwargs):
     sensor = kwargs.get('sensor')
@@ -186,7 +158,7 @@ class ZwaveDevice(Device):
     # Update config if device config has not been updated.
     if not self._config_updated:
       for s, i in node.get_values().items():
-        self.zwave_values[i.index] = ZwavePrarmValue(i.index, i.label, s, i.data, i.command_class, i.type, i.genre)
+        self.zwave_values.set(i.index, i.label, s, i.data, i.command_class, i.type, i.genre)
 
 
     if node.has_command_class(COMMAND_CLASS_BATTERY) and BATTERY not in self.request_map:
@@ -204,6 +176,52 @@ class ZwaveDevice(Device):
   def get_battery(self):
     return self._battery
 
+  def hydrate_from_snapshot(self, node_id: int, entry: dict) -> None:
+    """Fill in the device from its ZwaveSnapshot entry before the Z-Wave network is ready.
+
+    Live values replace everything set here as they arrive. Only routes that set a request are applied, function
+    routes need the live node.
+
+    Args:
+      node_id (int): Z-Wave node id
+      entry (dict): node entry of the snapshot
+    """
+    self._node_id = node_id
+    self._manufacturer_id = self._manufacturer_id or entry.get('manufacturer_id') or ''
+    self._manufacturer_name = self._manufacturer_name or entry.get('manufacturer_name') or ''
+    self._product_name = self._product_name or entry.get('product_name') or ''
+    self._product_type = self._product_type or entry.get('product_type') or ''
+
+    for label, value_id in entry.get('value_map', {}).items():
+      self.value_map.setdefault(label, value_id)
+
+    values = entry.get('values', {})
+    for value_id, (index, label, data, command_class, value_type, genre) in values.items():
+      self.zwave_values.set(index, label, int(value_id), data, command_class, value_type, genre)
+
+    routes = self.value_routes()
+    for label, value_id in self.value_map.items():
+      handler = routes.get(label)
+      value = values.get(str(value_id))
+      if isinstance(handler, str) and value is not None and value[2] is not None:
+        self.update_values(**{handler: value[2]})
+
+  def value_routes(self) -> dict:
+    """Get the values that can be applied without a ZWAVE_UPDATE command (see ValueRouter).
+
+    Returns:
+      (dict) {value label: request to set to the value data, or a function called with the value}
+    """
+    return {}
+
+  def apply_zwave_value(self, handler, value) -> None:
+    """Apply a value routed by ValueRouter and broadcast the changes, the same as command() does for ZWAVE_UPDATE."""
+    self.start_tracking()
+    self._last_command_source = 'service_zwave'
+    self._last_update_time = self.firefly.location.now
+    handler(value)
+    self.broadcast_tracked_changes()
+
   def get_zwave_value(self, value_id: int) -> ZwavePrarmValue:
     try:
       return self.zwave_values[value_id]
@@ -214,22 +232,56 @@ class ZwaveDevice(Device):
       return ZwavePrarmValue()
 
 
+  @property
+  def config_engine(self):
+    """ConfigApplyEngine of the zwave service, None if the service is not installed."""
+    return getattr(self.firefly.components.get(SERVICE_ZWAVE), 'config_engine', None)
+
+  def get_config_value(self, param_index: int):
+    """Get the last known value of a configuration parameter, None if it is not known."""
+    engine = self.config_engine
+    if engine is not None and self._node_id is not None:
+      reported = engine.reported(self._node_id, param_index)
+      if reported is not None:
+        return reported
+    # zwave_values is keyed by index only, so the value at the index may be from another command class. List values
+    # hold the label of the selected item, which is only known to the config engine as a number.
+    param = self.zwave_values.get(param_index)
+    if param is not None and param.command_class == COMMAND_CLASS_DESC[COMMAND_CLASS_CONFIGURATION]:
+      value = to_number(param.value)
+      return None if isinstance(value, str) else value
+    return None
+
   def verify_set_zwave_param(self, param_index, param_value, size=2) -> bool:
-    if self.get_zwave_value(param_index) != param_value:
-      self.node.set_config_param(param_index, param_value, size)
-      return False
-    return True
+    return self.verify_set_zwave_params([(param_index, param_value, size)])
 
   def verify_set_zwave_params(self, param_list) -> bool:
-    successful = True
+    """Check the configuration parameters of the node and queue writes of the ones that differ on the config engine.
+
+    Args:
+      param_list (list): [(index, value)] or [(index, value, size)]
+
+    Returns:
+      (bool) every parameter already has its value
+    """
+    writes = []
     for param in param_list:
-      if len(param) == 3:
-        successful &= self.verify_set_zwave_param(param[0], param[1], param[2])
-      elif len(param) == 2:
-        successful &= self.verify_set_zwave_param(param[0], param[1])
-      else:
+      if len(param) not in (2, 3):
         logging.error('[ZWAVE DEVICE] unknown param length')
-    return successful
+        continue
+      if self.get_config_value(param[0]) != param[1]:
+        writes.append(tuple(param))
+    if not writes:
+      return True
+    if self._node is None:
+      return False
+    engine = self.config_engine
+    if engine is None:
+      for param in writes:
+        self._node.set_config_param(*param)
+    else:
+      engine.queue(self._node, writes)
+    return False
 
   @property
   def node(self):
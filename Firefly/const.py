@@ -15,8 +15,25 @@ CONFIG_MODES = 'modes'
 CONFIG_MODES_DEFAULT = 'home, away, morning, night'
 CONFIG_POSTAL_CODE = 'postal_code'
 CONFIG_BEACON = 'beacon'
+CONFIG_EVENT_QUEUE_SIZE = 'event_queue_size'
+CONFIG_DEFAULT_EVENT_QUEUE_SIZE = 1000
+CONFIG_EVENT_DROP_POLICY = 'event_drop_policy'
+CONFIG_DEFAULT_EVENT_DROP_POLICY = 'block'
+CONFIG_COALESCE_WINDOW = 'coalesce_window'
+CONFIG_DEFAULT_COALESCE_WINDOW = 1.0
+CONFIG_COALESCE_PROPERTIES = 'coalesce_properties'
+CONFIG_LOG_QUEUE = 'log_queue'
+CONFIG_DEFAULT_LOG_QUEUE = False
+CONFIG_SERVICE_TIMEOUT = 'service_timeout'
+CONFIG_DEFAULT_SERVICE_TIMEOUT = 60
 CONFIG_FILE = 'dev_config/firefly.config'
 
+# #### COMMAND EXECUTION POLICIES ####
+# cheap: run on the caller's thread. blocking: run in the executor. async: command() returns a coroutine to await.
+EXECUTION_CHEAP = 'cheap'
+EXECUTION_BLOCKING = 'blocking'
+EXECUTION_ASYNC = 'async'
+
 SERVICE_CONFIG_FILE = 'dev_config/services.config'
 NEST_CACHE_FILE = 'dev_config/service_nest_cache.config'
 
@@ -25,8 +42,10 @@ DEVICE_FILE = 'dev_config/devices.json'
 AUTOMATION_FILE = 'dev_config/automation.json'
 LOCATION_FILE = 'dev_config/location.json'
 ZWAVE_FILE = 'dev_config/zwave.json'
+ZWAVE_SNAPSHOT_FILE = 'dev_config/zwave_snapshot.json'
 GROUPS_CONFIG_FILE = 'dev_config/groups.json'
 ROUTINES_CONFIG_FILE = 'dev_config/routines.json'
+STATE_STORE_FILE = 'dev_config/state.db'
 
 REQUIRED_FILES = {
   ALIAS_FILE:           {},
@@ -45,6 +64,7 @@ SERVICE_FOOBOT = 'service_foobot'
 FOOBOT_SECTION = 'FOOBOT'
 
 TYPE_ZWAVE_SERVICE = 'zwave_service'
+SERVICE_ZWAVE = 'service_zwave'
 
 SERVICE_NOTIFICATION = 'FIREFLY_NOTIFICATION_SERVICE'
 NOTIFY_DEFAULT = 'DEFAULT'
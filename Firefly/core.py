@@ -4,20 +4,30 @@ import importlib
 import json
 import signal
 import sys
+import threading
+import time
 from os import path
 from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import Any
 from pathlib import Path
 
 from aiohttp import web
 
-from Firefly import aliases, logging, scheduler
-from Firefly.const import COMPONENT_MAP, DEVICE_FILE, EVENT_TYPE_BROADCAST, LOCATION_FILE, SERVICE_CONFIG_FILE, TIME, TYPE_DEVICE, VERSION, REQUIRED_FILES
+from Firefly import aliases, logging, metrics, scheduler
+from Firefly.const import COMPONENT_MAP, DEVICE_FILE, EVENT_TYPE_BROADCAST, LOCATION_FILE, SERVICE_CONFIG_FILE, STATE_STORE_FILE, TIME, TYPE_DEVICE, VERSION, REQUIRED_FILES
+from Firefly.helpers.command_executor import CommandExecutor
+from Firefly.helpers.dispatcher import EventDispatcher, FIREBASE_SINK
 from Firefly.helpers.events import (Event, Request)
 from Firefly.helpers.groups.groups import import_groups
 from Firefly.helpers.location import Location
+from Firefly.helpers.metrics import KIND_REQUEST
+from Firefly.helpers.refresh_coordinator import SECTION_ALIASES, SECTION_DEVICES, RefreshCoordinator, sections_for_type
 from Firefly.helpers.room import Rooms
+from Firefly.helpers.startup import StartupPhases, import_packages
+from Firefly.helpers.state_store import StateStore
 from Firefly.helpers.subscribers import Subscriptions
+from Firefly.util.files import write_json_atomic
 
 app = web.Application()
 
@@ -38,9 +48,13 @@ class Firefly(object):
 
     # TODO: Most of this should be in startup not init.
     logging.Startup(self)
+    if settings.log_queue:
+      logging.start_queue()
     logging.message('Initializing Firefly')
 
+    self.startup = StartupPhases()
     self.check_required_files()
+    self.state_store = StateStore(STATE_STORE_FILE)
 
     # TODO (zpriddy): Add import and export of current state.
     self.current_state = {}
@@ -48,6 +62,8 @@ class Firefly(object):
     self._firebase_enabled = False
     self._rooms = None
     self._components = {}
+    # Services are installed in parallel in the executor. Held while adding components and building rooms.
+    self._install_lock = threading.RLock()
     self.settings = settings
     self.loop = asyncio.get_event_loop()
 
@@ -56,7 +72,18 @@ class Firefly(object):
 
     self._subscriptions = Subscriptions()
 
+    self.dispatcher = EventDispatcher(self, self.loop, self.executor, queue_size=settings.event_queue_size,
+                                      drop_policy=settings.event_drop_policy,
+                                      coalesce_properties=settings.coalesce_properties)
+    self.dispatcher.add_sink(FIREBASE_SINK, self.send_firebase)
+    self.dispatcher.start()
+
+    self.commands = CommandExecutor(self, self.loop, self.executor)
+
+    self.firebase_refresh = RefreshCoordinator(self.refresh_firebase_sections, scheduler)
+
     self.location = self.import_location()
+    self._subscriptions.time_triggers = self.location.time_triggers
 
     # Get the beacon ID.
     self.beacon_id = settings.beacon_id
@@ -67,20 +94,29 @@ class Firefly(object):
     # self.install_package('Firefly.components.notification.pushover', alias='Pushover', api_key='KEY', user_key='KEY')
 
 
-    for c in COMPONENT_MAP:
-      self.import_components(c['file'])
+    # Startup is staged: read all configs, import all packages in parallel, then run Setup in order. Services can block
+    # on the network so they are installed in the background by start_services once the API is running.
+    with self.startup.phase('config'):
+      component_configs = [(c['file'], self.load_components(c['file'], c['type'])) for c in COMPONENT_MAP]
 
-    self.install_services()
+    with self.startup.phase('import'):
+      packages = [component.get('package') for _, components in component_configs for component in components]
+      packages.extend(package for _, package, _ in self.read_services())
+      import_packages(packages, self.executor)
 
-    # TODO: Rooms will be replaced by groups subclass rooms.
-    self._rooms = Rooms(self)
-    self._rooms.build_rooms()
+    with self.startup.phase('components'):
+      for config_file, components in component_configs:
+        self.install_components(components, config_file)
 
-    # Import Groups
-    import_groups(self)
+    with self.startup.phase('rooms'):
+      # TODO: Rooms will be replaced by groups subclass rooms.
+      self._rooms = Rooms(self)
+      self.build_rooms()
+
+      # Import Groups
+      import_groups(self)
 
 
-    logging.error(code='FF.COR.INI.001')  # this is a test error message
     logging.notify('Firefly is starting up in mode: %s' % self.location.mode)
 
     # TODO: Leave In.
@@ -88,7 +124,7 @@ class Firefly(object):
 
     # Set the current state for all devices.
     # TODO (zpriddy): Remove this when import and export is done.
-    all_devices = set([c_id for c_id, c in self.components.items() if (c.type == TYPE_DEVICE or c.type == 'ROOM')])
+    all_devices = set([c_id for c_id, c in self.component_items() if (c.type == TYPE_DEVICE or c.type == 'ROOM')])
     self.current_state = self.get_device_states(all_devices)
 
   def install_component(self, component):
@@ -101,13 +137,32 @@ class Firefly(object):
 
     '''
     try:
-      self.components[component.id] = component
+      with self._install_lock:
+        self.components[component.id] = component
       return component.id
     except Exception as e:
       logging.error('[CORE INSTALL COMPONENT] ERROR INSTALLING: %s' % str(e))
       return None
 
 
+  def build_rooms(self) -> None:
+    ''' Build the rooms from the room of every device.
+
+    Returns:
+
+    '''
+    with self._install_lock:
+      self._rooms.build_rooms()
+
+  def component_items(self) -> list:
+    ''' Get a snapshot of the components that is safe to iterate while services install in the background.
+
+    Returns:
+      (list) [(ff_id, component)]
+    '''
+    with self._install_lock:
+      return list(self._components.items())
+
   def import_location(self) -> Location:
     ''' Import location data.
 
@@ -144,31 +199,86 @@ class Firefly(object):
 
 
 
-  def install_services(self) -> None:
+  def read_services(self) -> list:
+    """Read the enabled services from the service config file.
+
+    Returns:
+      (list) [(service, package, alias)]
+    """
     config = configparser.ConfigParser()
     config.read(SERVICE_CONFIG_FILE)
-    services = config.sections()
-
-    for service in services:
-      package = config.get(service, 'package')
-      alias = ('service_%s' % service).lower()
-      enabled = config.getboolean(service, 'enable', fallback=False)
-      if not enabled:
+    services = []
+    for service in config.sections():
+      if not config.getboolean(service, 'enable', fallback=False):
         continue
+      services.append((service, config.get(service, 'package'), ('service_%s' % service).lower()))
+    return services
 
-      try:
-        self.install_package(package, alias=alias)
-      except Exception as e:
-        logging.error(code='FF.COR.INS.001', args=(service, e))  # error installing package %s: %s
-        logging.notify('Error installing package %s: %s' % (service, e))
+  @asyncio.coroutine
+  def start_services(self):
+    """Install all enabled services at the same time, each in the executor with a timeout.
 
+    This runs on the event loop after the API started, so requests are served from the imported components while
+    services sign in and discover devices.
+    """
+    start = time.monotonic()
+    services = self.read_services()
+    if services:
+      yield from asyncio.wait([self.install_service(*service) for service in services], loop=self.loop)
+    self.startup.record('services', time.monotonic() - start)
+    self.services_installed()
+
+  def services_installed(self) -> None:
+    """Enable firebase and rebuild the rooms after services were installed."""
     if self.components.get('service_firebase'):
       self._firebase_enabled = True
+    # Services can install new devices.
+    self.build_rooms()
+    self.refresh_firebase()
+
+  @asyncio.coroutine
+  def install_service(self, service: str, package: str, alias: str) -> bool:
+    """Install a service in the executor.
+
+    A service that times out keeps installing in the executor, services_installed is called again once it is done.
+
+    Args:
+      service (str): service section in the service config
+      package (str): package of the service
+      alias (str): alias of the service
+
+    Returns:
+      (bool) service was installed
+    """
+    timeout = self.settings.service_timeout
+    install = self.loop.run_in_executor(self.executor, partial(self.install_package, package, alias=alias))
+    try:
+      yield from asyncio.wait_for(asyncio.shield(install, loop=self.loop), timeout, loop=self.loop)
+      return True
+    except asyncio.TimeoutError:
+      logging.error(code='FF.COR.INS.002', args=(service, timeout))  # timed out installing package %s after %ss
+      logging.notify('Timed out installing package %s' % service)
+      install.add_done_callback(partial(self.late_service_installed, service))
+    except Exception as e:
+      logging.error(code='FF.COR.INS.001', args=(service, e))  # error installing package %s: %s
+      logging.notify('Error installing package %s: %s' % (service, e))
+    return False
+
+  def late_service_installed(self, service: str, install: asyncio.Future) -> None:
+    """Done callback of a service install that timed out."""
+    if install.cancelled():
+      return
+    if install.exception() is not None:
+      logging.error(code='FF.COR.INS.001', args=(service, install.exception()))  # error installing package %s: %s
+      return
+    logging.message('Finished installing package %s after it timed out' % service)
+    self.services_installed()
 
   def start(self) -> None:
     """
     Start up Firefly.
     """
+    self.loop.create_task(self.start_services())
     try:
       web.run_app(app, host=self.settings.firefly_host, port=self.settings.firefly_port)
     except KeyboardInterrupt:
@@ -185,9 +295,23 @@ class Firefly(object):
     '''
     logging.message('Stopping Firefly')
 
-    self.export_all_components()
+    self.dispatcher.stop()
+
+    self.export_all_components(write_files=True)
     self.export_location()
 
+    try:
+      if self.components.get('service_firebase'):
+        self.components['service_firebase'].stop()
+    except Exception as e:
+      logging.notify(e)
+
+    try:
+      if self.components.get('service_hue'):
+        self.components['service_hue'].stop()
+    except Exception as e:
+      logging.notify(e)
+
     try:
       logging.message('Stopping zwave service')
       if self.components.get('service_zwave'):
@@ -197,6 +321,7 @@ class Firefly(object):
 
     self.loop.stop()
     self.loop.close()
+    logging.stop_queue()
 
   @asyncio.coroutine
   def add_task(self, task):
@@ -207,55 +332,112 @@ class Firefly(object):
     return r
 
   def delete_device(self, ff_id):
-    self.components.pop(ff_id)
+    self.location.time_triggers.remove(ff_id)
+    with self._install_lock:
+      self.components.pop(ff_id)
     aliases.aliases.pop(ff_id)
-    if self.components.get('service_firebase'):
-      self.components['service_firebase'].refresh_all()
+    self.refresh_firebase(SECTION_DEVICES, SECTION_ALIASES)
 
-  def export_all_components(self) -> None:
+  def export_all_components(self, write_files: bool = False) -> None:
     """
-    Export current values to backup files to restore current config on reboot.
+    Export current values to the state store to restore current config on reboot.
+
+    Args:
+      write_files (bool): Also write the json config files. Done on shutdown.
     """
     logging.message('Exporting current config.')
     for c in COMPONENT_MAP:
-      self.export_components(c['file'], c['type'])
+      self.export_components(c['file'], c['type'], write_file=write_files)
     aliases.export_aliases()
 
 
-  def import_components(self, config_file=DEVICE_FILE):
-    ''' Import all components from the devices file
+  def import_components(self, config_file=DEVICE_FILE, component_type: str = None):
+    ''' Import all components from the state store or the config file.
 
     Args:
       config_file: json file of all components
+      component_type: type of the components in the file
 
     Returns:
 
     '''
-    logging.message('Importing components from config file: %s' % config_file)
+    self.install_components(self.load_components(config_file, component_type), config_file)
+
+  def load_components(self, config_file=DEVICE_FILE, component_type: str = None) -> list:
+    ''' Load the component records from the state store or the config file.
+
+    The state store is used unless the config file was changed after it was last exported (or, if it was never
+    exported, after the last save), so edits to the config file still win.
+
+    Args:
+      config_file: json file of all components
+      component_type: type of the components in the file
+
+    Returns:
+      (list) component records
+    '''
     try:
+      if component_type:
+        updated = self.state_store.updated(component_type)
+        exported = self.state_store.exported(component_type)
+        seen = exported if exported is not None else updated
+        if updated is not None and (not path.isfile(config_file) or path.getmtime(config_file) <= seen):
+          logging.message('Importing components from state store: %s' % component_type)
+          return self.state_store.load(component_type)
+      logging.message('Importing components from config file: %s' % config_file)
       with open(config_file) as file:
-        components = json.loads(file.read())
+        return json.loads(file.read())
+    except Exception as e:
+      logging.error('Error importing data from: %s - %s' % (config_file, str(e)))
+      return []
+
+  def install_components(self, components: list, config_file: str = '') -> None:
+    ''' Install loaded component records in order.
+
+    Args:
+      components: component records
+      config_file: file the records were loaded from, for logging
+
+    Returns:
+
+    '''
+    try:
       for component in components:
         self.install_package(component.get('package'), **component)
     except Exception as e:
       logging.error('Error importing data from: %s - %s' % (config_file, str(e)))
 
-  def export_components(self, config_file: str, component_type: str, current_values: bool = True) -> None:
+  def export_components(self, config_file: str, component_type: str, current_values: bool = True,
+                        write_file: bool = False) -> None:
     """
-    Export all components with config and optional current states to a config file.
+    Export all components with config and optional current states to the state store and optionally a config file.
+
+    Only changed components are written to the state store. The config file is only rewritten when the store changed
+    since it was last exported, and is replaced atomically.
 
     Args:
       config_file (str): Path to config file.
       current_values (bool): Include current values.
+      write_file (bool): Also write the config file.
     """
-    logging.message('Exporting component and states to config file. - %s' % component_type)
     components = []
-    for _, device in self.components.items():
+    for _, device in self.component_items():
       if device.type == component_type:
         components.append(device.export(current_values=current_values))
 
-    with open(config_file, 'w') as file:
-      json.dump(components, file, indent=4, sort_keys=True)
+    self.state_store.save(component_type, components)
+    if not write_file:
+      return
+
+    exported = self.state_store.exported(component_type)
+    if (exported is not None and path.isfile(config_file) and path.getmtime(config_file) == exported
+        and self.state_store.updated(component_type) <= exported):
+      logging.debug('No changes to export. - %s', component_type)
+      return
+
+    logging.message('Exporting component and states to config file. - %s' % component_type)
+    write_json_atomic(config_file, components, indent=4, sort_keys=True)
+    self.state_store.mark_exported(component_type, path.getmtime(config_file))
 
   def install_package(self, module: str, **kwargs):
     """
@@ -272,7 +454,8 @@ class Firefly(object):
     if kwargs.get('package'):
       kwargs.pop('package')
     setup_return = package.Setup(self, module, **kwargs)
-    scheduler.runInS(10, self.refresh_firebase, job_id='FIREBASE_REFRESH_CORE')
+    component = self.components.get(setup_return) if isinstance(setup_return, str) else None
+    self.refresh_firebase(*sections_for_type(component.type if component else None))
     return setup_return
 
   def send_firebase(self, event: Event):
@@ -287,41 +470,38 @@ class Firefly(object):
     if self.components.get('service_firebase'):
       self.components['service_firebase'].push(event.source, event.event_action)
 
-  def refresh_firebase(self, **kwargs):
+  def refresh_firebase(self, *sections, **kwargs):
+    ''' Request a firebase refresh. Requests are coalesced by the refresh coordinator.
+
+    Args:
+      *sections: sections to refresh (SECTION_DEVICES, ...). All sections are refreshed when none are given.
+
+    Returns:
+
+    '''
     if self.firebase_enabled:
-      self.components['service_firebase'].refresh_all()
+      self.firebase_refresh.request(*sections)
 
-  @asyncio.coroutine
-  def async_send_event(self, event):
-    logging.info('Received event: %s' % event)
-    s = True
-    fut = asyncio.Future(loop=self.loop)
-    send_to = self._subscriptions.get_subscribers(event.source, event_action=event.event_action)
-    for s in send_to:
-      s &= yield from self._send_event(event, s, fut)
-    self.send_firebase(event)
-    return s
+  def refresh_firebase_sections(self, sections: frozenset) -> None:
+    if self.firebase_enabled:
+      self.components['service_firebase'].refresh_sections(sections)
 
   def send_event(self, event: Event) -> Any:
-    logging.info('Received event: %s' % event)
-    fut = asyncio.Future(loop=self.loop)
-    send_to = self._subscriptions.get_subscribers(event.source, event_action=event.event_action)
-    for s in send_to:
-      # asyncio.ensure_future(self._send_event(event, s, fut), loop=self.loop)
-      try:
-        self.components[s].event(event)
-      except Exception as e:
-        logging.error('Error sending event %s' % str(e))
-        # self.loop.run_in_executor(None,self.components[s].event, event)
-    self.update_current_state(event)
-    self.send_firebase(event)
-    return True
+    """Send an event to all subscribers and firebase.
 
-  @asyncio.coroutine
-  def _send_event(self, event, ff_id, fut):
-    result = self.components[ff_id].event(event)
-    # fut.set_result(result)
-    return result
+    The current state is updated right away. Delivery to subscribers and firebase is done by the event dispatcher so
+    this does not wait on them. This is safe to call from any thread.
+
+    Args:
+      event (Event): event to send
+
+    Returns:
+      (bool) event was accepted by the dispatcher
+    """
+    logging.info('Received event: %s', event)
+    metrics.count_event(event.source)
+    self.update_current_state(event)
+    return self.dispatcher.publish(event)
 
   @asyncio.coroutine
   def async_send_request(self, request):
@@ -336,52 +516,42 @@ class Firefly(object):
 
   @asyncio.coroutine
   def _send_request(self, request, fut):
-    result = self.components[request.ff_id].request(request)
+    result = metrics.timed(KIND_REQUEST, request.ff_id, self.components[request.ff_id].request, request)
     fut.set_result(result)
     return result
 
   def send_command(self, command, wait=False):
+    """Send a command to a component.
+
+    The command is run according to the component's execution policy (see CommandExecutor), so blocking commands do
+    not run on the event loop. This is safe to call from any thread.
+
+    Args:
+      command (Command): command to send
+      wait (bool): wait up to 10 seconds for the result. Do not wait from the event loop thread.
+
+    Returns:
+      The result of the command when waiting or the command is cheap, else True when the command was scheduled.
+    """
     if command.device not in self.components:
       return False
     try:
       if wait:
-        fut = asyncio.run_coroutine_threadsafe(self.new_send_command(command, None, self.loop), self.loop)
-        return fut.result(10)
-      else:
-        # asyncio.run_coroutine_threadsafe(self.send_command_no_wait(command, self.loop), self.loop)
-        self.components[command.device].command(command)
-        return True
+        return self.commands.run(command, timeout=10)
+      return self.commands.submit(command)
     except Exception as e:
       logging.error(code='FF.COR.SEN.001')  # unknown error sending command
       logging.error(e)
-      # TODO: Figure out how to wait for result
     return False
 
-  async def new_send_command(self, command, fut, loop):
-    fut = await asyncio.ensure_future(loop.run_in_executor(None, self.components[command.device].command, command))
-    return fut
-
-  async def send_command_no_wait(self, command, loop):
-    # await asyncio.ensure_future(loop.run_in_executor(None, self.components[command.device].command, command))
-    self.components[command.device].command(command)
-    # loop.run_in_executor(None, self.components[command.device].command, command)
-    return True
-
   @asyncio.coroutine
   def async_send_command(self, command):
-    fut = asyncio.Future(loop=self.loop)
-    result = yield from asyncio.ensure_future(self._send_command(command, fut), loop=self.loop)
+    if command.device not in self.components:
+      logging.error(code='FF.COR._SE.001', args=(command.device))  # device not found %s
+      return None
+    result = yield from self.commands.run_async(command)
     return result
 
-  @asyncio.coroutine
-  def _send_command(self, command, fut):
-    if command.device in self.components:
-      result = self.components[command.device].command(command)
-      fut.set_result(result)
-      return result
-    logging.error(code='FF.COR._SE.001', args=(command.device))  # device not found %s
-    return None
-
   def add_route(self, route, method, handler):
     app.router.add_route(method, route, handler)
 
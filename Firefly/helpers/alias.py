@@ -1,11 +1,14 @@
 from Firefly import logging
 from Firefly.const import (ALIAS_FILE)
 import json
+import threading
 
 class Alias(object):
   def __init__(self, alias_file=ALIAS_FILE):
     self._alias_file = alias_file
     self._aliases = {}
+    # Services are installed in parallel, so aliases can be set from several threads.
+    self._lock = threading.RLock()
 
     self.read_file()
 
@@ -18,20 +21,21 @@ class Alias(object):
       json.dump(self.aliases, file, indent=4, sort_keys=True)
 
   def set_alias(self, device_id, alias) -> str:
-    if alias in self.aliases.values():
-      if device_id not in self.aliases or self.aliases[str(device_id)] != alias:
-        try:
-          alias_base = '-'.join(alias.split('-')[:-1])
-          alias_number = int(alias.split('-')[-1])
-        except:
-          alias_number = 0
-          alias_base = alias
-          logging.error('Unknown error')
-        alias_number += 1
-        alias = str(alias_base + '-' + str(alias_number))
-        return self.set_alias(device_id, alias)
-    self.aliases[str(device_id)] = str(alias)
-    return alias
+    with self._lock:
+      if alias in self.aliases.values():
+        if device_id not in self.aliases or self.aliases[str(device_id)] != alias:
+          try:
+            alias_base = '-'.join(alias.split('-')[:-1])
+            alias_number = int(alias.split('-')[-1])
+          except:
+            alias_number = 0
+            alias_base = alias
+            logging.error('Unknown error')
+          alias_number += 1
+          alias = str(alias_base + '-' + str(alias_number))
+          return self.set_alias(device_id, alias)
+      self.aliases[str(device_id)] = str(alias)
+      return alias
 
   def get_alias(self, device_id):
     if device_id in self.aliases.keys():
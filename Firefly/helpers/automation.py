@@ -57,7 +57,7 @@ class Automation(object):
     self.build_interfaces()
 
   def event(self, event: Event, **kwargs):
-    logging.info('[AUTOMATION] %s - Receiving event: %s' % (self.id, event))
+    logging.info('[AUTOMATION] %s - Receiving event: %s', self.id, event)
     # Check each triggerList in triggers.
     for trigger_index, trigger in self.triggers.items():
       if trigger.check_triggers(event):
@@ -0,0 +1,151 @@
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from typing import Callable
+
+from Firefly import logging, metrics
+from Firefly.const import EXECUTION_ASYNC, EXECUTION_BLOCKING, EXECUTION_CHEAP
+from Firefly.helpers.events import Command
+from Firefly.helpers.metrics import KIND_COMMAND
+
+EXECUTION_POLICIES = [EXECUTION_CHEAP, EXECUTION_BLOCKING, EXECUTION_ASYNC]
+
+DEFAULT_MAX_CONCURRENCY = 1
+
+
+def execution_policy(component) -> str:
+  """Get the execution policy of a component. Components without a known policy are treated as blocking."""
+  policy = getattr(component, 'execution_policy', EXECUTION_BLOCKING)
+  return policy if policy in EXECUTION_POLICIES else EXECUTION_BLOCKING
+
+
+class CommandExecutor(object):
+  """CommandExecutor runs component commands according to the component's execution policy.
+
+  Components declare how their command() should be run with the execution_policy class attribute:
+    cheap: command() is quick and does no I/O. It is called on the caller's thread.
+    blocking: command() can block (HTTP requests, sockets). It runs in the executor so it never blocks the event loop.
+    async: command() returns a coroutine that is awaited on the event loop.
+
+  Blocking and async commands are limited to max_concurrency (class attribute, default 1) commands at a time per
+  component, so commands to one device run in order while commands to different devices run concurrently. When the
+  event loop is not running (startup and shutdown) blocking commands are called on the caller's thread.
+  """
+
+  def __init__(self, firefly, loop: asyncio.AbstractEventLoop, executor: Executor = None):
+    self.firefly = firefly
+    self.loop = loop
+    self.executor = executor
+    # {ff_id: asyncio.Semaphore}
+    self._semaphores = {}
+
+  def submit(self, command: Command) -> bool:
+    """Run a command without waiting for blocking or async commands to finish. This is safe to call from any thread.
+
+    Args:
+      command (Command): command to run
+
+    Returns:
+      (bool) the result of cheap commands, else True when the command was scheduled.
+    """
+    component = self.firefly.components.get(command.device)
+    if component is None:
+      return False
+    policy = execution_policy(component)
+    if policy == EXECUTION_CHEAP or (policy == EXECUTION_BLOCKING and not self.loop.is_running()):
+      return metrics.timed(KIND_COMMAND, command.device, component.command, command)
+    asyncio.run_coroutine_threadsafe(self._run(component, command, policy), self.loop)
+    return True
+
+  def run(self, command: Command, timeout: float = None):
+    """Run a command and wait for the result. This must not be called from the event loop thread.
+
+    Args:
+      command (Command): command to run
+      timeout (float): seconds to wait
+
+    Returns:
+      The result of the command.
+    """
+    component = self.firefly.components.get(command.device)
+    if component is None:
+      return False
+    policy = execution_policy(component)
+    if policy == EXECUTION_CHEAP or not self.loop.is_running():
+      if policy == EXECUTION_ASYNC:
+        return self.loop.run_until_complete(self._run(component, command, policy))
+      return metrics.timed(KIND_COMMAND, command.device, component.command, command)
+    return asyncio.run_coroutine_threadsafe(self._run(component, command, policy), self.loop).result(timeout)
+
+  @asyncio.coroutine
+  def run_async(self, command: Command):
+    """Run a command from a coroutine on the event loop.
+
+    Args:
+      command (Command): command to run
+
+    Returns:
+      The result of the command.
+    """
+    component = self.firefly.components.get(command.device)
+    if component is None:
+      return False
+    policy = execution_policy(component)
+    if policy == EXECUTION_CHEAP:
+      return metrics.timed(KIND_COMMAND, command.device, component.command, command)
+    result = yield from self._run(component, command, policy)
+    return result
+
+  def submit_call(self, ff_id: str, function: Callable, *args) -> bool:
+    """Run a function that changes a component's state the way a command to the component is run, for example a
+    routed Z-Wave value. It takes the component's turn with its commands. This is safe to call from any thread.
+
+    Args:
+      ff_id (str): component the function changes
+      function (Callable): function to call with args
+
+    Returns:
+      (bool) the result of the function when the component is cheap, else True when the call was scheduled.
+    """
+    component = self.firefly.components.get(ff_id)
+    if component is None:
+      return False
+    policy = execution_policy(component)
+    if policy == EXECUTION_CHEAP or not self.loop.is_running():
+      return function(*args)
+    asyncio.run_coroutine_threadsafe(self._call(component, ff_id, function, args), self.loop)
+    return True
+
+  def _semaphore(self, ff_id: str, component) -> asyncio.Semaphore:
+    semaphore = self._semaphores.get(ff_id)
+    if semaphore is None:
+      limit = getattr(component, 'max_concurrency', DEFAULT_MAX_CONCURRENCY) or DEFAULT_MAX_CONCURRENCY
+      semaphore = self._semaphores[ff_id] = asyncio.Semaphore(limit, loop=self.loop)
+    return semaphore
+
+  @asyncio.coroutine
+  def _call(self, component, ff_id: str, function: Callable, args: tuple):
+    with (yield from self._semaphore(ff_id, component)):
+      try:
+        return (yield from self.loop.run_in_executor(self.executor, partial(function, *args)))
+      except Exception as e:
+        logging.error(code='FF.CMD.CAL.001', args=(getattr(function, '__name__', function), ff_id, e))  # error calling %s for %s: %s
+        return False
+
+  @asyncio.coroutine
+  def _run(self, component, command: Command, policy: str):
+    with (yield from self._semaphore(command.device, component)):
+      start = metrics.start()
+      try:
+        if policy == EXECUTION_ASYNC:
+          result = component.command(command)
+          if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+            result = yield from result
+        else:
+          result = yield from self.loop.run_in_executor(self.executor, component.command, command)
+      except Exception as e:
+        metrics.observe(KIND_COMMAND, command.device, start, error=True)
+        logging.error(code='FF.CMD.RUN.001', args=(command.command, command.device, e))  # error running command %s for %s: %s
+        return False
+      metrics.observe(KIND_COMMAND, command.device, start)
+      return result
@@ -2,12 +2,22 @@ import uuid
 from typing import Any, Callable
 
 from Firefly import aliases, logging
-from Firefly.const import API_ALEXA_VIEW, API_FIREBASE_VIEW, API_INFO_REQUEST, EVENT_TYPE_BROADCAST, TYPE_DEVICE
+from Firefly.const import (API_ALEXA_VIEW, API_FIREBASE_VIEW, API_INFO_REQUEST, EVENT_TYPE_BROADCAST, EXECUTION_BLOCKING,
+                           TYPE_DEVICE)
 from Firefly.helpers.events import Command, Event, Request
 from Firefly.helpers.metadata import EXPORT_UI, FF_ID, HIDDEN_BY_USER
+from Firefly.helpers.tracked_state import TrackedState
 
 
-class Device(object):
+class Device(TrackedState):
+  # Broadcasts use the same values as get_all_request_values(min_data=True)
+  _tracked_min_data = True
+  _tracked_round_floats = True
+
+  # How core runs command() (see CommandExecutor). Devices that do no I/O in command() can set EXECUTION_CHEAP.
+  execution_policy = EXECUTION_BLOCKING
+  max_concurrency = 1
+
   def __init__(self, firefly, package, title, author, commands, requests, device_type, **kwargs):
     device_id = kwargs.get('ff_id')
     alias = kwargs.get('alias')
@@ -69,6 +79,11 @@ class Device(object):
     self._room = kwargs.get('room', '')
     self._tags = kwargs.get('tags', [])
 
+    # Optional window in seconds to coalesce broadcasts from this device. See EventDispatcher.
+    self._coalesce_window = kwargs.get('coalesce_window')
+    if self._coalesce_window:
+      self.firefly.dispatcher.set_coalesce_window(self._id, self._coalesce_window)
+
     self.add_command('set_alias', self.set_alias)
     self.add_command('set_room', self.set_room)
     self.add_command('delete', self.delete_device)
@@ -95,7 +110,7 @@ class Device(object):
       return
 
     self._room = new_room
-    self.firefly._rooms.build_rooms()
+    self.firefly.build_rooms()
 
   def delete_device(self):
     self.firefly.delete_device(self.id)
@@ -127,6 +142,9 @@ class Device(object):
       'alexa_export':            self._alexa_export
     }
 
+    if self._coalesce_window:
+      export_data['coalesce_window'] = self._coalesce_window
+
     if current_values:
       current_vals = {}
       for item in self._initial_values.keys():
@@ -194,6 +212,7 @@ class Device(object):
     if request not in self._requests:
       self._requests.append(request)
     self._request_mapping[request] = function
+    self.reset_tracking()
 
   def add_action(self, action, action_meta):
     self._metadata['actions'][action] = action_meta
@@ -212,8 +231,8 @@ class Device(object):
     Returns:
       (bool): Command successful.
     """
-    state_before = self.get_all_request_values(True)
-    logging.debug('%s: Got Command: %s' % (self.id, command.command))
+    self.start_tracking()
+    logging.debug('%s: Got Command: %s', self.id, command.command)
     if command.command in self.command_map.keys():
       self._last_command_source = command.source
       self._last_update_time = self.firefly.location.now
@@ -221,8 +240,7 @@ class Device(object):
         self.command_map[command.command](**command.args)
       except:
         return False
-      state_after = self.get_all_request_values(True)
-      self.broadcast_changes(state_before, state_after)
+      self.broadcast_tracked_changes()
       return True
     return False
 
@@ -357,10 +375,9 @@ class Device(object):
 
     """
     logging.info("Setting %s to %s" % (key, val))
-    state_before = self.get_all_request_values(True)
+    self.start_tracking()
     self.__setattr__(key, val)
-    state_after = self.get_all_request_values(True)
-    self.broadcast_changes(state_before, state_after)
+    self.broadcast_tracked_changes()
 
   # TODO: Add runInX functions to devices. These functions have to be similar to member_set and should be able to
   # replace it.
@@ -0,0 +1,399 @@
+import asyncio
+import threading
+from collections import deque
+from functools import partial
+from concurrent.futures import Executor
+from typing import Callable
+
+from Firefly import logging, metrics
+from Firefly.const import EVENT_TYPE_BROADCAST
+from Firefly.helpers.events import Event
+from Firefly.helpers.metrics import KIND_SINK, KIND_SUBSCRIBER
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+DROP_POLICIES = [DROP_OLDEST, DROP_NEWEST, BLOCK]
+
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_SINK_QUEUE_SIZE = 100
+
+FIREBASE_SINK = '_firebase'
+
+
+class EventDispatcher(object):
+  """EventDispatcher delivers events to subscribers off the caller's call stack.
+
+  Events are published into a bounded ingress queue. A router task looks up the subscribers of each event and hands it
+  to a worker per subscriber. Each worker has its own queue and runs the subscriber's event() in the executor, so a
+  slow subscriber only delays itself. Workers handle one event at a time, so every subscriber sees the events of a
+  source in the order they were published. Subscriber queues are not bounded, so automations never miss an event.
+
+  Sinks are workers that get every event (for example firebase). Their queues are bounded by sink_queue_size and follow
+  the drop policy. When the event loop is not running (startup and shutdown) events are delivered synchronously on the
+  caller's thread.
+
+  Broadcasts can optionally be coalesced. When a broadcast has a coalesce window (per source or because all of its
+  properties have one) it is held for that window and later broadcasts from the same source are merged into it. The
+  merged event carries the final value of every property. A broadcast from the same source that can not be coalesced
+  flushes the pending one merged with itself, so no update is reordered or lost.
+
+  Drop policies when a queue is full:
+    drop_oldest: drop the oldest queued event to make room.
+    drop_newest: drop the event being added.
+    block: block the publishing thread until there is room. The event loop thread can not block, so events it
+           publishes (and coalesced broadcasts it flushes) wait in an overflow buffer that the router drains into the
+           queue in order. No event is dropped.
+  """
+
+  def __init__(self, firefly, loop: asyncio.AbstractEventLoop, executor: Executor = None,
+               queue_size: int = DEFAULT_QUEUE_SIZE, sink_queue_size: int = DEFAULT_SINK_QUEUE_SIZE,
+               drop_policy: str = BLOCK, coalesce_properties: dict = None):
+    if drop_policy not in DROP_POLICIES:
+      logging.error(code='FF.DIS.INI.001', args=(drop_policy))  # unknown drop policy: %s. using drop_oldest
+      drop_policy = DROP_OLDEST
+
+    self.firefly = firefly
+    self.loop = loop
+    self.executor = executor
+    self.drop_policy = drop_policy
+    self.sink_queue_size = sink_queue_size
+
+    self._queue = asyncio.Queue(maxsize=queue_size, loop=loop)
+    # Events that did not fit in the queue under the block policy, and an asyncio.Event set when it is drained.
+    self._overflow = deque()
+    self._drained = asyncio.Event(loop=loop)
+    self._workers = {}
+    self._sinks = {}
+    self._router = None
+    self._loop_thread = None
+
+    # Coalescing: {source: seconds}, {property: seconds} and {source: _PendingBroadcast}
+    self._coalesce_sources = {}
+    self._coalesce_properties = coalesce_properties or {}
+    self._pending = {}
+
+    self.published = 0
+    self.dropped = 0
+    self.coalesced = 0
+    self.coalesced_by_source = {}
+
+  def start(self) -> None:
+    """Start the router task. The router will run once the event loop is running."""
+    if self._router is None:
+      self._router = asyncio.ensure_future(self._route(), loop=self.loop)
+
+  def stop(self) -> None:
+    """Cancel the router and all workers. Queued events are dropped, coalesced broadcasts are delivered first so
+    subscribers keep the final state."""
+    while self._pending:
+      _, pending = self._pending.popitem()
+      pending.timer.cancel()
+      self.deliver_now(pending.event())
+    self._overflow.clear()
+    self._drained.set()
+    if self._router is not None:
+      self._router.cancel()
+      self._router = None
+      self._loop_thread = None
+    for worker in self._workers.values():
+      worker.stop()
+    self._workers.clear()
+
+  def add_sink(self, name: str, handler: Callable[[Event], None]) -> None:
+    """Add a sink that gets every published event.
+
+    Args:
+      name (str): name of the sink
+      handler (Callable): function called with the event
+    """
+    self._sinks[name] = handler
+
+  def set_coalesce_window(self, source: str, window: float) -> None:
+    """Set the coalesce window for all broadcasts from a source.
+
+    Args:
+      source (str): ff_id of the source
+      window (float): seconds to hold and merge broadcasts. 0 or None turns coalescing off.
+    """
+    if window:
+      self._coalesce_sources[source] = float(window)
+    else:
+      self._coalesce_sources.pop(source, None)
+
+  def set_coalesce_property(self, prop: str, window: float) -> None:
+    """Set the coalesce window for a property. Broadcasts are coalesced when all of their properties have a window.
+
+    Args:
+      prop (str): event property
+      window (float): seconds to hold and merge broadcasts. 0 or None turns coalescing off.
+    """
+    if window:
+      self._coalesce_properties[prop] = float(window)
+    else:
+      self._coalesce_properties.pop(prop, None)
+
+  @property
+  def running(self) -> bool:
+    return self._loop_thread is not None and self.loop.is_running()
+
+  @property
+  def queue_depth(self) -> int:
+    return self._queue.qsize() + len(self._overflow)
+
+  def subscriber_queue_depths(self) -> dict:
+    """Get the queue depth of every subscriber and sink worker.
+
+    Returns:
+      (dict) { NAME: DEPTH }
+    """
+    return {name: worker.queue.qsize() for name, worker in list(self._workers.items())}
+
+  def publish(self, event: Event) -> bool:
+    """Publish an event. This is safe to call from any thread.
+
+    Args:
+      event (Event): event to publish
+
+    Returns:
+      (bool) event was accepted
+    """
+    self.published += 1
+
+    if not self.running:
+      self.deliver_now(event)
+      return True
+
+    if threading.get_ident() == self._loop_thread:
+      return self._accept(event)
+
+    # Coalescing state is only touched on the loop, so every event goes through _accept there.
+    if self.drop_policy == BLOCK:
+      return asyncio.run_coroutine_threadsafe(self._accept_blocking(event), self.loop).result()
+
+    self.loop.call_soon_threadsafe(self._accept, event)
+    return True
+
+  def publish_to(self, subscribers: list, event: Event) -> None:
+    """Publish an event to the given subscribers only. Sinks do not get the event. This is safe to call from any
+    thread.
+
+    Args:
+      subscribers (list): subscriber ids
+      event (Event): event to publish
+    """
+    if not self.running:
+      for subscriber in subscribers:
+        self._call_subscriber(subscriber, event)
+      return
+
+    if threading.get_ident() == self._loop_thread:
+      self._route_to(subscribers, event)
+      return
+
+    self.loop.call_soon_threadsafe(self._route_to, subscribers, event)
+
+  def deliver_now(self, event: Event) -> None:
+    """Deliver an event synchronously on the caller's thread.
+
+    Args:
+      event (Event): event to deliver
+    """
+    for subscriber in self.firefly.subscriptions.get_subscribers(event.source, event_action=event.event_action):
+      self._call_subscriber(subscriber, event)
+    for name, handler in self._sinks.items():
+      _call(name, handler, event)
+
+  def _coalesce_window(self, event: Event) -> float:
+    """Get the coalesce window for an event. Returns 0 if the event should not be coalesced."""
+    if event.event_type != EVENT_TYPE_BROADCAST:
+      return 0
+    window = self._coalesce_sources.get(event.source)
+    if window:
+      return window
+    if not self._coalesce_properties or not event.event_action:
+      return 0
+    try:
+      return min(self._coalesce_properties[prop] for prop in event.event_action)
+    except (KeyError, TypeError):
+      return 0
+
+  def _accept(self, event: Event) -> bool:
+    pending = self._pending.get(event.source)
+    window = self._coalesce_window(event)
+
+    if window:
+      if pending is None:
+        timer = self.loop.call_later(window, self._flush, event.source)
+        self._pending[event.source] = _PendingBroadcast(event, timer)
+      else:
+        pending.merge(event)
+        self._count_coalesced(event.source)
+      return True
+
+    if pending is None:
+      return self._put(event)
+
+    del self._pending[event.source]
+    pending.timer.cancel()
+    if event.event_type != pending.event_type:
+      self._put(pending.event())
+      return self._put(event)
+
+    # Flush the pending broadcast together with this event.
+    pending.merge(event)
+    self._count_coalesced(event.source)
+    return self._put(pending.event())
+
+  @asyncio.coroutine
+  def _accept_blocking(self, event: Event):
+    """Accept an event published from another thread and wait until the queue has room for everything before it."""
+    accepted = self._accept(event)
+    while self._overflow:
+      self._drained.clear()
+      yield from self._drained.wait()
+    return accepted
+
+  def _flush(self, source: str) -> None:
+    pending = self._pending.pop(source, None)
+    if pending is not None:
+      self._put(pending.event())
+
+  def _count_coalesced(self, source: str) -> None:
+    self.coalesced += 1
+    self.coalesced_by_source[source] = self.coalesced_by_source.get(source, 0) + 1
+
+  def _put(self, event: Event) -> bool:
+    if self.drop_policy == BLOCK:
+      if self._overflow or self._queue.full():
+        self._overflow.append(event)
+      else:
+        self._queue.put_nowait(event)
+      return True
+    dropped = _put_nowait(self._queue, event, self.drop_policy)
+    if dropped is None:
+      return True
+    self.dropped += 1
+    logging.warn('[DISPATCHER] event queue full, dropped event from %s' % dropped.source)
+    return dropped is not event
+
+  @asyncio.coroutine
+  def _route(self):
+    self._loop_thread = threading.get_ident()
+    workers = self._workers
+    while True:
+      event = yield from self._queue.get()
+      overflow = self._overflow
+      if overflow:
+        self._queue.put_nowait(overflow.popleft())
+        if not overflow:
+          self._drained.set()
+      try:
+        for subscriber in self.firefly.subscriptions.get_subscribers(event.source, event_action=event.event_action):
+          worker = workers.get(subscriber) or self._add_worker(subscriber, partial(self._call_subscriber, subscriber))
+          worker.put(event)
+        for name, handler in self._sinks.items():
+          worker = workers.get(name) or self._add_worker(name, partial(_call, name, handler), self.sink_queue_size)
+          worker.put(event)
+      except Exception as e:
+        logging.error(code='FF.DIS.ROU.001', args=(event.source, e))  # error routing event from %s: %s
+
+  def _route_to(self, subscribers: list, event: Event) -> None:
+    workers = self._workers
+    for subscriber in subscribers:
+      worker = workers.get(subscriber) or self._add_worker(subscriber, partial(self._call_subscriber, subscriber))
+      worker.put(event)
+
+  def _add_worker(self, name: str, deliver: Callable, queue_size: int = 0):
+    worker = _Worker(self, name, deliver, queue_size)
+    self._workers[name] = worker
+    return worker
+
+  def _call_subscriber(self, subscriber: str, event: Event) -> None:
+    component = self.firefly.components.get(subscriber)
+    if component is None:
+      logging.info('[DISPATCHER] subscriber %s not found' % subscriber)
+      return
+    _call(subscriber, component.event, event, KIND_SUBSCRIBER)
+
+
+class _PendingBroadcast(object):
+  """A broadcast held in the coalesce window and the events merged into it."""
+
+  def __init__(self, event: Event, timer: asyncio.Handle):
+    self.source = event.source
+    self.event_type = event.event_type
+    self.event_action = dict(event.event_action)
+    self.timer = timer
+    self.count = 1
+
+  def merge(self, event: Event) -> None:
+    self.event_action.update(event.event_action)
+    self.count += 1
+
+  def event(self) -> Event:
+    if self.count == 1:
+      return Event(self.source, self.event_type, self.event_action)
+    return Event(self.source, self.event_type, self.event_action, coalesced=self.count)
+
+
+class _Worker(object):
+  """Delivers events to one subscriber or sink in order.
+
+  Args:
+    dispatcher (EventDispatcher): the dispatcher that owns the worker
+    name (str): subscriber id or sink name
+    deliver (Callable): function called with each event. It must not raise.
+    queue_size (int): size of the queue, 0 for a queue that never drops
+  """
+
+  def __init__(self, dispatcher: EventDispatcher, name: str, deliver: Callable, queue_size: int = 0):
+    self.dispatcher = dispatcher
+    self.name = name
+    self.deliver = deliver
+    self.queue = asyncio.Queue(maxsize=queue_size, loop=dispatcher.loop)
+    self.task = asyncio.ensure_future(self._run(), loop=dispatcher.loop)
+
+  def put(self, event: Event) -> None:
+    # Workers are only fed from the router, so block falls back to drop_oldest here.
+    policy = DROP_NEWEST if self.dispatcher.drop_policy == DROP_NEWEST else DROP_OLDEST
+    dropped = _put_nowait(self.queue, event, policy)
+    if dropped is not None:
+      self.dispatcher.dropped += 1
+      logging.warn('[DISPATCHER] queue for %s full, dropped event from %s' % (self.name, dropped.source))
+
+  def stop(self) -> None:
+    self.task.cancel()
+
+  @asyncio.coroutine
+  def _run(self):
+    loop = self.dispatcher.loop
+    while True:
+      event = yield from self.queue.get()
+      yield from loop.run_in_executor(self.dispatcher.executor, self.deliver, event)
+
+
+def _put_nowait(queue: asyncio.Queue, event: Event, policy: str) -> Event:
+  """Put an event into a queue without waiting.
+
+  Returns:
+    (Event) The event that was dropped to apply the drop policy or None.
+  """
+  dropped = None
+  if queue.full():
+    if policy == DROP_NEWEST:
+      return event
+    dropped = queue.get_nowait()
+  queue.put_nowait(event)
+  return dropped
+
+
+def _call(name: str, handler: Callable, event: Event, kind: str = KIND_SINK) -> None:
+  start = metrics.start()
+  try:
+    handler(event)
+  except Exception as e:
+    metrics.observe(kind, name, start, error=True)
+    logging.error(code='FF.DIS.CAL.001', args=(name, e))  # error delivering event to %s: %s
+    return
+  metrics.observe(kind, name, start)
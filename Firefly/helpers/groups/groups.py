@@ -3,9 +3,10 @@ from typing import Callable
 from uuid import uuid4
 
 from Firefly import aliases, logging
-from Firefly.const import ACTION_OFF, ACTION_ON, CONTACT, CONTACT_CLOSED, CONTACT_OPEN, EVENT_TYPE_BROADCAST, GROUPS_CONFIG_FILE, LEVEL, MOTION, MOTION_ACTIVE, MOTION_INACTIVE, STATE, SWITCH
+from Firefly.const import ACTION_OFF, ACTION_ON, CONTACT, CONTACT_CLOSED, CONTACT_OPEN, EVENT_TYPE_BROADCAST, EXECUTION_CHEAP, GROUPS_CONFIG_FILE, LEVEL, MOTION, MOTION_ACTIVE, MOTION_INACTIVE, STATE, SWITCH
 from Firefly.helpers.events import Command, Event, Request
 from Firefly.helpers.metadata import action_on_off_switch, action_motion, action_contact
+from Firefly.helpers.tracked_state import TrackedState
 
 '''
 devices[ff_id] = {tags: [tags], values: {prop: value}}
@@ -36,6 +37,19 @@ TAG_MAP = {
 
 }
 
+# Device tags and properties each group request is computed from. Used to only re-evaluate the requests an event can
+# change. Requests not listed here are evaluated on every event.
+REQUEST_DEPENDENCIES = {
+  SWITCH:     (['switch'], [SWITCH]),
+  'light':    (['light'], [SWITCH]),
+  'dimmer':   (['dimmer'], [LEVEL]),
+  'contact':  (['contact'], [CONTACT]),
+  'door':     (['door'], [CONTACT]),
+  'window':   (['window'], [CONTACT]),
+  'motion':   (['motion'], [MOTION]),
+  'security': (['security'], [MOTION, CONTACT])
+}
+
 
 # TODO: New sample groups config
 # TODO: add groups export to shutdown
@@ -64,7 +78,7 @@ def export_groups(firefly, config_file=GROUPS_CONFIG_FILE):
     config_file: path to config file (default to config folder)
   """
   export_data = {}
-  for ff_id, component in firefly.components.items():
+  for ff_id, component in firefly.component_items():
     if component.type != 'GROUP':
       continue
     export_data[ff_id] = component.export()
@@ -84,7 +98,10 @@ def make_group(firefly, alias):
   return new_group.id
 
 
-class Group(object):
+class Group(TrackedState):
+  # Commands only fan out to the devices, which are run by their own execution policy.
+  execution_policy = EXECUTION_CHEAP
+
   def __init__(self, firefly, alias, **kwargs):
     self.firefly = firefly
 
@@ -242,6 +259,7 @@ class Group(object):
       'state': {}
     }
     self.get_device_values(ff_id)
+    self.reset_tracking()
     self.firefly.subscriptions.add_subscriber(self.id, ff_id)
     # except Exception as e:
     #  logging.error('[GROUP] tags function not found for ff_id: %s - %s' % (ff_id, str(e)))
@@ -307,12 +325,30 @@ class Group(object):
 
   def event(self, event: Event) -> None:
     logging.info('[GROUP] received event %s' % event)
-    state_before = self.get_all_request_values(True)
+    self.start_tracking()
 
     self.devices[event.source]['state'].update(event.event_action)
+    self.mark_requests_dirty(self.get_changed_requests(event.source, event.event_action))
+
+    self.broadcast_tracked_changes()
+
+  def get_changed_requests(self, ff_id: str, changed: dict) -> list:
+    """Get the requests that can change when the state of a device changes.
+
+    Args:
+      ff_id (str): ff_id of the device
+      changed (dict): changed properties
+
+    Returns:
+      (list) requests to evaluate
+    """
+    tags = set(self.devices[ff_id]['tags'])
+    return [r for r, (r_tags, r_props) in REQUEST_DEPENDENCIES.items() if tags.intersection(r_tags) and
+            any(p in changed for p in r_props)]
 
-    state_after = self.get_all_request_values(True)
-    self.broadcast_changes(state_before, state_after)
+  def tracked_request_dependencies(self) -> tuple:
+    """Group state is held in self.devices, requests in REQUEST_DEPENDENCIES are marked dirty by event()."""
+    return {}, [r for r in self._tracked_requests if r not in REQUEST_DEPENDENCIES]
 
   def get_all_request_values(self, min_data=False, **kwargs) -> dict:
     """Function to get all requestable values.
@@ -373,6 +409,7 @@ class Group(object):
     """
     self.requests.append(request)
     self.request_mapping[request] = function
+    self.reset_tracking()
 
   def add_action(self, action, action_meta):
     self.metadata['actions'][action] = action_meta
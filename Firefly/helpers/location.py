@@ -1,6 +1,6 @@
 import asyncio
 import pickle
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import json
 from os import path
 
@@ -9,6 +9,8 @@ from astral import Astral, GoogleGeocoder
 from Firefly import logging, scheduler
 from Firefly.const import DAY_EVENTS, EVENT_TYPE_BROADCAST, SOURCE_LOCATION, TIME, LOCATION_FILE
 from Firefly.helpers.events import Event, Command
+from Firefly.helpers.refresh_coordinator import SECTION_LOCATION
+from Firefly.helpers.time_triggers import TimeTriggers
 
 
 class Location(object):
@@ -21,6 +23,9 @@ class Location(object):
     self.address = 'San Fransisco'
     self.old_address = None
     self.location_dump = None
+    self.time_triggers = TimeTriggers()
+    # Solar events by local date: { DATE: { DAY_EVENT: datetime } }
+    self._sun_cache = {}
 
     self.read_config(location_file)
     if self.old_address == self.address and self.geolocation:
@@ -55,6 +60,7 @@ class Location(object):
     pickle_file = location_file.replace('.json', '.pickle')
     if path.isfile(pickle_file):
       self.geolocation = pickle.load(open(pickle_file, 'rb'))
+      self._sun_cache = {}
 
 
   def update_location(self, address:str, **kwargs):
@@ -70,6 +76,7 @@ class Location(object):
     a = Astral(GoogleGeocoder)
     a.solar_depression = 'civil'
     self.geolocation = a[address]
+    self._sun_cache = {}
     address = '%s %s' % (self.geolocation.name, self.geolocation.region)
     self.old_address = address
     self.address = address
@@ -124,6 +131,8 @@ class Location(object):
   # TODO: Add handling for realtime adding/deleting modes, changing zipcode etc.
 
   def setupScheduler(self) -> None:
+    self.time_triggers.set_timezone(self.geolocation.tz, self.now)
+
     for e in DAY_EVENTS:
       day_event_time = self.getNextDayEvent(e)
       logging.info('Day Event: {} Time: {}'.format(e, str(day_event_time)))
@@ -159,13 +168,35 @@ class Location(object):
 
   def getNextDayEvent(self, day_event):
     now = self.now
-    day_event_time = self.geolocation.sun(date=now, local=True).get(day_event)
+    day_event_time = self.sun(now.date()).get(day_event)
     if day_event_time is None:
       return False
     if day_event_time < now:
-      day_event_time = self.geolocation.sun(date=now + timedelta(days=1), local=True).get(day_event)
+      day_event_time = self.sun((now + timedelta(days=1)).date()).get(day_event)
     return day_event_time
 
+  def sun(self, local_date: date = None) -> dict:
+    ''' Get the solar events for a local date.
+
+    The solar events are computed once per date. Dates more than a day before the requested date are dropped from the
+    cache, so it rolls over at midnight. The cache is cleared when the location changes.
+
+    Args:
+      local_date: local date, defaults to today
+
+    Returns:
+      (dict) { DAY_EVENT: datetime } from astral
+    '''
+    if local_date is None:
+      local_date = self.now.date()
+    sun = self._sun_cache.get(local_date)
+    if sun is None:
+      sun = self.geolocation.sun(date=local_date, local=True)
+      oldest = local_date - timedelta(days=1)
+      self._sun_cache = {d: s for d, s in self._sun_cache.items() if d >= oldest}
+      self._sun_cache[local_date] = sun
+    return sun
+
   @property
   def mode(self):
     return self._mode
@@ -193,7 +224,7 @@ class Location(object):
   @property
   def isDark(self):
     now = self.now
-    sun = self.geolocation.sun(date=now, local=True)
+    sun = self.sun(now.date())
     if now >= sun['sunset'] or now <= sun['sunrise']:
       return True
     return False
@@ -212,8 +243,9 @@ class Location(object):
     '''
     if self.isDark:
       if sunrise_offset is not None:
-        offset_time = self.now - timedelta(hours=sunrise_offset)
-        sun = self.geolocation.sun(date=self.now, local=True)
+        now = self.now
+        offset_time = now - timedelta(hours=sunrise_offset)
+        sun = self.sun(now.date())
         if offset_time >= sun['sunrise'] and offset_time <= sun['sunset']:
           return True
         return False
@@ -232,6 +264,21 @@ class Location(object):
     })
     self.firefly.send_event(event)
 
+    # Only wake up the time triggers that are due this minute.
+    due = self.time_triggers.pop_due(now)
+    if due:
+      logging.info('[LOCATION] time triggers due: %s' % str(due))
+      self.firefly.dispatcher.publish_to(due, event)
+
+  def add_time_trigger(self, subscriber_id: str, trigger_action: list) -> None:
+    ''' Wake up a subscriber with the time broadcast when a time action is due.
+
+    Args:
+      subscriber_id: subscriber to send the time event to
+      trigger_action: list of time actions
+    '''
+    self.time_triggers.add(subscriber_id, trigger_action, self.now)
+
   def add_status_message(self, message_id, message):
     self.status_messages[message_id] = message
     event = Event(SOURCE_LOCATION, EVENT_TYPE_BROADCAST, event_action={
@@ -260,7 +307,7 @@ class Location(object):
     if command.command == 'update_address' and command.args.get('address'):
       self.update_location(command.args.get('address'))
 
-    self.firefly.refresh_firebase()
+    self.firefly.refresh_firebase(SECTION_LOCATION)
 
 
   @property
@@ -1,14 +1,17 @@
-import inspect
 import logging
 import os
+import queue
+import sys
 
 from Firefly import error_codes
 from Firefly.const import COMMAND_NOTIFY, SERVICE_NOTIFICATION
 
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 LOG_PATH = '/opt/firefly_system/logs/new_firefly_log.log'
 FORMAT = '%(asctime)s\t%(levelname)s:\t%(message)s'
+# Message padded to 130 characters followed by [function - file] of the caller.
+MESSAGE_FORMAT = '%-130s [%s - %s]'
 
 LOGGING_LEVEL = {
   'debug':    logging.DEBUG,
@@ -18,16 +21,26 @@ LOGGING_LEVEL = {
   'critical': logging.CRITICAL
 }
 
+# {co_filename: basename}
+_file_names = {}
+
 
 class FireflyLogging(object):
   '''FireflyLogging waraps the default logging module.
 
   Using FireflyLogging allows logging messages to also go into the database be be used and displayed in the ui. This is
   a work in progress and only logs out to the screen now.
+
+  The log level is checked before anything else, so disabled calls only cost a method call. Messages can take lazy
+  arguments that are only formatted when the level is enabled:
+    logging.debug('%s: Got Command: %s', self.id, command.command)
+
+  start_queue moves the handlers behind a QueueListener thread so writing the log file does not block the caller.
   '''
 
   def __init__(self, filename=None, level='debug'):
     self.firefly = None
+    self._listener = None
     if filename:
       logging.basicConfig(filename=filename)
     logging.basicConfig(level=LOGGING_LEVEL[level], format='%(asctime)s\t%(levelname)s:\t%(message)s', datefmt='%Y-%m-%d %H:%M:%S')
@@ -52,60 +65,96 @@ class FireflyLogging(object):
     """
     self.firefly = firefly
 
-  def notify(self, message):
-    func = inspect.currentframe().f_back.f_code
-    function_name = func.co_name
-    file_name = os.path.basename(func.co_filename)
-    self.logger.info('%-130s [%s - %s]' % (message, function_name, file_name))
+  def start_queue(self) -> None:
+    """Send log records through a queue to a listener thread that runs the handlers.
+
+    The handlers of the Firefly logger and the root logger are moved to the listener, so records are formatted on the
+    caller's thread and written by the listener thread.
+    """
+    if self._listener is not None:
+      return
+    handlers = list(self.logger.handlers)
+    if self.logger.propagate:
+      handlers.extend(logging.getLogger().handlers)
+    log_queue = queue.Queue(-1)
+    for handler in list(self.logger.handlers):
+      self.logger.removeHandler(handler)
+    self.logger.addHandler(QueueHandler(log_queue))
+    self._propagate = self.logger.propagate
+    self.logger.propagate = False
+    self._handlers = handlers
+    self._listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    self._listener.start()
+
+  def stop_queue(self) -> None:
+    """Write the queued records and move the handlers back to the Firefly logger."""
+    if self._listener is None:
+      return
+    self._listener.stop()
+    self._listener = None
+    for handler in list(self.logger.handlers):
+      self.logger.removeHandler(handler)
+    root_handlers = logging.getLogger().handlers
+    for handler in self._handlers:
+      if handler not in root_handlers:
+        self.logger.addHandler(handler)
+    self.logger.propagate = self._propagate
+
+  def _log(self, level: int, message, args: tuple) -> None:
+    """Log a message with the function and file of the caller of the public log function."""
+    logger = self.logger
+    if not logger.isEnabledFor(level):
+      return
+    code = sys._getframe(2).f_code
+    file_name = _file_names.get(code.co_filename)
+    if file_name is None:
+      file_name = _file_names[code.co_filename] = os.path.basename(code.co_filename)
+    if args:
+      try:
+        message = message % args
+      except (TypeError, ValueError):
+        message = '%s %s' % (message, args)
+    # The caller is already known, so skip Logger.findCaller by making the record here.
+    logger.handle(logger.makeRecord(logger.name, level, code.co_filename, 0, MESSAGE_FORMAT,
+                                    (message, code.co_name, file_name), None, code.co_name))
+
+  def notify(self, message, *args):
+    self._log(logging.INFO, message, args)
 
     if self.firefly is None:
       return
+    if args:
+      message = message % args
     from Firefly.helpers.events import Command
     notify = Command(SERVICE_NOTIFICATION, 'LOGGING', COMMAND_NOTIFY, message=message)
     self.firefly.send_command(notify)
 
-  def debug(self, message):
-    func = inspect.currentframe().f_back.f_code
-    function_name = func.co_name
-    file_name = os.path.basename(func.co_filename)
-    self.logger.debug('%-130s [%s - %s]' % (message, function_name, file_name))
+  def debug(self, message, *args):
+    self._log(logging.DEBUG, message, args)
 
-  def info(self, message):
-    func = inspect.currentframe().f_back.f_code
-    function_name = func.co_name
-    file_name = os.path.basename(func.co_filename)
-    self.logger.info('%-130s [%s - %s]' % (message, function_name, file_name))
+  def info(self, message, *args):
+    self._log(logging.INFO, message, args)
 
-  def message(self, message):
+  def message(self, message, *args):
     ''' message will also show up in the ui logs by defaults but logs as info'''
-    func = inspect.currentframe().f_back.f_code
-    function_name = func.co_name
-    file_name = os.path.basename(func.co_filename)
-    self.logger.info('%-130s [%s - %s]' % (message, function_name, file_name))
-
-  def warn(self, message):
-    func = inspect.currentframe().f_back.f_code
-    function_name = func.co_name
-    file_name = os.path.basename(func.co_filename)
-    self.logger.warning('%-130s [%s - %s]' % (message, function_name, file_name))
-
-  def error(self, message='', code: str = None, args: tuple = None):
-    func = inspect.currentframe().f_back.f_code
-    function_name = func.co_name
-    file_name = os.path.basename(func.co_filename)
-    try:
-      if code:
-        if args:
-          message = str(error_codes.get(code)) % args
-        else:
-          message = error_codes.get(code)
-          self.logger.error('%-130s [%s - %s]' % (message, function_name, file_name))
-    except:
-      self.logger.error('error getting code: %-130s [%s - %s]' % (code, function_name, file_name))
+    self._log(logging.INFO, message, args)
+
+  def warn(self, message, *args):
+    self._log(logging.WARNING, message, args)
+
+  def error(self, message='', *message_args, code: str = None, args: tuple = None):
+    if code:
+      if not self.logger.isEnabledFor(logging.ERROR):
+        return
+      try:
+        message = error_codes.get(code)
+        if args is not None:
+          message = str(message) % args
+      except Exception:
+        self._log(logging.ERROR, 'error getting code: %s', (code,))
+        return
       # TODO: Log errors to Fierbase for future debugging
+    self._log(logging.ERROR, message, message_args)
 
-  def critical(self, message):
-    func = inspect.currentframe().f_back.f_code
-    function_name = func.co_name
-    file_name = os.path.basename(func.co_filename)
-    self.logger.critical('%-130s [%s - %s]' % (message, function_name, file_name))
+  def critical(self, message, *args):
+    self._log(logging.CRITICAL, message, args)
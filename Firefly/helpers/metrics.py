@@ -0,0 +1,340 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
+
+# Kinds of handlers that are timed.
+KIND_SUBSCRIBER = 'subscriber'
+KIND_SINK = 'sink'
+KIND_COMMAND = 'command'
+KIND_REQUEST = 'request'
+KIND_JOB = 'job'
+
+# Histogram bucket upper bounds in seconds.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# Events per second are averaged over a sliding window of this many seconds.
+RATE_WINDOW = 60
+
+SLOWEST_HANDLERS = 10
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+
+class Histogram(object):
+  """Fixed bucket latency histogram.
+
+  Args:
+    buckets (tuple): sorted bucket upper bounds in seconds. The last bucket should be inf.
+  """
+
+  __slots__ = ['buckets', 'counts', 'count', 'sum', 'max']
+
+  def __init__(self, buckets: tuple = BUCKETS):
+    self.buckets = buckets
+    self.counts = [0] * len(buckets)
+    self.count = 0
+    self.sum = 0.0
+    self.max = 0.0
+
+  def observe(self, seconds: float) -> None:
+    self.counts[bisect_left(self.buckets, seconds)] += 1
+    self.count += 1
+    self.sum += seconds
+    if seconds > self.max:
+      self.max = seconds
+
+  def percentile(self, percent: float) -> float:
+    """Get the bucket upper bound that the given percent of observations are below. inf buckets report the max."""
+    if not self.count:
+      return 0.0
+    target = self.count * percent / 100
+    seen = 0
+    for bound, count in zip(self.buckets, self.counts):
+      seen += count
+      if seen >= target:
+        return min(bound, self.max)
+    return self.max
+
+  def export(self) -> dict:
+    return {
+      'count': self.count,
+      'sum':   self.sum,
+      'mean':  self.sum / self.count if self.count else 0.0,
+      'max':   self.max,
+      'p50':   self.percentile(50),
+      'p95':   self.percentile(95),
+      'p99':   self.percentile(99),
+    }
+
+
+class _Rate(object):
+  """Event counter with a sliding window rate."""
+
+  __slots__ = ['total', 'window', 'count', 'last_count']
+
+  def __init__(self):
+    self.total = 0
+    self.window = 0
+    self.count = 0
+    self.last_count = 0
+
+  def add(self, now: float) -> None:
+    window = int(now // RATE_WINDOW)
+    if window != self.window:
+      self.last_count = self.count if window == self.window + 1 else 0
+      self.window = window
+      self.count = 0
+    self.count += 1
+    self.total += 1
+
+  def per_second(self, now: float) -> float:
+    window = int(now // RATE_WINDOW)
+    if window == self.window:
+      count, last_count = self.count, self.last_count
+    elif window == self.window + 1:
+      count, last_count = 0, self.count
+    else:
+      return 0.0
+    # Weigh the last window by how much of it is still inside the sliding window.
+    elapsed = now / RATE_WINDOW - window
+    return (count + last_count * (1 - elapsed)) / RATE_WINDOW
+
+
+class Metrics(object):
+  """Metrics for the event bus and other hot paths.
+
+  Records:
+    - latency histograms per handler (subscribers, sinks, commands, requests and scheduler jobs).
+    - exception counts per handler.
+    - events per second per source.
+
+  Recording is a dict lookup and a few additions under a lock, so it can be left on. Set enabled to False to turn off
+  recording.
+
+  Usage:
+    start = metrics.start()
+    ... handle ...
+    metrics.observe(KIND_SUBSCRIBER, subscriber_id, start)
+  """
+
+  def __init__(self, enabled: bool = True):
+    self.enabled = enabled
+    self._lock = threading.Lock()
+    self._started = time.time()
+    # {(kind, name): Histogram}
+    self._handlers = {}
+    # {(kind, name): count}
+    self._exceptions = {}
+    # {source: _Rate}
+    self._events = {}
+    # {job_id: submitted time}
+    self._jobs_submitted = {}
+    self.jobs_missed = 0
+
+  def start(self) -> float:
+    """Get the start time to pass to observe."""
+    return time.perf_counter()
+
+  def observe(self, kind: str, name: str, start: float, error: bool = False) -> None:
+    """Record the time since start for a handler.
+
+    Args:
+      kind (str): kind of handler (KIND_*)
+      name (str): name of the handler, for example the subscriber id
+      start (float): time from start()
+      error (bool): the handler raised an exception
+    """
+    if not self.enabled:
+      return
+    self.observe_seconds(kind, name, time.perf_counter() - start, error)
+
+  def observe_seconds(self, kind: str, name: str, seconds: float, error: bool = False) -> None:
+    if not self.enabled:
+      return
+    key = (kind, name)
+    with self._lock:
+      histogram = self._handlers.get(key)
+      if histogram is None:
+        histogram = self._handlers[key] = Histogram()
+      histogram.observe(seconds)
+      if error:
+        self._exceptions[key] = self._exceptions.get(key, 0) + 1
+
+  def count_exception(self, kind: str, name: str) -> None:
+    if not self.enabled:
+      return
+    key = (kind, name)
+    with self._lock:
+      self._exceptions[key] = self._exceptions.get(key, 0) + 1
+
+  def count_event(self, source: str) -> None:
+    """Count an event sent by a source."""
+    if not self.enabled:
+      return
+    with self._lock:
+      rate = self._events.get(source)
+      if rate is None:
+        rate = self._events[source] = _Rate()
+      rate.add(time.time())
+
+  def timed(self, kind: str, name: str, function: Callable, *args, **kwargs):
+    """Call a function and record how long it took and if it raised.
+
+    Args:
+      kind (str): kind of handler (KIND_*)
+      name (str): name of the handler
+      function (Callable): function to call
+
+    Returns:
+      The return value of the function.
+    """
+    start = time.perf_counter()
+    try:
+      result = function(*args, **kwargs)
+    except Exception:
+      self.observe(kind, name, start, error=True)
+      raise
+    self.observe(kind, name, start)
+    return result
+
+  def listen_scheduler(self, add_listener: Callable) -> None:
+    """Record scheduler job run times.
+
+    Args:
+      add_listener (Callable): the scheduler's add_listener(callback, mask)
+    """
+    add_listener(self._scheduler_event, EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED)
+
+  def _scheduler_event(self, event) -> None:
+    if not self.enabled:
+      return
+    if event.code == EVENT_JOB_SUBMITTED:
+      with self._lock:
+        self._jobs_submitted[event.job_id] = time.perf_counter()
+      return
+    if event.code == EVENT_JOB_MISSED:
+      with self._lock:
+        self.jobs_missed += 1
+      return
+    with self._lock:
+      start = self._jobs_submitted.pop(event.job_id, None)
+    if start is not None:
+      self.observe(KIND_JOB, event.job_id, start, error=event.code == EVENT_JOB_ERROR)
+    elif event.code == EVENT_JOB_ERROR:
+      self.count_exception(KIND_JOB, event.job_id)
+
+  def reset(self) -> None:
+    with self._lock:
+      self._started = time.time()
+      self._handlers = {}
+      self._exceptions = {}
+      self._events = {}
+      self._jobs_submitted = {}
+      self.jobs_missed = 0
+
+  def export(self, dispatcher=None, slowest: int = SLOWEST_HANDLERS) -> dict:
+    """Export all metrics.
+
+    Args:
+      dispatcher (EventDispatcher): dispatcher to export queue depth and counters from
+      slowest (int): number of slowest handlers to include
+
+    Returns:
+      (dict) metrics
+    """
+    now = time.time()
+    with self._lock:
+      handlers = {}
+      for (kind, name), histogram in self._handlers.items():
+        handler = histogram.export()
+        handler['exceptions'] = self._exceptions.get((kind, name), 0)
+        handlers.setdefault(kind, {})[name] = handler
+      for (kind, name), count in self._exceptions.items():
+        if name not in handlers.get(kind, {}):
+          handlers.setdefault(kind, {})[name] = {'count': 0, 'exceptions': count}
+      events = {source: {'total': rate.total, 'per_second': rate.per_second(now)} for source, rate in self._events.items()}
+      slowest_handlers = sorted(((h.max, kind, name) for (kind, name), h in self._handlers.items()), reverse=True)
+      export_data = {
+        'uptime':          now - self._started,
+        'handlers':        handlers,
+        'events':          events,
+        'exceptions':      sum(self._exceptions.values()),
+        'jobs_missed':     self.jobs_missed,
+        'slowest_handlers': [{'kind': kind, 'name': name, 'max': seconds} for seconds, kind, name in
+                             slowest_handlers[:slowest]],
+      }
+
+    if dispatcher is not None:
+      export_data['dispatcher'] = {
+        'queue_depth':         dispatcher.queue_depth,
+        'subscriber_queues':   dispatcher.subscriber_queue_depths(),
+        'published':           dispatcher.published,
+        'dropped':             dispatcher.dropped,
+        'coalesced':           dispatcher.coalesced,
+        'coalesced_by_source': dict(dispatcher.coalesced_by_source),
+      }
+    return export_data
+
+  def export_prometheus(self, dispatcher=None) -> str:
+    """Export all metrics in the Prometheus text format.
+
+    Args:
+      dispatcher (EventDispatcher): dispatcher to export queue depth and counters from
+
+    Returns:
+      (str) metrics
+    """
+    lines = []
+    with self._lock:
+      handlers = [(kind, name, histogram.buckets, list(histogram.counts), histogram.count, histogram.sum) for
+                  (kind, name), histogram in self._handlers.items()]
+      exceptions = dict(self._exceptions)
+      now = time.time()
+      events = [(source, rate.total, rate.per_second(now)) for source, rate in self._events.items()]
+      jobs_missed = self.jobs_missed
+
+    lines.append('# TYPE firefly_handler_seconds histogram')
+    for kind, name, buckets, counts, count, total in handlers:
+      labels = 'kind="%s",name="%s"' % (_escape(kind), _escape(name))
+      cumulative = 0
+      for bound, bucket_count in zip(buckets, counts):
+        cumulative += bucket_count
+        lines.append('firefly_handler_seconds_bucket{%s,le="%s"} %d' % (labels, _bound(bound), cumulative))
+      lines.append('firefly_handler_seconds_sum{%s} %f' % (labels, total))
+      lines.append('firefly_handler_seconds_count{%s} %d' % (labels, count))
+
+    lines.append('# TYPE firefly_handler_exceptions_total counter')
+    for (kind, name), count in exceptions.items():
+      lines.append('firefly_handler_exceptions_total{kind="%s",name="%s"} %d' % (_escape(kind), _escape(name), count))
+
+    lines.append('# TYPE firefly_events_total counter')
+    for source, total, _ in events:
+      lines.append('firefly_events_total{source="%s"} %d' % (_escape(source), total))
+    lines.append('# TYPE firefly_events_per_second gauge')
+    for source, _, per_second in events:
+      lines.append('firefly_events_per_second{source="%s"} %f' % (_escape(source), per_second))
+
+    lines.append('# TYPE firefly_jobs_missed_total counter')
+    lines.append('firefly_jobs_missed_total %d' % jobs_missed)
+
+    if dispatcher is not None:
+      lines.append('# TYPE firefly_event_queue_depth gauge')
+      lines.append('firefly_event_queue_depth %d' % dispatcher.queue_depth)
+      lines.append('# TYPE firefly_subscriber_queue_depth gauge')
+      for name, depth in dispatcher.subscriber_queue_depths().items():
+        lines.append('firefly_subscriber_queue_depth{name="%s"} %d' % (_escape(name), depth))
+      for counter in ['published', 'dropped', 'coalesced']:
+        lines.append('# TYPE firefly_events_%s_total counter' % counter)
+        lines.append('firefly_events_%s_total %d' % (counter, getattr(dispatcher, counter)))
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value) -> str:
+  return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _bound(bound: float) -> str:
+  return '+Inf' if bound == float('inf') else repr(bound)
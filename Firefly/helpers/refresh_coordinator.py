@@ -0,0 +1,113 @@
+import threading
+import time
+from typing import Callable
+
+from Firefly import logging
+from Firefly.const import TYPE_DEVICE, TYPE_ROUTINE
+
+# Sections of the firebase home status that can be refreshed on their own.
+SECTION_DEVICES = 'devices'
+SECTION_ROUTINES = 'routines'
+SECTION_GROUPS = 'groups'
+SECTION_ALIASES = 'aliases'
+SECTION_LOCATION = 'location'
+ALL_SECTIONS = frozenset([SECTION_DEVICES, SECTION_ROUTINES, SECTION_GROUPS, SECTION_ALIASES, SECTION_LOCATION])
+
+# {component type: sections that show that component}
+TYPE_SECTIONS = {
+  TYPE_DEVICE:  frozenset([SECTION_DEVICES, SECTION_ALIASES]),
+  TYPE_ROUTINE: frozenset([SECTION_ROUTINES]),
+  'GROUP':      frozenset([SECTION_GROUPS]),
+}
+
+REFRESH_JOB_ID = 'FIREBASE_REFRESH_CORE'
+DEFAULT_DEBOUNCE = 2
+DEFAULT_MIN_INTERVAL = 30
+
+
+def sections_for_type(component_type: str) -> frozenset:
+  """Get the sections to refresh when a component of a type is added or removed. Unknown types refresh everything."""
+  return TYPE_SECTIONS.get(component_type, ALL_SECTIONS)
+
+
+class RefreshCoordinator(object):
+  """RefreshCoordinator coalesces refresh requests into as few refreshes as possible.
+
+  Requests mark sections dirty. The first request after an idle period refreshes right away (leading edge). Requests
+  that come in while a refresh is scheduled or running are merged into one trailing refresh that runs at most once
+  every min_interval seconds, and never sooner than debounce seconds after it was scheduled. Each refresh is passed
+  only the sections that were dirtied since the last one.
+
+  Args:
+    refresh (Callable[[frozenset], None]): called with the dirty sections.
+    scheduler: Firefly scheduler used to run the refreshes.
+    debounce (float): seconds to wait for more requests before a trailing refresh.
+    min_interval (float): minimum seconds between the start of two refreshes.
+    job_id (str): scheduler job id.
+  """
+
+  def __init__(self, refresh: Callable[[frozenset], None], scheduler, debounce: float = DEFAULT_DEBOUNCE,
+               min_interval: float = DEFAULT_MIN_INTERVAL, job_id: str = REFRESH_JOB_ID):
+    self._refresh = refresh
+    self._scheduler = scheduler
+    self.debounce = debounce
+    self.min_interval = min_interval
+    self.job_id = job_id
+    self._lock = threading.Lock()
+    self._dirty = set()
+    self._scheduled = False
+    self._running = False
+    self._last_run = None
+    self.requested = 0
+    self.refreshed = 0
+
+  @property
+  def dirty(self) -> frozenset:
+    return frozenset(self._dirty)
+
+  def request(self, *sections) -> None:
+    """Request a refresh of sections. All sections are refreshed when none are given.
+
+    Args:
+      *sections: sections to refresh, for example SECTION_DEVICES
+    """
+    with self._lock:
+      self.requested += 1
+      self._dirty.update(sections or ALL_SECTIONS)
+      # A scheduled refresh picks up the new sections and a running one schedules the trailing refresh when it is done.
+      if self._scheduled or self._running:
+        return
+      self._schedule()
+
+  def run(self) -> None:
+    """Refresh the dirty sections. This is run by the scheduler."""
+    with self._lock:
+      self._scheduled = False
+      if self._running or not self._dirty:
+        return
+      sections = frozenset(self._dirty)
+      self._dirty.clear()
+      self._running = True
+      self._last_run = time.monotonic()
+
+    logging.info('Refreshing firebase sections: %s', sorted(sections))
+    try:
+      self._refresh(sections)
+    except Exception as e:
+      logging.error(code='FF.REF.RUN.001', args=(sorted(sections), e))  # error refreshing %s: %s
+    finally:
+      with self._lock:
+        self._running = False
+        self.refreshed += 1
+        if self._dirty and not self._scheduled:
+          self._schedule()
+
+  def _schedule(self) -> None:
+    """Schedule the next refresh. Must be called holding the lock."""
+    delay = 0
+    if self._last_run is not None:
+      remaining = self._last_run + self.min_interval - time.monotonic()
+      if remaining > 0:
+        delay = max(remaining, self.debounce)
+    self._scheduled = True
+    self._scheduler.runInS(delay, self.run, job_id=self.job_id)
@@ -1,12 +1,12 @@
 import uuid
-from time import sleep
 from typing import Any, Callable
 
 from Firefly import aliases, logging, scheduler
 from Firefly.const import (API_INFO_REQUEST, CONTACT, CONTACT_CLOSED, CONTACT_OPEN, EVENT_ACTION_ANY,
-                           EVENT_TYPE_BROADCAST, LEVEL, LUX, MOTION, MOTION_ACTIVE, MOTION_INACTIVE, SWITCH, SWITCH_OFF,
-                           SWITCH_ON, TYPE_DEVICE)
+                           EVENT_TYPE_BROADCAST, EXECUTION_CHEAP, LEVEL, LUX, MOTION, MOTION_ACTIVE, MOTION_INACTIVE,
+                           SWITCH, SWITCH_OFF, SWITCH_ON, TYPE_DEVICE)
 from Firefly.helpers.events import Command, Event, Request
+from Firefly.helpers.tracked_state import TrackedState
 
 # TODO: These should be moved into the const file
 # Tag Lookups are used to know what properties to look for
@@ -79,7 +79,12 @@ class Rooms(object):
 """Please note that rooms are based off of devices, any major changes to devices should be copied here"""
 
 
-class Room(object):
+class Room(TrackedState):
+  # Broadcasts use the same values as get_all_request_values()
+  _tracked_min_data = False
+  # A room command only sends a command to each device in the room.
+  execution_policy = EXECUTION_CHEAP
+
   def __init__(self, firefly, alias, **kwargs):
     self._alias = alias
     self._devices = kwargs.get('devices', {})
@@ -142,7 +147,7 @@ class Room(object):
 
   def event(self, event: Event) -> None:
     logging.info('[ROOM] received event %s' % event)
-    state_before = self.get_all_request_values()
+    self.start_tracking()
 
     # TODO check if list of device > 0 before setting to true
     if SWITCH in event.event_action.keys() and event.source in self._devices:
@@ -157,8 +162,7 @@ class Room(object):
 
     self.check_states()
 
-    state_after = self.get_all_request_values()
-    self.broadcast_changes(state_before, state_after)
+    self.broadcast_tracked_changes()
 
   def broadcast_changes(self, before: dict, after: dict) -> None:
     """Find changes from before and after states and broadcast the changes.
@@ -305,6 +309,7 @@ class Room(object):
     """
     self._requests.append(request)
     self._request_mapping[request] = function
+    self.reset_tracking()
 
   def execute_command(self, command: Command):
     print(command.args)
@@ -322,7 +327,6 @@ class Room(object):
     for d in devices:
       c = Command(d, command.source, command.command, **command.args)
       self.firefly.send_command(c)
-      sleep(0.01)
 
   def switch_state(self):
     return self._switch
@@ -96,6 +96,10 @@ class Scheduler(object):
                             max_instances=max_instances, misfire_grace_time=misfire_grace_time,
                             replace_existing=replace)
 
+  def add_listener(self, callback, mask):
+    '''Add a listener for scheduler events. mask is a combination of apscheduler.events codes.'''
+    self._scheduler.add_listener(callback, mask)
+
   def cancel(self, job_id):
     try:
       logging.info('canceling job: {}'.format(str(job_id)))
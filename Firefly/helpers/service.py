@@ -1,11 +1,15 @@
 from typing import Any, Callable
 
 from Firefly import logging
-from Firefly.const import TYPE_SERVICE
+from Firefly.const import EXECUTION_BLOCKING, TYPE_SERVICE
 from Firefly.helpers.events import Command, Event, Request
 
 
 class Service(object):
+  # How core runs command() (see CommandExecutor).
+  execution_policy = EXECUTION_BLOCKING
+  max_concurrency = 1
+
   def __init__(self, firefly, service_id, package, title, author, commands, requests):
     self._firefly = firefly
     self._title = title
@@ -1,7 +1,11 @@
 import configparser
 
 from Firefly.const import (FIREFLY_CONFIG_SECTION, CONFIG_HOST, CONFIG_PORT, CONFIG_DEFAULT_HOST, CONFIG_DEFAULT_PORT,
-                           CONFIG_POSTAL_CODE, CONFIG_MODES, CONFIG_MODES_DEFAULT, CONFIG_BEACON)
+                           CONFIG_POSTAL_CODE, CONFIG_MODES, CONFIG_MODES_DEFAULT, CONFIG_BEACON,
+                           CONFIG_EVENT_QUEUE_SIZE, CONFIG_DEFAULT_EVENT_QUEUE_SIZE, CONFIG_EVENT_DROP_POLICY,
+                           CONFIG_DEFAULT_EVENT_DROP_POLICY, CONFIG_COALESCE_WINDOW, CONFIG_DEFAULT_COALESCE_WINDOW,
+                           CONFIG_COALESCE_PROPERTIES, CONFIG_LOG_QUEUE, CONFIG_DEFAULT_LOG_QUEUE,
+                           CONFIG_SERVICE_TIMEOUT, CONFIG_DEFAULT_SERVICE_TIMEOUT)
 
 
 class Settings(object):
@@ -30,4 +34,40 @@ class Settings(object):
 
   @property
   def beacon_id(self):
-    return self.config.get(FIREFLY_CONFIG_SECTION, CONFIG_BEACON, fallback=None)
\ No newline at end of file
+    return self.config.get(FIREFLY_CONFIG_SECTION, CONFIG_BEACON, fallback=None)
+
+  @property
+  def event_queue_size(self):
+    return self.config.getint(FIREFLY_CONFIG_SECTION, CONFIG_EVENT_QUEUE_SIZE, fallback=CONFIG_DEFAULT_EVENT_QUEUE_SIZE)
+
+  @property
+  def event_drop_policy(self):
+    return self.config.get(FIREFLY_CONFIG_SECTION, CONFIG_EVENT_DROP_POLICY, fallback=CONFIG_DEFAULT_EVENT_DROP_POLICY)
+
+  @property
+  def coalesce_window(self):
+    return self.config.getfloat(FIREFLY_CONFIG_SECTION, CONFIG_COALESCE_WINDOW, fallback=CONFIG_DEFAULT_COALESCE_WINDOW)
+
+  @property
+  def log_queue(self):
+    """Write logs from a background thread. Useful when the log file is on slow storage (SD card)."""
+    return self.config.getboolean(FIREFLY_CONFIG_SECTION, CONFIG_LOG_QUEUE, fallback=CONFIG_DEFAULT_LOG_QUEUE)
+
+  @property
+  def service_timeout(self):
+    """Seconds to wait for a service to install on startup before giving up on it."""
+    return self.config.getfloat(FIREFLY_CONFIG_SECTION, CONFIG_SERVICE_TIMEOUT, fallback=CONFIG_DEFAULT_SERVICE_TIMEOUT)
+
+  @property
+  def coalesce_properties(self):
+    """Properties to coalesce. Format: "watts:2, voltage:5, current". Properties without a window use coalesce_window.
+
+    Returns:
+      (dict) { PROPERTY: WINDOW_IN_SECONDS }
+    """
+    properties = {}
+    config = self.config.get(FIREFLY_CONFIG_SECTION, CONFIG_COALESCE_PROPERTIES, fallback='')
+    for prop in [p.strip() for p in config.split(',') if p.strip()]:
+      name, _, window = prop.partition(':')
+      properties[name.strip()] = float(window) if window.strip() else self.coalesce_window
+    return properties
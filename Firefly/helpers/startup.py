@@ -0,0 +1,74 @@
+import importlib
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from contextlib import contextmanager
+
+from Firefly import logging
+
+
+class StartupPhases(object):
+  """StartupPhases records how long each phase of Firefly startup took.
+
+  Phases are timed with the phase() context manager, or recorded with record() when they run in the background (for
+  example services that are installed after the API started).
+  """
+
+  def __init__(self):
+    # {phase: seconds}
+    self.phases = OrderedDict()
+
+  @contextmanager
+  def phase(self, name: str):
+    start = time.monotonic()
+    try:
+      yield
+    finally:
+      self.record(name, time.monotonic() - start)
+
+  def record(self, name: str, seconds: float) -> None:
+    self.phases[name] = seconds
+    logging.message('Startup phase %s took %.3fs', name, seconds)
+
+  def export(self) -> dict:
+    """Export the phase timings.
+
+    Returns:
+      (dict) {'phases': {PHASE: SECONDS}, 'total': SUM_OF_PHASE_SECONDS}
+    """
+    return {
+      'phases': OrderedDict((name, round(seconds, 4)) for name, seconds in self.phases.items()),
+      'total':  round(sum(self.phases.values()), 4)
+    }
+
+  def export_prometheus(self) -> str:
+    lines = ['# TYPE firefly_startup_phase_seconds gauge']
+    for name, seconds in self.phases.items():
+      lines.append('firefly_startup_phase_seconds{phase="%s"} %.6f' % (name, seconds))
+    return '\n'.join(lines) + '\n'
+
+
+def import_packages(modules, executor: Executor) -> dict:
+  """Import python modules in parallel.
+
+  This only loads the modules. Setup is still run in order by install_package, which gets the already imported module
+  from sys.modules.
+
+  Args:
+    modules: module paths to import
+    executor (Executor): executor to import in
+
+  Returns:
+    (dict) {module: exception} of modules that failed to import.
+  """
+  modules = sorted(set(m for m in modules if m))
+  futures = [(module, executor.submit(importlib.import_module, module)) for module in modules]
+  errors = {}
+  for module, future in futures:
+    try:
+      future.result()
+    except Exception as e:
+      # install_package imports the module again and reports the error.
+      logging.debug('Error importing %s in parallel: %s', module, e)
+      errors[module] = e
+  return errors
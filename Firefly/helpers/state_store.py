@@ -0,0 +1,143 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from Firefly import logging
+from Firefly.const import STATE_STORE_FILE
+
+SCHEMA = [
+  'CREATE TABLE IF NOT EXISTS components (ff_id TEXT PRIMARY KEY, type TEXT NOT NULL, position INTEGER NOT NULL, '
+  'record TEXT NOT NULL, hash TEXT NOT NULL)',
+  'CREATE INDEX IF NOT EXISTS components_type ON components (type, position)',
+  'CREATE TABLE IF NOT EXISTS snapshots (type TEXT PRIMARY KEY, updated REAL NOT NULL, exported REAL)',
+]
+
+
+def record_hash(record_json: str) -> str:
+  return hashlib.sha1(record_json.encode('utf-8')).hexdigest()
+
+
+class StateStore(object):
+  """StateStore keeps the exported config and state of every component in SQLite.
+
+  Each component is one row holding its export() as json and a hash of it. save() only writes the rows that changed
+  since the last save and deletes the rows of removed components, all in one transaction, so a crash leaves the
+  previous snapshot intact. load() returns the records of a component type in install order, decoded with a single
+  json.loads.
+
+  The store is where component state is saved and restored from. The json config files are only written on shutdown
+  or an explicit export, and mark_exported() records the modified time of the written file so a later edit of the file
+  can be told apart.
+
+  Args:
+    path (str): SQLite database file. ':memory:' keeps the store in memory.
+  """
+
+  def __init__(self, path: str = STATE_STORE_FILE):
+    self.path = path
+    self._lock = threading.Lock()
+    self._connection = sqlite3.connect(path, check_same_thread=False)
+    with self._connection:
+      for statement in SCHEMA:
+        self._connection.execute(statement)
+    # {ff_id: (type, position, hash)} of the rows in the database.
+    self._rows = {}
+    for ff_id, component_type, position, row_hash in self._connection.execute(
+        'SELECT ff_id, type, position, hash FROM components'):
+      self._rows[ff_id] = (component_type, position, row_hash)
+
+  def load(self, component_type: str) -> list:
+    """Load the records of a component type.
+
+    Args:
+      component_type (str): component type, for example TYPE_DEVICE
+
+    Returns:
+      (list) component records in the order they were saved.
+    """
+    with self._lock:
+      rows = self._connection.execute('SELECT record FROM components WHERE type = ? ORDER BY position',
+                                      (component_type,)).fetchall()
+    # Decoding the records as one json array is about three times faster than a json.loads per record.
+    return json.loads('[%s]' % ','.join(record for record, in rows))
+
+  def updated(self, component_type: str) -> float:
+    """Get when a component type was last saved.
+
+    Returns:
+      (float) unix time of the last save or None if it was never saved.
+    """
+    with self._lock:
+      row = self._connection.execute('SELECT updated FROM snapshots WHERE type = ?', (component_type,)).fetchone()
+    return row[0] if row else None
+
+  def exported(self, component_type: str) -> float:
+    """Get the modified time of the config file of a component type when it was last exported.
+
+    Returns:
+      (float) modified time of the file or None if it was never exported.
+    """
+    with self._lock:
+      row = self._connection.execute('SELECT exported FROM snapshots WHERE type = ?', (component_type,)).fetchone()
+    return row[0] if row else None
+
+  def mark_exported(self, component_type: str, mtime: float) -> None:
+    """Record the modified time of the config file written from the saved records of a component type."""
+    with self._lock:
+      with self._connection:
+        self._connection.execute('UPDATE snapshots SET exported = ? WHERE type = ?', (mtime, component_type))
+
+  def save(self, component_type: str, records: list) -> int:
+    """Save the records of a component type. Only changed records are written.
+
+    Args:
+      component_type (str): component type, for example TYPE_DEVICE
+      records (list): export() of every component of the type, in install order
+
+    Returns:
+      (int) number of records written or deleted. 0 means nothing changed.
+    """
+    changed = []
+    saved_ids = set()
+    for position, record in enumerate(records):
+      ff_id = record.get('ff_id')
+      if ff_id is None:
+        continue
+      saved_ids.add(ff_id)
+      record_json = json.dumps(record, sort_keys=True)
+      row_hash = record_hash(record_json)
+      if self._rows.get(ff_id) != (component_type, position, row_hash):
+        changed.append((ff_id, component_type, position, record_json, row_hash))
+    removed = [ff_id for ff_id, row in self._rows.items() if row[0] == component_type and ff_id not in saved_ids]
+
+    with self._lock:
+      first_save = self._connection.execute('SELECT 1 FROM snapshots WHERE type = ?', (component_type,)).fetchone()
+      if not changed and not removed and first_save:
+        return 0
+      try:
+        with self._connection:
+          self._connection.executemany('INSERT OR REPLACE INTO components (ff_id, type, position, record, hash) '
+                                       'VALUES (?, ?, ?, ?, ?)', changed)
+          self._connection.executemany('DELETE FROM components WHERE ff_id = ?', [(ff_id,) for ff_id in removed])
+          self._connection.execute('INSERT OR REPLACE INTO snapshots (type, updated, exported) '
+                                   'VALUES (?, ?, (SELECT exported FROM snapshots WHERE type = ?))',
+                                   (component_type, time.time(), component_type))
+      except sqlite3.Error as e:
+        logging.error(code='FF.STA.SAV.001', args=(component_type, e))  # error saving %s state: %s
+        return 0
+      for ff_id, _, position, _, row_hash in changed:
+        self._rows[ff_id] = (component_type, position, row_hash)
+      for ff_id in removed:
+        del self._rows[ff_id]
+    return len(changed) + len(removed)
+
+  def compact(self) -> None:
+    """Rebuild the database file to release the space of deleted rows."""
+    with self._lock:
+      self._connection.execute('VACUUM')
+
+  def close(self) -> None:
+    with self._lock:
+      self._connection.close()
@@ -14,6 +14,11 @@ class Subscriptions(object):
 
   def __init__(self):
     self.subscriptions = {}
+    # Compiled lookup index built from self.subscriptions. See _compile_index.
+    self._index = {}
+    # Time triggers are subscriptions to TIME kept by the location (TimeTriggers). Set by Firefly once the location is
+    # imported so deleting or renaming a subscriber also updates its time triggers.
+    self.time_triggers = None
     # TODO: Add functionality to import subscriptions from json file.
 
   def get_subscribers(self, subscribe_to_id: str, event_action: dict = {EVENT_ACTION_ANY:EVENT_ACTION_ANY}) -> List[str]:
@@ -22,6 +27,9 @@ class Subscriptions(object):
     Returns a list subscriber IDs that are subscribed to the ff_id passed in for the event types that are pass and any
     subscriber that is listening to the EVENT_ACTION_ANY.
 
+    Lookups are served from the compiled index (see _compile_index). For an event with a single property the list
+    stored in the index is returned as is, so callers must not modify the returned list.
+
     Args:
       subscribe_to_id (str): subscriber ID
       event_action (list): list of event types to listen for
@@ -29,46 +37,62 @@ class Subscriptions(object):
     Returns:
       list: List of subscriber IDs
     """
-
-    _event_action = event_action.copy()
-    _event_action = verify_event_action(_event_action, get_subscribers=True)
-
     try:
-      subscriptions = self.subscriptions[subscribe_to_id]
+      any_any, by_prop = self._index[subscribe_to_id]
     except KeyError:
       logging.warn('Component (%s) not found in subscriptions' % subscribe_to_id)
       return []
 
-    # Get subscribers listening to Anything
-    try:
-      subscribers_any = set(subscriptions[EVENT_ACTION_ANY][EVENT_ACTION_ANY])
-    except:
-      subscribers_any = set()
+    if type(event_action) is dict:
+      if len(event_action) == 1:
+        for prop, act in event_action.items():
+          return _lookup(any_any, by_prop, prop, act)
+      matches = [_lookup(any_any, by_prop, prop, act) for prop, act in event_action.items()]
+    else:
+      matches = []
+      event_actions = verify_event_action(event_action, get_subscribers=True)
+      if type(event_actions) is not list:
+        event_actions = [event_actions]
+      for ea in event_actions:
+        if type(ea) is not dict:
+          logging.error(code='FF.SUB.GET.001', args=(str(ea)))  # event action is not type dict: %s=
+          continue
+        matches.extend(_lookup(any_any, by_prop, prop, act) for prop, act in ea.items())
 
-    subscribers_prop_any = set()
-    subscribers = set()
+    return _merge(matches, any_any)
+
+  def _compile_index(self, subscribe_to_id: str) -> None:
+    """Rebuild the lookup index for one component.
 
-    for ea in _event_action:
-      if type(ea) is not dict:
-        logging.error(code='FF.SUB.GET.001', args=(str(ea)))  # event action is not type dict: %s=
+    The index stores, for every component listened to, a tuple of:
+      - the subscribers listening to EVENT_ACTION_ANY
+      - { PROP: (SUBSCRIBERS_FOR_ANY_VALUE, { VALUE: SUBSCRIBERS }) }
+
+    Every list in the index is already merged with the wildcard buckets above it, so a lookup of a single
+    (prop, value) pair is one dict get and returns a ready to use list.
+
+    Args:
+      subscribe_to_id (str): The component id that changed.
+    """
+    subscriptions = self.subscriptions.get(subscribe_to_id)
+    if subscriptions is None:
+      self._index.pop(subscribe_to_id, None)
+      return
+
+    any_any = _unique(subscriptions.get(EVENT_ACTION_ANY, {}).get(EVENT_ACTION_ANY, []))
+    by_prop = {}
+    for prop, actions in subscriptions.items():
+      if type(actions) is not dict:
         continue
+      prop_any = _unique(any_any + actions.get(EVENT_ACTION_ANY, []))
+      by_value = {}
+      for value, subscribers in actions.items():
+        if value == EVENT_ACTION_ANY:
+          continue
+        by_value[value] = _unique(prop_any + subscribers)
+      by_prop[prop] = (prop_any, by_value)
 
-      for prop, act in ea.items():
-        # Get any subscribers listening for any of that prop
-        try:
-          subscribers_prop_any.update(subscriptions[prop][EVENT_ACTION_ANY])
-        except:
-          pass
-
-        # Get subscribers for the prop and action
-        for a in act:
-          try:
-            subscribers.update(subscriptions[prop][a])
-          except:
-            pass
-
-    subscribers.update(subscribers_any, subscribers_prop_any)
-    return list(subscribers)
+    self._index[subscribe_to_id] = (any_any, by_prop)
 
   def add_subscriber(self, subscriber_id: str, subscribe_to_id: str,
                      event_action: EVENT_ACTON_TYPE = EVENT_ACTION_ANY) -> None:
@@ -118,6 +142,8 @@ class Subscriptions(object):
             if subscriber_id not in subscriptions[evt][act]:
               subscriptions[evt][act].append(subscriber_id)
 
+    self._compile_index(subscribe_to_id)
+
   def get_all_subscribers(self, subscribe_to_id: str) -> list:
     """Get a list of all subscribers to a component.
 
@@ -213,6 +239,8 @@ class Subscriptions(object):
     total_deletions = 0
     for sub in self.subscriptions.keys():
       total_deletions += self.delete_subscriber(subscriber_id, sub, delete_all=True)
+    if self.time_triggers is not None:
+      self.time_triggers.remove(subscriber_id)
     return total_deletions
 
 
@@ -233,6 +261,14 @@ class Subscriptions(object):
       (int): The number of subscriptions changed
     """
 
+    changed_subscriptions = self._delete_replace_subscriber(subscriber_id, subscribe_to_id, event_action, change_all,
+                                                            new_subscriber_id)
+    if changed_subscriptions:
+      self._compile_index(subscribe_to_id)
+    return changed_subscriptions
+
+  def _delete_replace_subscriber(self, subscriber_id: str, subscribe_to_id: str, event_action: EVENT_ACTON_TYPE,
+                                 change_all: bool, new_subscriber_id: str) -> int:
     changed_subscriptions = 0
     event_action = verify_event_action(event_action)
 
@@ -311,6 +347,7 @@ class Subscriptions(object):
       return False
     self.subscriptions[new_id] = self.subscriptions[old_id]
     del self.subscriptions[old_id]
+    self._index[new_id] = self._index.pop(old_id)
     return True
 
   def change_subscriber_id(self, subscriber_id: str, new_subscriber_id: str) -> int:
@@ -332,9 +369,64 @@ class Subscriptions(object):
     for subscription in self.subscriptions:
       change_count += self.delete_replace_subscriber(subscriber_id, subscription, change_all=True,
                                                      new_subscriber_id=new_subscriber_id)
+    if self.time_triggers is not None:
+      self.time_triggers.rename(subscriber_id, new_subscriber_id)
     return change_count
 
 
+def _unique(subscribers: list) -> list:
+  """Remove duplicate subscribers keeping the first seen order."""
+  return list(dict.fromkeys(subscribers))
+
+
+def _lookup(any_any: list, by_prop: dict, prop, act) -> list:
+  """Get the compiled subscriber list for one property of an event action.
+
+  Args:
+    any_any (list): subscribers listening to EVENT_ACTION_ANY
+    by_prop (dict): compiled index for the component
+    prop: event property
+    act: event value or list of event values
+
+  Returns:
+    list: subscribers for the property and value(s)
+  """
+  try:
+    prop_any, by_value = by_prop[prop]
+  except (KeyError, TypeError):
+    return any_any
+
+  if type(act) is not list:
+    try:
+      return by_value.get(act, prop_any)
+    except TypeError:
+      # Unhashable values can not be subscribed to.
+      return prop_any
+
+  if len(act) == 1:
+    return _lookup(any_any, by_prop, prop, act[0])
+  return _merge([_lookup(any_any, by_prop, prop, a) for a in act], prop_any)
+
+
+def _merge(matches: list, default: list) -> list:
+  """Merge subscriber lists from the index.
+
+  When every list is the same compiled list it is returned without building a new one.
+  """
+  if not matches:
+    return default
+  first = matches[0]
+  for m in matches:
+    if m is not first:
+      break
+  else:
+    return first
+  subscribers = {}
+  for m in matches:
+    subscribers.update(dict.fromkeys(m))
+  return list(subscribers)
+
+
 def verify_event_action(event_action: EVENT_ACTON_TYPE = EVENT_ACTION_ANY, get_subscribers: bool = False) -> list:
   """Takes and event action and returns a list of event actions.
 
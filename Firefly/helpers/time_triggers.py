@@ -0,0 +1,178 @@
+import heapq
+from datetime import date, datetime, time, timedelta, tzinfo
+from itertools import count
+
+from pytz import AmbiguousTimeError, NonExistentTimeError, utc
+
+from Firefly import logging
+
+ALL_WEEKDAYS = [1, 2, 3, 4, 5, 6, 7]
+
+# A day and month trigger on Feb 29th with a weekday filter can take up to 28 years to come around.
+MAX_SEARCH_DAYS = 28 * 366
+
+
+class TimeTriggers(object):
+  """TimeTriggers keeps the next fire time of every time trigger in a heap.
+
+  Time triggers used to subscribe to the TIME broadcast, so every automation with a time trigger was woken up every
+  minute to compare the hour, minute and weekdays. Now each time trigger action is registered here with its next fire
+  time. When the minute broadcast is sent only the subscribers that are due get the event.
+
+  Fire times are found in local time:
+    - day and month filters are applied when searching for the next date.
+    - a time skipped by a DST change (spring forward) does not fire that day.
+    - a time repeated by a DST change (fall back) fires once, on the first occurrence.
+  """
+
+  def __init__(self, timezone: tzinfo = None):
+    self._timezone = timezone or utc
+    # {subscriber_id: [time actions]}
+    self._triggers = {}
+    # [(fire epoch, sequence, subscriber_id, time action)]
+    self._heap = []
+    self._sequence = count()
+
+  def add(self, subscriber_id: str, trigger_action: list, now: datetime = None) -> None:
+    """Add the time actions of a time trigger.
+
+    Args:
+      subscriber_id (str): subscriber to wake up when a time action is due
+      trigger_action (list): list of time actions { 'hour': HOUR, 'minute': MINUTE, 'weekdays': [WEEKDAYS] }
+      now (datetime): current time
+    """
+    now = now or datetime.now(self._timezone)
+    if type(trigger_action) is dict:
+      trigger_action = [trigger_action]
+    actions = self._triggers.setdefault(subscriber_id, [])
+    for time_action in trigger_action:
+      if time_action in actions:
+        continue
+      actions.append(time_action)
+      self._schedule(subscriber_id, time_action, now)
+
+  def remove(self, subscriber_id: str) -> None:
+    """Remove all time actions of a subscriber.
+
+    Args:
+      subscriber_id (str): subscriber to remove
+    """
+    if self._triggers.pop(subscriber_id, None) is not None:
+      self._heap = [entry for entry in self._heap if entry[2] != subscriber_id]
+      heapq.heapify(self._heap)
+
+  def rename(self, subscriber_id: str, new_subscriber_id: str) -> None:
+    """Move all time actions of a subscriber to a new subscriber id.
+
+    Args:
+      subscriber_id (str): current subscriber id
+      new_subscriber_id (str): new subscriber id
+    """
+    actions = self._triggers.pop(subscriber_id, None)
+    if actions is None:
+      return
+    self._triggers.setdefault(new_subscriber_id, []).extend(actions)
+    self._heap = [(e[0], e[1], new_subscriber_id if e[2] == subscriber_id else e[2], e[3]) for e in self._heap]
+    heapq.heapify(self._heap)
+
+  def set_timezone(self, timezone: tzinfo, now: datetime = None) -> None:
+    """Change the timezone and reschedule every time action.
+
+    Args:
+      timezone (tzinfo): local timezone
+      now (datetime): current time
+    """
+    self._timezone = timezone
+    now = now or datetime.now(timezone)
+    self._heap = []
+    for subscriber_id, actions in self._triggers.items():
+      for time_action in actions:
+        self._schedule(subscriber_id, time_action, now)
+
+  def pop_due(self, now: datetime) -> list:
+    """Get the subscribers with a time action in the current minute and schedule their next fire time.
+
+    Time actions from earlier minutes (for example when a broadcast was missed) are rescheduled without firing, the same
+    as a missed TIME broadcast.
+
+    Args:
+      now (datetime): current time
+
+    Returns:
+      (list) subscriber ids in the order they are due.
+    """
+    minute_start = now.timestamp() - now.second - now.microsecond / 1000000
+    minute_end = minute_start + 60
+    heap = self._heap
+    due = []
+    while heap and heap[0][0] < minute_end:
+      fire_epoch, _, subscriber_id, time_action = heapq.heappop(heap)
+      if fire_epoch >= minute_start and subscriber_id not in due:
+        due.append(subscriber_id)
+      self._schedule(subscriber_id, time_action, now)
+    return due
+
+  @property
+  def next_fire(self) -> datetime:
+    """The next time a time action fires or None."""
+    if not self._heap:
+      return None
+    return datetime.fromtimestamp(self._heap[0][0], self._timezone)
+
+  @property
+  def subscribers(self) -> list:
+    return list(self._triggers.keys())
+
+  def __len__(self):
+    return len(self._heap)
+
+  def _schedule(self, subscriber_id: str, time_action: dict, now: datetime) -> None:
+    fire_time = next_fire_time(time_action, now, self._timezone)
+    if fire_time is None:
+      logging.info('[TIME TRIGGERS] time action for %s never fires: %s' % (subscriber_id, time_action))
+      return
+    heapq.heappush(self._heap, (fire_time.timestamp(), next(self._sequence), subscriber_id, time_action))
+
+
+def next_fire_time(time_action: dict, after: datetime, timezone: tzinfo) -> datetime:
+  """Get the next time a time action fires after a given time.
+
+  Args:
+    time_action (dict): { 'hour': HOUR, 'minute': MINUTE, 'weekdays': [WEEKDAYS], 'day': DAY, 'month': MONTH }
+    after (datetime): timezone aware time to search from
+    timezone (tzinfo): local timezone of the time action
+
+  Returns:
+    (datetime) next fire time or None if the time action can never fire.
+  """
+  hour = time_action.get('hour')
+  minute = time_action.get('minute')
+  if type(hour) is not int or type(minute) is not int or not 0 <= hour < 24 or not 0 <= minute < 60:
+    return None
+  weekdays = time_action.get('weekdays') or ALL_WEEKDAYS
+  day = time_action.get('day')
+  month = time_action.get('month')
+  fire_at = time(hour, minute)
+
+  search_date = after.astimezone(timezone).date()
+  for _ in range(MAX_SEARCH_DAYS):
+    if (not day or search_date.day == day) and (not month or search_date.month == month) and \
+        search_date.isoweekday() in weekdays:
+      fire_time = _localize(timezone, search_date, fire_at)
+      if fire_time is not None and fire_time > after:
+        return fire_time
+    search_date += timedelta(days=1)
+  return None
+
+
+def _localize(timezone: tzinfo, local_date: date, local_time: time) -> datetime:
+  """Get the local time on a date or None if it does not exist on that date."""
+  naive = datetime.combine(local_date, local_time)
+  if not hasattr(timezone, 'localize'):
+    return naive.replace(tzinfo=timezone)
+  try:
+    return timezone.localize(naive, is_dst=None)
+  except NonExistentTimeError:
+    return None
+  except AmbiguousTimeError:
+    return timezone.localize(naive, is_dst=True)
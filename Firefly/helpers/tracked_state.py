@@ -0,0 +1,210 @@
+from typing import Iterable
+
+from Firefly import logging
+from Firefly.const import EVENT_TYPE_BROADCAST
+from Firefly.helpers.events import Event
+
+# Values of these types can only change by assigning the attribute again.
+IMMUTABLE_TYPES = (str, int, float, bool, type(None), frozenset)
+
+
+class TrackedState(object):
+  """TrackedState records which attributes are written so broadcasts only re-evaluate the requests that can change.
+
+  Usage:
+    self.start_tracking()
+    ... change attributes ...
+    self.broadcast_tracked_changes()
+
+  Request dependencies are found from the request function's code the first time tracking starts. A request is tracked
+  when it is a method of the component that only reads instance attributes and module constants holding immutable
+  values, for example `return self._switch`. All other requests are evaluated on every broadcast like before.
+
+  The values from the last broadcast are kept, so a broadcast only evaluates the requests whose attributes were written.
+  Attributes written between broadcasts (outside of start_tracking and broadcast_tracked_changes) are applied to the
+  saved values without broadcasting them, the same as taking a new before state.
+
+  Subclasses can mark requests as changed with mark_requests_dirty when their state is not held in plain attributes.
+
+  state_version changes whenever an attribute is written, requests are marked dirty or a broadcast finds changed values,
+  so it can be used to cache data derived from the component's state when requests_tracked() is True.
+  """
+
+  # Only include lowercase requests, same as get_all_request_values(min_data=True)
+  _tracked_min_data = True
+  # Round floats to 2 places, same as Device.get_all_request_values(min_data=True)
+  _tracked_round_floats = False
+
+  def __setattr__(self, name, value):
+    object.__setattr__(self, name, value)
+    attributes = self.__dict__
+    attributes['_state_version'] = attributes.get('_state_version', 0) + 1
+    dirty = attributes.get('_dirty_attributes')
+    if dirty is not None:
+      dirty.add(name)
+
+  @property
+  def state_version(self) -> int:
+    return self.__dict__.get('_state_version', 0)
+
+  def requests_tracked(self) -> bool:
+    """Check that every tracked request only reads attributes holding immutable values.
+
+    Otherwise a request can read state that is changed in place, which does not change state_version.
+    """
+    request_map = self.request_map
+    return all(self._request_attributes(request_map[r]) is not None
+               for r in request_map if not self._tracked_min_data or r.islower())
+
+  def _bump_state_version(self) -> None:
+    self.__dict__['_state_version'] = self.__dict__.get('_state_version', 0) + 1
+
+  def start_tracking(self) -> None:
+    """Start recording changes. Call before changing attributes that should be broadcasted."""
+    state = self.__dict__.get('_tracked_state')
+    if state is None:
+      self._compile_tracked_requests()
+      object.__setattr__(self, '_tracked_state', self._evaluate_requests(self._tracked_requests))
+      object.__setattr__(self, '_dirty_attributes', set())
+      object.__setattr__(self, '_dirty_requests', set())
+      return
+
+    # Apply silent changes since the last broadcast.
+    requests = self._pending_requests()
+    if requests:
+      state.update(self._evaluate_requests(requests))
+
+  def tracked_changes(self) -> dict:
+    """Get the request values that changed since start_tracking and save them.
+
+    Returns:
+      (dict) { REQUEST: NEW_VALUE }
+    """
+    state = self.__dict__.get('_tracked_state')
+    if state is None:
+      return {}
+
+    changed = {}
+    for request, value in self._evaluate_requests(self._pending_requests()).items():
+      if request not in state or state[request] != value:
+        changed[request] = value
+        state[request] = value
+    if changed:
+      self._bump_state_version()
+    return changed
+
+  def broadcast_tracked_changes(self) -> None:
+    """Broadcast the requests that changed since start_tracking."""
+    changed = self.tracked_changes()
+    if not changed:
+      logging.debug('No change detected. %s', self)
+      return
+    logging.debug('Items changed: %s %s', changed, self)
+    broadcast = Event(self.id, EVENT_TYPE_BROADCAST, event_action=changed)
+    logging.info(broadcast)
+    self.firefly.send_event(broadcast)
+
+  def mark_requests_dirty(self, requests: Iterable[str]) -> None:
+    """Mark requests as changed so they are evaluated on the next broadcast.
+
+    Args:
+      requests (list): request names
+    """
+    self._bump_state_version()
+    dirty = self.__dict__.get('_dirty_requests')
+    if dirty is not None:
+      dirty.update(requests)
+
+  def reset_tracking(self) -> None:
+    """Rebuild the request dependencies and evaluate all requests on the next broadcast.
+
+    Call when requests are added or the state is rebuilt.
+    """
+    if '_tracked_state' in self.__dict__:
+      object.__setattr__(self, '_tracked_compiled', False)
+
+  def tracked_request_dependencies(self) -> tuple:
+    """Get the dependencies of the requests.
+
+    Returns:
+      (dict, list): { ATTRIBUTE: [REQUESTS] } and a list of requests that are always evaluated.
+    """
+    attribute_requests = {}
+    untracked = []
+    for request in self._tracked_requests:
+      attributes = self._request_attributes(self.request_map.get(request))
+      if attributes is None:
+        untracked.append(request)
+        continue
+      for attribute in attributes:
+        attribute_requests.setdefault(attribute, []).append(request)
+    return attribute_requests, untracked
+
+  def _compile_tracked_requests(self) -> None:
+    requests = [r for r in self.request_map if not self._tracked_min_data or r.islower()]
+    object.__setattr__(self, '_tracked_requests', requests)
+    object.__setattr__(self, '_tracked_request_order', {r: i for i, r in enumerate(requests)})
+    attribute_requests, untracked = self.tracked_request_dependencies()
+    object.__setattr__(self, '_attribute_requests', attribute_requests)
+    object.__setattr__(self, '_untracked_requests', untracked)
+    object.__setattr__(self, '_tracked_compiled', True)
+
+  def _request_attributes(self, function) -> list:
+    """Get the attributes a request function reads, or None if it can not be tracked."""
+    if getattr(function, '__self__', None) is not self:
+      return None
+    code = getattr(getattr(function, '__func__', None), '__code__', None)
+    if code is None:
+      return None
+
+    attributes = []
+    function_globals = function.__func__.__globals__
+    for name in code.co_names:
+      if name in self.__dict__:
+        if not isinstance(self.__dict__[name], IMMUTABLE_TYPES):
+          return None
+        attributes.append(name)
+      elif not isinstance(function_globals.get(name, self), IMMUTABLE_TYPES):
+        return None
+    return attributes
+
+  def _pending_requests(self) -> list:
+    """Get the requests to evaluate and clear the dirty sets."""
+    dirty_attributes = self._dirty_attributes
+    dirty_requests = self._dirty_requests
+    if not self._tracked_compiled:
+      self._compile_tracked_requests()
+      dirty_attributes.clear()
+      dirty_requests.clear()
+      return self._tracked_requests
+    requests = set(self._untracked_requests)
+    if dirty_requests:
+      requests.update(dirty_requests)
+      dirty_requests.clear()
+    if dirty_attributes:
+      attribute_requests = self._attribute_requests
+      for attribute in dirty_attributes:
+        dependent = attribute_requests.get(attribute)
+        if not dependent:
+          continue
+        requests.update(dependent)
+        if not isinstance(self.__dict__.get(attribute), IMMUTABLE_TYPES):
+          # The attribute can now be changed in place, stop tracking the requests that read it.
+          self._untracked_requests.extend(r for r in dependent if r not in self._untracked_requests)
+          del attribute_requests[attribute]
+      dirty_attributes.clear()
+    order = self._tracked_request_order
+    return sorted((r for r in requests if r in order), key=order.get)
+
+  def _evaluate_requests(self, requests: Iterable[str]) -> dict:
+    request_values = {}
+    request_map = self.request_map
+    for r in requests:
+      try:
+        value = request_map[r]()
+      except Exception:
+        continue
+      if self._tracked_round_floats and type(value) is float:
+        value = round(value, 2)
+      request_values[r] = value
+    return request_values
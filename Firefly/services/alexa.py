@@ -53,7 +53,7 @@ def process_alexa_request(firefly, request):
 
 
 def alexa_handler(firefly, request: AlexaRequest):
-  devices = [device._alias for _, device in firefly.components.items() if device.type == TYPE_DEVICE]
+  devices = [device._alias for _, device in firefly.component_items() if device.type == TYPE_DEVICE]
 
   logging.debug('[ALEXA HANDLER] intent: %s' % str(request.intent))
 
@@ -84,7 +84,7 @@ def alexa_handler(firefly, request: AlexaRequest):
 
   if request.intent == 'ChangeMode':
     routines = {}
-    for id, c in firefly.components.items():
+    for id, c in firefly.component_items():
       if c.type == TYPE_ROUTINE:
         routines[c._alias] = id
     r_alias = get_close_matches(request.parameters['mode'].value, routines.keys())
@@ -83,7 +83,7 @@ class AlexaRequest(object):
     logging.info('process_request')
 
     if self.intent == SWITCH_INTENT:
-      devices = [device._alias for _, device in firefly.components.items() if device.type == TYPE_DEVICE]
+      devices = [device._alias for _, device in firefly.component_items() if device.type == TYPE_DEVICE]
       d = get_close_matches(self.slots[DEVICE].value, devices)
       if len(d) == 0:
         return make_response('No device found', 'No device found')
@@ -95,7 +95,7 @@ class AlexaRequest(object):
 
 
     if self.intent == DIMMER_INTENT:
-      devices = [device._alias for _, device in firefly.components.items() if device.type == TYPE_DEVICE]
+      devices = [device._alias for _, device in firefly.component_items() if device.type == TYPE_DEVICE]
       d = get_close_matches(self.slots[DEVICE].value, devices)
       if len(d) == 0:
         return make_response('No device found', 'No device found')
@@ -107,7 +107,7 @@ class AlexaRequest(object):
 
     if self.intent == MODE_INTENT:
       routines = {}
-      for id, c in firefly.components.items():
+      for id, c in firefly.component_items():
         if c.type == TYPE_ROUTINE:
           routines[c._alias] = id
       r_alias = get_close_matches(self.slots[MODE].value, routines.keys())
@@ -22,7 +22,7 @@ def apiai_make_response(text, speech=''):
   }
 
 def get_device_id(firefly, device_alias):
-  devices = [device._alias for _, device in firefly.components.items() if device.type == TYPE_DEVICE]
+  devices = [device._alias for _, device in firefly.component_items() if device.type == TYPE_DEVICE]
   d = get_close_matches(device_alias, devices)
   if len(d) == 0:
     error = 'No device found matching name %s' % device_alias
@@ -34,7 +34,7 @@ def get_device_id(firefly, device_alias):
 
 def get_routine_id(firefly, routine_alias):
   routines = {}
-  for id, c in firefly.components.items():
+  for id, c in firefly.component_items():
     if c.type == TYPE_ROUTINE:
       routines[c._alias] = id
   r_alias = get_close_matches(routine_alias, routines.keys())
@@ -86,7 +86,7 @@ def apiai_add_rule_motion(firefly, params):
   trigger = params.get('trigger')
 
   # TODO: Make this a function
-  rooms = [device._alias for _, device in firefly.components.items() if device.type == 'ROOM']
+  rooms = [device._alias for _, device in firefly.component_items() if device.type == 'ROOM']
   r = get_close_matches(room, rooms)
   if len(r) == 0:
     error = 'No room found matching name %s' % room
@@ -225,8 +225,8 @@ def apiai_routine(firefly, params):
 
 def process_api_ai_request(firefly, request):
   a = APIaiRequest(request)
-  devices = [device._alias for _, device in firefly.components.items() if device.type == TYPE_DEVICE]
-  rooms = [device._alias for _, device in firefly.components.items() if device.type == 'ROOM']
+  devices = [device._alias for _, device in firefly.component_items() if device.type == TYPE_DEVICE]
+  rooms = [device._alias for _, device in firefly.component_items() if device.type == 'ROOM']
 
   if a.intent == 'firefly.simple_action':
     for device in a.parameters.devices:
@@ -1,6 +1,5 @@
 import configparser
-import copy
-import json
+from functools import partial
 from os import system
 
 import pyrebase
@@ -10,10 +9,14 @@ from Firefly import aliases, logging, scheduler
 from Firefly.const import API_ALEXA_VIEW, API_FIREBASE_VIEW, SERVICE_CONFIG_FILE, SOURCE_LOCATION, SOURCE_TIME, TYPE_AUTOMATION, TYPE_DEVICE, TYPE_ROUTINE
 from Firefly.helpers.service import Command, Request, Service
 from Firefly.services.api_ai import apiai_command_reply
+from Firefly.services.firebase_sanitizer import SanitizeCache, sanitize
+from Firefly.services.firebase_sync import FirebaseSync
+from Firefly.services.firebase_writer import FirebaseWriter
 from Firefly.services.alexa.alexa import process_alexa_request
 
 
 from Firefly.helpers.metadata import PRIMARY_ACTION, FF_ID, HIDDEN_BY_USER, EXPORT_UI
+from Firefly.helpers.refresh_coordinator import ALL_SECTIONS, SECTION_ALIASES, SECTION_DEVICES, SECTION_GROUPS, SECTION_LOCATION, SECTION_ROUTINES
 
 FIREBASE_LOCATION_STATUS_PATH = 'locationStatus'
 FIREBASE_DEVICE_VIEWS = 'deviceViews'
@@ -22,6 +25,9 @@ FIREBASE_HOME_STATUS = 'homeStatus'
 FIREBASE_COMMAND_REPLY = 'commandReply'
 FIREBASE_ALIASES = 'aliases'
 
+# Not uploaded with the device status.
+DEBUG_VALUES = ['PARAMS', 'RAW_VALUES', 'SENSORS', 'ZWAVE_VALUES']
+
 ALEXA_CUSTOM_SKILL_ID = 'firefly-alexa'
 
 # This is the action when status messages are updated
@@ -64,10 +70,11 @@ def Setup(firefly, package, **kwargs):
   home_id = config.get(SECTION, 'home_id', fallback=None)
   #TODO: Move facebook somewhere better
   facebook = config.getboolean(SECTION, 'facebook', fallback=False)
+  sanitize_cache = config.getboolean(SECTION, 'sanitize_cache', fallback=False)
   if api_key is None:
     logging.error('firebase error')  # TODO Make this error code
     return False
-  firebase = Firebase(firefly, package, api_key=api_key, auth_domain=auth_domain, database_url=database_url, email=email, password=password, storage_bucket=storage_bucket, home_id=home_id, facebook=facebook)
+  firebase = Firebase(firefly, package, api_key=api_key, auth_domain=auth_domain, database_url=database_url, email=email, password=password, storage_bucket=storage_bucket, home_id=home_id, facebook=facebook, sanitize_cache=sanitize_cache)
   firefly.install_component(firebase)
   return True
 
@@ -83,11 +90,13 @@ class Firebase(Service):
     self.email = kwargs.get('email')
     self.password = kwargs.get('password')
     self.facebook = kwargs.get('facebook')
+    # Cache the sanitized status of each component until it changes.
+    self.sanitize_cache = SanitizeCache() if kwargs.get('sanitize_cache') else None
 
     self.home_id = kwargs.get('home_id')
 
     self.add_command('push', self.push)
-    self.add_command('refresh', self.refresh_all)
+    self.add_command('refresh', self.request_refresh)
     self.add_command('get_api_id', self.get_api_id)
 
     self.config = {
@@ -113,13 +122,23 @@ class Firebase(Service):
     if self.home_id is None:
       self.register_home()
 
+    # Status updates, events and syncs are batched and sent in order from a background thread.
+    self.writer = FirebaseWriter(self.db, self.home_id, lambda: self.id_token, on_error=self.refresh_user)
+    self.writer.start()
+    self.sync = FirebaseSync(self.writer)
+
     scheduler.runEveryM(30, self.refresh_user)
-    scheduler.runEveryM(20, self.refresh_all)
-    scheduler.runInS(30, self.refresh_all)
+    # Full refresh every 20 minutes, through the refresh coordinator so it is merged with other refreshes. The first
+    # refresh is requested by Firefly once all services are installed.
+    scheduler.runEveryM(20, self.firefly.refresh_firebase, job_id='firebase_refresh_all')
 
     self.stream = self.db.child('homeStatus').child(self.home_id).child('commands').stream(self.command_stream_handler, self.id_token)
     self.commandReplyStream = self.db.child('homeStatus').child(self.home_id).child('commandReply').stream(self.command_reply, self.id_token)
 
+  def stop(self):
+    ''' Send the queued writes and stop the writer thread. '''
+    self.writer.stop()
+
   def register_home(self):
     register_url = 'https://us-central1-firefly-beta-cdb9d.cloudfunctions.net/registerHome'
     return_data = requests.post(register_url, data={
@@ -291,71 +310,96 @@ class Firebase(Service):
     except Exception as e:
       logging.error('Firebase Stream Error: %s' % str(e))
 
-  def refresh_all(self, **kwargs):
-    # Hard-coded refresh all device values
-    # TODO use core api for this.
-    all_values = {}
-    for ff_id, device in self.firefly.components.items():
-      try:
-        all_values[ff_id] = device.get_all_request_values(True)
-      except:
-        pass
-
-    # Nasty json sanitation
-    all_values = scrub(all_values)
-    all_values = json.dumps(all_values)
-    all_values = all_values.replace('null', '')
-    all_values = all_values.replace('#', '')
-    all_values = all_values.replace('$', '')
-    all_values = all_values.replace('/', '_-_')
-    all_values = json.loads(all_values)
-
-    try:
-      alexa_views = self.get_all_alexa_views('firebase')
-      routines = self.get_routines()
+  def request_refresh(self, **kwargs):
+    """Handle the refresh command. Refreshes are coalesced by the Firefly refresh coordinator.
 
-      # TODO(zpriddy): Remove old views when new UI is done
-      #self.db.child("userAlexa").child(self.uid).child("devices").set(alexa_views, self.id_token)
-      #self.db.child("homeStatus").child(self.home_id).child('devices').update(all_values, self.id_token)
-      self.db.child("homeStatus").child(self.home_id).child('routines').set(routines['config'], self.id_token)
-      # End of old views
-
-      routine_view = {}
-      for r in routines['view']:
-        routine_view[r.get('ff_id')] = r
+    Args:
+      sections (list): optional sections to refresh (devices, routines, groups, aliases, location). Defaults to all.
+    """
+    self.firefly.refresh_firebase(*kwargs.get('sections', []))
 
-      routine_config = {}
-      for r in routines['config']:
-        routine_config[r.get('ff_id')] = r
+  def refresh_all(self, **kwargs):
+    self.refresh_sections(ALL_SECTIONS)
 
-      # Update all devices statuses
-      self.update_all_device_status(overwrite=True)
+  def refresh_sections(self, sections, **kwargs):
+    """Upload the given sections of the home status.
 
-      # This is the new location of routine views [/homeStatus/{homeId}/routineViews]
-      self.db.child("homeStatus").child(self.home_id).child('routineViews').set(routine_view, self.id_token)
-      self.db.child("homeStatus").child(self.home_id).child('routineConfigs').set(routine_config, self.id_token)
+    All sections are sent in one sync, so only what changed since the last upload is sent.
 
-      # This is the new location of location status [/homeStatus/{homeId}/locationStatus]
-      self.update_location_status(overwrite=True, update_metadata_timestamp=False)
+    Args:
+      sections: sections to upload (SECTION_DEVICES, SECTION_ROUTINES, SECTION_GROUPS, SECTION_ALIASES, SECTION_LOCATION)
+    """
+    try:
+      data = {}
+      if SECTION_DEVICES in sections:
+        # Update all devices statuses
+        data[FIREBASE_DEVICE_STATUS] = self.get_all_device_status()
+        # Also includes the aliases.
+        data.update(self.get_device_view_data())
+
+      elif SECTION_ALIASES in sections:
+        data[FIREBASE_ALIASES] = aliases.aliases
+
+      if SECTION_ROUTINES in sections:
+        routines = self.get_routines()
+
+        # TODO(zpriddy): Remove old views when new UI is done
+        #self.db.child("userAlexa").child(self.uid).child("devices").set(alexa_views, self.id_token)
+        #self.db.child("homeStatus").child(self.home_id).child('devices').update(all_values, self.id_token)
+        data['routines'] = routines['config']
+        # End of old views
+
+        routine_view = {}
+        for r in routines['view']:
+          routine_view[r.get('ff_id')] = r
+
+        routine_config = {}
+        for r in routines['config']:
+          routine_config[r.get('ff_id')] = r
+
+        # This is the new location of routine views [/homeStatus/{homeId}/routineViews]
+        data['routineViews'] = routine_view
+        data['routineConfigs'] = routine_config
+
+      if SECTION_DEVICES in sections or SECTION_ROUTINES in sections:
+        # This is the new location of alexa api data [/homeStatus/{homeId}/alexaAPIView]
+        data['alexaAPIViews'] = self.get_all_alexa_views('firebase')
+
+      if SECTION_GROUPS in sections:
+        groups = {}
+        groups_state = {}
+        for ff_id, group in self.firefly.component_items():
+          if group.type != 'GROUP':
+            continue
+          groups[ff_id] = group.get_metadata()
+          groups_state[ff_id] = group.get_all_request_values(True)
+
+        data['groupViews'] = groups
+        data['groupStatus'] = groups_state
+
+      self.sync_home_status(data)
+
+      if SECTION_LOCATION in sections:
+        # This is the new location of location status [/homeStatus/{homeId}/locationStatus]
+        self.update_location_status(overwrite=True, update_metadata_timestamp=False)
+
+      if SECTION_DEVICES in sections:
+        self.update_last_metadata_timestamp()
 
-      # This is the new location of alexa api data [/homeStatus/{homeId}/alexaAPIView]
-      self.db.child("homeStatus").child(self.home_id).child('alexaAPIViews').set(alexa_views, self.id_token)
+    except Exception as e:
+      logging.notify("Firebase 271: %s" % str(e))
 
-      groups = {}
-      groups_state = {}
-      for ff_id, group in self.firefly.components.items():
-        if group.type != 'GROUP':
-          continue
-        groups[ff_id] = group.get_metadata()
-        groups_state[ff_id] = group.get_all_request_values(True)
+  def sync_home_status(self, data):
+    ''' Queue the changes of homeStatus paths since they were last synced. Errors are retried by the writer.
 
-      self.db.child("homeStatus").child(self.home_id).child('groupViews').set(groups, self.id_token)
-      self.db.child("homeStatus").child(self.home_id).child('groupStatus').set(groups_state, self.id_token)
+    Args:
+      data: {path: data} of paths from homeStatus/{homeID}/
 
-      self.update_device_views()
+    Returns:
 
-    except Exception as e:
-      logging.notify("Firebase 271: %s" % str(e))
+    '''
+    self.sync.sync(data)
+    return True
 
   def update_last_metadata_timestamp(self):
     ''' Update the lastMetadataUpdate timestamp
@@ -365,8 +409,8 @@ class Firebase(Service):
     '''
     self.set_home_status('locationStatus/lastMetadataUpdate', self.firefly.location.now.timestamp())
 
-  def set_home_status(self, path, data, retry=True, **kwargs):
-    ''' Function to set homeStatus in firebase
+  def set_home_status(self, path, data, **kwargs):
+    ''' Queue a set of homeStatus in firebase. It is sent in order with the updates queued on the writer.
 
     Args:
       path: path from homeStatus/{homeID}/ that will be set.
@@ -375,18 +419,11 @@ class Firebase(Service):
     Returns:
 
     '''
-    try:
-      self.db.child("homeStatus").child(self.home_id).child(path).set(data, self.id_token)
-      return True
-    except Exception as e:
-      if not retry:
-        return False
-      logging.error('[FIREBASE SET HOME STATUS] ERROR: %s' % str(e))
-      self.refresh_user()
-      return self.set_home_status(path, data, False)
+    self.writer.set(path, data)
+    return True
 
-  def update_home_status(self, path, data, retry=True, **kwargs):
-    ''' Function to update homeStatus in firebase
+  def update_home_status(self, path, data, **kwargs):
+    ''' Queue an update of homeStatus in firebase. The synced copy is updated once the writer sent it.
 
     Args:
       path: path from homeStatus/{homeID}/ that will be updateed.
@@ -395,15 +432,8 @@ class Firebase(Service):
     Returns:
 
     '''
-    try:
-      self.db.child("homeStatus").child(self.home_id).child(path).update(data, self.id_token)
-      return True
-    except Exception as e:
-      if not retry:
-        return False
-      logging.error('[FIREBASE UPDATE HOME STATUS] ERROR: %s' % str(e))
-      self.refresh_user()
-      return self.update_home_status(path, data, False)
+    self.writer.update(path, data, on_sent=partial(self.sync.merge, path, data))
+    return True
 
   def update_location_status(self, overwrite=False, update_metadata_timestamp=False, update_status_message=False, **kwargs):
     ''' update the location status in firebase.
@@ -426,12 +456,12 @@ class Firebase(Service):
       return
 
     if update_status_message:
-      self.set_home_status('%s/statusMessages' % FIREBASE_LOCATION_STATUS_PATH, {})
+      self.writer.set('%s/statusMessages' % FIREBASE_LOCATION_STATUS_PATH, {})
 
-    self.update_home_status(FIREBASE_LOCATION_STATUS_PATH, location_status)
+    self.writer.update(FIREBASE_LOCATION_STATUS_PATH, location_status)
 
 
-  def update_device_min_views(self, device_views, **kwargs):
+  def get_device_min_views(self, device_views, **kwargs):
     device_min_view = {}
     for ff_id, device_view in device_views.items():
       try:
@@ -452,64 +482,70 @@ class Firebase(Service):
         }
       except Exception as e:
         logging.error('[FIREBASE DEVICE MIN VIEW] error: %s' % str(e))
-    logging.debug('[FIREBASE DEVICE MIN VIEW] setting min view: %s' % str(device_min_view))
-    self.set_home_status('deviceMinView', device_min_view)
-
+    logging.debug('[FIREBASE DEVICE MIN VIEW] setting min view: %s', device_min_view)
+    return device_min_view
 
+  def update_device_min_views(self, device_views, **kwargs):
+    self.sync_home_status({'deviceMinView': self.get_device_min_views(device_views)})
 
-  def update_device_views(self, **kwargs):
-    ''' Update device views metadata for all devices
-
-    Args:
-      **kwargs:
+  def get_device_view_data(self) -> dict:
+    ''' Get device views metadata for all devices, the min views and the aliases.
 
     Returns:
-
+      (dict) {path: data}
     '''
     logging.info('[FIREBASE DEVICE VIEW UPDATE] updating all device views')
     device_views = {}
     devices = self.get_all_component_views('firebase_refresh', filter=TYPE_DEVICE)
     for device in devices:
       device_views[device.get(FF_ID, 'unknown')] = device
-    self.set_home_status(FIREBASE_DEVICE_VIEWS, device_views)
 
-    self.update_device_min_views(device_views)
+    device_views = sanitize(device_views, values=False)
+    return {
+      FIREBASE_DEVICE_VIEWS: device_views,
+      'deviceMinView':       self.get_device_min_views(device_views),
+      'devices':             device_views,
+      FIREBASE_ALIASES:      aliases.aliases
+    }
 
-    #TODO: Remove this
-    check_all_keys(device_views)
-    self.set_home_status('devices', device_views)
+  def update_device_views(self, **kwargs):
+    ''' Update device views metadata for all devices
+
+    Args:
+      **kwargs:
 
-    self.update_aliases()
+    Returns:
+
+    '''
+    self.sync_home_status(self.get_device_view_data())
     self.update_last_metadata_timestamp()
 
-  def update_all_device_status(self, overwrite=False, **kwargs):
+  def get_all_device_status(self) -> dict:
+    ''' Get the status of all components with keys made safe for firebase.
+
+    Returns:
+      (dict) {ff_id: status}
+    '''
     # TODO use core api for this.
     all_values = {}
-    for ff_id, device in self.firefly.components.items():
+    for ff_id, device in self.firefly.component_items():
       try:
-        all_values[ff_id] = device.get_all_request_values(True)
+        if self.sanitize_cache is None:
+          all_values[ff_id] = sanitize(get_device_status(device), values=False)
+        else:
+          all_values[ff_id] = self.sanitize_cache.get(device, partial(get_device_status, device), values=False)
       except:
         pass
+    if self.sanitize_cache is not None:
+      self.sanitize_cache.retain(all_values)
+    return all_values
 
-    for device, device_view in all_values.items():
-      try:
-        if 'PARAMS' in device_view.keys():
-          device_view.pop('PARAMS')
-        if 'RAW_VALUES' in device_view.keys():
-          device_view.pop('RAW_VALUES')
-        if 'SENSORS' in device_view.keys():
-          device_view.pop('SENSORS')
-        if 'ZWAVE_VALUES' in device_view.keys():
-          device_view.pop('ZWAVE_VALUES')
-      except:
-        pass
-
-    #TODO Remove this
-    check_all_keys(all_values)
+  def update_all_device_status(self, overwrite=False, **kwargs):
+    all_values = self.get_all_device_status()
     #self.update_home_status('devices', all_values)
 
     if overwrite:
-      self.set_home_status(FIREBASE_DEVICE_STATUS, all_values)
+      self.sync_home_status({FIREBASE_DEVICE_STATUS: all_values})
       return
 
     self.update_home_status(FIREBASE_DEVICE_STATUS, all_values)
@@ -535,8 +571,7 @@ class Firebase(Service):
     if 'ZWAVE_VALUES' in action.keys():
       return
 
-    path = '%s/%s' % (FIREBASE_DEVICE_STATUS, ff_id)
-    self.update_home_status(path, action)
+    self.update_home_status('%s/%s' % (FIREBASE_DEVICE_STATUS, ff_id), action)
 
   def update_aliases(self, **kwargs):
     ''' update all device aliases from firefly.
@@ -547,14 +582,14 @@ class Firebase(Service):
     Returns:
 
     '''
-    self.set_home_status(FIREBASE_ALIASES, aliases.aliases)
+    self.sync_home_status({FIREBASE_ALIASES: aliases.aliases})
 
   def get_routines(self):
     routines = {
       'view':   [],
       'config': []
     }
-    for ff_id, d in self.firefly.components.items():
+    for ff_id, d in self.firefly.component_items():
       logging.info('[FIREBASE]: getting routine view for: %s-%s' % (ff_id, d.type))
       if d.type == TYPE_ROUTINE:
         logging.info('[FIREBASE]: getting routine view for (2): %s' % ff_id)
@@ -577,7 +612,7 @@ class Firebase(Service):
     if type(filter) is str:
       filter = [filter]
     views = []
-    for ff_id, device in self.firefly.components.items():
+    for ff_id, device in self.firefly.component_items():
       if device.type in filter or filter is None:
         data = self.get_component_alexa_view(ff_id, source)
         if data is not None and len(data.get('capabilities')) > 0:
@@ -588,7 +623,7 @@ class Firebase(Service):
     if type(filter) is str:
       filter = [filter]
     views = []
-    for ff_id, device in self.firefly.components.items():
+    for ff_id, device in self.firefly.component_items():
       if device.type in filter or filter is None:
         data = self.get_component_view(ff_id, source)
         views.append(data)
@@ -637,6 +672,8 @@ class Firebase(Service):
     logging.info('[FIREBASE] REFRESHING USER')
     if not internet_up():
       logging.error('[FIREBASE REFRESH] Internet seems to be down')
+      # Writes may have been lost while offline, so the next sync rewrites everything.
+      self.sync.reset()
       scheduler.runInM(1, self.refresh_user, 'refresh_user_internet_down')
       return
 
@@ -652,11 +689,21 @@ class Firebase(Service):
       self.commandReplyStream = self.db.child('homeStatus').child(self.home_id).child('commandReply').stream(self.command_reply, self.id_token)
     except Exception as e:
       logging.info("Firebase 266: %s" % str(e))
+      self.sync.reset()
       scheduler.runInH(1, self.refresh_user, 'firebase_refresh_user')
       pass
 
   def push(self, source, action, retry=True):
-    logging.info('[FIREBASE PUSH] Pushing Data: %s: %s' % (str(source), str(action)))
+    ''' Queue the status update and event log entry of a broadcast. Errors are retried by the writer.
+
+    Args:
+      source: ff_id of the device or SOURCE_TIME / SOURCE_LOCATION
+      action: changed values
+
+    Returns:
+
+    '''
+    logging.info('[FIREBASE PUSH] Pushing Data: %s: %s', source, action)
     try:
 
       # Update time events
@@ -676,7 +723,7 @@ class Firebase(Service):
         return
 
       if self.firefly.components[source].type == 'GROUP':
-        self.db.child("homeStatus").child(self.home_id).child('groupStatus').child(source).update(action, self.id_token)
+        self.update_home_status('groupStatus/%s' % source, action)
         self.send_event(source, action)
         return
 
@@ -691,15 +738,12 @@ class Firebase(Service):
         return
       if 'ZWAVE_VALUES' in action.keys():
         return
-      self.db.child("homeStatus").child(self.home_id).child('devices').child(source).update(action, self.id_token)
+      self.update_home_status('devices/%s' % source, action)
 
       self.send_event(source, action)
 
     except Exception as e:
       logging.info('[FIREBASE PUSH] ERROR: %s' % str(e))
-      self.refresh_user()
-      if retry:
-        self.push(source, action, False)
 
   def send_event(self, source, action):
     ''' add new event in the event log
@@ -713,12 +757,12 @@ class Firebase(Service):
     '''
     now = self.firefly.location.now
     now_time = now.strftime("%B %d %Y %I:%M:%S %p")
-    self.db.child("homeStatus").child(self.home_id).child('events').push({
+    self.writer.push('events', {
       'ff_id':     source,
       'event':     action,
       'timestamp': now.timestamp(),
       'time':      now_time
-    }, self.id_token)
+    })
 
   def push_notification(self, message, priority, retry=True):
     try:
@@ -778,38 +822,9 @@ class Firebase(Service):
     my_stream = self.db.child("homeStatus").child(self.home_id).child("apiDevices").child(ff_id).child('apiKey').stream(stream_api_key, self.id_token)
 
 
-def scrub(x):
-  # Converts None to empty string
-  ret = copy.deepcopy(x)
-  # Handle dictionaries, lits & tuples. Scrub all values
-  if isinstance(x, dict):
-    for k, v in ret.items():
-      ret[k] = scrub(v)
-
-  if isinstance(x, (list, tuple)):
-    if isinstance(x, (tuple)):
-      logging.notify(str(x))
-    for k, v in enumerate(ret):
-      ret[k] = scrub(v)
-  # Handle None
-  if x is None:
-    ret = ''
-  # Finished scrubbing
-  return ret
-
-
-FIREBASE_INVALID_CHARS = ['/', '\\', '$', '#']
-
-def has_invalid_char(string_to_check):
-  for c in FIREBASE_INVALID_CHARS:
-    if c in string_to_check:
-      return True
-  return False
-
-
-def check_all_keys(firebase_dict):
-  for key in firebase_dict:
-    if has_invalid_char(key):
-      logging.critical('[FIREBASE CHECK ALL KEYS] ****************** BAD KEY: %s' % key)
-    if type(firebase_dict[key]) is dict:
-      check_all_keys(firebase_dict[key])
\ No newline at end of file
+def get_device_status(device) -> dict:
+  """Get the status of a device without the large debug values."""
+  device_view = device.get_all_request_values(True)
+  for key in DEBUG_VALUES:
+    device_view.pop(key, None)
+  return device_view
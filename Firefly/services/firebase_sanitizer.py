@@ -0,0 +1,156 @@
+from Firefly import logging
+
+# Removed from keys (and string values).
+REMOVED_CHARS = ('#', '$')
+# Replaced in keys (and string values).
+REPLACED_CHARS = {'/': '_-_'}
+# Keys that still contain these after sanitizing are rejected by firebase.
+INVALID_KEY_CHARS = ('\\',)
+
+_TRANSLATE = dict((ord(c), None) for c in REMOVED_CHARS)
+_TRANSLATE.update((ord(c), r) for c, r in REPLACED_CHARS.items())
+
+# {key: sanitized key}. Keys repeat a lot (request names, zwave labels) so they are only sanitized once.
+_key_cache = {}
+MAX_KEY_CACHE = 10000
+
+# Values of these types never change.
+_NUMBERS = frozenset([int, float, bool])
+
+
+def sanitize_string(value: str) -> str:
+  """Remove # and $ and replace / with _-_. The same string is returned when there is nothing to change."""
+  if '#' in value or '$' in value or '/' in value:
+    return value.translate(_TRANSLATE)
+  return value
+
+
+def sanitize_key(key) -> str:
+  if not isinstance(key, str):
+    # Not cached: 1 and True are the same dict key.
+    return _sanitize_key(str(key))
+  sanitized = _key_cache.get(key)
+  if sanitized is None:
+    sanitized = _sanitize_key(key)
+    if len(_key_cache) < MAX_KEY_CACHE:
+      _key_cache[key] = sanitized
+  return sanitized
+
+
+def _sanitize_key(key: str) -> str:
+  sanitized = sanitize_string(key)
+  for c in INVALID_KEY_CHARS:
+    if c in sanitized:
+      logging.critical('[FIREBASE SANITIZE] ****************** BAD KEY: %s', sanitized)
+  return sanitized
+
+
+def sanitize(value, values: bool = True):
+  """Make data safe to upload to firebase in one pass.
+
+  Keys are made strings with # and $ removed and / replaced with _-_. When values is True, string values get the same
+  replacements and None becomes an empty string. Tuples become lists.
+
+  Unchanged dicts, lists and strings are returned as they are instead of being copied, so only the parts that change
+  are allocated.
+
+  Args:
+    value: data to sanitize
+    values (bool): also sanitize values, not only keys
+
+  Returns:
+    sanitized data
+  """
+  value_type = type(value)
+  if value_type is dict or isinstance(value, dict):
+    result = None
+    key_cache = _key_cache
+    for index, (key, item) in enumerate(value.items()):
+      new_key = key_cache.get(key) if type(key) is str else None
+      if new_key is None:
+        new_key = sanitize_key(key)
+      item_type = type(item)
+      if item_type in _NUMBERS:
+        new_item = item
+      elif item_type is str:
+        new_item = sanitize_string(item) if values else item
+      else:
+        new_item = sanitize(item, values)
+      if result is None:
+        if new_key is key and new_item is item:
+          continue
+        # First change. Copy the items before it.
+        result = {}
+        for old_key, old_item in value.items():
+          if len(result) == index:
+            break
+          result[old_key] = old_item
+      result[new_key] = new_item
+    return value if result is None else result
+
+  if value_type is list or value_type is tuple or isinstance(value, (list, tuple)):
+    result = None
+    for index, item in enumerate(value):
+      new_item = item if type(item) in _NUMBERS else sanitize(item, values)
+      if result is None:
+        if new_item is item:
+          continue
+        result = list(value[:index])
+      result.append(new_item)
+    if result is None:
+      return value if value_type is list else list(value)
+    return result
+
+  if not values:
+    return value
+  if value is None:
+    return ''
+  if isinstance(value, str):
+    return sanitize_string(value)
+  return value
+
+
+class SanitizeCache(object):
+  """Cache sanitized component values until the component changes.
+
+  Components that keep a state_version (TrackedState) are cached until their version changes, as long as all their
+  requests are tracked. Other components, and components with requests that read state changed in place (for example
+  a dict of sensor values), are sanitized every time.
+  """
+
+  def __init__(self):
+    # {ff_id: ((state_version, values), sanitized values)}
+    self._cache = {}
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, component, build, values: bool = True):
+    """Get the sanitized values of a component.
+
+    Args:
+      component: component
+      build (Callable[[], Any]): returns the values of the component to sanitize
+      values (bool): also sanitize values, not only keys
+
+    Returns:
+      sanitized values
+    """
+    version = getattr(component, 'state_version', None)
+    if version is None or not component.requests_tracked():
+      return sanitize(build(), values)
+    cached = self._cache.get(component.id)
+    if cached is not None and cached[0] == (version, values):
+      self.hits += 1
+      return cached[1]
+    self.misses += 1
+    sanitized = sanitize(build(), values)
+    self._cache[component.id] = ((version, values), sanitized)
+    return sanitized
+
+  def retain(self, ff_ids) -> None:
+    """Drop the cached values of components that are not in ff_ids."""
+    for ff_id in [ff_id for ff_id in self._cache if ff_id not in ff_ids]:
+      del self._cache[ff_id]
+
+  def clear(self) -> None:
+    self._cache.clear()
@@ -0,0 +1,151 @@
+import threading
+from functools import partial
+
+
+def normalize(value):
+  """Get a value the way firebase stores it: None values and empty dicts are dropped and keys are strings.
+
+  Lists are kept as they are and compared as a whole.
+  """
+  if isinstance(value, dict):
+    normalized = {}
+    for key, item in value.items():
+      item = normalize(item)
+      if item is None or item == {}:
+        continue
+      normalized[str(key)] = item
+    return normalized
+  return value
+
+
+def diff(old, new, path: str, updates: dict) -> None:
+  """Add the multi-path updates that change old into new to updates.
+
+  Args:
+    old: last uploaded value (normalized)
+    new: current value (normalized)
+    path (str): path of the value
+    updates (dict): {path: value} to add to. None deletes the path.
+  """
+  if isinstance(old, dict) and isinstance(new, dict):
+    for key, value in new.items():
+      child_path = '%s/%s' % (path, key)
+      if key in old:
+        diff(old[key], value, child_path, updates)
+      else:
+        updates[child_path] = value
+    for key in old:
+      if key not in new:
+        updates['%s/%s' % (path, key)] = None
+  elif old != new:
+    updates[path] = new if new != {} else None
+
+
+class FirebaseSync(object):
+  """FirebaseSync uploads trees under homeStatus/{home_id} by sending only what changed since the last upload.
+
+  A shadow copy of what was last uploaded is kept for every synced path. sync() diffs the current data against the
+  shadow and queues all changed leaves of all paths as one multi-path update on the FirebaseWriter, so syncs and
+  pushes are sent in the order they were made. A path without a shadow (first sync or after reset()) is written whole
+  so anything stale on the server is removed. The shadow only changes once the writer sent the writes.
+
+  Args:
+    writer (FirebaseWriter): writer of homeStatus/{home_id}
+  """
+
+  def __init__(self, writer):
+    self.writer = writer
+    self._lock = threading.Lock()
+    # {path: normalized value last uploaded}
+    self._shadow = {}
+    self.paths_set = 0
+    self.paths_updated = 0
+
+  def reset(self) -> None:
+    """Forget what was uploaded. The next sync of every path rewrites it. Call this after reconnecting."""
+    with self._lock:
+      self._shadow.clear()
+
+  def has_shadow(self, path: str) -> bool:
+    return path in self._shadow
+
+  def sync(self, data: dict) -> int:
+    """Queue the upload of trees. Failed writes are retried by the writer.
+
+    Args:
+      data (dict): {path: value} where path is relative to homeStatus/{home_id}, for example deviceStatus
+
+    Returns:
+      (int) number of paths queued. 0 means nothing changed.
+    """
+    current = dict((path, normalize(value)) for path, value in data.items())
+    full = {}
+    updates = {}
+    with self._lock:
+      for path, value in current.items():
+        if path in self._shadow:
+          diff(self._shadow[path], value, path, updates)
+        else:
+          full[path] = value
+    if not full and not updates:
+      return 0
+
+    writes = dict(updates)
+    writes.update(full)
+    self.writer.update_paths(writes, on_sent=partial(self.sent, full, updates))
+    return len(writes)
+
+  def sent(self, full: dict, updates: dict) -> None:
+    """Record the writes of a sync in the shadow once they were sent.
+
+    Only what was sent is recorded. A merge made while the writes were queued is newer and must be kept.
+    """
+    with self._lock:
+      for path, value in full.items():
+        self._shadow[path] = value
+      for path, value in updates.items():
+        self._record(path, value)
+    self.paths_set += len(full)
+    self.paths_updated += len(updates)
+
+  def _record(self, path: str, value) -> None:
+    """Set a path inside the shadow to a sent value. None deletes the path. Must hold the lock."""
+    keys = path.split('/')
+    node = self._shadow.get(keys[0])
+    # The path is written whole next time when its shadow was dropped while the writes were queued.
+    if not isinstance(node, dict) or len(keys) == 1:
+      return
+    for key in keys[1:-1]:
+      child = node.get(key)
+      if not isinstance(child, dict):
+        child = node[key] = {}
+      node = child
+    if value is None:
+      node.pop(keys[-1], None)
+    else:
+      node[keys[-1]] = value
+
+  def merge(self, path: str, data: dict) -> None:
+    """Record an update() that was sent outside of sync so the shadow stays up to date. Call it from the on_sent
+    callback of the write.
+
+    Args:
+      path (str): path the update was sent to, for example deviceStatus/light_a
+      data (dict): data that was sent
+    """
+    keys = path.split('/')
+    with self._lock:
+      node = self._shadow
+      for key in keys[:-1]:
+        node = node.get(key)
+        if not isinstance(node, dict):
+          return
+      last = keys[-1]
+      if last not in node:
+        return
+      if not isinstance(node[last], dict) or not isinstance(data, dict):
+        node[last] = normalize(data)
+        return
+      merged = dict(node[last])
+      merged.update(data)
+      node[last] = normalize(merged)
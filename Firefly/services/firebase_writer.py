@@ -0,0 +1,272 @@
+import queue
+import random
+import threading
+import time
+from typing import Callable
+
+from Firefly import logging
+
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_MAX_BACKOFF = 60
+# Consecutive failed flushes before the circuit opens.
+DEFAULT_FAILURE_THRESHOLD = 5
+# Seconds the circuit stays open before a single flush is tried again.
+DEFAULT_OPEN_TIME = 120
+# Events kept while firebase can not be reached. The oldest are dropped first.
+MAX_PENDING_EVENTS = 1000
+# Firebase limits the size of a request, so large multi-path updates are split.
+MAX_PATHS_PER_UPDATE = 500
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+
+
+class PushIds(object):
+  """Generate firebase push ids. Ids sort in the order they were generated, like the ids made by push()."""
+
+  def __init__(self):
+    self._last_time = 0
+    self._last_random = []
+
+  def next(self) -> str:
+    now = max(int(time.time() * 1000), self._last_time)
+    if now == self._last_time and self._last_random:
+      # Same millisecond: increment the random part so the id still sorts after the last one.
+      for i in range(len(self._last_random) - 1, -1, -1):
+        if self._last_random[i] < 63:
+          self._last_random[i] += 1
+          break
+        self._last_random[i] = 0
+    else:
+      self._last_random = [random.randrange(64) for _ in range(12)]
+    self._last_time = now
+
+    timestamp = []
+    for _ in range(8):
+      timestamp.append(PUSH_CHARS[now % 64])
+      now //= 64
+    return ''.join(reversed(timestamp)) + ''.join(PUSH_CHARS[i] for i in self._last_random)
+
+
+def merge_update(updates: dict, path: str, value) -> None:
+  """Add a write of value to path to a multi-path update.
+
+  Firebase rejects a multi-path update where one path is inside another, so a write inside a path that is already in
+  the update is merged into that path's value, and writes inside the new path are replaced by it.
+
+  Args:
+    updates (dict): {path: value} multi-path update
+    path (str): path to write
+    value: value to write. None deletes the path.
+  """
+  prefix = path + '/'
+  for existing in [p for p in updates if p.startswith(prefix)]:
+    del updates[existing]
+
+  parts = path.split('/')
+  for i in range(1, len(parts)):
+    ancestor = '/'.join(parts[:i])
+    if ancestor not in updates:
+      continue
+    node = updates[ancestor] = dict(updates[ancestor]) if isinstance(updates[ancestor], dict) else {}
+    for key in parts[i:-1]:
+      child = node.get(key)
+      node[key] = dict(child) if isinstance(child, dict) else {}
+      node = node[key]
+    node[parts[-1]] = value
+    return
+  updates[path] = value
+
+
+class FirebaseWriter(object):
+  """FirebaseWriter writes status updates and events to homeStatus/{home_id} from a background thread.
+
+  Writes are queued and sent once per flush interval as one multi-path update(). Updates to the same path in one
+  interval are merged, so only the latest values are sent. Events get push ids when they are queued, so they are
+  stored in order. A write can have an on_sent callback, called from the writer thread in queue order once the flush
+  that sent it succeeded.
+
+  A failed flush is retried with exponential backoff. After failure_threshold failures in a row the circuit opens:
+  on_error is called once (for example to sign in again) and nothing is sent for open_time seconds, then one flush is
+  tried. Writes keep being merged while waiting; events over MAX_PENDING_EVENTS are dropped, oldest first.
+
+  Args:
+    db: pyrebase database
+    home_id (str): firebase home id
+    token (Callable[[], str]): returns the current id token
+    on_error (Callable[[], None]): called when the circuit opens
+  """
+
+  def __init__(self, db, home_id: str, token: Callable[[], str], on_error: Callable[[], None] = None,
+               flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_backoff: float = DEFAULT_MAX_BACKOFF,
+               failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, open_time: float = DEFAULT_OPEN_TIME):
+    self.db = db
+    self.home_id = home_id
+    self.token = token
+    self.on_error = on_error
+    self.flush_interval = flush_interval
+    self.max_backoff = max_backoff
+    self.failure_threshold = failure_threshold
+    self.open_time = open_time
+
+    self._queue = queue.Queue()
+    self._push_ids = PushIds()
+    self._thread = None
+    self._running = False
+    # {path: value}, [(event path, value)] and on_sent callbacks waiting to be sent.
+    self._updates = {}
+    self._events = []
+    self._on_sent = []
+    self._failures = 0
+    self._retry_at = 0
+    self.circuit = CIRCUIT_CLOSED
+
+    self.flushes = 0
+    self.failed_flushes = 0
+    self.dropped_events = 0
+
+  def start(self) -> None:
+    if self._running:
+      return
+    self._running = True
+    self._thread = threading.Thread(target=self._run, name='firebase_writer', daemon=True)
+    self._thread.start()
+
+  def stop(self, timeout: float = 5) -> None:
+    """Stop the writer thread after one last try to send what is pending."""
+    if not self._running:
+      return
+    self._running = False
+    self._queue.put(None)
+    self._thread.join(timeout)
+
+  def update(self, path: str, data: dict, on_sent: Callable[[], None] = None) -> None:
+    """Queue an update() of data at path. Safe to call from any thread."""
+    self._queue.put(('update', path, data, on_sent))
+
+  def set(self, path: str, data, on_sent: Callable[[], None] = None) -> None:
+    """Queue a set() of data at path. Safe to call from any thread."""
+    self._queue.put(('set', path, data, on_sent))
+
+  def update_paths(self, updates: dict, on_sent: Callable[[], None] = None) -> None:
+    """Queue a multi-path update of {path: value}, None deletes the path. Safe to call from any thread."""
+    self._queue.put(('paths', None, updates, on_sent))
+
+  def push(self, path: str, data) -> None:
+    """Queue a push() of data to the list at path. Safe to call from any thread."""
+    # The push id is made now so events are stored in the order they were queued.
+    self._queue.put(('push', '%s/%s' % (path, self._push_ids.next()), data, None))
+
+  @property
+  def pending(self) -> int:
+    return self._queue.qsize() + len(self._updates) + len(self._events)
+
+  def _add(self, write) -> None:
+    kind, path, data, on_sent = write
+    if on_sent is not None:
+      self._on_sent.append(on_sent)
+    if kind == 'paths':
+      for update_path, value in data.items():
+        merge_update(self._updates, update_path, value)
+      return
+    if kind == 'push':
+      self._events.append((path, data))
+      if len(self._events) > MAX_PENDING_EVENTS:
+        self._events.pop(0)
+        self.dropped_events += 1
+      return
+    if kind == 'set' or not isinstance(data, dict):
+      merge_update(self._updates, path, data)
+      return
+    for key, value in data.items():
+      merge_update(self._updates, '%s/%s' % (path, key), value)
+
+  def _drain(self, timeout: float) -> bool:
+    """Move queued writes into the pending batch, waiting up to timeout for the first one.
+
+    Returns:
+      (bool) the writer was asked to stop
+    """
+    try:
+      write = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+    except queue.Empty:
+      return False
+    while True:
+      if write is None:
+        return True
+      self._add(write)
+      try:
+        write = self._queue.get_nowait()
+      except queue.Empty:
+        return False
+
+  def _run(self) -> None:
+    stopping = False
+    while not stopping:
+      wait = None if not (self._updates or self._events) else max(self._retry_at - time.monotonic(), 0)
+      stopping = self._drain(wait if wait is not None else 1)
+      if not (self._updates or self._events):
+        continue
+      # Collect the writes of one flush interval.
+      deadline = max(time.monotonic() + self.flush_interval, self._retry_at)
+      while not stopping and time.monotonic() < deadline:
+        stopping = self._drain(deadline - time.monotonic())
+      self.flush()
+
+  def flush(self) -> bool:
+    """Send the pending writes in one multi-path update.
+
+    Returns:
+      (bool) the writes were sent
+    """
+    if not (self._updates or self._events):
+      return True
+    if self.circuit == CIRCUIT_OPEN:
+      if time.monotonic() < self._retry_at:
+        return False
+      self.circuit = CIRCUIT_HALF_OPEN
+
+    batch = list(self._updates.items()) + self._events
+    try:
+      # A failed request sends the whole batch again, writing the same values and push ids is harmless.
+      for i in range(0, len(batch), MAX_PATHS_PER_UPDATE):
+        self.db.child('homeStatus').child(self.home_id).update(dict(batch[i:i + MAX_PATHS_PER_UPDATE]), self.token())
+    except Exception as e:
+      self._failed(e)
+      return False
+
+    on_sent = self._on_sent
+    self._updates = {}
+    self._events = []
+    self._on_sent = []
+    self._failures = 0
+    self._retry_at = 0
+    self.circuit = CIRCUIT_CLOSED
+    self.flushes += 1
+    for callback in on_sent:
+      try:
+        callback()
+      except Exception as e:
+        logging.error(code='FF.FIR.WRI.002', args=(e,))  # error in firebase write callback: %s
+    return True
+
+  def _failed(self, error: Exception) -> None:
+    self._failures += 1
+    self.failed_flushes += 1
+    if self.circuit == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+      if self.circuit != CIRCUIT_OPEN:
+        logging.error(code='FF.FIR.WRI.001', args=(self._failures, error))  # firebase writes failed %s times: %s
+      self.circuit = CIRCUIT_OPEN
+      self._retry_at = time.monotonic() + self.open_time
+      if self.on_error:
+        try:
+          self.on_error()
+        except Exception as e:
+          logging.error('[FIREBASE WRITER] error handler failed: %s', e)
+      return
+    backoff = min(self.flush_interval * (2 ** self._failures), self.max_backoff)
+    self._retry_at = time.monotonic() + backoff
+    logging.warn('[FIREBASE WRITER] write failed, retrying in %.1fs: %s', backoff, error)
@@ -1,13 +1,17 @@
+import asyncio
 import configparser
-from time import sleep
+from time import monotonic, sleep
 
 import requests
-import aiohttp
 
 from Firefly import logging, scheduler
-from Firefly.const import COMMAND_UPDATE, SERVICE_CONFIG_FILE
+from Firefly.components.hue.transition import TransitionEngine
+from Firefly.const import COMMAND_UPDATE, EXECUTION_BLOCKING, SERVICE_CONFIG_FILE
 from Firefly.helpers.events import Command
+from Firefly.helpers.refresh_coordinator import SECTION_ALIASES, SECTION_DEVICES
 from Firefly.helpers.service import Service
+from Firefly.services.hue_state import AdaptivePoll, HueStateCache
+from Firefly.services.hue_transport import HueTransport
 
 TITLE = 'Hue service for Firefly'
 AUTHOR = 'Zachary Priddy me@zpriddy.com'
@@ -16,6 +20,7 @@ COMMANDS = ['send_command', 'refresh', 'send_request']
 REQUESTS = ['get_lights', 'get_groups', 'get_orphans']
 
 SECTION = 'HUE'
+REFRESH_JOB_ID = 'HUE_REFRESH'
 
 
 def Setup(firefly, package, **kwargs):
@@ -36,6 +41,10 @@ def Setup(firefly, package, **kwargs):
 
 
 class Hue(Service):
+  # send_request still blocks on GET and POST requests to the bridge (pairing, lookups), so it runs in the executor. PUTs
+  # return right away and the transport keeps the PUTs to a light in order.
+  execution_policy = EXECUTION_BLOCKING
+
   def __init__(self, firefly, package, **kwargs):
     super().__init__(firefly, SERVICE_ID, package, TITLE, AUTHOR, COMMANDS, REQUESTS)
 
@@ -58,7 +67,14 @@ class Hue(Service):
     self._request_count = 0
 
     self.initialize_hue()
-    scheduler.runEveryS(10, self.refresh)
+    self.state_cache = HueStateCache()
+    self.transport = HueTransport(self._firefly.loop, self._ip, self._username,
+                                  on_put_failed=self.state_cache.forget_path)
+    self.poll = AdaptivePoll()
+    # Fades of all hue devices share one timer and are sent through the paced transport.
+    self.transitions = TransitionEngine(self.send_transition, scheduler)
+    self._next_poll = 0
+    self.schedule_refresh(self.poll.normal)
     scheduler.runInM(5, self.reset_request_count)
 
 
@@ -111,6 +127,10 @@ class Hue(Service):
       if return_json is passed then only the JSON output is returned, otherwise the full request object is returned.
 
     """
+    if method == 'PUT' and path:
+      # The device already shows the new state. Let the next poll correct it if the PUT is dropped or fails.
+      self.state_cache.forget_path(path)
+
     if self.temp_disabled:
       return None
 
@@ -128,8 +148,10 @@ class Hue(Service):
         r = requests.post(url, json=data)
 
       elif method == 'PUT':
-        r = requests.put(url, json=data)
-        logging.error("[HUE] send_request is deprecated for PUT method requests")
+        # Light and group changes are paced and sent by the transport without waiting for the response.
+        self.transport.put_threadsafe(path, data)
+        self.command_sent()
+        return True
 
       elif method == 'GET':
         if data:
@@ -182,74 +204,113 @@ class Hue(Service):
       logging.info('Config file for hue has been updated.')
 
 
-  #TODO: Rename this when more functionality is added.
-  async def makeHuePutRequest(self, url, data, method):
-    async with aiohttp.ClientSession() as session:
-      if method == 'PUT':
-        async with session.put(url, data=data, timeout=10) as resp:
-          return await resp.status == 200
-
-
-  def sendLightRequest(self, request):
-    if 'lightID' in request.keys():
-      logging.debug('Sending Light Request')
-      #success = self.send_request('lights/' + str(request.get('lightID')) + '/state', data=request.get('data'), method='PUT')
-      success = self.makeHuePutRequest('lights/' + str(request.get('lightID')) + '/state', data=request.get('data'), method='PUT')
-      if success is None:
-        logging.error(code='FF.HUE.SEN.001')  # error talking to hue bridge
-      return
-    logging.error(code='FF.HUE.SEN.003')  # no light id given
-
-
-  def sendGroupRequest(self, request):
-    if 'groupID' in request.keys():
-      logging.debug('Sending Group Request')
-      #success = self.send_request('groups/' + str(request.get('groupID')) + '/action', data=request.get('data'), method='PUT')
-      success = self.makeHuePutRequest('groups/' + str(request.get('groupID')) + '/action', data=request.get('data'), method='PUT')
-      if success is None:
-        logging.error(code='FF.HUE.SEN.002')  # error talking to hue bridge
-      return
-    logging.error(code='FF.HUE.SEN.004')  # no group id given
-
-  def refresh(self):
-    #TODO: Make this an async function with a callback when data is gathered.
-    data = self.send_request()
+  def stop(self):
+    """Close the keep-alive session to the bridge."""
+    loop = self._firefly.loop
+    if loop.is_running():
+      asyncio.ensure_future(self.transport.close(), loop=loop)
+    else:
+      loop.run_until_complete(self.transport.close())
+
+  def send_transition(self, path, data):
+    self.state_cache.forget_path(path)
+    self.transport.put_threadsafe(path, data)
+    self.command_sent()
+
+  def schedule_refresh(self, delay):
+    self._next_poll = monotonic() + delay
+    scheduler.runInS(delay, self.refresh, job_id=REFRESH_JOB_ID)
+
+  def command_sent(self):
+    """Poll fast for a while so the new state of the light shows up quickly."""
+    self.poll.command_sent()
+    if self._next_poll > monotonic() + self.poll.fast:
+      self.schedule_refresh(self.poll.fast)
+
+  async def refresh(self):
+    try:
+      changed = await self.refresh_lights()
+      self.poll.polled(changed)
+    finally:
+      self.schedule_refresh(self.poll.interval)
+
+  async def refresh_lights(self):
+    """Get the state of all lights and groups from the bridge and update the devices that changed.
+
+    Returns:
+      (bool) a device changed or was installed
+    """
+    if self.temp_disabled:
+      return False
+    data = await self.transport.get()
     # TODO: Handle errors like:
     # [{'error': {'type': 1, 'address': '/', 'description': 'unauthorized user'}}] that is returned as data
 
     if data is None:
       logging.error(code='FF.HUE.REF.001')  # error talking to hue hub
-      return
+      self._request_count += 1
+      if self._request_count > 5:
+        self.temp_disable(1)
+      return False
 
+    if self.state_cache.full_sync_due():
+      self.state_cache.clear()
+
+    changed = False
     need_to_refresh = False
+    # {hue number: ff_id} of the lights, and {path: [ff_id]} of the devices a PUT to a light or group changes.
+    light_ids = {}
+    targets = {}
 
     for light_id, light in data['lights'].items():
       ff_id = light['uniqueid']
+      light_ids[light_id] = ff_id
+      targets['lights/%s' % light_id] = [ff_id]
       light['hue_number'] = light_id
       light['hue_service'] = SERVICE_ID
-
-      if ff_id in self._firefly.components:
-        command = Command(ff_id, SERVICE_ID, COMMAND_UPDATE, **light)
-        self._firefly.send_command(command)
-      else:
-        self._firefly.install_package('Firefly.components.hue.hue_light', ff_id=ff_id, alias=light.get('name'), **light)
-        need_to_refresh = True
+      installed = self.update_device(ff_id, 'Firefly.components.hue.hue_light', light)
+      changed |= installed is not None
+      need_to_refresh |= installed is True
 
     for group_id, group in data['groups'].items():
       ff_id = 'hue-group-device-%s' % str(group_id)
+      targets['groups/%s' % group_id] = [ff_id] + [light_ids[n] for n in group.get('lights', []) if n in light_ids]
       group['hue_number'] = group_id
       group['hue_service'] = SERVICE_ID
+      installed = self.update_device(ff_id, 'Firefly.components.hue.hue_group', group)
+      changed |= installed is not None
+      need_to_refresh |= installed is True
 
-      if ff_id in self._firefly.components:
-        command = Command(ff_id, SERVICE_ID, COMMAND_UPDATE, **group)
-        self._firefly.send_command(command)
-      else:
-        self._firefly.install_package('Firefly.components.hue.hue_group', ff_id=ff_id, alias=group.get('name'), **group)
-        need_to_refresh = True
+    self.state_cache.set_targets(targets)
+    self.transitions.set_groups(dict((group_id, group.get('lights', [])) for group_id, group in data['groups'].items()))
 
     if need_to_refresh:
       self.refresh_firebase()
+    return changed
+
+  def update_device(self, ff_id, package, item):
+    """Send the fields of a light or group that changed since the last poll to its device, or install it.
+
+    Args:
+      ff_id: (str) device id
+      package: (str) package to install the device from
+      item: (dict) state reported by the bridge
+
+    Returns:
+      None if nothing changed, False if the device was updated and True if it was installed.
+    """
+    if ff_id not in self._firefly.components:
+      self.state_cache.forget(ff_id)
+      self._firefly.install_package(package, ff_id=ff_id, alias=item.get('name'), **item)
+      return True
+
+    changes = self.state_cache.changes(ff_id, item)
+    if changes is None:
+      return None
+    command = Command(ff_id, SERVICE_ID, COMMAND_UPDATE, **changes)
+    self._firefly.send_command(command)
+    return False
 
   def refresh_firebase(self):
-    refresh_command = Command('service_firebase', 'hue', 'refresh')
+    refresh_command = Command('service_firebase', 'hue', 'refresh', sections=[SECTION_DEVICES, SECTION_ALIASES])
     self._firefly.send_command(refresh_command)
@@ -0,0 +1,142 @@
+import json
+import time
+from typing import Dict, List
+
+# Poll intervals in seconds.
+FAST_INTERVAL = 2
+NORMAL_INTERVAL = 10
+IDLE_INTERVAL = 30
+# Seconds to poll at FAST_INTERVAL after a command is sent.
+FAST_WINDOW = 20
+# Polls in a row without a change before polling at IDLE_INTERVAL.
+IDLE_AFTER = 6
+# Seconds between full updates of every light, so devices that were changed outside of the service catch up.
+FULL_SYNC_INTERVAL = 300
+
+
+def state_hash(item: dict) -> int:
+  """Hash the state of a light or group as reported by the bridge."""
+  return hash(json.dumps(item, sort_keys=True, default=str))
+
+
+def changed_fields(old: dict, new: dict) -> dict:
+  """Get the fields of new that are not the same in old.
+
+  Nested dicts (state, action) only keep the keys that changed. Fields missing from new are ignored.
+
+  Args:
+    old (dict): last state
+    new (dict): current state
+
+  Returns:
+    (dict) changed fields
+  """
+  changes = {}
+  for key, value in new.items():
+    old_value = old.get(key)
+    if old_value == value:
+      continue
+    if isinstance(value, dict) and isinstance(old_value, dict):
+      nested = changed_fields(old_value, value)
+      if nested:
+        changes[key] = nested
+      continue
+    changes[key] = value
+  return changes
+
+
+class HueStateCache(object):
+  """HueStateCache remembers the last state of every light and group so polls only pass on what changed.
+
+  Entries are keyed by ff_id, which is the uniqueid for lights. The cache is cleared every full_sync_interval seconds so
+  the next poll updates every device. Devices update their state before a command reaches the bridge, so the entries
+  of the devices a PUT targets are forgotten (forget_path) when it is sent or fails, and the next poll sets them to
+  the bridge state again.
+  """
+
+  def __init__(self, full_sync_interval: float = FULL_SYNC_INTERVAL):
+    self.full_sync_interval = full_sync_interval
+    # {ff_id: (state_hash, state)}
+    self._states = {}
+    # {'lights/1': [ff_id]} of the devices a PUT to a path changes.
+    self._targets = {}
+    self._last_full_sync = time.monotonic()
+    self.skipped = 0
+    self.changed = 0
+
+  def changes(self, ff_id: str, item: dict):
+    """Record the current state of a device.
+
+    Args:
+      ff_id (str): device id
+      item (dict): state reported by the bridge
+
+    Returns:
+      None when nothing changed, the changed fields otherwise. The first state of a device is returned in full.
+    """
+    new_hash = state_hash(item)
+    cached = self._states.get(ff_id)
+    if cached is not None and cached[0] == new_hash:
+      self.skipped += 1
+      return None
+    self._states[ff_id] = (new_hash, item)
+    self.changed += 1
+    if cached is None:
+      return item
+    return changed_fields(cached[1], item)
+
+  def forget(self, ff_id: str) -> None:
+    self._states.pop(ff_id, None)
+
+  def set_targets(self, targets: Dict[str, List[str]]) -> None:
+    """Set the devices changed by PUTs to each light and group.
+
+    Args:
+      targets (dict): {'lights/1': [ff_id], 'groups/1': [ff_id of the group and of each of its lights]}
+    """
+    self._targets = targets
+
+  def forget_path(self, path: str) -> None:
+    """Forget the devices changed by a PUT to path, for example lights/1/state."""
+    for ff_id in self._targets.get('/'.join(path.split('/')[:2]), []):
+      self._states.pop(ff_id, None)
+
+  def clear(self) -> None:
+    self._states.clear()
+    self._last_full_sync = time.monotonic()
+
+  def full_sync_due(self) -> bool:
+    return time.monotonic() - self._last_full_sync >= self.full_sync_interval
+
+
+class AdaptivePoll(object):
+  """AdaptivePoll picks how long to wait before the next poll of the bridge.
+
+  Polls are fast for fast_window seconds after a command so the result shows up quickly, normal while lights keep
+  changing and slow after idle_after polls in a row that found nothing new.
+  """
+
+  def __init__(self, fast: float = FAST_INTERVAL, normal: float = NORMAL_INTERVAL, idle: float = IDLE_INTERVAL,
+               fast_window: float = FAST_WINDOW, idle_after: int = IDLE_AFTER):
+    self.fast = fast
+    self.normal = normal
+    self.idle = idle
+    self.fast_window = fast_window
+    self.idle_after = idle_after
+    self._fast_until = 0
+    self._quiet_polls = 0
+
+  def command_sent(self) -> None:
+    self._fast_until = time.monotonic() + self.fast_window
+    self._quiet_polls = 0
+
+  def polled(self, changed: bool) -> None:
+    self._quiet_polls = 0 if changed else self._quiet_polls + 1
+
+  @property
+  def interval(self) -> float:
+    if time.monotonic() < self._fast_until:
+      return self.fast
+    if self._quiet_polls >= self.idle_after:
+      return self.idle
+    return self.normal
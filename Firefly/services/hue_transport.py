@@ -0,0 +1,180 @@
+import asyncio
+import time
+from typing import Callable
+
+import aiohttp
+
+from Firefly import logging
+
+# The bridge handles about 10 light commands and 1 group command per second.
+LIGHT_RATE = 10
+LIGHT_BURST = 3
+GROUP_RATE = 1
+GROUP_BURST = 1
+MAX_CONCURRENCY = 4
+REQUEST_TIMEOUT = 10
+
+
+class TokenBucket(object):
+  """Token bucket that allows rate requests per second on average and up to burst at once.
+
+  Args:
+    rate (float): tokens added per second
+    burst (int): maximum number of tokens
+  """
+
+  def __init__(self, rate: float, burst: int = 1):
+    self.rate = rate
+    self.burst = burst
+    self._tokens = float(burst)
+    self._updated = time.monotonic()
+
+  def reserve(self) -> float:
+    """Take a token.
+
+    Returns:
+      (float) seconds to wait before using the token.
+    """
+    now = time.monotonic()
+    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+    self._updated = now
+    self._tokens -= 1
+    if self._tokens >= 0:
+      return 0
+    return -self._tokens / self.rate
+
+  async def acquire(self, loop: asyncio.AbstractEventLoop = None) -> None:
+    delay = self.reserve()
+    if delay > 0:
+      await asyncio.sleep(delay, loop=loop)
+
+
+class _PendingPut(object):
+  def __init__(self, data: dict):
+    self.data = dict(data)
+    self.merged = 0
+
+
+class HueTransport(object):
+  """HueTransport sends requests to the hue bridge on one shared keep-alive aiohttp session.
+
+  PUTs to lights are paced to LIGHT_RATE per second and PUTs to groups to GROUP_RATE per second. A PUT that is waiting
+  for its turn takes in later PUTs to the same path, so the bridge only gets the latest state. PUTs to the same path
+  are sent in order. At most max_concurrency requests are sent at the same time. on_put_failed is called with the path
+  of a PUT that could not be sent.
+
+  Coroutines must run on loop. put_threadsafe can be called from any thread.
+
+  Args:
+    loop (asyncio.AbstractEventLoop): event loop to run the requests on
+    ip (str): bridge ip
+    username (str): bridge username
+    on_put_failed (Callable[[str], None]): called on the loop with the path of a failed PUT
+  """
+
+  def __init__(self, loop: asyncio.AbstractEventLoop, ip: str = None, username: str = None,
+               max_concurrency: int = MAX_CONCURRENCY, timeout: float = REQUEST_TIMEOUT,
+               light_rate: float = LIGHT_RATE, group_rate: float = GROUP_RATE,
+               on_put_failed: Callable[[str], None] = None):
+    self.loop = loop
+    self.ip = ip
+    self.username = username
+    self.max_concurrency = max_concurrency
+    self.timeout = timeout
+    self.light_bucket = TokenBucket(light_rate, LIGHT_BURST)
+    self.group_bucket = TokenBucket(group_rate, GROUP_BURST)
+    self.on_put_failed = on_put_failed
+    self._session = None
+    self._semaphore = None
+    # {path: _PendingPut} of PUTs waiting to be sent.
+    self._pending = {}
+    # {path: asyncio.Lock} keeps PUTs to a path in order.
+    self._path_locks = {}
+    self.requests = 0
+    self.merged_puts = 0
+    self.errors = 0
+
+  def set_bridge(self, ip: str, username: str) -> None:
+    self.ip = ip
+    self.username = username
+
+  def url(self, path: str = '') -> str:
+    return 'http://%s/api/%s/%s' % (self.ip, self.username, path or '')
+
+  @property
+  def session(self) -> aiohttp.ClientSession:
+    if self._session is None or self._session.closed:
+      # Created on first use, from a coroutine on loop.
+      connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+      self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+      self._semaphore = asyncio.Semaphore(self.max_concurrency, loop=self.loop)
+    return self._session
+
+  async def close(self) -> None:
+    if self._session is not None:
+      await self._session.close()
+      self._session = None
+
+  async def request(self, method: str, path: str = '', data: dict = None):
+    """Send a request to the bridge.
+
+    Args:
+      method (str): HTTP method
+      path (str): path after /api/{username}/
+      data (dict): json body
+
+    Returns:
+      json response or None if the request failed.
+    """
+    session = self.session
+    async with self._semaphore:
+      self.requests += 1
+      try:
+        async with session.request(method, self.url(path), json=data) as response:
+          return await response.json(content_type=None)
+      except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        self.errors += 1
+        logging.error(code='FF.HUE.TRA.001', args=(method, path, e))  # error sending %s %s to hue bridge: %s
+        return None
+
+  async def get(self, path: str = ''):
+    return await self.request('GET', path)
+
+  async def put(self, path: str, data: dict):
+    """PUT data to a light or group path, paced to the bridge limits.
+
+    Args:
+      path (str): for example lights/1/state or groups/1/action
+      data (dict): state to set
+
+    Returns:
+      json response, None if the request failed or True if it was merged into a PUT that was already waiting.
+    """
+    pending = self._pending.get(path)
+    if pending is not None:
+      pending.data.update(data)
+      pending.merged += 1
+      self.merged_puts += 1
+      return True
+
+    pending = self._pending[path] = _PendingPut(data)
+    lock = self._path_locks.get(path)
+    if lock is None:
+      lock = self._path_locks[path] = asyncio.Lock(loop=self.loop)
+    async with lock:
+      if path.startswith('groups'):
+        await self.group_bucket.acquire(self.loop)
+      await self.light_bucket.acquire(self.loop)
+      # Stop merging: later PUTs wait for this one.
+      del self._pending[path]
+      response = await self.request('PUT', path, pending.data)
+    if response is None and self.on_put_failed is not None:
+      self.on_put_failed(path)
+    return response
+
+  def put_threadsafe(self, path: str, data: dict) -> None:
+    """Queue a PUT from any thread without waiting for it."""
+    self.loop.call_soon_threadsafe(self._start_put, path, data)
+
+  def _start_put(self, path: str, data: dict) -> None:
+    asyncio.ensure_future(self.put(path, data), loop=self.loop)
@@ -5,6 +5,7 @@ import nest
 from Firefly import logging, scheduler
 from Firefly.const import COMMAND_UPDATE, NEST_CACHE_FILE, SERVICE_CONFIG_FILE
 from Firefly.helpers.events import Command
+from Firefly.helpers.refresh_coordinator import SECTION_ALIASES, SECTION_DEVICES
 from Firefly.helpers.service import Service
 
 TITLE = 'nest service for Firefly'
@@ -91,5 +92,5 @@ class Nest(Service):
       logging.error(e)
 
   def refresh_firebase(self):
-    refresh_command = Command('service_firebase', 'hue', 'refresh')
+    refresh_command = Command('service_firebase', 'hue', 'refresh', sections=[SECTION_DEVICES, SECTION_ALIASES])
     self.firefly.send_command(refresh_command)
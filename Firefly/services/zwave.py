@@ -1,7 +1,6 @@
 import asyncio
 import configparser
 import json
-from time import sleep
 
 import logging as pyLogging
 from logging.handlers import RotatingFileHandler
@@ -11,8 +10,13 @@ from openzwave.option import ZWaveOption
 
 from Firefly import logging, scheduler
 from Firefly.components.zwave.package_lookup import get_package
+from Firefly.components.zwave.config_apply import ConfigApplyEngine
+from Firefly.components.zwave.poller import ZwavePoller
+from Firefly.components.zwave.snapshot import ZwaveSnapshot
+from Firefly.components.zwave.value_router import ValueRouter
 from Firefly.const import SERVICE_CONFIG_FILE, ZWAVE_FILE
 from Firefly.helpers.events import Command
+from Firefly.helpers.refresh_coordinator import SECTION_ALIASES, SECTION_DEVICES
 from Firefly.helpers.service import Service
 
 
@@ -36,11 +40,12 @@ TITLE = 'Z-Wave service for Firefly'
 AUTHOR = 'Zachary Priddy me@zpriddy.com'
 SERVICE_ID = 'service_zwave'
 COMMANDS = ['send_command', 'stop', 'add_node', 'remove_node', 'cancel']
-REQUESTS = ['get_nodes', 'get_orphans']
+REQUESTS = ['get_nodes', 'get_orphans', 'get_config_progress']
 
 SECTION = 'ZWAVE'
 # TODO: Make this 300 after testing is done
 STARTUP_TIMEOUT = 10
+SNAPSHOT_SAVE_INTERVAL_M = 10
 
 
 def Setup(firefly, package, **kwargs):
@@ -99,10 +104,17 @@ class Zwave(Service):
 
     self.add_request('get_nodes', self.get_nodes)
     self.add_request('get_orphans', self.get_orphans)
+    self.add_request('get_config_progress', self.get_config_progress)
 
     self.new_alias = None
     self.healed = False
 
+    self.router = ValueRouter(self._firefly.components, self._firefly.commands)
+    self.poller: ZwavePoller = None
+    self.config_engine = ConfigApplyEngine(scheduler)
+    self.snapshot = ZwaveSnapshot()
+    self.hydrate_from_snapshot()
+
     dispatcher.connect(self.zwave_handler, ZWaveNetwork.SIGNAL_NODE_ADDED)
     dispatcher.connect(self.zwave_node_removed_handler, ZWaveNetwork.SIGNAL_NODE_REMOVED)
 
@@ -125,8 +137,24 @@ class Zwave(Service):
     dispatcher.connect(self.node_event_handler, ZWaveNetwork.SIGNAL_NODE_EVENT)
 
     scheduler.runInS(5, self.initialize_zwave)
+    scheduler.runEveryM(SNAPSHOT_SAVE_INTERVAL_M, self.save_snapshot, job_id='zwave_snapshot')
 
-    scheduler.runEveryH(2, self.poll_nodes)
+  def hydrate_from_snapshot(self) -> None:
+    """Fill in the installed devices from the last snapshot so they have values before the network is ready."""
+    if not self.snapshot.load():
+      return
+    hydrated = self.snapshot.hydrate(self._firefly.components, self._installed_nodes)
+    for node_id, device in hydrated:
+      # Function routes like update_level need the live node, relearn() adds them once ZWAVE_UPDATE set it.
+      self.router.learn(node_id, device, requests_only=True)
+    logging.message('ZWAVE hydrated %d devices from snapshot' % len(hydrated))
+
+  def save_snapshot(self, **kwargs) -> None:
+    for node_id, ff_id in self._installed_nodes.items():
+      device = self._firefly.components.get(ff_id)
+      if device is not None and hasattr(device, 'value_map'):
+        self.snapshot.set_value_map(node_id, device.value_map)
+    self.snapshot.save()
 
   async def initialize_zwave(self):
     if self._network is not None:
@@ -167,10 +195,12 @@ class Zwave(Service):
 
     self._network.set_poll_interval(milliseconds=10000)
 
+    self.poller = ZwavePoller(self._network, self._firefly.loop, ignore_nodes=self.ignore_nodes)
+    self.poller.start()
+
     # Initial refresh of all nodes
     self.zwave_refresh()
     scheduler.runEveryH(72, self.zwave_refresh, job_id='123-zwave_refresh')
-    #scheduler.runEveryH(10, self.find_dead_nodes, job_id='123-find-dead-nodes')
 
     for node_id, node in self._network.nodes.items():
       #node.refresh_info()
@@ -182,20 +212,32 @@ class Zwave(Service):
         if str(node.node_id) in self._installed_nodes:
           command = Command(self._installed_nodes[str(node.node_id)], SERVICE_ID, 'ZWAVE_UPDATE', node=node)
           self._firefly.send_command(command)
+          self.capture_node(node)
       except Exception as e:
         logging.error('ZWAVE INIT ERROR: %s' % str(e))
 
+  def capture_node(self, node: ZWaveNode) -> None:
+    """Replace the snapshot of an installed node with its live values."""
+    ff_id = self._installed_nodes.get(str(node.node_id))
+    device = self._firefly.components.get(ff_id)
+    if device is not None:
+      self.snapshot.capture_node(node, ff_id, getattr(device, 'value_map', {}))
+
   def find_dead_nodes(self, **kwargs):
-    for node_id, node in self._network.nodes.items():
-      logging.message('ZWAVE FINDING DEAD NODES: %s' % str(node_id))
-      self._network.controller.has_node_failed(node_id)
-      sleep(60)
+    """Check every failed node now. The poller also checks them every few hours on its own."""
+    if self.poller is None:
+      return
+    logging.message('ZWAVE FINDING DEAD NODES')
+    self.poller.sweep_failed()
 
   def zwave_controller_command(self, **kwargs):
     logging.message('ZWAVE CONTROLLER COMMAND: %s' % str(kwargs))
 
   def zwave_node_removed_handler(self, **kwargs):
     logging.notify('ZWAVE NODE REMOVED %s Node %s' % (str(kwargs), str(kwargs['node'].to_dict())))
+    self.router.forget(kwargs['node'].node_id)
+    self.snapshot.forget(kwargs['node'].node_id)
+    self.config_engine.forget(kwargs['node'].node_id)
 
   def node_handler(self, **kwargs):
     '''Called when a node is changed, added, removed'''
@@ -230,21 +272,32 @@ class Zwave(Service):
 
   def value_added_handler(self, **kwargs):
     '''Called when a node is changed, added, removed'''
-    logging.message('ZWAVE VALUE ADDED HANDLER: %s' % str(kwargs))
-    logging.message('ZWAVE VALUE ADDED HANDLER: %s' % str(kwargs['value'].to_dict()))
+    logging.debug('ZWAVE VALUE ADDED HANDLER: %s', kwargs.get('value'))
 
   def value_handler(self, **kwargs):
-    '''Called when a node is changed, added, removed'''
-    logging.message('ZWAVE VALUE HANDLER: %s' % str(kwargs))
-    logging.message('ZWAVE VALUE HANDLER: %s' % str(kwargs['value'].to_dict()))
-
+    '''Called when a value of a node changes'''
     node: ZWaveNode = kwargs.get('node')
+    value = kwargs.get('value')
+    logging.debug('ZWAVE VALUE HANDLER: %s', value)
 
     if node is None:
       return
 
-    if str(node.node_id) in self._installed_nodes:
-      command = Command(self._installed_nodes[str(node.node_id)], SERVICE_ID, 'ZWAVE_UPDATE', node=node, values=kwargs['value'], values_only=True)
+    if self.poller is not None:
+      self.poller.node_active(node.node_id)
+    self.snapshot.update_value(node.node_id, value)
+    self.config_engine.value_reported(node.node_id, value)
+
+    if self.router.route(node.node_id, value):
+      return
+
+    ff_id = self._installed_nodes.get(str(node.node_id))
+    if ff_id is not None:
+      # Earlier ZWAVE_UPDATE commands may have added to the device's value_map since the routes were learned.
+      device = self._firefly.components.get(ff_id)
+      if device is not None and self.router.relearn(node.node_id, device) and self.router.route(node.node_id, value):
+        return
+      command = Command(ff_id, SERVICE_ID, 'ZWAVE_UPDATE', node=node, values=value, values_only=True)
       self._firefly.send_command(command)
       return
 
@@ -269,6 +322,8 @@ class Zwave(Service):
 
   def node_queries_handler(self, **kwargs):
     logging.message('ZWAVE NODE QUERIES: %s' % str(kwargs))
+    if kwargs.get('node') is not None:
+      self.capture_node(kwargs['node'])
     # 2017-09-29 02:08:14	DEBUG:	Z-Wave Notification NodeQueriesComplete : {'notificationType': 'NodeQueriesComplete', 'homeId': 3348036247, 'nodeId': 43}
     # 2017-09-29 02:08:14	INFO:	ZWAVE NODE QUERIES: {'signal': 'NodeQueriesComplete', 'sender': _Anonymous, 'network': <openzwave.network.ZWaveNetwork object at 0x7458e270>,
     # 'node': <openzwave.node.ZWaveNode object at 0x703c4fd0>} [node_queries_handler - zwave.py]
@@ -331,7 +386,10 @@ class Zwave(Service):
         logging.error('ZWAVE ERROR: %s' % str(e))
 
   def stop(self):
+    if self.poller is not None:
+      self.poller.stop()
     self.export()
+    self.save_snapshot()
     self._network.stop()
 
   def zwave_handler(self, *args, **kwargs):
@@ -399,7 +457,7 @@ class Zwave(Service):
     self.export()
 
   def refresh_firebase(self):
-    refresh_command = Command('service_firebase', 'zwave', 'refresh')
+    refresh_command = Command('service_firebase', 'zwave', 'refresh', sections=[SECTION_DEVICES, SECTION_ALIASES])
     self._firefly.send_command(refresh_command)
 
   def export(self):
@@ -485,6 +543,14 @@ class Zwave(Service):
     '''
     pass
 
+  def get_config_progress(self, **kwargs):
+    """Get the progress of the configuration parameter writes of every node.
+
+    Returns:
+      (dict) {node_id: progress from ConfigApplyEngine.progress}
+    """
+    return self.config_engine.all_progress()
+
   def get_orphans(self):
     '''
     Get a list of nodes that are orphaned and not in the alias file
@@ -494,14 +560,8 @@ class Zwave(Service):
     pass
 
   def poll_nodes(self, **kwargs):
+    """Poll every node now. The poller spaces the polls out and skips battery nodes that are asleep."""
+    if self.poller is None:
+      return
     logging.info('polling zwave nodes')
-    nodes = self._network.nodes.values()
-    logging.debug('******************************** ZWAVE NODES ******************************')
-    logging.debug(str(nodes))
-
-    for n in nodes:
-      # n:ZWaveNode = n
-      n.request_state()
-      sleep(1)
-      n.refresh_info()
-      sleep(10)
+    self.poller.poll_all()
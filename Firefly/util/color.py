@@ -330,6 +330,7 @@ def color_temperature_to_rgb(color_temperature_kelvin):
 
     This is a rough approximation based on the formula provided by T. Helland
     http://www.tannerhelland.com/4435/convert-temperature-rgb-algorithm-code/
+
     """
     # range check
     if color_temperature_kelvin < 1000:
@@ -395,4 +396,194 @@ def color_temperature_mired_to_kelvin(mired_temperature):
 
 def color_temperature_kelvin_to_mired(kelvin_temperature):
     """Convert degrees kelvin to mired shift."""
-    return 1000000 / kelvin_temperature
\ No newline at end of file
+    return 1000000 / kelvin_temperature
+
+
+# Batched conversions. Colors are passed as arrays with one color per row,
+# for example an (N, 3) array of RGB colors. NumPy is an optional dependency
+# (pip install numpy): only the batch functions, the lookup tables and
+# color_temperature_to_xy need it, and it is imported on first use.
+
+def color_RGB_to_xy_batch(rgb) -> 'numpy.ndarray':
+    """Convert (N, 3) RGB colors to (N, 3) rows of x, y and brightness."""
+    import numpy as np
+    rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3) / 255
+    linear = np.where(rgb > 0.04045,
+                      np.power((rgb + 0.055) / (1.0 + 0.055), 2.4),
+                      rgb / 12.92)
+    xyz = linear.dot(np.array(_RGB_TO_XYZ).T)
+    total = xyz.sum(axis=1)
+    black = total == 0
+    total[black] = 1
+
+    result = np.empty((len(rgb), 3))
+    result[:, 0] = np.round(xyz[:, 0] / total, 3)
+    result[:, 1] = np.round(xyz[:, 1] / total, 3)
+    result[:, 2] = np.round(np.minimum(xyz[:, 1], 1) * 255)
+    result[black] = 0
+    return result
+
+
+def color_xy_brightness_to_RGB_batch(xyb) -> 'numpy.ndarray':
+    """Convert (N, 3) rows of x, y and brightness to (N, 3) int RGB colors."""
+    import numpy as np
+    xyb = np.asarray(xyb, dtype=np.float64).reshape(-1, 3)
+    x = xyb[:, 0]
+    y = np.where(xyb[:, 1] == 0, 0.00000000001, xyb[:, 1])
+    Y = xyb[:, 2] / 255.
+
+    xyz = np.stack([(Y / y) * x, Y, (Y / y) * (1 - x - y)], axis=1)
+    rgb = xyz.dot(np.array(_XYZ_TO_RGB).T)
+    with np.errstate(invalid='ignore'):
+        rgb = np.where(rgb <= 0.0031308,
+                       12.92 * rgb,
+                       (1.0 + 0.055) * np.power(rgb, 1.0 / 2.4) - 0.055)
+    rgb = np.maximum(rgb, 0)
+    max_component = rgb.max(axis=1, keepdims=True)
+    rgb = np.where(max_component > 1, rgb / np.maximum(max_component, 1), rgb)
+    rgb = (rgb * 255).astype(int)
+    rgb[Y == 0] = 0
+    return rgb
+
+
+def color_RGB_to_hsv_batch(rgb) -> 'numpy.ndarray':
+    """Convert (N, 3) RGB colors to (N, 3) int hue (0-65535), saturation and value (0-255)."""
+    import numpy as np
+    rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3) / 255.0
+    maxc = rgb.max(axis=1)
+    minc = rgb.min(axis=1)
+    delta = maxc - minc
+    gray = delta == 0
+    safe_delta = np.where(gray, 1, delta)
+    safe_max = np.where(maxc == 0, 1, maxc)
+
+    rc = (maxc - rgb[:, 0]) / safe_delta
+    gc = (maxc - rgb[:, 1]) / safe_delta
+    bc = (maxc - rgb[:, 2]) / safe_delta
+    h = np.where(rgb[:, 0] == maxc, bc - gc,
+                 np.where(rgb[:, 1] == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0, (h / 6.0) % 1.0)
+    s = np.where(maxc == 0, 0, delta / safe_max)
+
+    hsv = np.empty((len(rgb), 3), dtype=int)
+    hsv[:, 0] = (h * 65536).astype(int)
+    hsv[:, 1] = (s * 255).astype(int)
+    hsv[:, 2] = (maxc * 255).astype(int)
+    return hsv
+
+
+def color_hsv_to_RGB_batch(hsv) -> 'numpy.ndarray':
+    """Convert (N, 3) hue (0-65535), saturation and value (0-255) colors to (N, 3) int RGB colors."""
+    import numpy as np
+    hsv = np.asarray(hsv, dtype=np.float64).reshape(-1, 3)
+    h = hsv[:, 0] / 65536
+    s = hsv[:, 1] / 255
+    v = hsv[:, 2] / 255
+
+    i = (h * 6.0).astype(int)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i %= 6
+    # Same sector table as colorsys.hsv_to_rgb.
+    choices = np.stack([
+        np.stack([v, q, p, p, t, v], axis=1),
+        np.stack([t, v, v, q, p, p], axis=1),
+        np.stack([p, p, t, v, v, q], axis=1),
+    ], axis=1)
+    rows = np.arange(len(hsv))
+    return (choices[rows, :, i] * 255).astype(int)
+
+
+def color_temperature_to_rgb_batch(kelvin) -> 'numpy.ndarray':
+    """Convert color temperatures in kelvin to (N, 3) RGB colors with the formula of color_temperature_to_rgb."""
+    import numpy as np
+    temperature = np.clip(np.asarray(kelvin, dtype=np.float64).reshape(-1), 1000, 40000) / 100.0
+    warm = temperature <= 66
+    with np.errstate(invalid='ignore', divide='ignore'):
+        red = np.where(warm, 255, 329.698727446 * np.power(temperature - 60, -0.1332047592))
+        green = np.where(warm,
+                         99.4708025861 * np.log(temperature) - 161.1195681661,
+                         288.1221695283 * np.power(temperature - 60, -0.0755148492))
+        blue = np.where(temperature >= 66, 255,
+                        np.where(temperature <= 19, 0,
+                                 138.5177312231 * np.log(temperature - 10) - 305.0447927307))
+    return np.clip(np.stack([red, green, blue], axis=1), 0, 255)
+
+
+def color_temperature_lookup_rgb(kelvin) -> 'numpy.ndarray':
+    """Get (N, 3) RGB colors of color temperatures in kelvin from the lookup table."""
+    return _kelvin_tables()[0][_kelvin_index(kelvin)]
+
+
+def color_temperature_lookup_xy(kelvin) -> 'numpy.ndarray':
+    """Get (N, 3) rows of x, y and brightness of color temperatures in kelvin from the lookup table."""
+    return _kelvin_tables()[1][_kelvin_index(kelvin)]
+
+
+def color_temperature_mired_lookup_rgb(mired) -> 'numpy.ndarray':
+    """Get (N, 3) RGB colors of color temperatures in mired from the lookup table."""
+    return color_temperature_lookup_rgb(color_temperature_mired_to_kelvin_batch(mired))
+
+
+def color_temperature_mired_lookup_xy(mired) -> 'numpy.ndarray':
+    """Get (N, 3) rows of x, y and brightness of color temperatures in mired from the lookup table."""
+    return color_temperature_lookup_xy(color_temperature_mired_to_kelvin_batch(mired))
+
+
+def color_temperature_to_xy(color_temperature_kelvin) -> Tuple[float, float, int]:
+    """Return the xy color and brightness of a color temperature in Kelvin."""
+    kelvin = min(max(int(round(color_temperature_kelvin)), LUT_MIN_KELVIN), LUT_MAX_KELVIN)
+    x, y, brightness = _kelvin_tables()[1][kelvin - LUT_MIN_KELVIN].tolist()
+    return x, y, int(brightness)
+
+
+def color_temperature_mired_to_kelvin_batch(mired) -> 'numpy.ndarray':
+    """Convert absolute mired shifts to degrees kelvin."""
+    import numpy as np
+    return 1000000 / np.asarray(mired, dtype=np.float64).reshape(-1)
+
+
+def color_temperature_kelvin_to_mired_batch(kelvin) -> 'numpy.ndarray':
+    """Convert degrees kelvin to mired shifts."""
+    import numpy as np
+    return 1000000 / np.asarray(kelvin, dtype=np.float64).reshape(-1)
+
+
+def _kelvin_index(kelvin) -> 'numpy.ndarray':
+    import numpy as np
+    kelvin = np.rint(np.asarray(kelvin, dtype=np.float64).reshape(-1)).astype(int)
+    return np.clip(kelvin, LUT_MIN_KELVIN, LUT_MAX_KELVIN) - LUT_MIN_KELVIN
+
+
+# Wide RGB D65 conversion matrices used by color_RGB_to_xy and
+# color_xy_brightness_to_RGB.
+_RGB_TO_XYZ = (
+    (0.664511, 0.154324, 0.162028),
+    (0.313881, 0.668433, 0.047685),
+    (0.000088, 0.072310, 0.986039),
+)
+_XYZ_TO_RGB = (
+    (1.656492, -0.354851, -0.255038),
+    (-0.707196, 1.655397, 0.036152),
+    (0.051713, -0.121364, 1.011530),
+)
+
+# Lookup tables for every kelvin from 1000K (1000 mired) to 10000K (100
+# mired). This covers the color temperatures of hue (2000K-6500K) and
+# lightify (1500K-6500K) lights with room to spare. They are built by the
+# first lookup.
+LUT_MIN_KELVIN = 1000
+LUT_MAX_KELVIN = 10000
+_KELVIN_TABLES = None
+
+
+def _kelvin_tables():
+    """Get the RGB and the xy/brightness lookup tables, building them on first use."""
+    global _KELVIN_TABLES
+    if _KELVIN_TABLES is None:
+        import numpy as np
+        kelvin_rgb = color_temperature_to_rgb_batch(np.arange(LUT_MIN_KELVIN, LUT_MAX_KELVIN + 1))
+        _KELVIN_TABLES = (kelvin_rgb, color_RGB_to_xy_batch(kelvin_rgb))
+    return _KELVIN_TABLES
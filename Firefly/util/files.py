@@ -0,0 +1,29 @@
+import json
+import os
+import tempfile
+
+
+def write_json_atomic(path: str, data, **kwargs) -> None:
+  """Write json to a file so the file is either the old or the new content, even if Firefly crashes while writing.
+
+  The json is written to a temp file in the same directory, flushed to disk and moved over the file.
+
+  Args:
+    path (str): file to write
+    data: data to dump
+    **kwargs: arguments for json.dump (for example indent=4, sort_keys=True)
+  """
+  directory = os.path.dirname(os.path.abspath(path))
+  fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.%s.' % os.path.basename(path), suffix='.tmp')
+  try:
+    with os.fdopen(fd, 'w') as temp_file:
+      json.dump(data, temp_file, **kwargs)
+      temp_file.flush()
+      os.fsync(temp_file.fileno())
+    os.replace(temp_path, path)
+  except BaseException:
+    try:
+      os.remove(temp_path)
+    except OSError:
+      pass
+    raise
@@ -0,0 +1,69 @@
+"""Benchmark for color conversions.
+
+Compares converting colors one at a time with the scalar functions in Firefly.util.color against the batched NumPy
+versions, and the color temperature formula against the kelvin lookup table. COLORS is about the number of
+conversions of a fade over a large home.
+
+Run from a Firefly working directory (needs dev_config/):
+  python -m benchmarks.bench_color
+"""
+import logging as python_logging
+import random
+import timeit
+
+import numpy as np
+
+from Firefly import logging
+from Firefly.util import color
+
+COLORS = 10000
+
+
+def timed(function) -> float:
+  return min(timeit.repeat(function, number=1, repeat=3)) * 1e3
+
+
+def main():
+  logging.logger.setLevel(python_logging.WARNING)
+  random.seed(1)
+  rgb = [(random.randrange(256), random.randrange(256), random.randrange(256)) for _ in range(COLORS)]
+  hsv = [color.color_RGB_to_hsv(*c) for c in rgb]
+  kelvin = [random.randrange(2000, 6501) for _ in range(COLORS)]
+  mired = [random.randrange(153, 501) for _ in range(COLORS)]
+  rgb_array = np.array(rgb)
+  hsv_array = np.array(hsv)
+
+  print('%d colors          scalar loop   batch' % COLORS)
+  print('  RGB to xy:        %8.2f ms %8.2f ms' % (timed(lambda: [color.color_RGB_to_xy(*c) for c in rgb]),
+                                                   timed(lambda: color.color_RGB_to_xy_batch(rgb_array))))
+  print('  RGB to hsv:       %8.2f ms %8.2f ms' % (timed(lambda: [color.color_RGB_to_hsv(*c) for c in rgb]),
+                                                   timed(lambda: color.color_RGB_to_hsv_batch(rgb_array))))
+  print('  hsv to RGB:       %8.2f ms %8.2f ms' % (timed(lambda: [color.color_hsv_to_RGB(*c) for c in hsv]),
+                                                   timed(lambda: color.color_hsv_to_RGB_batch(hsv_array))))
+
+  def formula(k):
+    t = k / 100.0
+    return color._get_red(t), color._get_green(t), color._get_blue(t)
+
+  print('  kelvin to RGB:    %8.2f ms %8.2f ms (formula)' % (timed(lambda: [formula(k) for k in kelvin]),
+                                                             timed(lambda: color.color_temperature_to_rgb_batch(kelvin))))
+  print('  kelvin to RGB:    %8.2f ms %8.2f ms (lookup table)' % (
+    timed(lambda: [color.color_temperature_to_rgb(k) for k in kelvin]),
+    timed(lambda: color.color_temperature_lookup_rgb(kelvin))))
+  print('  kelvin to xy:     %8.2f ms %8.2f ms (lookup table)' % (
+    timed(lambda: [color.color_RGB_to_xy(*map(int, formula(k))) for k in kelvin]),
+    timed(lambda: color.color_temperature_lookup_xy(kelvin))))
+  print('  mired to xy:      %8.2f ms %8.2f ms (lookup table)' % (
+    timed(lambda: [color.color_temperature_to_xy(color.color_temperature_mired_to_kelvin(m)) for m in mired]),
+    timed(lambda: color.color_temperature_mired_lookup_xy(mired))))
+
+  # One color at a time the scalar functions win, which is why they do not call the batched versions.
+  single = timeit.Timer(lambda: color.color_RGB_to_xy(10, 200, 30))
+  single_batch = timeit.Timer(lambda: color.color_RGB_to_xy_batch([(10, 200, 30)]))
+  print('one color')
+  print('  RGB to xy:        %8.2f us %8.2f us' % (min(single.repeat(number=1000, repeat=3)) * 1e3,
+                                                   min(single_batch.repeat(number=1000, repeat=3)) * 1e3))
+
+
+if __name__ == '__main__':
+  main()
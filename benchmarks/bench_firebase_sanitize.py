@@ -0,0 +1,114 @@
+"""Benchmark for sanitizing component values for firebase.
+
+Compares the previous pipeline (scrub with deepcopy at every level, a json round trip with four str.replace passes and
+check_all_keys) against the single pass sanitize(), and against SanitizeCache when only a few components changed. The
+data looks like get_all_request_values() of Z-Wave devices including ZWAVE_VALUES.
+
+Run from a Firefly working directory (needs dev_config/):
+  python -m benchmarks.bench_firebase_sanitize
+"""
+import copy
+import json
+import logging as python_logging
+import timeit
+
+from Firefly import logging
+from Firefly.services.firebase_sanitizer import SanitizeCache, sanitize
+
+DEVICES = 100
+ZWAVE_VALUES = 40
+CHANGED = 5
+
+FIREBASE_INVALID_CHARS = ['/', '\\', '$', '#']
+
+
+def scrub(x):
+  ret = copy.deepcopy(x)
+  if isinstance(x, dict):
+    for k, v in ret.items():
+      ret[k] = scrub(v)
+  if isinstance(x, (list, tuple)):
+    for k, v in enumerate(ret):
+      ret[k] = scrub(v)
+  if x is None:
+    ret = ''
+  return ret
+
+
+def check_all_keys(firebase_dict):
+  for key in firebase_dict:
+    for c in FIREBASE_INVALID_CHARS:
+      if c in key:
+        logging.critical('BAD KEY: %s' % key)
+    if type(firebase_dict[key]) is dict:
+      check_all_keys(firebase_dict[key])
+
+
+def legacy(all_values):
+  all_values = scrub(all_values)
+  all_values = json.dumps(all_values)
+  all_values = all_values.replace('null', '')
+  all_values = all_values.replace('#', '')
+  all_values = all_values.replace('$', '')
+  all_values = all_values.replace('/', '_-_')
+  all_values = json.loads(all_values)
+  check_all_keys(all_values)
+  return all_values
+
+
+class FakeDevice(object):
+  def __init__(self, index):
+    self.id = 'zwave_%d' % index
+    self.state_version = 0
+    self.index = index
+
+  def requests_tracked(self):
+    # The values only change with state_version.
+    return True
+
+  def get_all_request_values(self):
+    zwave_values = []
+    for i in range(ZWAVE_VALUES):
+      zwave_values.append({
+        'index':         i,
+        'label':         'Power Management/Battery #%d' % i if i % 10 == 0 else 'level %d' % i,
+        'ref':           72057594000000000 + i,
+        'value':         None if i % 7 == 0 else i * 1.5,
+        'command_class': 'COMMAND_CLASS_CONFIGURATION',
+        'type':          'Byte',
+        'genre':         'Config',
+      })
+    return {
+      'switch':       'on' if self.state_version % 2 else 'off',
+      'level':        100,
+      'battery':      None,
+      'alias':        'Device %d' % self.index,
+      'last_update':  'Sat Sep 2 12:00:00 2017',
+      'ZWAVE_VALUES': zwave_values,
+      'PARAMS':       {'%d' % i: {'value': i, 'label': 'param/%d' % i} for i in range(20)},
+    }
+
+
+def main():
+  logging.logger.setLevel(python_logging.WARNING)
+  devices = [FakeDevice(i) for i in range(DEVICES)]
+  cache = SanitizeCache()
+
+  def all_values():
+    return dict((d.id, d.get_all_request_values()) for d in devices)
+
+  def run_cached():
+    for d in devices[:CHANGED]:
+      d.state_version += 1
+    return dict((d.id, cache.get(d, d.get_all_request_values)) for d in devices)
+
+  build = min(timeit.repeat(all_values, number=1, repeat=3))
+  print('%d devices with %d ZWAVE_VALUES each (building the values: %.2f ms)' % (DEVICES, ZWAVE_VALUES, build * 1e3))
+  print('  previous pipeline: %.2f ms' % (min(timeit.repeat(lambda: legacy(all_values()), number=1, repeat=3)) * 1e3))
+  print('  sanitize:          %.2f ms' % (min(timeit.repeat(lambda: sanitize(all_values()), number=1, repeat=3)) * 1e3))
+  run_cached()
+  print('  cache, %d changed:  %.2f ms' % (CHANGED, min(timeit.repeat(run_cached, number=1, repeat=3)) * 1e3))
+
+
+if __name__ == '__main__':
+  main()
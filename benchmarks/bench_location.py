@@ -0,0 +1,66 @@
+"""Benchmark for checking automation conditions.
+
+Compares computing the solar events on every isDark / isLight access (the old Location) against the per-day solar
+events cache, by checking conditions the way automations do.
+
+Run from a Firefly working directory (needs dev_config/):
+  python -m benchmarks.bench_location
+"""
+import logging as python_logging
+import timeit
+from unittest.mock import MagicMock
+
+from astral import Location as AstralLocation
+
+from Firefly import logging
+from Firefly.helpers.conditions import Conditions
+from Firefly.helpers.location import Location
+
+CHECKS = 5000
+
+
+class BenchLocation(Location):
+  """Location without the config file and scheduler."""
+
+  def __init__(self):
+    self.modes = ['home', 'away']
+    self._mode = 'home'
+    self._last_mode = 'home'
+    self.geolocation = AstralLocation(('Chicago', 'USA', 41.85, -87.65, 'America/Chicago', 0))
+    self.geolocation.solar_depression = 'civil'
+    self._sun_cache = {}
+
+
+class LegacyLocation(BenchLocation):
+  """isDark before the solar events cache."""
+
+  @property
+  def isDark(self):
+    now = self.now
+    sun = self.geolocation.sun(date=now, local=True)
+    if now >= sun['sunset'] or now <= sun['sunrise']:
+      return True
+    return False
+
+
+def main():
+  logging.logger.setLevel(python_logging.WARNING)
+  conditions = [Conditions(is_dark=True), Conditions(is_light=True, is_mode=['home']), Conditions(is_mode=['away'])]
+  results = {}
+  for name, location in [('astral every check', LegacyLocation()), ('cached per day', BenchLocation())]:
+    firefly = MagicMock()
+    firefly.location = location
+
+    def run():
+      for _ in range(CHECKS):
+        for c in conditions:
+          c.check_conditions(firefly)
+
+    results[name] = min(timeit.repeat(run, number=1, repeat=3))
+    print('%s: %.2f us/check  %.0f checks/s' % (name, results[name] / CHECKS / len(conditions) * 1e6,
+                                                CHECKS * len(conditions) / results[name]))
+  print('speedup: %.1fx' % (results['astral every check'] / results['cached per day']))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,72 @@
+"""Benchmark for FireflyLogging calls.
+
+Compares the previous FireflyLogging (inspect.currentframe and padding before the level check) against the current one,
+for a disabled level and an enabled level writing to a file, with and without the queue listener.
+
+Run from a Firefly working directory (needs dev_config/):
+  python -m benchmarks.bench_logging
+"""
+import inspect
+import logging as python_logging
+import os
+import tempfile
+import timeit
+
+from Firefly import logging
+
+CALLS = 20000
+
+
+class LegacyLogging(object):
+  """FireflyLogging.debug before the level check and lazy formatting."""
+
+  def __init__(self, logger):
+    self.logger = logger
+
+  def debug(self, message):
+    func = inspect.currentframe().f_back.f_code
+    function_name = func.co_name
+    file_name = os.path.basename(func.co_filename)
+    self.logger.debug('%-130s [%s - %s]' % (message, function_name, file_name))
+
+
+def per_call(function) -> float:
+  return min(timeit.repeat(function, number=1, repeat=3)) / CALLS * 1e6
+
+
+def main():
+  logger = logging.logger
+  for handler in list(logger.handlers):
+    logger.removeHandler(handler)
+  logger.propagate = False
+  legacy = LegacyLogging(logger)
+  event = {'switch': 'on', 'level': 100}
+
+  def run_legacy():
+    for _ in range(CALLS):
+      legacy.debug('Received event: %s' % event)
+
+  def run_current():
+    for _ in range(CALLS):
+      logging.debug('Received event: %s', event)
+
+  with tempfile.TemporaryDirectory() as log_dir:
+    logger.addHandler(python_logging.FileHandler(os.path.join(log_dir, 'bench.log')))
+
+    logger.setLevel(python_logging.INFO)
+    print('debug disabled')
+    print('  previous: %.2f us/call' % per_call(run_legacy))
+    print('  current:  %.2f us/call' % per_call(run_current))
+
+    logger.setLevel(python_logging.DEBUG)
+    print('debug enabled, file handler')
+    print('  previous: %.2f us/call' % per_call(run_legacy))
+    print('  current:  %.2f us/call' % per_call(run_current))
+
+    logging.start_queue()
+    print('  current with queue listener: %.2f us/call' % per_call(run_current))
+    logging.stop_queue()
+
+
+if __name__ == '__main__':
+  main()
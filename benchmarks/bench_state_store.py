@@ -0,0 +1,84 @@
+"""Benchmark for exporting and importing component state.
+
+Compares the previous export (json.dump of every component to the config file) against StateStore.save, which only
+writes the components that changed, for 2000 devices where 10 changed. Also compares loading the config file against
+StateStore.load, which startup restores from unless the config file was edited.
+
+Run from a Firefly working directory (needs dev_config/):
+  python -m benchmarks.bench_state_store
+"""
+import json
+import logging as python_logging
+import os
+import tempfile
+import timeit
+
+from Firefly import logging
+from Firefly.helpers.state_store import StateStore
+from Firefly.util.files import write_json_atomic
+
+DEVICES = 2000
+CHANGED = 10
+TYPE_DEVICE = 'DEVICE'
+
+
+def make_devices(version=0):
+  devices = []
+  for i in range(DEVICES):
+    devices.append({
+      'ff_id':    'device_%d' % i,
+      'alias':    'Device %d' % i,
+      'package':  'Firefly.components.zwave.zwave_generic_devices.switch',
+      'node_id':  i,
+      'security': False,
+      'current_values': {
+        'switch': 'on' if (i < CHANGED and version % 2) else 'off',
+        'level':  100,
+        'last_update': 'Sat Sep 2 12:00:00 2017',
+      },
+      'tags': ['light', 'switch'],
+    })
+  return devices
+
+
+def legacy_export(config_file, components):
+  with open(config_file, 'w') as file:
+    json.dump(components, file, indent=4, sort_keys=True)
+
+
+def main():
+  logging.logger.setLevel(python_logging.WARNING)
+  with tempfile.TemporaryDirectory() as directory:
+    config_file = os.path.join(directory, 'devices.json')
+    store = StateStore(os.path.join(directory, 'state.db'))
+    store.save(TYPE_DEVICE, make_devices())
+    write_json_atomic(config_file, make_devices(), indent=4, sort_keys=True)
+    versions = iter(range(1, 100))
+
+    def run_legacy():
+      legacy_export(config_file, make_devices(next(versions)))
+
+    def run_store():
+      store.save(TYPE_DEVICE, make_devices(next(versions)))
+
+    def run_unchanged():
+      store.save(TYPE_DEVICE, make_devices(0))
+
+    print('export %d devices, %d changed' % (DEVICES, CHANGED))
+    print('  previous json.dump: %.2f ms' % (min(timeit.repeat(run_legacy, number=1, repeat=3)) * 1e3))
+    print('  state store:        %.2f ms' % (min(timeit.repeat(run_store, number=1, repeat=3)) * 1e3))
+    store.save(TYPE_DEVICE, make_devices(0))
+    print('  state store, none changed: %.2f ms' % (min(timeit.repeat(run_unchanged, number=1, repeat=3)) * 1e3))
+
+    def load_json():
+      with open(config_file) as file:
+        json.loads(file.read())
+
+    print('import %d devices' % DEVICES)
+    print('  config file: %.2f ms' % (min(timeit.repeat(load_json, number=1, repeat=3)) * 1e3))
+    print('  state store: %.2f ms' % (min(timeit.repeat(lambda: store.load(TYPE_DEVICE), number=1, repeat=3)) * 1e3))
+    store.close()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,106 @@
+"""Micro-benchmark for Subscriptions.get_subscribers.
+
+Compares the compiled subscription index against the previous implementation that rebuilt sets from the nested
+subscription dict on every event.
+
+Run from a Firefly working directory (needs dev_config/):
+  python -m benchmarks.bench_subscribers
+"""
+import random
+import timeit
+
+from Firefly.const import EVENT_ACTION_ANY
+from Firefly.helpers.subscribers import Subscriptions, verify_event_action
+
+DEVICES = 300
+AUTOMATIONS = 500
+EVENTS = 20000
+PROPS = ['switch', 'motion', 'battery', 'temperature', 'luminance', 'power', 'level']
+VALUES = {
+  'switch':      ['on', 'off'],
+  'motion':      ['active', 'inactive'],
+  'battery':     list(range(0, 101)),
+  'temperature': list(range(50, 90)),
+  'luminance':   list(range(0, 200)),
+  'power':       [round(random.random() * 100, 2) for _ in range(50)],
+  'level':       list(range(0, 101))
+}
+
+
+def legacy_get_subscribers(subscriptions: dict, subscribe_to_id: str, event_action: dict) -> list:
+  """get_subscribers as it was before the compiled index (logging removed)."""
+  _event_action = event_action.copy()
+  _event_action = verify_event_action(_event_action, get_subscribers=True)
+  try:
+    subscriptions = subscriptions[subscribe_to_id]
+  except KeyError:
+    return []
+  try:
+    subscribers_any = set(subscriptions[EVENT_ACTION_ANY][EVENT_ACTION_ANY])
+  except:
+    subscribers_any = set()
+  subscribers_prop_any = set()
+  subscribers = set()
+  for ea in _event_action:
+    if type(ea) is not dict:
+      continue
+    for prop, act in ea.items():
+      try:
+        subscribers_prop_any.update(subscriptions[prop][EVENT_ACTION_ANY])
+      except:
+        pass
+      for a in act:
+        try:
+          subscribers.update(subscriptions[prop][a])
+        except:
+          pass
+  subscribers.update(subscribers_any, subscribers_prop_any)
+  return list(subscribers)
+
+
+def build(seed: int = 1):
+  rnd = random.Random(seed)
+  s = Subscriptions()
+  devices = ['zwave_%d' % i for i in range(DEVICES)]
+  for a in range(AUTOMATIONS):
+    for device in rnd.sample(devices, 4):
+      kind = rnd.random()
+      prop = rnd.choice(PROPS)
+      if kind < 0.2:
+        s.add_subscriber('automation_%d' % a, device)
+      elif kind < 0.5:
+        s.add_subscriber('automation_%d' % a, device, {prop: [EVENT_ACTION_ANY]})
+      else:
+        s.add_subscriber('automation_%d' % a, device, {prop: [rnd.choice(VALUES[prop])]})
+  events = []
+  for _ in range(EVENTS):
+    prop = rnd.choice(PROPS)
+    events.append((rnd.choice(devices), {prop: rnd.choice(VALUES[prop])}))
+  return s, events
+
+
+def main():
+  s, events = build()
+  subscriptions = s.subscriptions
+
+  for source, event_action in events:
+    assert set(s.get_subscribers(source, event_action)) == set(legacy_get_subscribers(subscriptions, source, event_action))
+
+  def run_legacy():
+    for source, event_action in events:
+      legacy_get_subscribers(subscriptions, source, event_action)
+
+  def run_indexed():
+    for source, event_action in events:
+      s.get_subscribers(source, event_action)
+
+  legacy = min(timeit.repeat(run_legacy, number=1, repeat=5))
+  indexed = min(timeit.repeat(run_indexed, number=1, repeat=5))
+  print('events: %d devices: %d automations: %d' % (EVENTS, DEVICES, AUTOMATIONS))
+  print('legacy:  %.2f us/event' % (legacy / EVENTS * 1e6))
+  print('indexed: %.2f us/event' % (indexed / EVENTS * 1e6))
+  print('speedup: %.1fx' % (legacy / indexed))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,86 @@
+"""Benchmark for broadcasting device changes.
+
+Compares taking a full before/after snapshot of every request (the old Device.command) against the tracked state used
+now, for devices with many requests where a command changes one value.
+
+Run from a Firefly working directory (needs dev_config/):
+  python -m benchmarks.bench_tracked_state
+"""
+import logging as python_logging
+import timeit
+from unittest.mock import MagicMock
+
+from Firefly import logging
+from Firefly.helpers.device.device import Device
+from Firefly.helpers.events import Command
+
+COMMANDS = 5000
+
+
+class ManyRequestDevice(Device):
+  def __init__(self, firefly, requests: int):
+    initial_values = {'_value_%d' % i: float(i) for i in range(requests)}
+    super().__init__(firefly, 'bench.device', 'Bench Device', 'bench', [], [], 'sensor',
+                     initial_values=initial_values, ff_id='bench_%d' % requests, alias='bench %d' % requests)
+    self.add_command('update', self.update)
+    for i in range(requests):
+      self.add_request('value_%d' % i, self.make_request('_value_%d' % i))
+
+  def make_request(self, attr):
+    # Generated getters read state through a closure, so they are evaluated on every broadcast.
+    return lambda **kwargs: getattr(self, attr)
+
+  def update(self, index=0, value=0.0, **kwargs):
+    self.__setattr__('_value_%d' % index, value)
+
+
+class TrackedDevice(ManyRequestDevice):
+  """Same device with plain attribute getters, like the device types in Firefly/helpers/device_types."""
+
+  def make_request(self, attr):
+    code = 'def get(self, **kwargs):\n  return self.%s' % attr
+    namespace = {}
+    exec(code, namespace)
+    return namespace['get'].__get__(self)
+
+
+class LegacyDevice(TrackedDevice):
+  """Device.command before tracked state."""
+
+  def command(self, command: Command) -> bool:
+    state_before = self.get_all_request_values(True)
+    logging.debug('%s: Got Command: %s' % (self.id, command.command))
+    if command.command in self.command_map.keys():
+      self._last_command_source = command.source
+      self._last_update_time = self.firefly.location.now
+      try:
+        self.command_map[command.command](**command.args)
+      except:
+        return False
+      state_after = self.get_all_request_values(True)
+      self.broadcast_changes(state_before, state_after)
+      return True
+    return False
+
+
+def main():
+  logging.logger.setLevel(python_logging.WARNING)
+  firefly = MagicMock()
+  firefly.components = {}
+  for requests in [10, 50, 200]:
+    commands = [Command('bench', 'bench', 'update', index=i % requests, value=float(i)) for i in range(COMMANDS)]
+    legacy_device = LegacyDevice(firefly, requests)
+    untracked_device = ManyRequestDevice(firefly, requests)
+    tracked_device = TrackedDevice(firefly, requests)
+
+    legacy = min(timeit.repeat(lambda: [legacy_device.command(c) for c in commands], number=1, repeat=3))
+    untracked = min(timeit.repeat(lambda: [untracked_device.command(c) for c in commands], number=1, repeat=3))
+    tracked = min(timeit.repeat(lambda: [tracked_device.command(c) for c in commands], number=1, repeat=3))
+    print('requests: %d' % requests)
+    print('  before/after snapshot: %.2f us/command' % (legacy / COMMANDS * 1e6))
+    print('  untracked getters:     %.2f us/command' % (untracked / COMMANDS * 1e6))
+    print('  tracked getters:       %.2f us/command' % (tracked / COMMANDS * 1e6))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,131 @@
+"""Benchmark for checking automation triggers.
+
+Builds 500 automations with 2,000 trigger sets and routes a stream of device events to the automations subscribed to
+the event source. Compares the previous linear scan of every TriggerSet and Trigger against the (source, property)
+index and compiled triggers.
+
+Run from a Firefly working directory (needs dev_config/):
+  python -m benchmarks.bench_triggers
+"""
+import logging as python_logging
+import random
+import timeit
+from unittest.mock import MagicMock
+
+from Firefly import logging
+from Firefly.automation.triggers import Trigger, Triggers
+from Firefly.const import EVENT_ACTION_ANY, EVENT_TYPE_BROADCAST, TIME
+from Firefly.helpers.events import Event
+from Firefly.helpers.subscribers import Subscriptions
+
+AUTOMATIONS = 500
+TRIGGER_SETS_PER_AUTOMATION = 4
+DEVICES = 300
+EVENTS = 5000
+PROPS = {
+  'switch':      ['on', 'off'],
+  'motion':      ['active', 'inactive'],
+  'contact':     ['open', 'closed'],
+  'temperature': list(range(50, 90)),
+  'battery':     list(range(0, 101)),
+  'luminance':   list(range(0, 200))
+}
+
+
+def legacy_check_triggers(triggers: Triggers, event: Event) -> bool:
+  """TriggerList.check_triggers before the index and compiled triggers."""
+  for trigger_set in triggers.trigger_list:
+    if event.source not in trigger_set.trigger_sources:
+      continue
+    for trigger in trigger_set.trigger_set:
+      try:
+        if not trigger.check_trigger(trigger_set.firefly, event):
+          break
+      except Exception:
+        break
+    else:
+      return True
+  return False
+
+
+def random_trigger(rnd: random.Random, devices: list) -> Trigger:
+  kind = rnd.random()
+  device = rnd.choice(devices)
+  if kind < 0.1:
+    return Trigger(TIME, [{'hour': rnd.randint(0, 23), 'minute': rnd.randint(0, 59), 'weekdays': [1, 2, 3, 4, 5]}])
+  if kind < 0.3:
+    return Trigger(device, {'temperature': [{'gt': rnd.randint(60, 80)}]})
+  if kind < 0.4:
+    return Trigger(device, {rnd.choice(list(PROPS)): [EVENT_ACTION_ANY]})
+  prop = rnd.choice(['switch', 'motion', 'contact'])
+  return Trigger(device, {prop: [rnd.choice(PROPS[prop])]})
+
+
+def build(seed: int = 1):
+  rnd = random.Random(seed)
+  firefly = MagicMock()
+  firefly.subscriptions = Subscriptions()
+  devices = ['device_%d' % i for i in range(DEVICES)]
+  firefly.current_state = {d: {p: rnd.choice(v) for p, v in PROPS.items()} for d in devices}
+
+  automations = {}
+  for a in range(AUTOMATIONS):
+    triggers = Triggers(firefly, 'automation_%d' % a)
+    for _ in range(TRIGGER_SETS_PER_AUTOMATION):
+      trigger_set = [random_trigger(rnd, devices)]
+      if rnd.random() < 0.3:
+        trigger_set.append(random_trigger(rnd, devices))
+      triggers.add_trigger(trigger_set)
+    automations['automation_%d' % a] = triggers
+
+  events = []
+  for _ in range(EVENTS):
+    prop = rnd.choice(list(PROPS))
+    events.append(Event(rnd.choice(devices), EVENT_TYPE_BROADCAST, {prop: rnd.choice(PROPS[prop])}))
+  return firefly, automations, events
+
+
+def main():
+  logging.logger.setLevel(python_logging.WARNING)
+  firefly, automations, events = build()
+  trigger_sets = sum(len(t.trigger_list) for t in automations.values())
+  routed = [(event, [automations[s] for s in firefly.subscriptions.get_subscribers(event.source, event.event_action)])
+            for event in events]
+
+  for event, subscribers in routed:
+    for triggers in subscribers:
+      assert triggers.check_triggers(event) == legacy_check_triggers(triggers, event)
+
+  def run_legacy():
+    for event, subscribers in routed:
+      for triggers in subscribers:
+        legacy_check_triggers(triggers, event)
+
+  def run_indexed():
+    for event, subscribers in routed:
+      for triggers in subscribers:
+        triggers.check_triggers(event)
+
+  def run_legacy_all():
+    for event in events:
+      for triggers in automations.values():
+        legacy_check_triggers(triggers, event)
+
+  def run_indexed_all():
+    for event in events:
+      for triggers in automations.values():
+        triggers.check_triggers(event)
+
+  print('automations: %d trigger sets: %d events: %d' % (len(automations), trigger_sets, EVENTS))
+  for name, legacy_run, indexed_run in [('routed to subscribers', run_legacy, run_indexed),
+                                        ('checked by every automation', run_legacy_all, run_indexed_all)]:
+    legacy = min(timeit.repeat(legacy_run, number=1, repeat=3))
+    indexed = min(timeit.repeat(indexed_run, number=1, repeat=3))
+    print(name)
+    print('  linear scan: %.2f us/event' % (legacy / EVENTS * 1e6))
+    print('  indexed:     %.2f us/event' % (indexed / EVENTS * 1e6))
+    print('  speedup:     %.1fx' % (legacy / indexed))
+
+
+if __name__ == '__main__':
+  main()
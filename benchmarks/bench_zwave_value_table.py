@@ -0,0 +1,149 @@
+"""Benchmark for the memory and export cost of Z-Wave values.
+
+Builds the values of a synthetic 200 node network (100 values per node, five device models) the way
+update_from_zwave does, with the previous ZwavePrarmValue (one __dict__ and its own label, type and genre strings per
+value) and with ZwaveValueTable. Each variant is built in a fresh interpreter so the RSS growth can be compared, and
+tracemalloc reports the bytes allocated for the values. Also times the ZWAVE_VALUES export of every device (previous:
+the __dict__ of each value, now: rows and columns) dumped to json, and the size of the json.
+
+Run from a Firefly working directory (needs dev_config/):
+  python -m benchmarks.bench_zwave_value_table
+"""
+import gc
+import json
+import subprocess
+import sys
+import timeit
+import tracemalloc
+
+from Firefly.components.zwave.value_table import ZwaveValueTable
+from Firefly.util.zwave_command_class import COMMAND_CLASS_DESC
+
+NODES = 200
+VALUES = 100
+MODELS = 5
+
+COMMAND_CLASSES = [0x25, 0x26, 0x31, 0x32, 0x70, 0x71, 0x80, 0x84, 0x86]
+TYPES = ['Bool', 'Byte', 'Decimal', 'Int', 'List', 'Short']
+GENRES = ['Basic', 'Config', 'System', 'User']
+
+
+class LegacyValue(object):
+  """ZwavePrarmValue before it was slotted."""
+
+  def __init__(self, index=None, label=None, ref=None, value=None, command_class=None, value_type=None, genre=None):
+    self.index = index
+    try:
+      self.label = self.label.lower()
+    except:
+      self.label = label
+    self.ref = ref
+    self.value = value
+    try:
+      self.command_class = COMMAND_CLASS_DESC[command_class]
+    except:
+      self.command_class = command_class
+    self.type = value_type
+    self.genre = genre
+
+
+def fresh(name):
+  # openzwave hands out a new string object for every value it reads.
+  return ''.join(list(name))
+
+
+def node_values(node_id):
+  """(value_id, index, label, data, command_class, type, genre) of a node as openzwave reports them."""
+  model = node_id % MODELS
+  values = []
+  for i in range(VALUES):
+    values.append((72057594000000000 + node_id * 1000 + i, i, fresh('Model %d Parameter %d Setting' % (model, i)),
+                   i * 1.5, COMMAND_CLASSES[i % len(COMMAND_CLASSES)], fresh(TYPES[i % len(TYPES)]),
+                   fresh(GENRES[i % len(GENRES)])))
+  return values
+
+
+def build_legacy():
+  devices = []
+  for node_id in range(NODES):
+    values = {}
+    for value_id, index, label, data, command_class, value_type, genre in node_values(node_id):
+      values[index] = LegacyValue(index, label, value_id, data, command_class, value_type, genre)
+    devices.append(values)
+  return devices
+
+
+def build_table():
+  devices = []
+  for node_id in range(NODES):
+    table = ZwaveValueTable()
+    for value_id, index, label, data, command_class, value_type, genre in node_values(node_id):
+      table.set(index, label, value_id, data, command_class, value_type, genre)
+    devices.append(table)
+  return devices
+
+
+VARIANTS = {'legacy': build_legacy, 'table': build_table}
+
+
+def rss_kb() -> int:
+  with open('/proc/self/status') as f:
+    for line in f:
+      if line.startswith('VmRSS:'):
+        return int(line.split()[1])
+  return 0
+
+
+def measure(variant):
+  """Run in a fresh interpreter: print the RSS growth and the bytes still allocated after building a variant."""
+  gc.collect()
+  before = rss_kb()
+  devices = VARIANTS[variant]()
+  gc.collect()
+  rss = rss_kb() - before
+  del devices
+  gc.collect()
+  # Traced separately, tracemalloc's own bookkeeping would count towards the RSS.
+  tracemalloc.start()
+  devices = VARIANTS[variant]()
+  allocated = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  print(json.dumps({'rss_kb': rss, 'allocated': allocated, 'devices': len(devices)}))
+
+
+def run_measure(variant) -> dict:
+  output = subprocess.check_output([sys.executable, '-m', 'benchmarks.bench_zwave_value_table', variant])
+  return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+  print('%d nodes, %d values per node' % (NODES, VALUES))
+  for variant, title in [('legacy', 'previous ZwavePrarmValue'), ('table', 'ZwaveValueTable')]:
+    result = run_measure(variant)
+    print('  %-25s RSS +%6.1f MB, allocated %6.1f MB' % (title, result['rss_kb'] / 1024,
+                                                          result['allocated'] / 1024 / 1024))
+
+  legacy = build_legacy()
+  tables = build_table()
+
+  def export_legacy():
+    return [[value.__dict__ for value in values.values()] for values in legacy]
+
+  def export_rows():
+    return [table.rows() for table in tables]
+
+  def export_columns():
+    return [table.columns() for table in tables]
+
+  print('export ZWAVE_VALUES of every device and dump it to json')
+  for title, export in [('previous __dict__', export_legacy), ('rows', export_rows), ('columns', export_columns)]:
+    export_time = min(timeit.repeat(lambda: json.dumps(export()), number=1, repeat=5))
+    size = len(json.dumps(export()))
+    print('  %-18s %7.2f ms, json %6.1f KB' % (title, export_time * 1e3, size / 1024))
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    measure(sys.argv[1])
+  else:
+    main()
@@ -0,0 +1,164 @@
+"""Benchmark for handling Z-Wave value notifications.
+
+Replays value notifications recorded from metering switches (power reports every few seconds with the occasional switch
+flip) through the previous value_handler (two message-level logs of the notification, a ZWAVE_UPDATE Command and the
+label matching in update_from_zwave) and through the ValueRouter. Both paths run device.command / apply_zwave_value
+inline, so the executor hop the Command path also takes is not counted.
+
+Run from a Firefly working directory (needs dev_config/):
+  python -m benchmarks.bench_zwave_values
+"""
+import logging as python_logging
+import timeit
+
+from Firefly import logging
+from Firefly.components.zwave.value_router import ValueRouter
+from Firefly.helpers.device_types.switch import Switch
+from Firefly.helpers.events import Command
+
+COMMAND_CLASS_SWITCH_BINARY = 37
+COMMAND_CLASS_METER = 50
+
+# (node_id, value_id, label, command_class, data)
+RECORDED = [
+  (4, 72057594109853697, 'Power', COMMAND_CLASS_METER, 61.2),
+  (4, 72057594109853698, 'Voltage', COMMAND_CLASS_METER, 121.4),
+  (4, 72057594109853699, 'Current', COMMAND_CLASS_METER, 0.51),
+  (7, 72057594160185345, 'Power', COMMAND_CLASS_METER, 3.1),
+  (4, 72057594109853697, 'Power', COMMAND_CLASS_METER, 60.9),
+  (9, 72057594193739777, 'Switch', COMMAND_CLASS_SWITCH_BINARY, True),
+  (9, 72057594193739778, 'Power', COMMAND_CLASS_METER, 412.0),
+  (4, 72057594109853700, 'Energy', COMMAND_CLASS_METER, 18.73),
+  (7, 72057594160185345, 'Power', COMMAND_CLASS_METER, 3.0),
+  (9, 72057594193739778, 'Power', COMMAND_CLASS_METER, 418.5),
+  (4, 72057594109853697, 'Power', COMMAND_CLASS_METER, 61.0),
+  (9, 72057594193739777, 'Switch', COMMAND_CLASS_SWITCH_BINARY, False),
+  (9, 72057594193739778, 'Power', COMMAND_CLASS_METER, 0.0),
+  (7, 72057594160185346, 'Previous Reading', COMMAND_CLASS_METER, 2.2),
+]
+REPLAYS = 200
+
+VALUE_ROUTES = {
+  'Switch':           'switch',
+  'Energy':           'current_energy_reading',
+  'Previous Reading': 'previous_energy_reading',
+  'Power':            'watts',
+  'Voltage':          'voltage',
+  'Current':          'power_current',
+}
+
+
+class Value(object):
+  def __init__(self, node_id, value_id, label, command_class, data):
+    self.node_id = node_id
+    self.value_id = value_id
+    self.label = label
+    self.command_class = command_class
+    self.data = data
+
+  def to_dict(self):
+    return dict(self.__dict__)
+
+
+class Node(object):
+  def __init__(self, node_id):
+    self.node_id = node_id
+
+
+class Location(object):
+  now = None
+
+
+class BenchFirefly(object):
+  """Only what the devices use. Events are dropped so the time spent is in handling the values."""
+
+  def __init__(self):
+    self.components = {}
+    self.location = Location()
+
+  def send_event(self, event):
+    pass
+
+
+class BenchSwitch(Switch):
+  """The parts of ZwaveSwitch and ZwaveDevice used by the two paths."""
+
+  def __init__(self, firefly, node_id):
+    super().__init__(firefly, 'bench.zwave', 'Bench Switch', 'bench', capabilities={'power_meter': True},
+                     ff_id='zwave_%d' % node_id, alias='zwave %d' % node_id)
+    self.value_map = {}
+    self.add_command('ZWAVE_UPDATE', self.update_from_zwave)
+
+  def update_from_zwave(self, node=None, ignore_update=False, values=None, values_only=False, **kwargs):
+    label = values.label
+    if label == 'Switch':
+      self.update_values(switch=values.data)
+      self.value_map[values.label] = values.value_id
+    elif label == 'Battery Level':
+      self.update_values(battery=values.data)
+      self.value_map[values.label] = values.value_id
+    elif values.command_class == COMMAND_CLASS_METER:
+      self.value_map[values.label] = values.value_id
+      if label == 'Energy':
+        self.update_values(current_energy_reading=values.data)
+      if label == 'Previous Reading':
+        self.update_values(previous_energy_reading=values.data)
+      if label == 'Power':
+        self.update_values(watts=values.data)
+      if label == 'Voltage':
+        self.update_values(voltage=values.data)
+      if label == 'Current':
+        self.update_values(power_current=values.data)
+
+  def value_routes(self):
+    return VALUE_ROUTES
+
+  def apply_zwave_value(self, handler, value):
+    self.start_tracking()
+    self._last_command_source = 'service_zwave'
+    self._last_update_time = self.firefly.location.now
+    handler(value)
+    self.broadcast_tracked_changes()
+
+
+def main():
+  logging.logger.setLevel(python_logging.WARNING)
+  firefly = BenchFirefly()
+  nodes = {}
+  for node_id in set(r[0] for r in RECORDED):
+    device = BenchSwitch(firefly, node_id)
+    firefly.components[device.id] = device
+    nodes[node_id] = Node(node_id)
+  notifications = [Value(*r) for r in RECORDED] * REPLAYS
+
+  def legacy(value):
+    kwargs = {'network': None, 'node': nodes[value.node_id], 'value': value}
+    logging.message('ZWAVE VALUE HANDLER: %s' % str(kwargs))
+    logging.message('ZWAVE VALUE HANDLER: %s' % str(kwargs['value'].to_dict()))
+    node = kwargs['node']
+    command = Command('zwave_%d' % node.node_id, 'service_zwave', 'ZWAVE_UPDATE', node=node, values=value,
+                      values_only=True)
+    firefly.components[command.device].command(command)
+
+  # The legacy replay fills in value_map, which the router learns from.
+  for value in notifications[:len(RECORDED)]:
+    legacy(value)
+  router = ValueRouter(firefly.components)
+  for node_id in nodes:
+    router.learn(node_id, firefly.components['zwave_%d' % node_id])
+
+  def routed(value):
+    logging.debug('ZWAVE VALUE HANDLER: %s', value)
+    if not router.route(value.node_id, value):
+      raise RuntimeError('value was not routed')
+
+  count = len(notifications)
+  legacy_time = min(timeit.repeat(lambda: [legacy(v) for v in notifications], number=1, repeat=3))
+  routed_time = min(timeit.repeat(lambda: [routed(v) for v in notifications], number=1, repeat=3))
+  print('%d recorded notifications replayed %d times (%d routes)' % (len(RECORDED), REPLAYS, len(router)))
+  print('  command path: %.2f us/value' % (legacy_time / count * 1e6))
+  print('  value router: %.2f us/value' % (routed_time / count * 1e6))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,65 @@
+import random
+import unittest
+
+from Firefly.util import color
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestBatchConversions(unittest.TestCase):
+  def setUp(self):
+    random.seed(3)
+    self.rgb = [(random.randrange(256), random.randrange(256), random.randrange(256)) for _ in range(200)]
+    self.rgb += [(0, 0, 0), (255, 255, 255), (255, 0, 0)]
+
+  def test_rgb_to_xy(self):
+    batch = color.color_RGB_to_xy_batch(self.rgb)
+    for rgb, row in zip(self.rgb, batch):
+      self.assertEqual(tuple(row), color.color_RGB_to_xy(*rgb))
+
+  def test_xy_to_rgb(self):
+    xyb = [color.color_RGB_to_xy(*rgb) for rgb in self.rgb]
+    batch = color.color_xy_brightness_to_RGB_batch(xyb)
+    for row, result in zip(xyb, batch):
+      self.assertEqual(tuple(result), color.color_xy_brightness_to_RGB(*row))
+
+  def test_hsv(self):
+    hsv = color.color_RGB_to_hsv_batch(self.rgb)
+    for rgb, row in zip(self.rgb, hsv):
+      self.assertEqual(tuple(row), color.color_RGB_to_hsv(*rgb))
+    rgb = color.color_hsv_to_RGB_batch(hsv)
+    for row, result in zip(hsv, rgb):
+      self.assertEqual(tuple(result), color.color_hsv_to_RGB(*row))
+
+  def test_color_temperature(self):
+    kelvin = [500, 1000, 1900, 2700, 6500, 6600, 12000, 50000]
+    batch = color.color_temperature_to_rgb_batch(kelvin)
+    for k, row in zip(kelvin, batch):
+      temperature = min(max(k, 1000), 40000) / 100.0
+      expected = (color._get_red(temperature), color._get_green(temperature), color._get_blue(temperature))
+      for value, expected_value in zip(row, expected):
+        self.assertAlmostEqual(value, expected_value)
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestLookupTables(unittest.TestCase):
+  def test_rgb(self):
+    for kelvin in [1000, 2000, 2700, 4000, 6500, 10000]:
+      for value, expected in zip(color.color_temperature_lookup_rgb([kelvin])[0], color.color_temperature_to_rgb(kelvin)):
+        self.assertAlmostEqual(value, expected)
+    self.assertEqual(color.color_temperature_to_rgb(6600), (255, 255, 255))
+
+  def test_xy(self):
+    expected = tuple(color.color_RGB_to_xy_batch(color.color_temperature_lookup_rgb([2700]))[0])
+    self.assertEqual(tuple(color.color_temperature_lookup_xy([2700])[0]), expected)
+    self.assertEqual(color.color_temperature_to_xy(2700.2), expected)
+
+  def test_mired(self):
+    self.assertEqual(color.color_temperature_mired_lookup_xy([370]).tolist(),
+                     color.color_temperature_lookup_xy([1000000 / 370]).tolist())
+    self.assertEqual(color.color_temperature_kelvin_to_mired_batch([2000, 6500]).tolist(),
+                     [color.color_temperature_kelvin_to_mired(2000), color.color_temperature_kelvin_to_mired(6500)])
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from Firefly.const import EXECUTION_ASYNC, EXECUTION_BLOCKING, EXECUTION_CHEAP
+from Firefly.helpers.command_executor import CommandExecutor
+from Firefly.helpers.events import Command
+
+
+class FakeComponent(object):
+  def __init__(self, policy, delay=0.0, max_concurrency=1):
+    self.execution_policy = policy
+    self.max_concurrency = max_concurrency
+    self.delay = delay
+    self.commands = []
+    self.threads = set()
+    self.running = 0
+    self.max_running = 0
+    self.lock = threading.Lock()
+
+  def command(self, command):
+    with self.lock:
+      self.running += 1
+      self.max_running = max(self.max_running, self.running)
+    self.threads.add(threading.get_ident())
+    time.sleep(self.delay)
+    self.commands.append(command.command)
+    with self.lock:
+      self.running -= 1
+    return command.command
+
+
+class FakeAsyncComponent(object):
+  execution_policy = EXECUTION_ASYNC
+
+  def __init__(self):
+    self.commands = []
+
+  @asyncio.coroutine
+  def command(self, command):
+    yield from asyncio.sleep(0)
+    self.commands.append(command.command)
+    return command.command
+
+
+class TestCommandExecutor(unittest.TestCase):
+  @patch('Firefly.core.Firefly')
+  def setUp(self, firefly):
+    self.firefly = firefly
+    self.firefly.components = {}
+    self.loop = asyncio.new_event_loop()
+    self.executor = ThreadPoolExecutor(max_workers=8)
+    self.commands = CommandExecutor(self.firefly, self.loop, self.executor)
+
+  def tearDown(self):
+    self.loop.close()
+    self.executor.shutdown()
+
+  def add(self, ff_id, component):
+    self.firefly.components[ff_id] = component
+    return component
+
+  def run_until(self, condition):
+    @asyncio.coroutine
+    def wait():
+      for _ in range(500):
+        if condition():
+          return
+        yield from asyncio.sleep(0.01, loop=self.loop)
+
+    self.loop.run_until_complete(wait())
+
+  def test_cheap_runs_inline(self):
+    device = self.add('cheap', FakeComponent(EXECUTION_CHEAP))
+    self.assertEqual(self.commands.submit(Command('cheap', 'test', 'on')), 'on')
+    self.assertSetEqual(device.threads, {threading.get_ident()})
+
+  def test_blocking_inline_when_loop_not_running(self):
+    device = self.add('blocking', FakeComponent(EXECUTION_BLOCKING))
+    self.assertEqual(self.commands.submit(Command('blocking', 'test', 'on')), 'on')
+    self.assertListEqual(device.commands, ['on'])
+
+  def test_missing_component(self):
+    self.assertFalse(self.commands.submit(Command('missing', 'test', 'on')))
+
+  def test_blocking_runs_in_executor_concurrently(self):
+    light_a = self.add('light_a', FakeComponent(EXECUTION_BLOCKING, delay=0.05))
+    light_b = self.add('light_b', FakeComponent(EXECUTION_BLOCKING, delay=0.05))
+
+    def submit():
+      for c in ['on', 'level', 'off']:
+        self.commands.submit(Command('light_a', 'test', c))
+        self.commands.submit(Command('light_b', 'test', c))
+
+    start = time.time()
+    self.loop.call_soon(submit)
+    self.run_until(lambda: len(light_a.commands) == 3 and len(light_b.commands) == 3)
+    # Each light runs its commands in order, one at a time, while the two lights run at the same time.
+    self.assertListEqual(light_a.commands, ['on', 'level', 'off'])
+    self.assertListEqual(light_b.commands, ['on', 'level', 'off'])
+    self.assertEqual(light_a.max_running, 1)
+    self.assertLess(time.time() - start, 0.29)
+    self.assertNotIn(threading.get_ident(), light_a.threads)
+
+  def test_max_concurrency(self):
+    bridge = self.add('bridge', FakeComponent(EXECUTION_BLOCKING, delay=0.05, max_concurrency=2))
+
+    def submit():
+      for i in range(6):
+        self.commands.submit(Command('bridge', 'test', str(i)))
+
+    self.loop.call_soon(submit)
+    self.run_until(lambda: len(bridge.commands) == 6)
+    self.assertEqual(bridge.max_running, 2)
+
+  def test_async(self):
+    device = self.add('async', FakeAsyncComponent())
+    result = self.loop.run_until_complete(self.commands.run_async(Command('async', 'test', 'on')))
+    self.assertEqual(result, 'on')
+    self.assertListEqual(device.commands, ['on'])
+
+  def test_error_returns_false(self):
+    device = self.add('broken', FakeComponent(EXECUTION_BLOCKING))
+    device.command = lambda command: 1 / 0
+    result = self.loop.run_until_complete(self.commands.run_async(Command('broken', 'test', 'on')))
+    self.assertFalse(result)
+
+  def test_submit_call_waits_for_commands(self):
+    device = self.add('light', FakeComponent(EXECUTION_BLOCKING, delay=0.05))
+    calls = []
+
+    def update(value):
+      calls.append(device.running)
+      device.commands.append(value)
+
+    def submit():
+      self.commands.submit(Command('light', 'test', 'on'))
+      self.commands.submit_call('light', update, 'routed')
+      self.commands.submit(Command('light', 'test', 'off'))
+
+    self.loop.call_soon(submit)
+    self.run_until(lambda: len(device.commands) == 3)
+    self.assertListEqual(device.commands, ['on', 'routed', 'off'])
+    self.assertListEqual(calls, [0])
+    self.assertNotIn(threading.get_ident(), device.threads)
@@ -0,0 +1,265 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from Firefly.const import EVENT_TYPE_BROADCAST, STATE
+from Firefly.helpers.dispatcher import DROP_NEWEST, DROP_OLDEST, EventDispatcher
+from Firefly.helpers.events import Event
+from Firefly.helpers.subscribers import Subscriptions
+
+
+class FakeComponent(object):
+  def __init__(self, block: threading.Event = None):
+    self.events = []
+    self.block = block
+
+  def event(self, event):
+    if self.block:
+      self.block.wait(5)
+    self.events.append(event)
+
+
+class TestEventDispatcher(unittest.TestCase):
+  @patch('Firefly.core.Firefly')
+  def setUp(self, firefly):
+    self.firefly = firefly
+    self.firefly.subscriptions = Subscriptions()
+    self.firefly.components = {}
+    self.loop = asyncio.new_event_loop()
+    self.executor = ThreadPoolExecutor(max_workers=4)
+    self.device = 'fake_device'
+    self.app = 'subscriber_app'
+    self.app_b = 'subscriber_app_b'
+
+  def tearDown(self):
+    self.loop.close()
+    self.executor.shutdown()
+
+  def add_component(self, ff_id, block=None):
+    component = FakeComponent(block)
+    self.firefly.components[ff_id] = component
+    self.firefly.subscriptions.add_subscriber(ff_id, self.device)
+    return component
+
+  def event(self, value):
+    return Event(self.device, EVENT_TYPE_BROADCAST, {STATE: value})
+
+  def run_until(self, condition):
+    @asyncio.coroutine
+    def wait():
+      for _ in range(500):
+        if condition():
+          return
+        yield from asyncio.sleep(0.01, loop=self.loop)
+
+    self.loop.run_until_complete(wait())
+
+  def test_deliver_sync_when_loop_not_running(self):
+    app = self.add_component(self.app)
+    firebase = []
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor)
+    dispatcher.add_sink('firebase', firebase.append)
+    dispatcher.start()
+    event = self.event(1)
+    dispatcher.publish(event)
+    self.assertListEqual(app.events, [event])
+    self.assertListEqual(firebase, [event])
+    dispatcher.stop()
+
+  def test_deliver_in_order(self):
+    app = self.add_component(self.app)
+    firebase = []
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor)
+    dispatcher.add_sink('firebase', firebase.append)
+    dispatcher.start()
+    events = [self.event(i) for i in range(50)]
+
+    def publish():
+      for event in events:
+        dispatcher.publish(event)
+
+    self.loop.call_soon(self.loop.run_in_executor, None, publish)
+    self.run_until(lambda: len(app.events) == 50 and len(firebase) == 50)
+    self.assertListEqual(app.events, events)
+    self.assertListEqual(firebase, events)
+    dispatcher.stop()
+
+  def test_slow_subscriber_does_not_block(self):
+    block = threading.Event()
+    slow = self.add_component(self.app, block)
+    fast = self.add_component(self.app_b)
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor)
+    dispatcher.start()
+    self.loop.call_soon(dispatcher.publish, self.event(1))
+    self.loop.call_soon(dispatcher.publish, self.event(2))
+    self.run_until(lambda: len(fast.events) == 2)
+    self.assertEqual(len(fast.events), 2)
+    self.assertEqual(len(slow.events), 0)
+    block.set()
+    self.run_until(lambda: len(slow.events) == 2)
+    self.assertEqual(len(slow.events), 2)
+    dispatcher.stop()
+
+  def test_drop_oldest(self):
+    app = self.add_component(self.app)
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor, queue_size=2, drop_policy=DROP_OLDEST)
+    dispatcher.start()
+    events = [self.event(i) for i in range(3)]
+
+    def publish():
+      for event in events:
+        dispatcher.publish(event)
+
+    self.loop.call_soon(publish)
+    self.run_until(lambda: len(app.events) == 2)
+    self.assertListEqual(app.events, events[1:])
+    self.assertEqual(dispatcher.dropped, 1)
+    dispatcher.stop()
+
+  def test_drop_newest(self):
+    app = self.add_component(self.app)
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor, queue_size=2, drop_policy=DROP_NEWEST)
+    dispatcher.start()
+    events = [self.event(i) for i in range(3)]
+
+    def publish():
+      for event in events:
+        dispatcher.publish(event)
+
+    self.loop.call_soon(publish)
+    self.run_until(lambda: len(app.events) == 2)
+    self.assertListEqual(app.events, events[:2])
+    self.assertEqual(dispatcher.dropped, 1)
+    dispatcher.stop()
+
+  def test_block_on_loop_never_drops(self):
+    app = self.add_component(self.app)
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor, queue_size=2)
+    dispatcher.start()
+    events = [self.event(i) for i in range(10)]
+
+    def publish():
+      for event in events:
+        dispatcher.publish(event)
+
+    self.loop.call_soon(publish)
+    self.run_until(lambda: len(app.events) == 10)
+    self.assertListEqual(app.events, events)
+    self.assertEqual(dispatcher.dropped, 0)
+    self.assertEqual(dispatcher.queue_depth, 0)
+    dispatcher.stop()
+
+  def test_coalesce_source(self):
+    app = self.add_component(self.app)
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor)
+    dispatcher.set_coalesce_window(self.device, 0.05)
+    dispatcher.start()
+
+    def publish():
+      dispatcher.publish(Event(self.device, EVENT_TYPE_BROADCAST, {'watts': 1, 'voltage': 120}))
+      dispatcher.publish(Event(self.device, EVENT_TYPE_BROADCAST, {'watts': 2}))
+      dispatcher.publish(Event(self.device, EVENT_TYPE_BROADCAST, {'watts': 3}))
+
+    self.loop.call_soon(publish)
+    self.run_until(lambda: len(app.events) == 1)
+    self.assertEqual(len(app.events), 1)
+    self.assertDictEqual(app.events[0].event_action, {'watts': 3, 'voltage': 120})
+    self.assertEqual(dispatcher.coalesced, 2)
+    self.assertDictEqual(dispatcher.coalesced_by_source, {self.device: 2})
+    dispatcher.stop()
+
+  def test_coalesce_property_flushed_by_other_property(self):
+    app = self.add_component(self.app)
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor, coalesce_properties={'watts': 10})
+    dispatcher.start()
+
+    def publish():
+      dispatcher.publish(Event(self.device, EVENT_TYPE_BROADCAST, {'watts': 1}))
+      dispatcher.publish(Event(self.device, EVENT_TYPE_BROADCAST, {'watts': 2}))
+      dispatcher.publish(Event(self.device, EVENT_TYPE_BROADCAST, {STATE: 'on'}))
+
+    self.loop.call_soon(publish)
+    self.run_until(lambda: len(app.events) == 1)
+    self.assertEqual(len(app.events), 1)
+    self.assertDictEqual(app.events[0].event_action, {'watts': 2, STATE: 'on'})
+    self.assertEqual(dispatcher.coalesced, 2)
+    dispatcher.stop()
+
+  def test_coalesce_flushed_from_other_thread(self):
+    app = self.add_component(self.app)
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor, coalesce_properties={'watts': 10})
+    dispatcher.start()
+
+    def publish():
+      dispatcher.publish(Event(self.device, EVENT_TYPE_BROADCAST, {'watts': 1}))
+      dispatcher.publish(Event(self.device, EVENT_TYPE_BROADCAST, {STATE: 'on'}))
+
+    self.loop.call_soon(self.loop.run_in_executor, None, publish)
+    self.run_until(lambda: len(app.events) == 1)
+    self.assertEqual(len(app.events), 1)
+    self.assertDictEqual(app.events[0].event_action, {'watts': 1, STATE: 'on'})
+    dispatcher.stop()
+
+  def test_publish_to(self):
+    app = self.add_component(self.app)
+    other = FakeComponent()
+    self.firefly.components[self.app_b] = other
+    firebase = []
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor)
+    dispatcher.add_sink('firebase', firebase.append)
+    dispatcher.start()
+    event = self.event(1)
+    self.loop.call_soon(dispatcher.publish_to, [self.app_b], event)
+    self.run_until(lambda: len(other.events) == 1)
+    self.assertListEqual(other.events, [event])
+    self.assertListEqual(app.events, [])
+    self.assertListEqual(firebase, [])
+    dispatcher.stop()
+
+  def test_subscriber_queue_never_drops(self):
+    block = threading.Event()
+    app = self.add_component(self.app, block)
+    sink_block = threading.Event()
+    firebase = []
+
+    def sink(event):
+      sink_block.wait(5)
+      firebase.append(event)
+
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor, sink_queue_size=2)
+    dispatcher.add_sink('firebase', sink)
+    dispatcher.start()
+    events = [self.event(i) for i in range(200)]
+
+    def publish():
+      for event in events:
+        dispatcher.publish(event)
+
+    self.loop.call_soon(publish)
+    self.run_until(lambda: dispatcher.queue_depth == 0)
+    block.set()
+    sink_block.set()
+    self.run_until(lambda: len(app.events) == 200)
+    self.assertListEqual(app.events, events)
+    self.assertLess(len(firebase), 200)
+    self.assertEqual(firebase[-1], events[-1])
+    dispatcher.stop()
+
+  def test_stop_delivers_coalesced(self):
+    app = self.add_component(self.app)
+    dispatcher = EventDispatcher(self.firefly, self.loop, self.executor)
+    dispatcher.set_coalesce_window(self.device, 60)
+    dispatcher.start()
+
+    def publish():
+      dispatcher.publish(Event(self.device, EVENT_TYPE_BROADCAST, {'watts': 1}))
+      dispatcher.publish(Event(self.device, EVENT_TYPE_BROADCAST, {'watts': 2}))
+
+    self.loop.call_soon(publish)
+    self.run_until(lambda: dispatcher.coalesced == 1)
+    self.assertListEqual(app.events, [])
+    dispatcher.stop()
+    self.assertEqual(len(app.events), 1)
+    self.assertDictEqual(app.events[0].event_action, {'watts': 2})
@@ -0,0 +1,95 @@
+import unittest
+
+from Firefly.helpers.tracked_state import TrackedState
+from Firefly.services.firebase_sanitizer import SanitizeCache, sanitize, sanitize_key
+
+
+class Component(TrackedState):
+  def __init__(self, ff_id):
+    self.id = ff_id
+    self.switch = 'off'
+    self.sensors = {}
+    self.builds = 0
+    self.request_map = {'switch': self.get_switch}
+
+  def get_switch(self):
+    return self.switch
+
+  def get_temperature(self):
+    return self.sensors.get('temperature')
+
+  def values(self):
+    self.__dict__['builds'] += 1
+    return dict((request, function()) for request, function in self.request_map.items())
+
+
+class TestSanitize(unittest.TestCase):
+  def test_keys_and_values(self):
+    data = {'a/b': {'#c$': None, 'd': 'x/y#', 'e': [None, ('f$', 1)]}, 2: 1.5}
+    self.assertDictEqual(sanitize(data), {'a_-_b': {'c': '', 'd': 'x_-_y', 'e': ['', ['f', 1]]}, '2': 1.5})
+
+  def test_keys_only(self):
+    data = {'a/b': {'c': None, 'd': 'x/y'}}
+    self.assertDictEqual(sanitize(data, values=False), {'a_-_b': {'c': None, 'd': 'x/y'}})
+
+  def test_unchanged_not_copied(self):
+    inner = {'switch': 'on', 'level': 10, 'tags': ['light']}
+    data = {'light': inner, 'other': {'a#': 1}}
+    result = sanitize(data)
+    self.assertIsNot(result, data)
+    self.assertIs(result['light'], inner)
+    self.assertIs(sanitize(inner), inner)
+    self.assertListEqual(list(result.keys()), ['light', 'other'])
+
+  def test_order_kept(self):
+    self.assertListEqual(list(sanitize({'a': 1, 'b/': 2, 'c': 3}).keys()), ['a', 'b_-_', 'c'])
+
+  def test_bool_key(self):
+    self.assertEqual(sanitize_key(1), '1')
+    self.assertEqual(sanitize_key(True), 'True')
+
+
+class TestSanitizeCache(unittest.TestCase):
+  def test_cached_until_changed(self):
+    cache = SanitizeCache()
+    component = Component('light')
+    self.assertDictEqual(cache.get(component, component.values), {'switch': 'off'})
+    cache.get(component, component.values)
+    self.assertEqual(component.builds, 1)
+    component.switch = 'on'
+    self.assertDictEqual(cache.get(component, component.values), {'switch': 'on'})
+    self.assertEqual(component.builds, 2)
+    self.assertEqual(cache.hits, 1)
+
+  def test_mark_requests_dirty(self):
+    cache = SanitizeCache()
+    component = Component('light')
+    cache.get(component, component.values)
+    component.mark_requests_dirty(['switch'])
+    cache.get(component, component.values)
+    self.assertEqual(component.builds, 2)
+
+  def test_request_reads_mutable_state(self):
+    cache = SanitizeCache()
+    component = Component('sensor')
+    component.request_map['temperature'] = component.get_temperature
+    component.sensors['temperature'] = 20
+    cache.get(component, component.values)
+    component.sensors['temperature'] = 21
+    self.assertEqual(cache.get(component, component.values)['temperature'], 21)
+    self.assertEqual(cache.misses, 0)
+
+  def test_untracked_component(self):
+    class Plain(object):
+      id = 'plain'
+
+    cache = SanitizeCache()
+    self.assertDictEqual(cache.get(Plain(), lambda: {'a#': 1}), {'a': 1})
+    self.assertEqual(cache.misses, 0)
+
+  def test_retain(self):
+    cache = SanitizeCache()
+    cache.get(Component('a'), lambda: {})
+    cache.get(Component('b'), lambda: {})
+    cache.retain({'a': {}})
+    self.assertListEqual(list(cache._cache.keys()), ['a'])
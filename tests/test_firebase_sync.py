@@ -0,0 +1,158 @@
+import unittest
+
+from Firefly.services.firebase_sync import FirebaseSync, diff, normalize
+from Firefly.services.firebase_writer import FirebaseWriter
+
+
+class FakeDb(object):
+  """Fake of the pyrebase database that keeps the data in a dict and records the requests."""
+
+  def __init__(self, data=None, path=None, requests=None):
+    self.data = data if data is not None else {}
+    self.path = path or []
+    self.requests = requests if requests is not None else []
+    self.fail = False
+
+  def child(self, key):
+    db = FakeDb(self.data, self.path + [key], self.requests)
+    db.fail = self.fail
+    return db
+
+  def _node(self, keys):
+    node = self.data
+    for key in keys:
+      node = node.setdefault(key, {})
+    return node
+
+  def _set(self, keys, value):
+    parent = self._node(keys[:-1])
+    if value is None or value == {}:
+      parent.pop(keys[-1], None)
+    else:
+      parent[keys[-1]] = value
+
+  def set(self, data, token):
+    if self.fail:
+      raise ConnectionError('offline')
+    self.requests.append(('set', '/'.join(self.path), data))
+    self._set(self.path, normalize(data))
+
+  def update(self, data, token):
+    if self.fail:
+      raise ConnectionError('offline')
+    self.requests.append(('update', '/'.join(self.path), data))
+    for path, value in data.items():
+      self._set(self.path + path.split('/'), normalize(value))
+
+  def get(self, *keys):
+    node = self.data
+    for key in keys:
+      node = node[key]
+    return node
+
+
+def status(switch='off', level=100):
+  return {'switch': switch, 'level': level, 'battery': None}
+
+
+class TestDiff(unittest.TestCase):
+  def test_diff(self):
+    updates = {}
+    diff({'a': {'switch': 'on', 'level': 10}, 'b': {'switch': 'on'}},
+         {'a': {'switch': 'off', 'level': 10}, 'c': {'switch': 'on'}}, 'deviceStatus', updates)
+    self.assertDictEqual(updates, {
+      'deviceStatus/a/switch': 'off',
+      'deviceStatus/b':        None,
+      'deviceStatus/c':        {'switch': 'on'}
+    })
+
+  def test_normalize(self):
+    self.assertDictEqual(normalize({'a': None, 'b': {}, 'c': {'d': None}, 1: [None]}), {'1': [None]})
+
+
+class TestFirebaseSync(unittest.TestCase):
+  def setUp(self):
+    self.db = FakeDb()
+    self.writer = FirebaseWriter(self.db, 'home', lambda: 'token')
+    self.sync = FirebaseSync(self.writer)
+
+  def send(self, data=None):
+    """Sync data if given and flush the writer."""
+    queued = self.sync.sync(data) if data is not None else None
+    self.writer._drain(0)
+    self.writer.flush()
+    return queued
+
+  def test_first_sync_writes_whole_path(self):
+    self.db.data['homeStatus'] = {'home': {'deviceStatus': {'removed': {'switch': 'on'}}, 'commands': {'x': 1}}}
+    self.assertEqual(self.send({'deviceStatus': {'a': status()}}), 1)
+    self.assertListEqual(self.db.requests, [('update', 'homeStatus/home',
+                                             {'deviceStatus': {'a': {'switch': 'off', 'level': 100}}})])
+    self.assertDictEqual(self.db.get('homeStatus', 'home', 'deviceStatus'), {'a': {'switch': 'off', 'level': 100}})
+    self.assertDictEqual(self.db.get('homeStatus', 'home', 'commands'), {'x': 1})
+
+  def test_delta_in_one_update(self):
+    self.send({'deviceStatus': {'a': status(), 'b': status()}, 'groupStatus': {'g': status()}})
+    self.db.requests.clear()
+    self.send({'deviceStatus': {'a': status('on'), 'b': status()}, 'groupStatus': {'g': status(level=5)}})
+    self.assertEqual(len(self.db.requests), 1)
+    method, path, data = self.db.requests[0]
+    self.assertEqual((method, path), ('update', 'homeStatus/home'))
+    self.assertDictEqual(data, {'deviceStatus/a/switch': 'on', 'groupStatus/g/level': 5})
+    self.assertEqual(self.db.get('homeStatus', 'home', 'deviceStatus', 'a', 'switch'), 'on')
+
+  def test_unchanged_sends_nothing(self):
+    self.send({'deviceStatus': {'a': status()}})
+    self.db.requests.clear()
+    self.assertEqual(self.send({'deviceStatus': {'a': status()}}), 0)
+    self.assertListEqual(self.db.requests, [])
+
+  def test_removed_device(self):
+    self.send({'deviceStatus': {'a': status(), 'b': status()}})
+    self.send({'deviceStatus': {'a': status()}})
+    self.assertNotIn('b', self.db.get('homeStatus', 'home', 'deviceStatus'))
+
+  def test_reset_rewrites(self):
+    self.send({'deviceStatus': {'a': status()}})
+    self.sync.reset()
+    self.db.requests.clear()
+    self.send({'deviceStatus': {'a': status()}})
+    self.assertListEqual(list(self.db.requests[0][2].keys()), ['deviceStatus'])
+
+  def test_shadow_after_sent(self):
+    self.send({'deviceStatus': {'a': status()}})
+    self.writer.db = FakeDb(self.db.data, requests=self.db.requests)
+    self.writer.db.fail = True
+    self.send({'deviceStatus': {'a': status('on')}})
+    # Not sent yet, so the shadow still has the old value and the write is retried.
+    self.assertEqual(self.sync._shadow['deviceStatus']['a']['switch'], 'off')
+    self.writer.db = self.db
+    self.writer._retry_at = 0
+    self.send()
+    self.assertEqual(self.db.get('homeStatus', 'home', 'deviceStatus', 'a', 'switch'), 'on')
+    self.assertEqual(self.sync._shadow['deviceStatus']['a']['switch'], 'on')
+
+  def test_push_and_sync_in_order(self):
+    self.send({'deviceStatus': {'a': status()}})
+    self.sync.sync({'deviceStatus': {'a': status('on')}})
+    self.writer.update('deviceStatus/a', {'switch': 'off'},
+                       on_sent=lambda: self.sync.merge('deviceStatus/a', {'switch': 'off'}))
+    self.send()
+    self.assertEqual(self.db.get('homeStatus', 'home', 'deviceStatus', 'a', 'switch'), 'off')
+    self.assertEqual(self.sync._shadow['deviceStatus']['a']['switch'], 'off')
+
+  def test_merge(self):
+    self.send({'deviceStatus': {'a': status()}})
+    self.sync.merge('deviceStatus/a', {'switch': 'on'})
+    self.db.requests.clear()
+    self.send({'deviceStatus': {'a': status('on')}})
+    self.assertListEqual(self.db.requests, [])
+
+  def test_merge_before_sent_kept(self):
+    self.send({'deviceStatus': {'a': status(), 'b': status()}})
+    self.sync.sync({'deviceStatus': {'a': status('on'), 'b': status()}})
+    self.sync.merge('deviceStatus/b', {'switch': 'on'})
+    self.send()
+    self.db.requests.clear()
+    self.send({'deviceStatus': {'a': status('on'), 'b': status('on')}})
+    self.assertListEqual(self.db.requests, [])
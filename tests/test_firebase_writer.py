@@ -0,0 +1,151 @@
+import time
+import unittest
+
+from Firefly.services.firebase_writer import (CIRCUIT_CLOSED, CIRCUIT_OPEN, MAX_PATHS_PER_UPDATE, FirebaseWriter, PushIds,
+                                              merge_update)
+
+
+class RecordingDb(object):
+  def __init__(self):
+    self.updates = []
+    self.failures = 0
+    self.path = []
+
+  def child(self, key):
+    self.path.append(key)
+    return self
+
+  def update(self, data, token):
+    path, self.path = '/'.join(self.path), []
+    if self.failures:
+      self.failures -= 1
+      raise ConnectionError('offline')
+    self.updates.append((path, data, token))
+
+
+class TestMergeUpdate(unittest.TestCase):
+  def test_merge(self):
+    updates = {}
+    merge_update(updates, 'deviceStatus/a/switch', 'on')
+    merge_update(updates, 'deviceStatus/a/switch', 'off')
+    merge_update(updates, 'deviceStatus/a/level', 10)
+    self.assertDictEqual(updates, {'deviceStatus/a/switch': 'off', 'deviceStatus/a/level': 10})
+
+  def test_set_replaces_children(self):
+    updates = {'locationStatus/statusMessages/a': 'x', 'locationStatus/mode': 'home'}
+    merge_update(updates, 'locationStatus/statusMessages', {})
+    self.assertDictEqual(updates, {'locationStatus/statusMessages': {}, 'locationStatus/mode': 'home'})
+
+  def test_write_inside_set_path(self):
+    updates = {}
+    merge_update(updates, 'locationStatus/statusMessages', {})
+    merge_update(updates, 'locationStatus/statusMessages/a/text', 'hi')
+    self.assertDictEqual(updates, {'locationStatus/statusMessages': {'a': {'text': 'hi'}}})
+
+
+class TestPushIds(unittest.TestCase):
+  def test_ordered(self):
+    push_ids = PushIds()
+    ids = [push_ids.next() for _ in range(500)]
+    self.assertListEqual(ids, sorted(ids))
+    self.assertEqual(len(set(ids)), 500)
+    self.assertEqual(len(ids[0]), 20)
+
+
+class TestFirebaseWriter(unittest.TestCase):
+  def setUp(self):
+    self.db = RecordingDb()
+    self.errors = []
+    self.writer = FirebaseWriter(self.db, 'home', lambda: 'token', on_error=lambda: self.errors.append(1),
+                                 flush_interval=0.01, failure_threshold=3, open_time=60)
+
+  def tearDown(self):
+    self.writer.stop()
+
+  def queue_writes(self):
+    self.writer.update('deviceStatus/a', {'switch': 'on', 'level': 10})
+    self.writer.push('events', {'ff_id': 'a', 'n': 1})
+    self.writer.update('deviceStatus/a', {'switch': 'off'})
+    self.writer.push('events', {'ff_id': 'a', 'n': 2})
+    self.writer._drain(0)
+
+  def test_batched_and_ordered(self):
+    self.queue_writes()
+    self.assertTrue(self.writer.flush())
+    self.assertEqual(len(self.db.updates), 1)
+    path, data, token = self.db.updates[0]
+    self.assertEqual((path, token), ('homeStatus/home', 'token'))
+    self.assertEqual(data['deviceStatus/a/switch'], 'off')
+    self.assertEqual(data['deviceStatus/a/level'], 10)
+    events = sorted((k, v) for k, v in data.items() if k.startswith('events/'))
+    self.assertListEqual([v['n'] for _, v in events], [1, 2])
+    self.assertEqual(self.writer.pending, 0)
+
+  def test_set_in_queue_order(self):
+    self.writer.update('locationStatus', {'mode': 'home', 'isDark': False})
+    self.writer.set('locationStatus', {'mode': 'away'})
+    self.writer.update('locationStatus', {'lastMetadataUpdate': 1})
+    self.writer._drain(0)
+    self.assertTrue(self.writer.flush())
+    self.assertDictEqual(self.db.updates[0][1], {'locationStatus': {'mode': 'away', 'lastMetadataUpdate': 1}})
+
+  def test_retry_keeps_writes(self):
+    self.db.failures = 1
+    self.queue_writes()
+    self.assertFalse(self.writer.flush())
+    self.assertGreater(self.writer._retry_at, time.monotonic())
+    self.writer.update('deviceStatus/a', {'level': 20})
+    self.writer._drain(0)
+    self.assertTrue(self.writer.flush())
+    data = self.db.updates[0][1]
+    self.assertEqual(data['deviceStatus/a/level'], 20)
+    self.assertEqual(len([k for k in data if k.startswith('events/')]), 2)
+
+  def test_circuit_breaker(self):
+    self.db.failures = 3
+    self.queue_writes()
+    for _ in range(3):
+      self.writer.flush()
+    self.assertEqual(self.writer.circuit, CIRCUIT_OPEN)
+    self.assertListEqual(self.errors, [1])
+    # Nothing is sent while the circuit is open.
+    self.assertFalse(self.writer.flush())
+    self.assertEqual(self.writer.failed_flushes, 3)
+    self.writer._retry_at = 0
+    self.assertTrue(self.writer.flush())
+    self.assertEqual(self.writer.circuit, CIRCUIT_CLOSED)
+
+  def test_thread(self):
+    self.writer.start()
+    self.writer.update('deviceStatus/a', {'switch': 'on'})
+    for _ in range(100):
+      if self.db.updates:
+        break
+      time.sleep(0.01)
+    self.assertEqual(self.db.updates[0][1], {'deviceStatus/a/switch': 'on'})
+
+  def test_stop_flushes(self):
+    self.writer.flush_interval = 10
+    self.writer.start()
+    self.writer.push('events', {'n': 1})
+    self.writer.stop()
+    self.assertEqual(len(self.db.updates), 1)
+
+  def test_on_sent_after_flush(self):
+    sent = []
+    self.db.failures = 1
+    self.writer.update('deviceStatus/a', {'switch': 'on'}, on_sent=lambda: sent.append('a'))
+    self.writer.update_paths({'deviceStatus/b/switch': 'off', 'groupStatus': None}, on_sent=lambda: sent.append('b'))
+    self.writer._drain(0)
+    self.assertFalse(self.writer.flush())
+    self.assertListEqual(sent, [])
+    self.assertTrue(self.writer.flush())
+    self.assertListEqual(sent, ['a', 'b'])
+    self.assertDictEqual(self.db.updates[0][1], {'deviceStatus/a/switch': 'on', 'deviceStatus/b/switch': 'off',
+                                                 'groupStatus': None})
+
+  def test_large_update_split(self):
+    self.writer.update_paths(dict(('deviceStatus/%d' % i, i) for i in range(MAX_PATHS_PER_UPDATE + 1)))
+    self.writer._drain(0)
+    self.assertTrue(self.writer.flush())
+    self.assertListEqual([len(update[1]) for update in self.db.updates], [MAX_PATHS_PER_UPDATE, 1])
@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import patch
+
+from Firefly.services.hue_state import AdaptivePoll, HueStateCache, changed_fields
+
+
+def light(on=True, bri=254, name='Lamp'):
+  return {
+    'name':     name,
+    'uniqueid': 'light-1',
+    'state':    {'on': on, 'bri': bri, 'ct': 366, 'reachable': True},
+  }
+
+
+class TestChangedFields(unittest.TestCase):
+  def test_nested(self):
+    self.assertEqual(changed_fields(light(), light(bri=100)), {'state': {'bri': 100}})
+
+  def test_top_level(self):
+    self.assertEqual(changed_fields(light(), light(name='Desk')), {'name': 'Desk'})
+
+  def test_same(self):
+    self.assertEqual(changed_fields(light(), light()), {})
+
+
+class TestHueStateCache(unittest.TestCase):
+  def setUp(self):
+    self.cache = HueStateCache()
+
+  def test_first_state_in_full(self):
+    self.assertEqual(self.cache.changes('light-1', light()), light())
+
+  def test_unchanged_skipped(self):
+    self.cache.changes('light-1', light())
+    self.assertIsNone(self.cache.changes('light-1', light()))
+    self.assertEqual(self.cache.skipped, 1)
+
+  def test_forget_path(self):
+    self.cache.set_targets({'lights/1': ['light-1'], 'groups/1': ['hue-group-device-1', 'light-1']})
+    self.cache.changes('light-1', light())
+    self.cache.forget_path('lights/1/state')
+    self.assertEqual(self.cache.changes('light-1', light()), light())
+    self.cache.forget_path('groups/1/action')
+    self.assertEqual(self.cache.changes('light-1', light()), light())
+    self.cache.forget_path('lights/2/state')
+    self.assertIsNone(self.cache.changes('light-1', light()))
+
+  def test_only_changes(self):
+    self.cache.changes('light-1', light())
+    self.assertEqual(self.cache.changes('light-1', light(on=False)), {'state': {'on': False}})
+    self.assertIsNone(self.cache.changes('light-1', light(on=False)))
+
+  def test_forget(self):
+    self.cache.changes('light-1', light())
+    self.cache.forget('light-1')
+    self.assertEqual(self.cache.changes('light-1', light()), light())
+
+  def test_full_sync(self):
+    cache = HueStateCache(full_sync_interval=0)
+    cache.changes('light-1', light())
+    self.assertTrue(cache.full_sync_due())
+    cache.clear()
+    self.assertEqual(cache.changes('light-1', light()), light())
+
+
+class TestAdaptivePoll(unittest.TestCase):
+  def test_normal(self):
+    poll = AdaptivePoll(fast=1, normal=10, idle=30, idle_after=2)
+    self.assertEqual(poll.interval, 10)
+
+  def test_fast_after_command(self):
+    poll = AdaptivePoll(fast=1, normal=10, idle=30, fast_window=20)
+    with patch('Firefly.services.hue_state.time.monotonic', return_value=100):
+      poll.command_sent()
+    with patch('Firefly.services.hue_state.time.monotonic', return_value=110):
+      self.assertEqual(poll.interval, 1)
+    with patch('Firefly.services.hue_state.time.monotonic', return_value=121):
+      self.assertEqual(poll.interval, 10)
+
+  def test_idle(self):
+    poll = AdaptivePoll(fast=1, normal=10, idle=30, idle_after=2)
+    poll.polled(False)
+    self.assertEqual(poll.interval, 10)
+    poll.polled(False)
+    self.assertEqual(poll.interval, 30)
+    poll.polled(True)
+    self.assertEqual(poll.interval, 10)
@@ -0,0 +1,111 @@
+import unittest
+from unittest.mock import patch
+
+from Firefly.components.hue.transition import TransitionEngine, fade_curve, kelvin_to_mired, level_to_bri
+
+
+class FakeScheduler(object):
+  def __init__(self):
+    self.jobs = {}
+
+  def runInS(self, delay, function, job_id=None):
+    self.jobs[job_id] = (delay, function)
+
+  def cancel(self, job_id):
+    return self.jobs.pop(job_id, None) is not None
+
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+
+class TestFadeCurve(unittest.TestCase):
+  def test_endpoints(self):
+    curve = fade_curve(2700, 6500, 200, 10, 100)
+    self.assertEqual(len(curve), 5)
+    self.assertEqual(curve[0], (0, {'ct': kelvin_to_mired(2700), 'on': True, 'transitiontime': 1, 'bri': level_to_bri(10)}))
+    offset, state = curve[-1]
+    self.assertEqual(offset, 200)
+    self.assertEqual(state['ct'], kelvin_to_mired(6500))
+    self.assertEqual(state['bri'], level_to_bri(100))
+    self.assertEqual(state['transitiontime'], 500)
+
+  def test_linear(self):
+    curve = fade_curve(2000, 6000, 1000)
+    self.assertEqual(len(curve), 31)
+    self.assertEqual(curve[15][1]['ct'], kelvin_to_mired(4000))
+    self.assertNotIn('bri', curve[15][1])
+
+  def test_short_fade(self):
+    curve = fade_curve(2700, 4000, 5)
+    self.assertEqual([offset for offset, _ in curve], [0, 5])
+
+  def test_mired_limits(self):
+    self.assertEqual(kelvin_to_mired(1000), 500)
+    self.assertEqual(kelvin_to_mired(10000), 153)
+
+
+class TestTransitionEngine(unittest.TestCase):
+  def setUp(self):
+    self.sent = []
+    self.scheduler = FakeScheduler()
+    self.engine = TransitionEngine(lambda path, data: self.sent.append((path, data)), self.scheduler)
+    self.clock = FakeClock()
+    patcher = patch('Firefly.components.hue.transition.time.monotonic', self.clock)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def start_lights(self, numbers, curve):
+    for number in numbers:
+      self.engine.start('light-%s' % number, 'light', number, curve)
+
+  def test_steps_on_one_timer(self):
+    curve = fade_curve(2700, 6500, 200)
+    self.start_lights(['1', '2'], curve)
+    self.assertEqual(self.sent, [('lights/1/state', curve[0][1]), ('lights/2/state', curve[0][1])])
+    self.assertEqual(list(self.scheduler.jobs), ['HUE_TRANSITIONS'])
+    self.assertEqual(self.scheduler.jobs['HUE_TRANSITIONS'][0], 50)
+
+    self.sent.clear()
+    self.clock.now += 50
+    self.engine.tick()
+    self.assertEqual(self.sent, [('lights/1/state', curve[1][1]), ('lights/2/state', curve[1][1])])
+
+  def test_group_merge(self):
+    self.engine.set_groups({'1': ['1', '2', '3'], '2': ['4', '5']})
+    curve = fade_curve(2700, 6500, 200)
+    self.engine.start('light-4', 'light', '4', curve)
+    self.start_lights(['1', '2', '3'], curve)
+    self.sent.clear()
+
+    self.clock.now += 50
+    self.engine.tick()
+    self.assertEqual(sorted(path for path, _ in self.sent), ['groups/1/action', 'lights/4/state'])
+    self.assertEqual(self.engine.group_puts, 1)
+
+  def test_late_tick_sends_latest(self):
+    curve = fade_curve(2700, 6500, 200)
+    self.start_lights(['1'], curve)
+    self.sent.clear()
+    self.clock.now += 120
+    self.engine.tick()
+    self.assertEqual(self.sent, [('lights/1/state', curve[2][1])])
+
+  def test_finish_and_cancel(self):
+    curve = fade_curve(2700, 6500, 200)
+    self.start_lights(['1', '2'], curve)
+    self.engine.cancel('light-2')
+    self.clock.now += 200
+    self.engine.tick()
+    self.assertEqual(self.sent[-1], ('lights/1/state', curve[-1][1]))
+    self.assertEqual(self.engine.active, 0)
+    self.assertEqual(self.scheduler.jobs, {})
+
+  def test_group_device(self):
+    curve = fade_curve(2700, 4000, 5)
+    self.engine.start('hue-group-device-3', 'group', '3', curve)
+    self.assertEqual(self.sent, [('groups/3/action', curve[0][1])])
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from Firefly.services.hue_transport import HueTransport, TokenBucket
+
+USERNAME = 'firefly'
+
+
+class StandInBridge(object):
+  """Local stand-in for the hue bridge api."""
+
+  def __init__(self):
+    self.puts = []
+    self.app = web.Application()
+    self.app.router.add_get('/api/{username}/', self.get_state)
+    self.app.router.add_put('/api/{username}/{kind}/{number}/{noun}', self.put)
+
+  async def get_state(self, request):
+    return web.json_response({'lights': {'1': {'uniqueid': 'light-1'}}, 'groups': {}})
+
+  async def put(self, request):
+    path = '%s/%s/%s' % (request.match_info['kind'], request.match_info['number'], request.match_info['noun'])
+    data = await request.json()
+    self.puts.append((time.monotonic(), path, data))
+    return web.json_response([{'success': {'/%s/%s' % (path, k): v}} for k, v in data.items()])
+
+
+class TestTokenBucket(unittest.TestCase):
+  def test_reserve(self):
+    bucket = TokenBucket(10, burst=2)
+    self.assertEqual(bucket.reserve(), 0)
+    self.assertEqual(bucket.reserve(), 0)
+    self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+    self.assertAlmostEqual(bucket.reserve(), 0.2, places=2)
+
+
+class TestHueTransport(unittest.TestCase):
+  def setUp(self):
+    self.loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(self.loop)
+    self.bridge = StandInBridge()
+    self.server = TestServer(self.bridge.app, loop=self.loop)
+    self.loop.run_until_complete(self.server.start_server(loop=self.loop))
+    ip = '%s:%s' % (self.server.host, self.server.port)
+    self.transport = HueTransport(self.loop, ip, USERNAME, light_rate=20, group_rate=10)
+
+  def tearDown(self):
+    self.loop.run_until_complete(self.transport.close())
+    self.loop.run_until_complete(self.server.close())
+    self.loop.close()
+    asyncio.set_event_loop(None)
+
+  def run_coroutine(self, coroutine):
+    return self.loop.run_until_complete(coroutine)
+
+  def test_get(self):
+    data = self.run_coroutine(self.transport.get())
+    self.assertEqual(data['lights']['1']['uniqueid'], 'light-1')
+
+  def test_puts_to_one_light_merged_in_order(self):
+    async def send():
+      # The first PUT is sent right away, the others wait for it and are merged.
+      # Tasks are made one by one because gather does not start them in order on python 3.6.
+      tasks = [asyncio.ensure_future(self.transport.put('lights/1/state', data), loop=self.loop)
+               for data in [{'on': True}, {'bri': 10}, {'bri': 20, 'ct': 300}]]
+      return await asyncio.gather(*tasks, loop=self.loop)
+
+    results = self.run_coroutine(send())
+    self.assertEqual(results[2], True)
+    self.assertListEqual([data for _, _, data in self.bridge.puts], [{'on': True}, {'bri': 20, 'ct': 300}])
+    self.assertEqual(self.transport.merged_puts, 1)
+
+  def test_light_rate(self):
+    async def send():
+      await asyncio.gather(*[self.transport.put('lights/%d/state' % i, {'on': True}) for i in range(7)], loop=self.loop)
+
+    start = time.monotonic()
+    self.run_coroutine(send())
+    self.assertEqual(len(self.bridge.puts), 7)
+    # 3 at once then 20 per second.
+    self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+  def test_group_rate(self):
+    async def send():
+      await asyncio.gather(*[self.transport.put('groups/%d/action' % i, {'on': True}) for i in range(3)], loop=self.loop)
+
+    self.run_coroutine(send())
+    times = [t for t, _, _ in self.bridge.puts]
+    self.assertGreaterEqual(times[2] - times[0], 0.17)
+
+  def test_put_threadsafe(self):
+    thread = threading.Thread(target=self.transport.put_threadsafe, args=('lights/2/state', {'on': False}))
+    thread.start()
+    thread.join()
+
+    async def wait():
+      for _ in range(100):
+        if self.bridge.puts:
+          return
+        await asyncio.sleep(0.01, loop=self.loop)
+
+    self.run_coroutine(wait())
+    self.assertEqual(self.bridge.puts[0][1:], ('lights/2/state', {'on': False}))
+
+  def test_error(self):
+    self.transport.set_bridge('127.0.0.1:1', USERNAME)
+    self.assertIsNone(self.run_coroutine(self.transport.get()))
+    self.assertEqual(self.transport.errors, 1)
+
+  def test_failed_put_reported(self):
+    failed = []
+    self.transport.on_put_failed = failed.append
+    self.transport.set_bridge('127.0.0.1:1', USERNAME)
+    self.assertIsNone(self.run_coroutine(self.transport.put('lights/1/state', {'on': True})))
+    self.assertListEqual(failed, ['lights/1/state'])
@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from astral import Location as AstralLocation
+
+from Firefly.helpers.location import Location
+
+ADDRESS = 'Chicago USA'
+
+
+class TestLocationSunCache(unittest.TestCase):
+  @patch('Firefly.core.Firefly')
+  def setUp(self, firefly):
+    self.firefly = firefly
+    self.config_dir = tempfile.TemporaryDirectory()
+    location_file = os.path.join(self.config_dir.name, 'location.json')
+    with open(location_file, 'w') as config:
+      json.dump({'address': ADDRESS}, config)
+    self.geolocation = AstralLocation(('Chicago', 'USA', 41.85, -87.65, 'America/Chicago', 0))
+    self.geolocation.solar_depression = 'civil'
+    with patch('Firefly.helpers.location.Astral') as astral, patch.object(Location, 'export_to_file'):
+      astral.return_value.__getitem__.return_value = self.geolocation
+      self.location = Location(self.firefly, location_file)
+    self.tz = self.location.geolocation.tz
+
+  def tearDown(self):
+    self.config_dir.cleanup()
+
+  def set_now(self, now: datetime):
+    return patch.object(Location, 'now', new=now)
+
+  def test_sun_computed_once_per_day(self):
+    noon = self.tz.localize(datetime(2017, 6, 2, 12, 0))
+    with patch.object(self.location.geolocation, 'sun', wraps=self.location.geolocation.sun) as sun:
+      with self.set_now(noon):
+        self.assertFalse(self.location.isDark)
+        self.assertTrue(self.location.isLight)
+        self.location.getNextDayEvent('sunset')
+        self.location.getNextDayEvent('sunrise')
+      self.assertEqual(sun.call_count, 2)
+      with self.set_now(noon + timedelta(days=1)):
+        self.assertFalse(self.location.isDark)
+      self.assertEqual(sun.call_count, 2)
+      with self.set_now(noon + timedelta(days=2)):
+        self.assertFalse(self.location.isDark)
+      self.assertEqual(sun.call_count, 3)
+
+  def test_sun_same_as_astral(self):
+    midnight = self.tz.localize(datetime(2017, 6, 2, 0, 0))
+    for hour in range(0, 24):
+      now = midnight + timedelta(hours=hour)
+      with self.set_now(now):
+        sun = self.location.geolocation.sun(date=now.date(), local=True)
+        self.assertEqual(self.location.isDark, now >= sun['sunset'] or now <= sun['sunrise'])
+        self.assertDictEqual(self.location.sun(), sun)
+
+  def test_cache_cleared_on_new_location(self):
+    self.location._sun_cache[datetime.max.date()] = {}
+    with patch('Firefly.helpers.location.Astral') as astral, patch.object(Location, 'export_to_file'):
+      astral.return_value.__getitem__.return_value = self.geolocation
+      self.location.update_location(ADDRESS)
+    self.assertNotIn(datetime.max.date(), self.location._sun_cache)
@@ -0,0 +1,68 @@
+import logging as python_logging
+import unittest
+
+from Firefly import logging
+
+
+class CountStr(object):
+  def __init__(self):
+    self.count = 0
+
+  def __str__(self):
+    self.count += 1
+    return 'count_str'
+
+
+class CaptureHandler(python_logging.Handler):
+  def __init__(self):
+    super().__init__()
+    self.messages = []
+
+  def emit(self, record):
+    self.messages.append(record.getMessage())
+
+
+class TestFireflyLogging(unittest.TestCase):
+  def setUp(self):
+    self.level = logging.logger.level
+    self.handler = CaptureHandler()
+    logging.logger.addHandler(self.handler)
+    logging.logger.setLevel(python_logging.INFO)
+
+  def tearDown(self):
+    logging.stop_queue()
+    logging.logger.removeHandler(self.handler)
+    logging.logger.setLevel(self.level)
+
+  def test_disabled_level_not_formatted(self):
+    value = CountStr()
+    logging.debug('value: %s', value)
+    self.assertEqual(value.count, 0)
+    self.assertListEqual(self.handler.messages, [])
+
+  def test_lazy_args_and_caller(self):
+    logging.info('value: %s %d', 'a', 1)
+    self.assertEqual(len(self.handler.messages), 1)
+    message = self.handler.messages[0]
+    self.assertTrue(message.startswith('value: a 1 '))
+    self.assertEqual(len(message.split('[')[0]), 131)
+    self.assertTrue(message.endswith('[test_lazy_args_and_caller - test_logging.py]'))
+
+  def test_old_style_message(self):
+    logging.warn('value: %s' % 'a')
+    self.assertTrue(self.handler.messages[0].startswith('value: a '))
+
+  def test_error_with_code_and_args(self):
+    logging.error(code='FF.COR._SE.001', args=('light_a'))
+    self.assertTrue(self.handler.messages[0].startswith('[FF.COR._SE.001] device not found light_a'))
+
+  def test_error_message(self):
+    logging.error('too many triggers')
+    self.assertTrue(self.handler.messages[0].startswith('too many triggers'))
+
+  def test_queue(self):
+    logging.start_queue()
+    logging.info('queued %s', 1)
+    logging.stop_queue()
+    self.assertTrue(self.handler.messages[0].startswith('queued 1'))
+    self.assertIn(self.handler, logging.logger.handlers)
@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_SUBMITTED, JobEvent
+
+from Firefly.const import EVENT_TYPE_BROADCAST, STATE
+from Firefly.helpers.dispatcher import EventDispatcher
+from Firefly.helpers.events import Event
+from Firefly.helpers.metrics import Histogram, KIND_JOB, KIND_SINK, KIND_SUBSCRIBER, Metrics
+from Firefly.helpers.subscribers import Subscriptions
+
+
+class TestHistogram(unittest.TestCase):
+  def test_percentiles(self):
+    histogram = Histogram()
+    for _ in range(90):
+      histogram.observe(0.0004)
+    for _ in range(10):
+      histogram.observe(0.2)
+    exported = histogram.export()
+    self.assertEqual(exported['count'], 100)
+    self.assertEqual(exported['p50'], 0.0005)
+    self.assertEqual(exported['p95'], 0.2)
+    self.assertEqual(exported['max'], 0.2)
+
+
+class TestMetrics(unittest.TestCase):
+  def setUp(self):
+    self.metrics = Metrics()
+
+  def test_handlers_and_exceptions(self):
+    self.metrics.observe_seconds(KIND_SUBSCRIBER, 'automation_a', 0.002)
+    self.metrics.observe_seconds(KIND_SUBSCRIBER, 'automation_a', 0.5, error=True)
+    self.metrics.observe_seconds(KIND_SUBSCRIBER, 'automation_b', 0.001)
+    exported = self.metrics.export()
+    handler = exported['handlers'][KIND_SUBSCRIBER]['automation_a']
+    self.assertEqual(handler['count'], 2)
+    self.assertEqual(handler['exceptions'], 1)
+    self.assertEqual(exported['exceptions'], 1)
+    self.assertEqual(exported['slowest_handlers'][0], {'kind': KIND_SUBSCRIBER, 'name': 'automation_a', 'max': 0.5})
+
+  def test_timed_raises(self):
+    def fail():
+      raise ValueError()
+
+    with self.assertRaises(ValueError):
+      self.metrics.timed(KIND_SUBSCRIBER, 'fail', fail)
+    self.assertEqual(self.metrics.timed(KIND_SUBSCRIBER, 'ok', lambda x: x + 1, 1), 2)
+    handlers = self.metrics.export()['handlers'][KIND_SUBSCRIBER]
+    self.assertEqual(handlers['fail']['exceptions'], 1)
+    self.assertEqual(handlers['ok']['count'], 1)
+
+  def test_event_rate(self):
+    with patch('Firefly.helpers.metrics.time.time', return_value=600.0):
+      for _ in range(30):
+        self.metrics.count_event('sensor')
+    with patch('Firefly.helpers.metrics.time.time', return_value=690.0):
+      events = self.metrics.export()['events']
+    self.assertEqual(events['sensor']['total'], 30)
+    self.assertAlmostEqual(events['sensor']['per_second'], 0.25)
+
+  def test_scheduler_jobs(self):
+    self.metrics._scheduler_event(JobEvent(EVENT_JOB_SUBMITTED, 'job_a', None))
+    self.metrics._scheduler_event(JobEvent(EVENT_JOB_EXECUTED, 'job_a', None))
+    self.metrics._scheduler_event(JobEvent(EVENT_JOB_SUBMITTED, 'job_b', None))
+    self.metrics._scheduler_event(JobEvent(EVENT_JOB_ERROR, 'job_b', None))
+    jobs = self.metrics.export()['handlers'][KIND_JOB]
+    self.assertEqual(jobs['job_a']['count'], 1)
+    self.assertEqual(jobs['job_b']['exceptions'], 1)
+
+  def test_disabled(self):
+    self.metrics.enabled = False
+    self.metrics.observe_seconds(KIND_SUBSCRIBER, 'automation_a', 0.002)
+    self.metrics.count_event('sensor')
+    exported = self.metrics.export()
+    self.assertDictEqual(exported['handlers'], {})
+    self.assertDictEqual(exported['events'], {})
+
+  def test_prometheus(self):
+    self.metrics.observe_seconds(KIND_SUBSCRIBER, 'automation "a"', 0.002)
+    self.metrics.count_event('sensor')
+    dispatcher = MagicMock()
+    dispatcher.queue_depth = 3
+    dispatcher.subscriber_queue_depths.return_value = {'automation_a': 1}
+    dispatcher.published = 10
+    dispatcher.dropped = 1
+    dispatcher.coalesced = 2
+    text = self.metrics.export_prometheus(dispatcher)
+    self.assertIn('firefly_handler_seconds_bucket{kind="subscriber",name="automation \\"a\\"",le="0.0025"} 1', text)
+    self.assertIn('firefly_handler_seconds_bucket{kind="subscriber",name="automation \\"a\\"",le="+Inf"} 1', text)
+    self.assertIn('firefly_handler_seconds_count{kind="subscriber",name="automation \\"a\\""} 1', text)
+    self.assertIn('firefly_events_total{source="sensor"} 1', text)
+    self.assertIn('firefly_event_queue_depth 3', text)
+    self.assertIn('firefly_subscriber_queue_depth{name="automation_a"} 1', text)
+    self.assertIn('firefly_events_dropped_total 1', text)
+
+
+class TestDispatcherMetrics(unittest.TestCase):
+  @patch('Firefly.core.Firefly')
+  def test_subscriber_latency_recorded(self, firefly):
+    firefly.subscriptions = Subscriptions()
+    firefly.subscriptions.add_subscriber('automation_a', 'sensor')
+    component = MagicMock()
+    component.event.side_effect = ValueError()
+    firefly.components = {'automation_a': component}
+    metrics = Metrics()
+    with patch('Firefly.helpers.dispatcher.metrics', metrics):
+      dispatcher = EventDispatcher(firefly, MagicMock())
+      dispatcher.add_sink('firebase', lambda event: None)
+      dispatcher.publish(Event('sensor', EVENT_TYPE_BROADCAST, {STATE: 'on'}))
+    handlers = metrics.export()['handlers']
+    self.assertEqual(handlers[KIND_SUBSCRIBER]['automation_a']['exceptions'], 1)
+    self.assertEqual(handlers[KIND_SINK]['firebase']['count'], 1)
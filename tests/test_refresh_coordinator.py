@@ -0,0 +1,86 @@
+import unittest
+
+from Firefly.const import TYPE_DEVICE
+from Firefly.helpers.refresh_coordinator import (ALL_SECTIONS, SECTION_ALIASES, SECTION_DEVICES, SECTION_GROUPS,
+                                                 SECTION_LOCATION, RefreshCoordinator, sections_for_type)
+
+
+class FakeScheduler(object):
+  def __init__(self):
+    self.jobs = []
+
+  def runInS(self, delay, function, job_id=None):
+    self.jobs.append((delay, function, job_id))
+
+  def run_next(self):
+    _, function, _ = self.jobs.pop(0)
+    function()
+
+
+class TestRefreshCoordinator(unittest.TestCase):
+  def setUp(self):
+    self.refreshes = []
+    self.scheduler = FakeScheduler()
+    self.coordinator = RefreshCoordinator(self.refreshes.append, self.scheduler, debounce=2, min_interval=30)
+
+  def test_leading_refresh(self):
+    self.coordinator.request(SECTION_DEVICES)
+    self.assertEqual(len(self.scheduler.jobs), 1)
+    self.assertEqual(self.scheduler.jobs[0][0], 0)
+    self.scheduler.run_next()
+    self.assertListEqual(self.refreshes, [frozenset([SECTION_DEVICES])])
+    self.assertSetEqual(self.coordinator.dirty, set())
+
+  def test_requests_merged(self):
+    for section in [SECTION_DEVICES, SECTION_ALIASES, SECTION_DEVICES, SECTION_GROUPS]:
+      self.coordinator.request(section)
+    self.assertEqual(len(self.scheduler.jobs), 1)
+    self.scheduler.run_next()
+    self.assertListEqual(self.refreshes, [frozenset([SECTION_DEVICES, SECTION_ALIASES, SECTION_GROUPS])])
+    self.assertEqual(self.coordinator.requested, 4)
+    self.assertEqual(self.coordinator.refreshed, 1)
+
+  def test_trailing_refresh_rate_limited(self):
+    self.coordinator.request(SECTION_DEVICES)
+    self.scheduler.run_next()
+    self.coordinator.request(SECTION_LOCATION)
+    self.coordinator.request(SECTION_ALIASES)
+    self.assertEqual(len(self.scheduler.jobs), 1)
+    delay = self.scheduler.jobs[0][0]
+    self.assertGreater(delay, 29)
+    self.assertLessEqual(delay, 30)
+    self.scheduler.run_next()
+    self.assertListEqual(self.refreshes[1:], [frozenset([SECTION_LOCATION, SECTION_ALIASES])])
+
+  def test_request_while_running(self):
+    def refresh(sections):
+      self.refreshes.append(sections)
+      if len(self.refreshes) == 1:
+        self.coordinator.request(SECTION_GROUPS)
+        self.assertListEqual(self.scheduler.jobs, [])
+
+    self.coordinator._refresh = refresh
+    self.coordinator.request()
+    self.scheduler.run_next()
+    self.assertEqual(self.refreshes[0], ALL_SECTIONS)
+    self.assertEqual(len(self.scheduler.jobs), 1)
+    self.scheduler.run_next()
+    self.assertEqual(self.refreshes[1], frozenset([SECTION_GROUPS]))
+
+  def test_error_does_not_stop_refreshes(self):
+    def refresh(sections):
+      raise ValueError('firebase down')
+
+    self.coordinator._refresh = refresh
+    self.coordinator.request(SECTION_DEVICES)
+    self.scheduler.run_next()
+    self.coordinator.request(SECTION_DEVICES)
+    self.assertEqual(len(self.scheduler.jobs), 1)
+
+  def test_run_with_nothing_dirty(self):
+    self.coordinator.run()
+    self.assertListEqual(self.refreshes, [])
+
+  def test_sections_for_type(self):
+    self.assertSetEqual(sections_for_type(TYPE_DEVICE), {SECTION_DEVICES, SECTION_ALIASES})
+    self.assertEqual(sections_for_type(None), ALL_SECTIONS)
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from Firefly.core import Firefly
+from Firefly.helpers.startup import StartupPhases, import_packages
+
+
+class TestStartupPhases(unittest.TestCase):
+  def test_phase(self):
+    startup = StartupPhases()
+    with startup.phase('config'):
+      time.sleep(0.01)
+    startup.record('services', 2.0)
+    export = startup.export()
+    self.assertListEqual(list(export['phases'].keys()), ['config', 'services'])
+    self.assertGreaterEqual(export['phases']['config'], 0.01)
+    self.assertGreaterEqual(export['total'], 2.01)
+    self.assertIn('firefly_startup_phase_seconds{phase="services"} 2.000000', startup.export_prometheus())
+
+  def test_import_packages(self):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+      errors = import_packages(['json', 'Firefly.helpers.startup', 'Firefly.does_not_exist', None], executor)
+    self.assertListEqual(list(errors.keys()), ['Firefly.does_not_exist'])
+
+
+class TestStartServices(unittest.TestCase):
+  def setUp(self):
+    self.loop = asyncio.new_event_loop()
+    self.executor = ThreadPoolExecutor(max_workers=4)
+    self.firefly = MagicMock()
+    self.firefly.loop = self.loop
+    self.firefly.executor = self.executor
+    self.firefly.settings.service_timeout = 0.2
+    self.firefly.components = {}
+    self.firefly.startup = StartupPhases()
+    self.firefly._install_lock = threading.RLock()
+    self.firefly.install_service = lambda *args: Firefly.install_service(self.firefly, *args)
+    self.firefly.late_service_installed = lambda *args: Firefly.late_service_installed(self.firefly, *args)
+    self.firefly.services_installed = lambda: Firefly.services_installed(self.firefly)
+    self.firefly.build_rooms = lambda: Firefly.build_rooms(self.firefly)
+
+  def tearDown(self):
+    self.loop.close()
+    self.executor.shutdown()
+
+  def install_package(self, package, alias):
+    if package == 'slow':
+      time.sleep(0.5)
+    if package == 'broken':
+      raise ImportError(package)
+    time.sleep(0.1)
+    self.firefly.components[alias] = package
+
+  @patch('Firefly.core.logging')
+  def test_services_installed_concurrently(self, _):
+    self.firefly.install_package = self.install_package
+    self.firefly.read_services.return_value = [('a', 'a', 'service_a'), ('b', 'b', 'service_b'),
+                                               ('firebase', 'firebase', 'service_firebase')]
+    start = time.time()
+    self.loop.run_until_complete(Firefly.start_services(self.firefly))
+    self.assertLess(time.time() - start, 0.25)
+    self.assertSetEqual(set(self.firefly.components.keys()), {'service_a', 'service_b', 'service_firebase'})
+    self.assertTrue(self.firefly._firebase_enabled)
+    self.firefly._rooms.build_rooms.assert_called_once_with()
+    self.assertIn('services', self.firefly.startup.phases)
+
+  @patch('Firefly.core.logging')
+  def test_timeout_and_error(self, logging):
+    self.firefly.install_package = self.install_package
+    self.assertFalse(self.loop.run_until_complete(Firefly.install_service(self.firefly, 'slow', 'slow', 'service_slow')))
+    logging.error.assert_called_with(code='FF.COR.INS.002', args=('slow', 0.2))
+    self.assertFalse(self.loop.run_until_complete(Firefly.install_service(self.firefly, 'broken', 'broken', 'service_broken')))
+    self.assertEqual(logging.error.call_args[1]['code'], 'FF.COR.INS.001')
+    self.assertTrue(self.loop.run_until_complete(Firefly.install_service(self.firefly, 'a', 'a', 'service_a')))
+
+  @patch('Firefly.core.logging')
+  def test_timed_out_service_finishes(self, logging):
+    self.firefly.install_package = self.install_package
+    self.firefly.read_services.return_value = [('a', 'a', 'service_a'), ('slow', 'slow', 'service_slow')]
+    self.loop.run_until_complete(Firefly.start_services(self.firefly))
+    self.assertNotIn('service_slow', self.firefly.components)
+    self.firefly._rooms.build_rooms.assert_called_once_with()
+
+    self.loop.run_until_complete(asyncio.sleep(0.6, loop=self.loop))
+    self.assertIn('service_slow', self.firefly.components)
+    self.assertEqual(self.firefly._rooms.build_rooms.call_count, 2)
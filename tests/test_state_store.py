@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+import unittest
+
+from Firefly.helpers.state_store import StateStore
+from Firefly.util.files import write_json_atomic
+
+TYPE_DEVICE = 'DEVICE'
+
+
+def device(ff_id, state='off'):
+  return {'ff_id': ff_id, 'package': 'Firefly.components.virtual_devices.switch', 'state': state}
+
+
+class TestStateStore(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.directory.name, 'state.db')
+    self.store = StateStore(self.path)
+
+  def tearDown(self):
+    self.store.close()
+    self.directory.cleanup()
+
+  def test_first_save(self):
+    self.assertIsNone(self.store.updated(TYPE_DEVICE))
+    self.assertEqual(self.store.save(TYPE_DEVICE, []), 0)
+    self.assertIsNotNone(self.store.updated(TYPE_DEVICE))
+    self.assertListEqual(self.store.load(TYPE_DEVICE), [])
+
+  def test_unchanged_save(self):
+    records = [device('a'), device('b')]
+    self.assertEqual(self.store.save(TYPE_DEVICE, records), 2)
+    self.assertEqual(self.store.save(TYPE_DEVICE, [device('a'), device('b')]), 0)
+
+  def test_only_changed_written(self):
+    self.store.save(TYPE_DEVICE, [device('a'), device('b'), device('c')])
+    self.assertEqual(self.store.save(TYPE_DEVICE, [device('a'), device('b', 'on'), device('c')]), 1)
+    self.assertEqual(self.store.load(TYPE_DEVICE)[1]['state'], 'on')
+
+  def test_removed(self):
+    self.store.save(TYPE_DEVICE, [device('a'), device('b')])
+    self.assertEqual(self.store.save(TYPE_DEVICE, [device('a')]), 1)
+    self.assertListEqual(self.store.load(TYPE_DEVICE), [device('a')])
+
+  def test_types_kept_apart(self):
+    self.store.save(TYPE_DEVICE, [device('a')])
+    self.store.save('ROOM', [{'ff_id': 'kitchen'}])
+    self.assertListEqual(self.store.load(TYPE_DEVICE), [device('a')])
+    self.assertListEqual(self.store.load('ROOM'), [{'ff_id': 'kitchen'}])
+
+  def test_exported_kept_by_save(self):
+    self.store.save(TYPE_DEVICE, [device('a')])
+    self.assertIsNone(self.store.exported(TYPE_DEVICE))
+    self.store.mark_exported(TYPE_DEVICE, 1234.5)
+    self.store.save(TYPE_DEVICE, [device('a', 'on')])
+    self.assertEqual(self.store.exported(TYPE_DEVICE), 1234.5)
+    self.assertGreater(self.store.updated(TYPE_DEVICE), 1234.5)
+
+  def test_order_and_reopen(self):
+    self.store.save(TYPE_DEVICE, [device('c'), device('a'), device('b')])
+    self.store.save(TYPE_DEVICE, [device('b'), device('c'), device('a')])
+    self.store.close()
+    self.store = StateStore(self.path)
+    self.assertListEqual([r['ff_id'] for r in self.store.load(TYPE_DEVICE)], ['b', 'c', 'a'])
+    self.assertEqual(self.store.save(TYPE_DEVICE, [device('b'), device('c'), device('a')]), 0)
+
+
+class TestWriteJsonAtomic(unittest.TestCase):
+  def test_write(self):
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'devices.json')
+      write_json_atomic(path, [device('a')], indent=4)
+      write_json_atomic(path, [device('b')], indent=4)
+      with open(path) as file:
+        self.assertListEqual(json.load(file), [device('b')])
+      self.assertListEqual(os.listdir(directory), ['devices.json'])
+
+  def test_failed_write_keeps_file(self):
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'devices.json')
+      write_json_atomic(path, [device('a')])
+      with self.assertRaises(TypeError):
+        write_json_atomic(path, [object()])
+      with open(path) as file:
+        self.assertListEqual(json.load(file), [device('a')])
+      self.assertListEqual(os.listdir(directory), ['devices.json'])
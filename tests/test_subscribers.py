@@ -539,3 +539,72 @@ class SubscribersTest(unittest.TestCase):
       STATE: [EVENT_ACTION_OFF, EVENT_ACTION_ON]
     })
     self.assertSetEqual(set(subscribers), {self.app, self.app_b})
+
+  def test_get_subscribers_multiple_props(self):
+    s = Subscriptions()
+    s.add_subscriber(self.app, self.device, {
+      STATE: [EVENT_ACTION_ON]
+    })
+    s.add_subscriber(self.app_b, self.device, {
+      'level': [EVENT_ACTION_ANY]
+    })
+    subscribers = s.get_subscribers(self.device, {
+      STATE: EVENT_ACTION_ON,
+      'level': 50
+    })
+    self.assertSetEqual(set(subscribers), {self.app, self.app_b})
+    subscribers = s.get_subscribers(self.device, {
+      STATE: EVENT_ACTION_OFF,
+      'level': 50
+    })
+    self.assertListEqual(subscribers, [self.app_b])
+
+  def test_get_subscribers_unhashable_value(self):
+    s = Subscriptions()
+    s.add_subscriber(self.app, self.device)
+    s.add_subscriber(self.app_b, self.device, {
+      'zwave_values': [EVENT_ACTION_ANY]
+    })
+    subscribers = s.get_subscribers(self.device, {
+      'zwave_values': {'level': 1}
+    })
+    self.assertSetEqual(set(subscribers), {self.app, self.app_b})
+
+  def test_get_subscribers_after_delete(self):
+    s = Subscriptions()
+    s.add_subscriber(self.app, self.device, {
+      STATE: [EVENT_ACTION_ON]
+    })
+    s.add_subscriber(self.app_b, self.device, {
+      STATE: [EVENT_ACTION_ON]
+    })
+    s.delete_subscriber(self.app, self.device, {
+      STATE: [EVENT_ACTION_ON]
+    })
+    subscribers = s.get_subscribers(self.device, {
+      STATE: [EVENT_ACTION_ON]
+    })
+    self.assertListEqual(subscribers, [self.app_b])
+
+  def test_get_subscribers_after_change_parent_id(self):
+    s = Subscriptions()
+    s.add_subscriber(self.app, self.device, {
+      STATE: [EVENT_ACTION_ON]
+    })
+    s.change_subscriber_parent_id(self.device, self.device_b)
+    self.assertListEqual(s.get_subscribers(self.device, {
+      STATE: [EVENT_ACTION_ON]
+    }), [])
+    self.assertListEqual(s.get_subscribers(self.device_b, {
+      STATE: [EVENT_ACTION_ON]
+    }), [self.app])
+
+  def test_get_subscribers_after_change_subscriber_id(self):
+    s = Subscriptions()
+    s.add_subscriber(self.app, self.device, {
+      STATE: [EVENT_ACTION_ON]
+    })
+    s.change_subscriber_id(self.app, self.app_b)
+    self.assertListEqual(s.get_subscribers(self.device, {
+      STATE: [EVENT_ACTION_ON]
+    }), [self.app_b])
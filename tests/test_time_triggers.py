@@ -0,0 +1,103 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from pytz import timezone
+
+from Firefly.automation.triggers import Trigger, TriggerSet
+from Firefly.const import TIME
+from Firefly.helpers.subscribers import Subscriptions
+from Firefly.helpers.time_triggers import TimeTriggers, next_fire_time
+
+LOCAL = timezone('America/Chicago')
+
+
+def local(*args):
+  return LOCAL.localize(datetime(*args))
+
+
+class TestTimeTriggers(unittest.TestCase):
+  def setUp(self):
+    self.time_triggers = TimeTriggers(LOCAL)
+
+  def test_next_fire_time_weekdays(self):
+    # 2017-06-02 is a Friday.
+    time_action = {'hour': 7, 'minute': 30, 'weekdays': [1, 2, 3, 4, 5]}
+    self.assertEqual(next_fire_time(time_action, local(2017, 6, 2, 6, 0), LOCAL), local(2017, 6, 2, 7, 30))
+    self.assertEqual(next_fire_time(time_action, local(2017, 6, 2, 7, 30), LOCAL), local(2017, 6, 5, 7, 30))
+
+  def test_next_fire_time_day_month(self):
+    time_action = {'hour': 0, 'minute': 0, 'weekdays': [1, 2, 3, 4, 5, 6, 7], 'day': 25, 'month': 12}
+    self.assertEqual(next_fire_time(time_action, local(2017, 6, 2, 6, 0), LOCAL), local(2017, 12, 25, 0, 0))
+    time_action = {'hour': 8, 'minute': 0, 'weekdays': [1, 2, 3, 4, 5, 6, 7], 'day': 29, 'month': 2}
+    self.assertEqual(next_fire_time(time_action, local(2017, 6, 2, 6, 0), LOCAL), local(2020, 2, 29, 8, 0))
+
+  def test_next_fire_time_out_of_range(self):
+    self.assertIsNone(next_fire_time({'hour': 24, 'minute': 0, 'weekdays': [1]}, local(2017, 6, 2, 6, 0), LOCAL))
+    self.assertIsNone(next_fire_time({}, local(2017, 6, 2, 6, 0), LOCAL))
+
+  def test_dst_spring_forward_skipped(self):
+    # 2:30 does not exist on 2017-03-12 in Chicago.
+    time_action = {'hour': 2, 'minute': 30, 'weekdays': [1, 2, 3, 4, 5, 6, 7]}
+    self.assertEqual(next_fire_time(time_action, local(2017, 3, 12, 0, 0), LOCAL), local(2017, 3, 13, 2, 30))
+
+  def test_dst_fall_back_fires_once(self):
+    # 1:30 happens twice on 2017-11-05 in Chicago.
+    time_action = {'hour': 1, 'minute': 30, 'weekdays': [1, 2, 3, 4, 5, 6, 7]}
+    first = next_fire_time(time_action, local(2017, 11, 5, 0, 0), LOCAL)
+    self.assertEqual(first, LOCAL.localize(datetime(2017, 11, 5, 1, 30), is_dst=True))
+    self.assertEqual(next_fire_time(time_action, first, LOCAL), local(2017, 11, 6, 1, 30))
+
+  def test_pop_due_only_due_subscribers(self):
+    now = local(2017, 6, 2, 6, 0)
+    self.time_triggers.add('automation_a', [{'hour': 7, 'minute': 0, 'weekdays': [5]}], now)
+    self.time_triggers.add('automation_b', [{'hour': 7, 'minute': 1, 'weekdays': [5]}], now)
+    self.time_triggers.add('automation_c', [{'hour': 7, 'minute': 0, 'weekdays': [1]}], now)
+    self.assertListEqual(self.time_triggers.pop_due(local(2017, 6, 2, 6, 59)), [])
+    self.assertListEqual(self.time_triggers.pop_due(local(2017, 6, 2, 7, 0, 1)), ['automation_a'])
+    self.assertListEqual(self.time_triggers.pop_due(local(2017, 6, 2, 7, 1, 0)), ['automation_b'])
+    self.assertEqual(self.time_triggers.next_fire, local(2017, 6, 5, 7, 0))
+
+  def test_missed_minute_not_fired(self):
+    now = local(2017, 6, 2, 6, 0)
+    self.time_triggers.add('automation_a', [{'hour': 7, 'minute': 0, 'weekdays': [5, 6]}], now)
+    self.assertListEqual(self.time_triggers.pop_due(local(2017, 6, 2, 7, 5)), [])
+    self.assertEqual(self.time_triggers.next_fire, local(2017, 6, 3, 7, 0))
+
+  def test_remove(self):
+    now = local(2017, 6, 2, 6, 0)
+    self.time_triggers.add('automation_a', [{'hour': 7, 'minute': 0, 'weekdays': [5]}], now)
+    self.time_triggers.remove('automation_a')
+    self.assertEqual(len(self.time_triggers), 0)
+    self.assertListEqual(self.time_triggers.pop_due(local(2017, 6, 2, 7, 0)), [])
+
+  def test_rename(self):
+    now = local(2017, 6, 2, 6, 0)
+    self.time_triggers.add('automation_a', [{'hour': 7, 'minute': 0, 'weekdays': [5]}], now)
+    self.time_triggers.rename('automation_a', 'automation_b')
+    self.assertListEqual(self.time_triggers.subscribers, ['automation_b'])
+    self.assertListEqual(self.time_triggers.pop_due(local(2017, 6, 2, 7, 0)), ['automation_b'])
+
+  def test_subscriptions_update_time_triggers(self):
+    subscriptions = Subscriptions()
+    subscriptions.time_triggers = self.time_triggers
+    now = local(2017, 6, 2, 6, 0)
+    self.time_triggers.add('automation_a', [{'hour': 7, 'minute': 0, 'weekdays': [5]}], now)
+    self.time_triggers.add('automation_b', [{'hour': 7, 'minute': 0, 'weekdays': [5]}], now)
+    subscriptions.change_subscriber_id('automation_a', 'automation_c')
+    subscriptions.delete_all_subscriptions('automation_b')
+    self.assertListEqual(self.time_triggers.pop_due(local(2017, 6, 2, 7, 0)), ['automation_c'])
+    self.assertEqual(len(self.time_triggers), 1)
+
+
+class TestTimeTriggerSubscriptions(unittest.TestCase):
+  @patch('Firefly.core.Firefly')
+  def setUp(self, firefly):
+    self.firefly = firefly
+    self.firefly.subscriptions = Subscriptions()
+
+  def test_time_trigger_registered_with_location(self):
+    time_action = [{'hour': 7, 'minute': 0, 'weekdays': [1, 2, 3, 4, 5]}]
+    TriggerSet(self.firefly, 'automation_a', [Trigger(TIME, time_action)])
+    self.firefly.location.add_time_trigger.assert_called_once_with('automation_a', time_action)
+    self.assertListEqual(self.firefly.subscriptions.get_subscribers(TIME), [])
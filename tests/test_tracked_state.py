@@ -0,0 +1,138 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from Firefly.const import ACTION_OFF, ACTION_ON, EVENT_TYPE_BROADCAST, LEVEL, SWITCH
+from Firefly.helpers.device.device import Device
+from Firefly.helpers.events import Command, Event
+from Firefly.helpers.groups.groups import Group
+
+
+class FakeSwitch(Device):
+  def __init__(self, firefly, **kwargs):
+    initial_values = {
+      '_switch': ACTION_OFF,
+      '_level':  0,
+      '_watts':  0.0
+    }
+    super().__init__(firefly, 'test.fake_switch', 'Fake Switch', 'test', [], [], 'switch',
+                     initial_values=initial_values, ff_id='fake_switch', alias='fake switch', **kwargs)
+    self.level_reads = 0
+    self.add_command('update', self.update)
+    self.add_request(SWITCH, self.get_switch)
+    self.add_request(LEVEL, self.get_level)
+    self.add_request('watts', self.get_watts)
+    self.add_request('BIG_VALUE', self.get_watts)
+
+  def update(self, **kwargs):
+    for prop, value in kwargs.items():
+      self.__setattr__('_%s' % prop, value)
+
+  def get_switch(self, **kwargs):
+    return self._switch
+
+  def get_level(self, **kwargs):
+    self.level_reads += 1
+    return self._level
+
+  def get_watts(self, **kwargs):
+    return self._watts
+
+  @property
+  def computed(self):
+    return '%s-%s' % (self._switch, self._level)
+
+  def get_computed(self, **kwargs):
+    return self.computed
+
+
+class TestTrackedState(unittest.TestCase):
+  @patch('Firefly.core.Firefly')
+  def setUp(self, firefly):
+    self.firefly = firefly
+    self.firefly.components = {}
+    self.device = FakeSwitch(self.firefly)
+
+  def command(self, **kwargs):
+    self.firefly.send_event.reset_mock()
+    self.device.command(Command(self.device.id, 'test', 'update', **kwargs))
+
+  def sent(self):
+    self.assertEqual(self.firefly.send_event.call_count, 1)
+    return self.firefly.send_event.call_args[0][0].event_action
+
+  def test_broadcast_changed_only(self):
+    self.command(switch=ACTION_ON)
+    self.assertDictEqual(self.sent(), {SWITCH: ACTION_ON})
+
+  def test_no_change_no_broadcast(self):
+    self.command(switch=ACTION_OFF)
+    self.firefly.send_event.assert_not_called()
+
+  def test_unchanged_requests_not_evaluated(self):
+    self.command(switch=ACTION_ON)
+    reads = self.device.level_reads
+    self.command(switch=ACTION_OFF)
+    self.assertEqual(self.device.level_reads, reads)
+    self.command(level=50)
+    self.assertDictEqual(self.sent(), {LEVEL: 50})
+
+  def test_floats_rounded(self):
+    self.command(watts=1.23456)
+    self.assertDictEqual(self.sent(), {'watts': 1.23})
+
+  def test_silent_change_not_broadcast(self):
+    self.command(switch=ACTION_ON)
+    self.device._level = 10
+    self.command(switch=ACTION_OFF)
+    self.assertDictEqual(self.sent(), {SWITCH: ACTION_OFF})
+
+  def test_untracked_request(self):
+    self.device.add_request('computed', self.device.get_computed)
+    self.command(level=20)
+    self.assertDictEqual(self.sent(), {LEVEL: 20, 'computed': '%s-20' % ACTION_OFF})
+
+  def test_member_set(self):
+    self.firefly.send_event.reset_mock()
+    self.device.member_set('_switch', ACTION_ON)
+    self.assertDictEqual(self.sent(), {SWITCH: ACTION_ON})
+
+  def test_same_as_full_diff(self):
+    for kwargs in [{'switch': ACTION_ON, 'level': 10}, {'watts': 2.5}, {'level': 10}, {'switch': ACTION_OFF}]:
+      before = self.device.get_all_request_values(True)
+      self.command(**kwargs)
+      after = self.device.get_all_request_values(True)
+      expected = {k: v for k, v in after.items() if before.get(k) != v}
+      if expected:
+        self.assertDictEqual(self.sent(), expected)
+      else:
+        self.firefly.send_event.assert_not_called()
+
+
+class TestGroupTrackedState(unittest.TestCase):
+  @patch('Firefly.core.Firefly')
+  def setUp(self, firefly):
+    self.firefly = firefly
+    light = MagicMock()
+    light.tags = ['light', 'dimmer']
+    light.request.return_value = None
+    motion = MagicMock()
+    motion.tags = ['motion']
+    motion.request.return_value = None
+    self.firefly.components = {
+      'light':  light,
+      'motion': motion
+    }
+    self.group = Group(self.firefly, 'test group', ff_id='test_group', devices=['light', 'motion'])
+
+  def test_group_event(self):
+    self.group.event(Event('light', EVENT_TYPE_BROADCAST, {SWITCH: ACTION_ON, LEVEL: 100}))
+    self.firefly.send_event.assert_called_once()
+    self.assertDictEqual(self.firefly.send_event.call_args[0][0].event_action, {
+      'light':  ACTION_ON,
+      'dimmer': 100
+    })
+
+  def test_group_event_only_affected_requests(self):
+    self.group.event(Event('light', EVENT_TYPE_BROADCAST, {SWITCH: ACTION_ON, LEVEL: 100}))
+    self.assertListEqual(self.group.get_changed_requests('motion', {'motion': 'active'}), ['motion'])
+    self.assertListEqual(self.group.get_changed_requests('light', {LEVEL: 50}), ['dimmer'])
@@ -1,7 +1,7 @@
 import unittest
 from unittest.mock import patch
 
-from Firefly.automation.triggers import Trigger, Triggers
+from Firefly.automation.triggers import Trigger, Triggers, compile_trigger
 from Firefly.const import EVENT_ACTION_ANY, EVENT_ACTION_OFF, EVENT_ACTION_ON, EVENT_SUNRISE, EVENT_SUNSET, EVENT_TYPE_BROADCAST, SOURCE_LOCATION, STATE, TEMPERATURE, TIME
 from Firefly.helpers.events import Event
 from Firefly.helpers.subscribers import Subscriptions
@@ -1716,3 +1716,108 @@ class TestTriggers(unittest.TestCase):
     self.firefly.update_current_state(event)
     triggered = triggers.check_triggers(event)
     self.assertTrue(triggered)
+
+  def test_get_trigger_sets_index(self):
+    triggers = Triggers(self.firefly, self.trigger_id)
+    triggers.add_trigger(Trigger(self.device, {
+      STATE: [EVENT_ACTION_ON]
+    }))
+    triggers.add_trigger([Trigger(self.device_b, {
+      TEMPERATURE: [{
+        'gt': 70
+      }]
+    }), Trigger(self.device, {
+      STATE: [EVENT_ACTION_ON]
+    })])
+    triggers.add_trigger(Trigger(self.device_b))
+    triggers.add_trigger(Trigger(TIME, [{
+      'hour':     6,
+      'minute':   0,
+      'weekdays': [1, 2, 3, 4]
+    }]))
+    state_sets = triggers.get_trigger_sets(Event(self.device, EVENT_TYPE_BROADCAST, {
+      STATE: EVENT_ACTION_OFF
+    }))
+    self.assertListEqual(state_sets, [triggers.trigger_list[0]])
+    temperature_sets = triggers.get_trigger_sets(Event(self.device_b, EVENT_TYPE_BROADCAST, {
+      TEMPERATURE: 71
+    }))
+    self.assertListEqual(temperature_sets, triggers.trigger_list[1:3])
+    self.assertListEqual(triggers.get_trigger_sets(Event(TIME, EVENT_TYPE_BROADCAST, {
+      'hour': 6
+    })), [triggers.trigger_list[3]])
+    self.assertListEqual(triggers.get_trigger_sets(Event(self.app, EVENT_TYPE_BROADCAST, {
+      STATE: EVENT_ACTION_OFF
+    })), [])
+
+  def test_compiled_triggers_match_check_trigger(self):
+    self.firefly.current_state = {
+      self.device:   {
+        STATE:       EVENT_ACTION_ON,
+        TEMPERATURE: 72
+      },
+      self.device_b: {
+        STATE:       EVENT_ACTION_OFF,
+        TEMPERATURE: 60
+      }
+    }
+    trigger_list = [
+      Trigger(self.device, {
+        STATE: [EVENT_ACTION_ON]
+      }),
+      Trigger(self.device_b, {
+        STATE: [EVENT_ACTION_ANY]
+      }),
+      Trigger(self.device),
+      Trigger(self.device, {
+        TEMPERATURE: [{
+          'gt': 70
+        }, {
+          'le': 80
+        }]
+      }),
+      Trigger(SOURCE_LOCATION, {
+        SOURCE_LOCATION: [EVENT_SUNRISE]
+      }),
+      Trigger(TIME, [{
+        'hour':     6,
+        'minute':   0,
+        'weekdays': [1, 2, 3, 4]
+      }])
+    ]
+    events = [
+      Event(self.device, EVENT_TYPE_BROADCAST, {
+        STATE: EVENT_ACTION_ON
+      }),
+      Event(self.device, EVENT_TYPE_BROADCAST, {
+        TEMPERATURE: 75
+      }),
+      Event(self.device_b, EVENT_TYPE_BROADCAST, {
+        TEMPERATURE: 90
+      }),
+      Event(self.device_b, EVENT_TYPE_BROADCAST, {
+        STATE: EVENT_ACTION_OFF
+      }),
+      Event(SOURCE_LOCATION, EVENT_TYPE_BROADCAST, {
+        SOURCE_LOCATION: EVENT_SUNRISE
+      }),
+      Event(TIME, EVENT_TYPE_BROADCAST, {
+        'day':     1,
+        'month':   4,
+        'hour':    6,
+        'minute':  0,
+        'weekday': 1
+      })
+    ]
+    for trigger in trigger_list:
+      check = compile_trigger(trigger)
+      for event in events:
+        for ignore_event in [False, True]:
+          if trigger.trigger_type == 'number' and ignore_event is False and \
+              list(event.event_action.keys()) != [TEMPERATURE]:
+            # Trigger.check_trigger raises an error here, the compiled trigger does not match.
+            self.assertFalse(check(self.firefly, event, ignore_event))
+            continue
+          self.assertEqual(check(self.firefly, event, ignore_event),
+                           trigger.check_trigger(self.firefly, event, ignore_event),
+                           '%s %s %s' % (trigger, event, ignore_event))
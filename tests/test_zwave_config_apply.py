@@ -0,0 +1,184 @@
+import unittest
+
+from Firefly.components.zwave.config_apply import (PARAM_FAILED, PARAM_PENDING, PARAM_SENT, PARAM_VERIFIED,
+                                                   ConfigApplyEngine, config_value)
+from Firefly.util.zwave_command_class import COMMAND_CLASS_CONFIGURATION, COMMAND_CLASS_METER
+
+
+class FakeScheduler(object):
+  def __init__(self):
+    self.jobs = {}
+
+  def runInS(self, delay, function, job_id=None):
+    self.jobs[job_id] = (delay, function)
+
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+
+class Node(object):
+  def __init__(self, node_id, awake=True):
+    self.node_id = node_id
+    self.is_awake = awake
+    self.writes = []
+
+  def set_config_param(self, index, value, size=2):
+    self.writes.append((index, value, size))
+
+
+class Value(object):
+  def __init__(self, index, data, command_class=COMMAND_CLASS_CONFIGURATION):
+    self.index = index
+    self.data = data
+    self.command_class = command_class
+
+
+class ListValue(Value):
+  """List value as openzwave reports it: the data is the label of the selected item."""
+
+  def __init__(self, index, label, items, network=None):
+    super().__init__(index, label)
+    self.value_id = 72057594000000000 + index
+    self.type = 'List'
+    self.data_items = items
+    if network is not None:
+      self._network = network
+
+
+class Manager(object):
+  def __init__(self, selections):
+    self.selections = selections
+
+  def getValueListSelectionNum(self, value_id):
+    return self.selections[value_id]
+
+
+class Network(object):
+  def __init__(self, selections):
+    self.manager = Manager(selections)
+
+
+class TestConfigValue(unittest.TestCase):
+  def test_plain(self):
+    self.assertEqual(config_value(Value(110, 1)), 1)
+    self.assertEqual(config_value(Value(110, '7')), 7)
+
+  def test_list_from_manager(self):
+    value = ListValue(110, 'Enabled', {'Disabled', 'Enabled'}, Network({72057594000000110: 255}))
+    self.assertEqual(config_value(value), 255)
+
+  def test_list_from_items(self):
+    self.assertEqual(config_value(ListValue(110, 'Enabled', ['Disabled', 'Enabled'])), 1)
+    self.assertEqual(config_value(ListValue(110, 'Unknown', ['Disabled', 'Enabled'])), 'Unknown')
+
+
+class TestConfigApplyEngine(unittest.TestCase):
+  def setUp(self):
+    self.scheduler = FakeScheduler()
+    self.clock = FakeClock()
+    self.engine = ConfigApplyEngine(self.scheduler, batch_size=2, batch_gap=1, retry_delay=30, max_attempts=3,
+                                    clock=self.clock)
+    self.node = Node(4)
+
+  def state(self, index, node_id=4):
+    return self.engine._queues[node_id].params[index].state
+
+  def test_batches(self):
+    self.engine.queue(self.node, [(110, 1), (100, 1), (80, 2, 1)])
+    self.assertEqual(self.scheduler.jobs['ZWAVE_CONFIG_APPLY'][0], 0)
+
+    self.engine.tick()
+    self.assertEqual(self.node.writes, [(110, 1, 2), (100, 1, 2)])
+    self.assertEqual(self.scheduler.jobs['ZWAVE_CONFIG_APPLY'][0], 1)
+
+    self.clock.now += 1
+    self.engine.tick()
+    self.assertEqual(self.node.writes[2:], [(80, 2, 1)])
+    self.assertEqual(self.engine.progress(4)[PARAM_SENT], 3)
+
+  def test_nodes_take_turns(self):
+    other = Node(5)
+    self.engine.queue(self.node, [(1, 1), (2, 1), (3, 1)])
+    self.engine.queue(other, [(1, 1)])
+    self.engine.tick()
+    self.engine.tick()
+    self.engine.tick()
+    self.assertEqual(len(self.node.writes), 3)
+    self.assertEqual(other.writes, [(1, 1, 2)])
+    self.assertEqual(self.node.writes[2], (3, 1, 2))
+
+  def test_verified_from_report(self):
+    self.engine.queue(self.node, [(110, 1), (100, 1)])
+    self.engine.tick()
+    self.engine.value_reported(4, Value(110, 1))
+    self.engine.value_reported(4, Value(100, 0))
+    self.engine.value_reported(4, Value(100, 1, COMMAND_CLASS_METER))
+    self.assertEqual(self.state(110), PARAM_VERIFIED)
+    self.assertEqual(self.state(100), PARAM_SENT)
+    self.assertEqual(self.engine.reported(4, 100), 0)
+    progress = self.engine.progress(4)
+    self.assertEqual((progress['total'], progress[PARAM_VERIFIED], progress['done']), (2, 1, False))
+
+  def test_verified_from_list_report(self):
+    self.engine.queue(self.node, [(110, 1)])
+    self.engine.tick()
+    self.engine.value_reported(4, ListValue(110, 'Enabled', ['Disabled', 'Enabled']))
+    self.assertEqual(self.state(110), PARAM_VERIFIED)
+    self.assertEqual(self.engine.reported(4, 110), 1)
+
+  def test_already_reported(self):
+    self.engine.value_reported(4, Value(110, 1))
+    self.engine.queue(self.node, [(110, 1)])
+    self.assertEqual(self.state(110), PARAM_VERIFIED)
+    self.assertTrue(self.engine.progress(4)['done'])
+    self.engine.tick()
+    self.assertEqual(self.node.writes, [])
+
+  def test_requeue_keeps_attempts(self):
+    self.engine.queue(self.node, [(110, 1)])
+    self.engine.tick()
+    self.engine.queue(self.node, [(110, 1)])
+    self.engine.tick()
+    self.assertEqual(len(self.node.writes), 1)
+
+    self.engine.queue(self.node, [(110, 2)])
+    self.assertEqual(self.state(110), PARAM_PENDING)
+
+  def test_retry_backoff_and_fail(self):
+    self.engine.queue(self.node, [(110, 1)])
+    self.engine.tick()
+    self.assertEqual(self.scheduler.jobs['ZWAVE_CONFIG_APPLY'][0], 30)
+
+    self.clock.now += 30
+    self.engine.tick()
+    self.assertEqual(len(self.node.writes), 2)
+    self.assertEqual(self.scheduler.jobs['ZWAVE_CONFIG_APPLY'][0], 60)
+
+    self.clock.now += 60
+    self.engine.tick()
+    self.clock.now += 120
+    self.engine.tick()
+    self.assertEqual(len(self.node.writes), 3)
+    self.assertEqual(self.state(110), PARAM_FAILED)
+    self.assertTrue(self.engine.progress(4)['done'])
+
+  def test_sleeping_node_not_rewritten(self):
+    self.engine.queue(self.node, [(110, 1)])
+    self.engine.tick()
+    self.node.is_awake = False
+    self.clock.now += 30
+    self.engine.tick()
+    self.assertEqual(len(self.node.writes), 1)
+    self.assertEqual(self.engine._queues[4].params[110].attempts, 1)
+
+  def test_forget(self):
+    self.engine.queue(self.node, [(110, 1)])
+    self.engine.value_reported(4, Value(100, 1))
+    self.engine.forget(4)
+    self.assertEqual(self.engine.all_progress(), {})
+    self.assertIsNone(self.engine.reported(4, 100))
@@ -0,0 +1,225 @@
+import asyncio
+import random
+import unittest
+from unittest.mock import patch
+
+from Firefly.components.zwave.poller import (PRIORITY_ACTIVE, PRIORITY_BATTERY, PRIORITY_FAILED, PRIORITY_MAINS,
+                                             ZwavePoller, wake_up_interval)
+from Firefly.util.zwave_command_class import COMMAND_CLASS_WAKE_UP
+
+
+class FakeValue(object):
+  def __init__(self, command_class, label, data):
+    self.command_class = command_class
+    self.label = label
+    self.data = data
+
+
+class FakeNode(object):
+  def __init__(self, node_id, mains=True, failed=False, awake=True, values=None):
+    self.node_id = node_id
+    self.is_listening_device = mains
+    self.is_frequent_listening_device = False
+    self.is_failed = failed
+    self.is_awake = awake
+    self.values = values or {}
+    self.state_requests = 0
+    self.info_requests = 0
+
+  def request_state(self):
+    self.state_requests += 1
+
+  def refresh_info(self):
+    self.info_requests += 1
+
+
+class FakeController(object):
+  def __init__(self):
+    self.node_id = 1
+    self.failed_checks = []
+
+  def has_node_failed(self, node_id):
+    self.failed_checks.append(node_id)
+
+
+class FakeNetwork(object):
+  def __init__(self, nodes):
+    self.controller = FakeController()
+    self.nodes = dict((node.node_id, node) for node in nodes)
+
+
+class FakeLoop(object):
+  def __init__(self):
+    self.now = 1000.0
+
+  def time(self):
+    return self.now
+
+  def call_soon_threadsafe(self, callback, *args):
+    callback(*args)
+
+
+class TestWakeUpInterval(unittest.TestCase):
+  def test_reads_value(self):
+    node = FakeNode(2, mains=False, values={1: FakeValue(COMMAND_CLASS_WAKE_UP, 'Wake-up Interval', 600)})
+    self.assertEqual(wake_up_interval(node), 600)
+
+  def test_default(self):
+    self.assertEqual(wake_up_interval(FakeNode(2, mains=False)), 3600)
+
+
+class TestZwavePoller(unittest.TestCase):
+  def setUp(self):
+    self.nodes = {
+      'controller': FakeNode(1),
+      'mains':      FakeNode(2),
+      'battery':    FakeNode(3, mains=False, awake=False),
+      'failed':     FakeNode(4, failed=True),
+      'ignored':    FakeNode(5),
+    }
+    self.network = FakeNetwork(self.nodes.values())
+    self.loop = FakeLoop()
+    self.poller = ZwavePoller(self.network, self.loop, ignore_nodes=[5], jitter=0, startup_spread=0,
+                              rng=random.Random(0))
+    self.poller.sync_nodes()
+
+  def test_sync_nodes(self):
+    self.assertEqual(self.poller.due(2), 1000)
+    self.assertEqual(self.poller.due(4), 1000)
+    self.assertIsNone(self.poller.due(1))
+    self.assertIsNone(self.poller.due(3))
+    self.assertIsNone(self.poller.due(5))
+
+    del self.network.nodes[2]
+    self.poller.sync_nodes()
+    self.assertIsNone(self.poller.due(2))
+
+  def test_priority(self):
+    now = self.loop.time()
+    self.assertEqual(self.poller.priority(2, now), PRIORITY_MAINS)
+    self.assertEqual(self.poller.priority(3, now), PRIORITY_BATTERY)
+    self.assertEqual(self.poller.priority(4, now), PRIORITY_FAILED)
+    self.poller.node_active(2)
+    self.assertEqual(self.poller.priority(2, now), PRIORITY_ACTIVE)
+    self.assertEqual(self.poller.priority(2, now + self.poller.active_window), PRIORITY_MAINS)
+
+  def test_next_node(self):
+    self.assertEqual(self.poller.next_node(1000), 2)
+    self.poller.poll(2, 1000)
+    self.assertEqual(self.poller.next_node(1000), 4)
+    self.poller.poll(4, 1000)
+    self.assertIsNone(self.poller.next_node(1000))
+
+  def test_poll_mains(self):
+    node = self.nodes['mains']
+    self.poller.poll(2, 1000)
+    self.assertEqual((node.state_requests, node.info_requests), (1, 1))
+    self.assertEqual(self.poller.due(2), 1000 + self.poller.mains_interval)
+
+    self.poller.poll(2, 2000)
+    self.assertEqual((node.state_requests, node.info_requests), (2, 1))
+
+  def test_active_node_polled_sooner(self):
+    self.poller.poll(2, 1000)
+    self.poller.node_active(2)
+    self.assertEqual(self.poller.due(2), 1000 + self.poller.active_interval)
+    self.poller.poll(2, 1000)
+    self.assertEqual(self.poller.due(2), 1000 + self.poller.active_interval)
+
+  def test_node_active_while_polled(self):
+    class PoppedDue(dict):
+      # poll() on the loop pops the entry between the check and the read.
+      def __contains__(self, node_id):
+        self.pop(node_id, None)
+        return True
+
+    self.poller.poll(2, 1000)
+    self.poller._due = PoppedDue(self.poller._due)
+    self.poller.node_active(2)
+    self.assertEqual(self.poller.due(2), 1000 + self.poller.active_interval)
+
+  def test_poll_error(self):
+    def fail():
+      raise RuntimeError('no route')
+
+    self.nodes['mains'].request_state = fail
+    self.poller.poll(2, 1000)
+    self.assertEqual(self.poller.due(2), 1000 + self.poller.mains_interval)
+
+  def test_battery_wake_up(self):
+    node = self.nodes['battery']
+    node.values = {1: FakeValue(COMMAND_CLASS_WAKE_UP, 'Wake-up Interval', 600)}
+    node.is_awake = True
+    self.poller.node_active(3)
+    self.assertEqual(self.poller.due(3), 1000)
+    self.poller.poll(3, 1000)
+    self.assertEqual(node.state_requests, 1)
+    self.assertIsNone(self.poller.due(3))
+
+    # Reports inside the wake-up interval do not poll again.
+    self.loop.now = 1300
+    self.poller.node_active(3)
+    self.assertIsNone(self.poller.due(3))
+
+    self.loop.now = 1600
+    self.poller.node_active(3)
+    self.assertEqual(self.poller.due(3), 1600)
+
+  def test_sleeping_battery_not_polled(self):
+    self.poller.poll_all()
+    self.poller.poll(3, 1000)
+    self.assertEqual(self.nodes['battery'].state_requests, 0)
+    self.assertIsNone(self.poller.due(3))
+
+  def test_failed_node_sweep(self):
+    self.poller.poll(4, 1000)
+    self.assertEqual(self.network.controller.failed_checks, [4])
+    self.assertEqual(self.nodes['failed'].state_requests, 0)
+    self.assertEqual(self.poller.due(4), 1000 + self.poller.dead_sweep_interval)
+
+    self.poller.sweep_failed()
+    self.assertEqual(self.poller.due(4), 1000)
+    self.assertIsNone(self.poller.next_node(999))
+
+
+class TestZwavePollerTask(unittest.TestCase):
+  def test_run(self):
+    loop = asyncio.new_event_loop()
+    self.addCleanup(loop.close)
+    nodes = [FakeNode(node_id) for node_id in range(2, 6)]
+    poller = ZwavePoller(FakeNetwork(nodes), loop, poll_gap=0.01, startup_spread=0, jitter=0)
+
+    async def run():
+      poller.start()
+      await asyncio.sleep(0.2, loop=loop)
+      poller.stop()
+
+    loop.run_until_complete(run())
+    self.assertEqual([node.state_requests for node in nodes], [1, 1, 1, 1])
+    self.assertEqual(poller.polls, 4)
+
+  @patch('Firefly.components.zwave.poller.logging')
+  def test_run_survives_errors(self, logging):
+    loop = asyncio.new_event_loop()
+    self.addCleanup(loop.close)
+    nodes = [FakeNode(node_id) for node_id in range(2, 4)]
+    network = FakeNetwork(nodes)
+    poller = ZwavePoller(network, loop, poll_gap=0.01, startup_spread=0, jitter=0)
+    errors = [RuntimeError('dictionary changed size during iteration')]
+
+    def sync_nodes():
+      if errors:
+        raise errors.pop()
+      ZwavePoller.sync_nodes(poller)
+
+    poller.sync_nodes = sync_nodes
+
+    async def run():
+      poller.start()
+      await asyncio.sleep(0.2, loop=loop)
+      poller.stop()
+
+    loop.run_until_complete(run())
+    self.assertEqual(logging.error.call_count, 1)
+    self.assertEqual(logging.error.call_args[1]['code'], 'FF.ZWA.POL.002')
+    self.assertEqual(poller.polls, 2)
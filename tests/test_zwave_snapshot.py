@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import unittest
+
+from Firefly.components.zwave.snapshot import SNAPSHOT_VERSION, ZwaveSnapshot
+
+
+class Value(object):
+  def __init__(self, value_id, index, label, data, command_class=37):
+    self.value_id = value_id
+    self.index = index
+    self.label = label
+    self.data = data
+    self.command_class = command_class
+    self.type = 'Bool'
+    self.genre = 'User'
+
+
+class Node(object):
+  def __init__(self, node_id, values):
+    self.node_id = node_id
+    self.manufacturer_id = '0x0063'
+    self.manufacturer_name = 'GE'
+    self.product_name = 'Switch'
+    self.product_type = '0x4952'
+    self.is_listening_device = True
+    self.is_frequent_listening_device = False
+    self._values = dict((value.value_id, value) for value in values)
+
+  def get_values(self):
+    return self._values
+
+
+class Device(object):
+  def __init__(self, ff_id):
+    self.id = ff_id
+    self.hydrated = None
+
+  def hydrate_from_snapshot(self, node_id, entry):
+    self.hydrated = (node_id, entry)
+
+
+class TestZwaveSnapshot(unittest.TestCase):
+  def setUp(self):
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.path = os.path.join(directory.name, 'zwave_snapshot.json')
+    self.snapshot = ZwaveSnapshot(self.path)
+    self.node = Node(4, [Value(101, 0, 'Switch', True), Value(102, 1, 'Power', 12.5, 50)])
+
+  def test_round_trip(self):
+    self.snapshot.capture_node(self.node, 'switch-1', {'Switch': 101})
+    self.assertTrue(self.snapshot.save())
+
+    snapshot = ZwaveSnapshot(self.path)
+    self.assertTrue(snapshot.load())
+    entry = snapshot.get(4)
+    self.assertEqual(entry['ff_id'], 'switch-1')
+    self.assertEqual(entry['product_name'], 'Switch')
+    self.assertEqual(entry['value_map'], {'Switch': 101})
+    self.assertEqual(entry['values']['102'], [1, 'Power', 12.5, 50, 'Bool', 'User'])
+
+    # Capturing the same values again does not write the file.
+    snapshot.capture_node(self.node, 'switch-1', {'Switch': 101})
+    self.assertFalse(snapshot.save())
+
+  def test_update_value(self):
+    self.snapshot.update_value(4, Value(101, 0, 'Switch', False))
+    self.assertFalse(self.snapshot.dirty)
+
+    self.snapshot.capture_node(self.node, 'switch-1', {})
+    self.snapshot.save()
+    self.snapshot.update_value(4, Value(101, 0, 'Switch', True))
+    self.assertFalse(self.snapshot.dirty)
+    self.snapshot.update_value(4, Value(101, 0, 'Switch', False))
+    self.assertTrue(self.snapshot.dirty)
+    self.assertEqual(self.snapshot.get(4)['values']['101'][2], False)
+
+  def test_value_map_and_forget(self):
+    self.snapshot.capture_node(self.node, 'switch-1', {})
+    self.snapshot.save()
+    self.snapshot.set_value_map(4, {'Switch': 101})
+    self.assertTrue(self.snapshot.save())
+    self.snapshot.forget(4)
+    self.assertEqual(len(self.snapshot), 0)
+    self.assertTrue(self.snapshot.dirty)
+
+  def test_unsupported_data(self):
+    self.snapshot.capture_node(Node(5, [Value(201, 0, 'Raw', b'\x01')]), 'raw-1', {})
+    self.assertIsNone(self.snapshot.get(5)['values']['201'][2])
+
+  def test_bad_files(self):
+    self.assertFalse(self.snapshot.load())
+    with open(self.path, 'w') as f:
+      json.dump({'version': SNAPSHOT_VERSION + 1, 'nodes': {'4': {}}}, f)
+    self.assertFalse(self.snapshot.load())
+    with open(self.path, 'w') as f:
+      f.write('{not json')
+    self.assertFalse(self.snapshot.load())
+    self.assertEqual(len(self.snapshot), 0)
+
+  def test_hydrate(self):
+    self.snapshot.capture_node(self.node, 'switch-1', {'Switch': 101})
+    self.snapshot.capture_node(Node(6, []), 'switch-old', {})
+    device = Device('switch-1')
+    moved = Device('switch-2')
+    components = {device.id: device, moved.id: moved}
+
+    hydrated = self.snapshot.hydrate(components, {'4': 'switch-1', '6': 'switch-2', '7': 'switch-3'})
+    self.assertEqual(hydrated, [(4, device)])
+    self.assertEqual(device.hydrated[1]['value_map'], {'Switch': 101})
+    # The node now belongs to another device, so its snapshot is stale.
+    self.assertIsNone(moved.hydrated)
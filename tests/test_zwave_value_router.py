@@ -0,0 +1,123 @@
+import unittest
+
+from Firefly.components.zwave.value_router import ValueRouter
+
+
+class Value(object):
+  def __init__(self, value_id, label, data):
+    self.value_id = value_id
+    self.label = label
+    self.data = data
+
+
+class Device(object):
+  """Device with the parts of ZwaveDevice the router uses."""
+
+  def __init__(self, ff_id, value_map):
+    self.id = ff_id
+    self.value_map = value_map
+    self.node = None
+    self.values = {}
+    self.applied = 0
+
+  def value_routes(self):
+    return {'Switch': 'switch', 'Battery Level': 'battery', 'Level': self.update_level}
+
+  def update_level(self, value):
+    self.values['level'] = value.data
+
+  def update_values(self, **kwargs):
+    self.values.update(kwargs)
+
+  def apply_zwave_value(self, handler, value):
+    self.applied += 1
+    handler(value)
+
+
+class TestValueRouter(unittest.TestCase):
+  def setUp(self):
+    self.device = Device('switch-1', {'Switch': 101, 'Level': 102, 'Power': 103})
+    self.components = {self.device.id: self.device}
+    self.router = ValueRouter(self.components)
+
+  def test_learn(self):
+    self.assertEqual(self.router.learn(4, self.device), 2)
+    self.assertEqual(len(self.router), 2)
+
+  def test_route(self):
+    self.router.learn(4, self.device)
+    self.assertTrue(self.router.route(4, Value(101, 'Switch', True)))
+    self.assertTrue(self.router.route(4, Value(102, 'Level', 40)))
+    self.assertEqual(self.device.values, {'switch': True, 'level': 40})
+    self.assertEqual(self.device.applied, 2)
+    self.assertEqual(self.router.routed, 2)
+
+  def test_miss(self):
+    self.router.learn(4, self.device)
+    # No handler for Power and value ids are per node.
+    self.assertFalse(self.router.route(4, Value(103, 'Power', 12.5)))
+    self.assertFalse(self.router.route(5, Value(101, 'Switch', True)))
+    self.assertEqual(self.router.missed, 2)
+    self.assertEqual(self.device.values, {})
+
+  def test_relearn(self):
+    self.router.learn(4, self.device)
+    self.device.value_map['Battery Level'] = 104
+    self.assertFalse(self.router.route(4, Value(104, 'Battery Level', 90)))
+    self.router.learn(4, self.device)
+    self.assertTrue(self.router.route(4, Value(104, 'Battery Level', 90)))
+    self.assertEqual(self.device.values, {'battery': 90})
+
+  def test_relearn_only_when_value_map_grew(self):
+    self.router.learn(4, self.device)
+    self.assertFalse(self.router.relearn(4, self.device))
+    self.device.value_map['Battery Level'] = 104
+    self.assertTrue(self.router.relearn(4, self.device))
+    self.assertFalse(self.router.relearn(4, self.device))
+    self.assertTrue(self.router.route(4, Value(104, 'Battery Level', 90)))
+    self.assertTrue(self.router.relearn(4, Device('switch-1', {'Switch': 101})))
+
+  def test_requests_only_until_node(self):
+    self.assertEqual(self.router.learn(4, self.device, requests_only=True), 1)
+    self.assertFalse(self.router.route(4, Value(102, 'Level', 40)))
+    self.assertFalse(self.router.relearn(4, self.device))
+    self.device.node = object()
+    self.assertTrue(self.router.relearn(4, self.device))
+    self.assertTrue(self.router.route(4, Value(102, 'Level', 40)))
+    self.assertFalse(self.router.relearn(4, self.device))
+    self.assertEqual(self.device.values, {'level': 40})
+
+  def test_device_removed(self):
+    self.router.learn(4, self.device)
+    self.components['switch-1'] = Device('switch-1', {})
+    self.assertFalse(self.router.route(4, Value(101, 'Switch', True)))
+    self.assertEqual(len(self.router), 0)
+
+  def test_forget(self):
+    self.router.learn(4, self.device)
+    self.router.forget(4)
+    self.assertFalse(self.router.route(4, Value(101, 'Switch', True)))
+
+  def test_handler_error(self):
+    def fail(**kwargs):
+      raise ValueError('bad value')
+    self.device.update_values = fail
+    self.router.learn(4, self.device)
+    self.assertFalse(self.router.route(4, Value(101, 'Switch', True)))
+
+  def test_through_command_executor(self):
+    calls = []
+
+    class Commands(object):
+      def submit_call(self, ff_id, function, *args):
+        calls.append((ff_id, function, args))
+        return True
+
+    router = ValueRouter(self.components, Commands())
+    router.learn(4, self.device)
+    self.assertTrue(router.route(4, Value(101, 'Switch', True)))
+    self.assertEqual(self.device.values, {})
+    ff_id, function, args = calls[0]
+    self.assertEqual(ff_id, 'switch-1')
+    self.assertTrue(function(*args))
+    self.assertEqual(self.device.values, {'switch': True})
@@ -0,0 +1,66 @@
+import unittest
+
+from Firefly.components.zwave.value_table import VALUE_FIELDS, ZwavePrarmValue, ZwaveValueTable
+
+
+def label(name):
+  # openzwave hands out a new string object for every value.
+  return ''.join(list(name))
+
+
+class TestZwavePrarmValue(unittest.TestCase):
+  def test_fields(self):
+    value = ZwavePrarmValue(3, 'Power', 101, 12.5, 0x32, 'Decimal', 'User')
+    self.assertEqual(value.to_dict(), {
+      'index':         3,
+      'label':         'Power',
+      'ref':           101,
+      'value':         12.5,
+      'command_class': 'COMMAND_CLASS_METER',
+      'type':          'Decimal',
+      'genre':         'User'
+    })
+    self.assertFalse(hasattr(value, '__dict__'))
+
+  def test_defaults(self):
+    value = ZwavePrarmValue()
+    self.assertIsNone(value.label)
+    self.assertIsNone(value.command_class)
+
+  def test_unknown_command_class(self):
+    self.assertEqual(ZwavePrarmValue(command_class=0x1FF).command_class, 0x1FF)
+
+  def test_interned(self):
+    first = ZwavePrarmValue(1, label('Wake-up Interval'), value_type=label('Int'), genre=label('System'))
+    second = ZwavePrarmValue(1, label('Wake-up Interval'), value_type=label('Int'), genre=label('System'))
+    self.assertIs(first.label, second.label)
+    self.assertIs(first.type, second.type)
+    self.assertIs(first.genre, second.genre)
+
+
+class TestZwaveValueTable(unittest.TestCase):
+  def setUp(self):
+    self.table = ZwaveValueTable()
+    self.table.set(0, 'Switch', 101, True, 0x25, 'Bool', 'User')
+    self.table.set(2, 'Power', 102, 12.5, 0x32, 'Decimal', 'User')
+
+  def test_set_in_place(self):
+    param = self.table[0]
+    self.assertIs(self.table.set(0, 'Switch', 101, False, 0x25, 'Bool', 'User'), param)
+    self.assertEqual(param.value, False)
+    self.table.set(0, 'Level', 103, 40, 0x26, 'Byte', 'User')
+    self.assertEqual((param.label, param.ref, param.command_class), ('Level', 103, 'COMMAND_CLASS_SWITCH_MULTILEVEL'))
+
+  def test_rows(self):
+    rows = self.table.rows()
+    self.assertEqual(len(rows), 2)
+    self.assertEqual(rows[1], self.table[2].to_dict())
+
+  def test_columns(self):
+    columns = self.table.columns()
+    self.assertEqual(tuple(columns), VALUE_FIELDS)
+    self.assertEqual(columns['label'], ['Switch', 'Power'])
+    self.assertEqual(columns['value'], [True, 12.5])
+
+  def test_empty(self):
+    self.assertEqual(ZwaveValueTable().columns(), dict((field, []) for field in VALUE_FIELDS))